@@ -0,0 +1,184 @@
+"""Ad soyad listesinden toplu kullanıcı oluşturma.
+
+Aynı temel kullanıcı adıyla başlayan mevcut adlar tek sorguda okunur ve
+benzersiz ad bellekte seçilir; şifreler ``accounts.passwords`` havuzunda
+hash'lenir ve kullanıcılar ``bulk_create`` ile eklenir. Eşzamanlı bir istek
+aynı adı aldıysa çakışan adlar yeniden seçilip ekleme tekrar denenir.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .models import UserBulkCreateJob
+from .passwords import hash_passwords
+from .user_import import allocate_username, full_name_to_username_base, split_full_name
+
+HASH_CHUNK_SIZE = 50
+LOOKUP_CHUNK_SIZE = 100
+INSERT_ATTEMPTS = 3
+
+
+def parse_lines(lines_raw):
+    if isinstance(lines_raw, str):
+        return [ln.strip() for ln in lines_raw.replace("\r\n", "\n").split("\n") if ln.strip()]
+    if isinstance(lines_raw, list):
+        return [str(ln).strip() for ln in lines_raw if str(ln).strip()]
+    return None
+
+
+def taken_usernames(bases):
+    """Verilen temellerle çakışabilecek mevcut kullanıcı adları (``base`` ve ``base.N``)."""
+    User = get_user_model()
+    bases = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(bases), LOOKUP_CHUNK_SIZE):
+        chunk = bases[start:start + LOOKUP_CHUNK_SIZE]
+        query = Q(username__in=chunk)
+        for base in chunk:
+            query |= Q(username__startswith=f"{base}.")
+        taken.update(User.objects.filter(query).values_list("username", flat=True))
+    return taken
+
+
+def _allocate(entries, taken):
+    """Adları seçer; seçilemeyen satırlar ``errors`` olarak döner ve ``username`` boş kalır."""
+    errors = []
+    for entry in entries:
+        try:
+            entry["username"] = allocate_username(entry["base"], taken.__contains__)
+        except ValueError as exc:
+            entry["username"] = None
+            errors.append({"line": entry["line"], "full_name": entry["full_name"], "detail": str(exc)})
+            continue
+        taken.add(entry["username"])
+    return errors
+
+
+def create_users(organization, lines, role="Worker", branch=None, progress=None):
+    User = get_user_model()
+    entries, errors = [], []
+    for idx, full_name in enumerate(lines, start=1):
+        if not full_name or len(full_name) > 200:
+            errors.append({"line": idx, "full_name": full_name[:50] if full_name else "", "detail": "Geçersiz satır"})
+            continue
+        entries.append({"line": idx, "full_name": full_name, "base": full_name_to_username_base(full_name)[:150]})
+
+    errors += _allocate(entries, taken_usernames(entry["base"] for entry in entries))
+    entries = [entry for entry in entries if entry["username"]]
+    total = len(entries)
+    if progress:
+        progress(0, total)
+    for entry in entries:
+        entry["password"] = get_random_string(12)
+    for start in range(0, total, HASH_CHUNK_SIZE):
+        chunk = entries[start:start + HASH_CHUNK_SIZE]
+        for entry, encoded in zip(chunk, hash_passwords([entry["password"] for entry in chunk])):
+            entry["encoded"] = encoded
+        if progress:
+            progress(start + len(chunk), total)
+
+    users = []
+    for attempt in range(INSERT_ATTEMPTS):
+        users = []
+        for entry in entries:
+            first_name, last_name = split_full_name(entry["full_name"])
+            users.append(
+                User(
+                    username=entry["username"],
+                    password=entry["encoded"],
+                    email="",
+                    first_name=first_name,
+                    last_name=last_name,
+                    role=role,
+                    organization=organization,
+                    branch=branch,
+                )
+            )
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            break
+        except IntegrityError:
+            if attempt == INSERT_ATTEMPTS - 1:
+                raise
+            # Başka bir istek aynı adları almış; yalnızca çakışanları yeniden seç.
+            taken = taken_usernames(entry["base"] for entry in entries)
+            clashing = [entry for entry in entries if entry["username"] in taken]
+            taken.update(entry["username"] for entry in entries)
+            errors += _allocate(clashing, taken)
+            entries = [entry for entry in entries if entry["username"]]
+
+    created = [
+        {
+            "id": user.id,
+            "username": user.username,
+            "password": entry["password"],
+            "full_name": entry["full_name"],
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+        }
+        for user, entry in zip(users, entries)
+    ]
+    errors.sort(key=lambda item: item["line"])
+    return {"created": created, "errors": errors, "summary": f"{len(created)} oluşturuldu, {len(errors)} satır atlandı"}
+
+
+def queue_create_users(organization, lines, role="Worker", branch=None, user=None):
+    job = UserBulkCreateJob.objects.create(
+        organization=organization,
+        created_by=user,
+        branch=branch,
+        role=role,
+        lines=lines,
+        total_rows=len(lines),
+    )
+
+    def _kick():
+        from .tasks import run_bulk_create_users
+
+        run_bulk_create_users.delay(job.id)
+
+    transaction.on_commit(_kick)
+    return job
+
+
+def run_create_users_job(job_id):
+    claimed = UserBulkCreateJob.objects.filter(pk=job_id, status="queued").update(status="running", started_at=timezone.now())
+    if not claimed:
+        return None
+    job = UserBulkCreateJob.objects.select_related("organization", "branch").get(pk=job_id)
+
+    def progress(processed, total):
+        UserBulkCreateJob.objects.filter(pk=job_id).update(processed_rows=processed, total_rows=total)
+
+    try:
+        result = create_users(job.organization, job.lines, role=job.role, branch=job.branch, progress=progress)
+    except Exception as exc:
+        UserBulkCreateJob.objects.filter(pk=job_id).update(status="failed", error=str(exc)[:2000], finished_at=timezone.now())
+        return None
+    UserBulkCreateJob.objects.filter(pk=job_id).update(status="completed", result=result, lines=[], finished_at=timezone.now())
+    return result
+
+
+def job_status(job):
+    """İşin durumu; tamamlanmış işin şifreleri yalnızca ilk okumada döner."""
+    payload = {
+        "id": job.id,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "error": job.error,
+    }
+    if job.status != "completed":
+        return payload
+    scrubbed = {**job.result, "created": [{**row, "password": ""} for row in job.result.get("created", [])]}
+    first_read = job.delivered_at is None and UserBulkCreateJob.objects.filter(pk=job.pk, delivered_at__isnull=True).update(
+        result=scrubbed,
+        delivered_at=timezone.now(),
+    )
+    payload.update(job.result if first_read else scrubbed)
+    payload["passwords_delivered"] = not first_read
+    return payload
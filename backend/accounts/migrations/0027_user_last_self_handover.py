@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:32
+
+from django.db import migrations, models
+
+
+def populate_last_self_handover(apps, schema_editor):
+    Task = apps.get_model('support', 'Task')
+    User = apps.get_model('accounts', 'User')
+    latest = {}
+    tasks = Task.objects.filter(handover_history__contains=[{'type': 'self-initiated'}]).only(
+        'id', 'organization_id', 'handover_history'
+    )
+    for task in tasks.iterator(chunk_size=500):
+        for entry in task.handover_history or []:
+            if not isinstance(entry, dict) or entry.get('type') != 'self-initiated' or not entry.get('by'):
+                continue
+            key = (task.organization_id, entry['by'])
+            if key not in latest or str(entry.get('at') or '') >= str(latest[key].get('at') or ''):
+                latest[key] = {**entry, 'task_id': task.id}
+    for (organization_id, username), entry in latest.items():
+        User.objects.filter(organization_id=organization_id, username=username).update(last_self_handover=entry)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_production_report_template_permissions'),
+        ('support', '0033_task_queue_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='last_self_handover',
+            field=models.JSONField(blank=True, help_text='Son kendi başlattığı görev devri (handover_history kaydı + task_id); self-handover yazar', null=True),
+        ),
+        migrations.RunPython(populate_last_self_handover, migrations.RunPython.noop),
+    ]
@@ -133,11 +133,43 @@ class User(AbstractUser):
     otp_enabled = models.BooleanField(default=False)
     otp_secret = models.CharField(max_length=64, blank=True, default='')
     is_superadmin = models.BooleanField(default=False, help_text='Platform owner/superadmin access')
+    last_self_handover = models.JSONField(
+        null=True,
+        blank=True,
+        help_text='Son kendi başlattığı görev devri (handover_history kaydı + task_id); self-handover yazar',
+    )
 
     def __str__(self):
         return f"{self.username} ({self.role})"
 
 
+class UserBulkCreateJob(models.Model):
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='user_bulk_create_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    branch = models.ForeignKey(Branch, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    role = models.CharField(max_length=20, default='Worker')
+    lines = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued')
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    # Üretilen şifreler sonuç ilk kez okunduğunda silinir (``delivered_at``).
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+
 class Team(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='teams')
     name = models.CharField(max_length=255)
@@ -0,0 +1,111 @@
+"""Toplu şifre hash'leme.
+
+PBKDF2 gibi yavaş hash'ler istek iş parçacığında sırayla hesaplanırsa gevent
+worker'ında diğer isteklerin de beklemesine yol açar. ``hash_passwords``
+hasher ve tuzları ana süreçte hazırlar, ``encode`` çağrılarını sınırlı bir
+süreç havuzunda (``spawn``) çalıştırır. Havuz ``POOL_IDLE_SECONDS`` boyunca
+kullanılmazsa kapatılır. Havuz kullanılamıyorsa (tek CPU, Celery görevi veya
+prefork alt süreci, havuz hatası) hash'ler sırayla hesaplanır.
+"""
+
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+
+PARALLEL_MIN_PASSWORDS = 4
+POOL_IDLE_SECONDS = 60
+
+_pool = {'executor': None, 'workers': 0, 'active': 0, 'timer': None}
+_guard = threading.Lock()
+
+
+def _workers():
+    default = min(4, os.cpu_count() or 1)
+    return max(1, int(getattr(settings, 'PASSWORD_HASH_WORKERS', default) or 1))
+
+
+def _encode(job):
+    hasher, password, salt = job
+    return hasher.encode(password, salt)
+
+
+def _pool_allowed():
+    if multiprocessing.current_process().daemon:
+        return False
+    try:
+        # Celery prefork alt süreçlerini multiprocessing değil billiard izler.
+        import billiard
+        from celery import current_task
+    except ImportError:
+        return True
+    return not billiard.current_process().daemon and not current_task
+
+
+def _cancel_idle_timer():
+    if _pool['timer'] is not None:
+        _pool['timer'].cancel()
+        _pool['timer'] = None
+
+
+def _acquire_executor(workers):
+    with _guard:
+        _cancel_idle_timer()
+        if _pool['executor'] is None or _pool['workers'] != workers:
+            if _pool['executor'] is not None:
+                _pool['executor'].shutdown(wait=False)
+            _pool['executor'] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool['workers'] = workers
+        _pool['active'] += 1
+        return _pool['executor']
+
+
+def _release_executor():
+    with _guard:
+        _pool['active'] -= 1
+        if _pool['active'] == 0 and _pool['executor'] is not None:
+            _cancel_idle_timer()
+            timer = threading.Timer(POOL_IDLE_SECONDS, _shutdown_idle_pool)
+            timer.daemon = True
+            _pool['timer'] = timer
+            timer.start()
+
+
+def _shutdown_idle_pool():
+    with _guard:
+        if _pool['active'] or _pool['timer'] is not threading.current_thread():
+            return
+        executor = _pool['executor']
+        _pool.update(executor=None, workers=0, timer=None)
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def shutdown_pool():
+    with _guard:
+        _cancel_idle_timer()
+        if _pool['executor'] is not None:
+            _pool['executor'].shutdown(wait=True)
+        _pool['executor'] = None
+        _pool['workers'] = 0
+
+
+def hash_passwords(passwords):
+    """``make_password`` ile aynı biçimde hash listesi döner (sıra korunur)."""
+    hasher = get_hasher('default')
+    jobs = [(hasher, password, hasher.salt()) for password in passwords]
+    workers = min(_workers(), len(jobs))
+    if workers > 1 and len(jobs) >= PARALLEL_MIN_PASSWORDS and _pool_allowed():
+        executor = _acquire_executor(workers)
+        try:
+            return list(executor.map(_encode, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        except (BrokenProcessPool, OSError, pickle.PicklingError):
+            shutdown_pool()
+        finally:
+            _release_executor()
+    return [_encode(job) for job in jobs]
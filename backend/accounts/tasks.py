@@ -0,0 +1,9 @@
+from celery import shared_task
+
+
+@shared_task
+def run_bulk_create_users(job_id: int):
+    from .bulk_users import run_create_users_job
+
+    result = run_create_users_job(job_id)
+    return {'job_id': job_id, 'created': len(result['created']) if result else 0}
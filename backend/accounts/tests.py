@@ -1,3 +1,70 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import check_password
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from organizations.models import Organization
+
+from .bulk_users import run_create_users_job
+from . import passwords as password_pool
+from .models import User
+from .passwords import hash_passwords, shutdown_pool
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, PASSWORD_HASH_WORKERS=1)
+class BulkCreateUsersTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Atölye', code='ATL')
+        self.admin = User.objects.create_user(username='atolye-admin', password='x', organization=self.org, role='Admin')
+        User.objects.create_user(username='ali.yilmaz', password='x', organization=self.org)
+        User.objects.create_user(username='ali.yilmaz.2', password='x', organization=self.org)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_usernames_are_allocated_from_prefetched_names_and_inserted_in_bulk(self):
+        lines = ['Ali Yılmaz', 'Ali Yilmaz', 'Şule Çelik', ''] + [f'Operatör {idx}' for idx in range(40)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/bulk-create-users/', {'lines': '\n'.join(lines)}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        created = response.json()['created']
+        self.assertEqual([row['username'] for row in created[:3]], ['ali.yilmaz.3', 'ali.yilmaz.4', 'sule.celik'])
+        self.assertEqual(len(created), 43)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "accounts_user"')]), 1)
+        self.assertLess(len(ctx.captured_queries), 15)
+        user = User.objects.get(username='sule.celik')
+        self.assertEqual((user.first_name, user.last_name, user.role, user.organization_id), ('Şule', 'Çelik', 'Worker', self.org.id))
+        self.assertTrue(user.check_password(created[2]['password']))
+
+    def test_background_job_reports_progress_and_hands_out_passwords_once(self):
+        response = self.client.post('/api/auth/bulk-create-users/', {'lines': ['Ayşe Kaya', 'Mehmet Demir'], 'background': True}, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        job_id = response.json()['id']
+        self.assertEqual(response.json()['status'], 'queued')
+
+        run_create_users_job(job_id)
+        first = self.client.get(f'/api/auth/bulk-create-users/jobs/{job_id}/').json()
+        self.assertEqual((first['status'], first['processed_rows'], first['total_rows']), ('completed', 2, 2))
+        self.assertTrue(User.objects.get(username='ayse.kaya').check_password(first['created'][0]['password']))
+        second = self.client.get(f'/api/auth/bulk-create-users/jobs/{job_id}/').json()
+        self.assertEqual([row['password'] for row in second['created']], ['', ''])
+        self.assertTrue(second['passwords_delivered'])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, PASSWORD_HASH_WORKERS=2)
+class PasswordPoolTests(TestCase):
+    def tearDown(self):
+        shutdown_pool()
+
+    def test_pool_hashes_match_make_password_format(self):
+        passwords = [f'sifre-{idx}' for idx in range(6)]
+        hashes = hash_passwords(passwords)
+        # Sıralı yedek yol havuzu hiç oluşturmaz veya hata sonrası kapatır.
+        self.assertIsNotNone(password_pool._pool['executor'])
+        self.assertEqual(password_pool._pool['active'], 0)
+        self.assertEqual(len(set(hashes)), 6)
+        for password, encoded in zip(passwords, hashes):
+            self.assertTrue(encoded.startswith('md5$'))
+            self.assertTrue(check_password(password, encoded))
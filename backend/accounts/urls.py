@@ -5,6 +5,7 @@ from .views import (
     MeView,
     CreateUserView,
     BulkCreateUsersView,
+    BulkCreateUsersJobView,
     UsersListView,
     DeleteUserView,
     NotificationPrefView,
@@ -40,6 +41,7 @@ urlpatterns = [
     path('notification-prefs/', NotificationPrefView.as_view(), name='notification_prefs'),
     path('create-user/', CreateUserView.as_view(), name='create_user'),
     path('bulk-create-users/', BulkCreateUsersView.as_view(), name='bulk_create_users'),
+    path('bulk-create-users/jobs/<int:job_id>/', BulkCreateUsersJobView.as_view(), name='bulk_create_users_job'),
     path('users/', UsersListView.as_view(), name='users_list'),
     path('users/<int:pk>/', DeleteUserView.as_view(), name='delete_user'),
     path('password-reset/', PasswordResetRequestView.as_view(), name='password_reset'),
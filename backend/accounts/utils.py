@@ -138,7 +138,12 @@ def user_has_any_perm(user, perm_codes: list[str] | tuple[str, ...] | set[str])
     return any(user_has_perm(user, code) for code in perm_codes)
 
 
-def get_effective_permissions(user) -> list[str]:
+def get_effective_permissions(user, include_role_defaults=False) -> list[str]:
+    """Kullanıcının etkin izin kodları; ``["*"]`` tüm izinler demektir.
+
+    ``include_role_defaults`` verilirse rol tablosu ile ``DEFAULT_ROLE_PERMS`` birleştirilir;
+    sonuç ``user_has_perm`` ile aynı kaynaklardan verilen izinlere eşit olur.
+    """
     role = (getattr(user, 'role', None) or '').strip()
     if role == "Admin" or getattr(user, 'is_superadmin', False) or getattr(user, 'is_superuser', False):
         return ['*']
@@ -152,15 +157,11 @@ def get_effective_permissions(user) -> list[str]:
         EffectivePermissionCache.objects.update_or_create(user=user, defaults={"permissions": computed})
         return computed
 
-    db_perms = list(
-        RolePermission.objects.filter(role__iexact=role)
-        .select_related('permission')
-        .values_list('permission__code', flat=True)
-    )
-    if db_perms:
-        return sorted(set(db_perms))
-
-    return sorted(set(DEFAULT_ROLE_PERMS.get(role, []) or DEFAULT_ROLE_PERMS.get(role.capitalize(), [])))
+    db_perms = set(RolePermission.objects.filter(role__iexact=role).values_list('permission__code', flat=True))
+    defaults = set(DEFAULT_ROLE_PERMS.get(role, []) or DEFAULT_ROLE_PERMS.get(role.capitalize(), []))
+    if include_role_defaults:
+        return sorted(db_perms | defaults)
+    return sorted(db_perms or defaults)
 
 
 def _compute_effective_permissions(user) -> list[str]:
@@ -16,7 +16,7 @@ import os
 import pyotp
 import secrets
 from .serializers import TwoFATokenObtainPairSerializer
-from .models import Permission, RolePermission, UserGroup, UserGroupMembership, UserGroupPermission
+from .models import Permission, RolePermission, UserBulkCreateJob, UserGroup, UserGroupMembership, UserGroupPermission
 from .permissions_map import PERMISSION_CATALOG
 from rest_framework import status
 from django.contrib.auth.hashers import check_password
@@ -27,9 +27,9 @@ from django.utils.crypto import get_random_string
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from pathlib import Path
-from PIL import Image, UnidentifiedImageError
 from rest_framework.parsers import FormParser, MultiPartParser
-from .user_import import allocate_username, full_name_to_username_base, split_full_name
+from .bulk_users import create_users, job_status, parse_lines, queue_create_users
+from .user_import import split_full_name
 from rest_framework import viewsets, permissions, filters
 from permissions import IsOrgMember, HasAPIPermission
 from .models import DEFAULT_DOCUMENT_TERMS_TEXT, Team, TeamAssociate, OrganizationSettings
@@ -46,6 +46,8 @@ MAX_BRANDING_FILE_SIZE = 2 * 1024 * 1024
 
 
 def _validate_branding_file(uploaded_file):
+  from PIL import Image, UnidentifiedImageError
+
   extension = Path(uploaded_file.name or "").suffix.lower()
   if extension not in ALLOWED_BRANDING_EXTENSIONS:
     raise ValueError("PNG, JPG, JPEG, SVG, ICO veya WEBP dosyası yükleyebilirsiniz.")
@@ -445,60 +447,29 @@ class BulkCreateUsersView(APIView):
       return Response({"detail": "Organizasyon bulunamadı"}, status=400)
 
     role = request.data.get("role", "Worker")
-    lines_raw = request.data.get("lines")
-    if isinstance(lines_raw, str):
-      lines = [ln.strip() for ln in lines_raw.replace("\r\n", "\n").split("\n") if ln.strip()]
-    elif isinstance(lines_raw, list):
-      lines = [str(ln).strip() for ln in lines_raw if str(ln).strip()]
-    else:
+    lines = parse_lines(request.data.get("lines"))
+    if lines is None:
       return Response({"detail": "lines alanı gerekli (çok satırlı metin veya dizi)."}, status=400)
 
-    User = get_user_model()
-    taken_this_batch: set[str] = set()
-    created = []
-    errors = []
-
-    def is_taken(uname: str) -> bool:
-      if uname in taken_this_batch:
-        return True
-      return User.objects.filter(username=uname).exists()
-
-    for idx, full_name in enumerate(lines, start=1):
-      if not full_name or len(full_name) > 200:
-        errors.append({"line": idx, "full_name": full_name[:50] if full_name else "", "detail": "Geçersiz satır"})
-        continue
-      base = full_name_to_username_base(full_name)
-      try:
-        uname = allocate_username(base, is_taken)
-      except ValueError as e:
-        errors.append({"line": idx, "full_name": full_name, "detail": str(e)})
-        continue
-      taken_this_batch.add(uname)
-      first_name, last_name = split_full_name(full_name)
-      password = get_random_string(12)
-      user = User(
-          username=uname,
-          email="",
-          first_name=first_name,
-          last_name=last_name,
-          role=role,
-          organization=org,
-          branch=getattr(requester, "branch", None),
-      )
-      user.set_password(password)
-      user.save()
-      created.append(
-          {
-              "id": user.id,
-              "username": user.username,
-              "password": password,
-              "full_name": full_name,
-              "first_name": first_name,
-              "last_name": last_name,
-          }
-      )
+    branch = getattr(requester, "branch", None)
+    if str(request.data.get("background", "")).lower() in {"1", "true", "evet"}:
+      job = queue_create_users(org, lines, role=role, branch=branch, user=requester)
+      return Response(job_status(job), status=202)
+    return Response(create_users(org, lines, role=role, branch=branch))
+
 
-    return Response({"created": created, "errors": errors, "summary": f"{len(created)} oluşturuldu, {len(errors)} satır atlandı"})
+class BulkCreateUsersJobView(APIView):
+  """Arka planda çalışan toplu kullanıcı oluşturma işinin ilerlemesi ve sonucu."""
+
+  permission_classes = [IsAuthenticated]
+
+  def get(self, request, job_id):
+    if not user_has_perm(request.user, "users.create"):
+      return Response({"detail": "Kullanıcı oluşturma yetkiniz yok"}, status=403)
+    job = UserBulkCreateJob.objects.filter(pk=job_id, organization=getattr(request.user, "organization", None)).first()
+    if job is None:
+      return Response({"detail": "İş bulunamadı"}, status=404)
+    return Response(job_status(job))
 
 
 class RateLimitedTokenObtainPairView(TokenObtainPairView):
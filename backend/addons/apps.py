@@ -5,3 +5,6 @@ class AddonsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "addons"
     verbose_name = "Add-ons"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,200 @@
+"""Derlenmiş phrase ve stil paketleri.
+
+Paketler add-on kurulduğunda, etkinleştirildiğinde, pasifleştirildiğinde veya
+rebuild edildiğinde ``rebuild_bundles`` ile ``AddonCompiledBundle`` tablosuna
+checksum ve gzip gövdesiyle yazılır. Okuma tarafı önce süreç içi önbelleğe,
+sonra Redis'e, en son veritabanına bakar; süreç içi kayıt ``LOCAL_TTL_SECONDS``
+sonunda yalnızca checksum karşılaştırılarak tazelenir. Redis yoksa veritabanı
+checksum'u kullanılır.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from typing import NamedTuple
+
+import redis
+from django.db import transaction
+
+from addons.models import AddonCompiledBundle, AddonLanguage, AddonPhrase, AddonStyleAsset
+from core.redis_client import redis_client, redis_failed
+
+KEY_PREFIX = "addons:bundle"
+DEFAULT_LANGUAGE_ID = "tr-TR"
+LOCAL_TTL_SECONDS = 30
+REDIS_TTL_SECONDS = 24 * 3600
+
+_local = {}
+_guard = threading.Lock()
+
+
+class CompiledBundle(NamedTuple):
+    checksum: str
+    body: bytes
+    compressed: bytes
+    data: object
+
+
+def _redis_key(kind, language_id):
+    return f"{KEY_PREFIX}:{kind}:{language_id}"
+
+
+def _phrase_languages(language_rows, phrase_languages):
+    return sorted({DEFAULT_LANGUAGE_ID, *(row["language_id"] for row in language_rows), *phrase_languages})
+
+
+def _compile_phrases() -> dict[str, str]:
+    language_rows = list(AddonLanguage.objects.filter(is_active=True).values("language_id", "fallback_language_id"))
+    fallbacks = {row["language_id"]: row["fallback_language_id"] for row in language_rows}
+    by_language: dict[str, list[tuple[str, str]]] = {}
+    rows = AddonPhrase.objects.filter(
+        is_active=True,
+        addon__is_installed=True,
+        addon__is_enabled=True,
+    ).order_by("title").values_list("language_id", "title", "text")
+    for language_id, title, text in rows:
+        by_language.setdefault(language_id, []).append((title, text))
+
+    bodies = {}
+    for language_id in _phrase_languages(language_rows, by_language):
+        chain = [DEFAULT_LANGUAGE_ID]
+        if fallbacks.get(language_id):
+            chain.insert(0, fallbacks[language_id])
+        chain.append(language_id)
+        phrases: dict[str, str] = {}
+        for lang in chain:
+            phrases.update(by_language.get(lang, ()))
+        bodies[language_id] = json.dumps({"language_id": language_id, "phrases": phrases}, ensure_ascii=False)
+    return bodies
+
+
+def _compile_styles() -> str:
+    rows = AddonStyleAsset.objects.filter(
+        is_active=True,
+        addon__is_installed=True,
+        addon__is_enabled=True,
+    ).select_related("addon").order_by("addon__addon_id", "display_order", "key")
+    return "\n\n".join(f"/* {row.addon.addon_id}:{row.key} */\n{row.content}" for row in rows)
+
+
+def clear_bundle_cache():
+    with _guard:
+        _local.clear()
+    client = redis_client()
+    if client is None:
+        return
+    try:
+        keys = list(client.scan_iter(match=f"{KEY_PREFIX}:*", count=200))
+        if keys:
+            client.delete(*keys)
+    except redis.RedisError:
+        redis_failed()
+
+
+def rebuild_bundles() -> int:
+    compiled = {("phrases", language_id): body for language_id, body in _compile_phrases().items()}
+    compiled[("styles", "")] = _compile_styles()
+    with transaction.atomic():
+        for (kind, language_id), content in compiled.items():
+            body = content.encode("utf-8")
+            AddonCompiledBundle.objects.update_or_create(
+                kind=kind,
+                language_id=language_id,
+                defaults={
+                    "content": content,
+                    "compressed": gzip.compress(body, compresslevel=9, mtime=0),
+                    "checksum": hashlib.sha256(body).hexdigest(),
+                },
+            )
+        stale = AddonCompiledBundle.objects.filter(kind="phrases").exclude(language_id__in=[key[1] for key in compiled if key[0] == "phrases"])
+        stale.delete()
+        transaction.on_commit(clear_bundle_cache)
+    return len(compiled)
+
+
+def _decode(kind, content):
+    return json.loads(content)["phrases"] if kind == "phrases" else content
+
+
+def _from_fields(kind, checksum, content, compressed):
+    return CompiledBundle(checksum, content.encode("utf-8"), bytes(compressed), _decode(kind, content))
+
+
+def _load_shared(kind, language_id):
+    client = redis_client()
+    if client is not None:
+        try:
+            fields = client.hgetall(_redis_key(kind, language_id))
+        except redis.RedisError:
+            redis_failed()
+            client = None
+        else:
+            if fields.get(b"checksum"):
+                return _from_fields(kind, fields[b"checksum"].decode(), fields[b"content"].decode("utf-8"), fields[b"compressed"])
+    row = AddonCompiledBundle.objects.filter(kind=kind, language_id=language_id).values_list("checksum", "content", "compressed").first()
+    if row is None:
+        return None
+    bundle = _from_fields(kind, *row)
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hset(_redis_key(kind, language_id), mapping={"checksum": bundle.checksum, "content": row[1], "compressed": bundle.compressed})
+            pipe.expire(_redis_key(kind, language_id), REDIS_TTL_SECONDS)
+            pipe.execute()
+        except redis.RedisError:
+            redis_failed()
+    return bundle
+
+
+def _shared_checksum(kind, language_id):
+    client = redis_client()
+    if client is not None:
+        try:
+            checksum = client.hget(_redis_key(kind, language_id), "checksum")
+        except redis.RedisError:
+            redis_failed()
+        else:
+            return checksum.decode() if checksum else None
+    return AddonCompiledBundle.objects.filter(kind=kind, language_id=language_id).values_list("checksum", flat=True).first()
+
+
+def get_bundle(kind, language_id="") -> CompiledBundle | None:
+    key = (kind, language_id)
+    now = time.monotonic()
+    with _guard:
+        entry = _local.get(key)
+    if entry is not None:
+        expires_at, bundle = entry
+        if expires_at > now:
+            return bundle
+        if _shared_checksum(kind, language_id) == bundle.checksum:
+            with _guard:
+                _local[key] = (now + LOCAL_TTL_SECONDS, bundle)
+            return bundle
+    bundle = _load_shared(kind, language_id)
+    if bundle is None:
+        return None
+    with _guard:
+        _local[key] = (now + LOCAL_TTL_SECONDS, bundle)
+    return bundle
+
+
+def _ensure_bundle(kind, language_id=""):
+    bundle = get_bundle(kind, language_id)
+    if bundle is None and not AddonCompiledBundle.objects.filter(kind=kind).exists():
+        # Henüz derlenmemiş kurulum (ör. yeni veritabanı): bir kez derle.
+        rebuild_bundles()
+        clear_bundle_cache()
+        bundle = get_bundle(kind, language_id)
+    return bundle
+
+
+def phrase_bundle_for(language_id=DEFAULT_LANGUAGE_ID) -> CompiledBundle | None:
+    """Dil paketi; derlenmemiş diller varsayılan dilin paketini alır."""
+    return _ensure_bundle("phrases", language_id) or _ensure_bundle("phrases", DEFAULT_LANGUAGE_ID)
+
+
+def style_bundle_compiled() -> CompiledBundle | None:
+    return _ensure_bundle("styles")
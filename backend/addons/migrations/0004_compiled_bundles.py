@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addons', '0003_navigationitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AddonCompiledBundle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('phrases', 'Phrases'), ('styles', 'Styles')], max_length=20)),
+                ('language_id', models.CharField(blank=True, default='', max_length=20)),
+                ('content', models.TextField(blank=True, default='')),
+                ('compressed', models.BinaryField(blank=True, default=b'')),
+                ('checksum', models.CharField(blank=True, default='', max_length=128)),
+                ('rebuilt_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', 'language_id'],
+                'unique_together': {('kind', 'language_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addons', '0004_compiled_bundles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='addoncompiledtemplate',
+            name='input_checksum',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+    ]
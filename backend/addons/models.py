@@ -255,6 +255,7 @@ class AddonCompiledTemplate(models.Model):
     content = models.TextField(blank=True, default="")
     applied_modifications = models.JSONField(default=list, blank=True)
     checksum = models.CharField(max_length=128, blank=True, default="")
+    input_checksum = models.CharField(max_length=128, blank=True, default="")
     rebuilt_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -273,3 +274,20 @@ class AddonStyleAsset(models.Model):
     class Meta:
         unique_together = ("addon", "key")
         ordering = ["display_order", "key"]
+
+
+class AddonCompiledBundle(models.Model):
+    KIND_CHOICES = [("phrases", "Phrases"), ("styles", "Styles")]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    language_id = models.CharField(max_length=20, blank=True, default="")
+    content = models.TextField(blank=True, default="")
+    compressed = models.BinaryField(blank=True, default=b"")
+    checksum = models.CharField(max_length=128, blank=True, default="")
+    rebuilt_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("kind", "language_id")
+        ordering = ["kind", "language_id"]
+
+    def __str__(self):
+        return f"{self.kind}:{self.language_id}" if self.language_id else self.kind
@@ -0,0 +1,168 @@
+"""Kullanıcıya görünen sol menü ve rota manifestinin önbelleği.
+
+Manifest kullanıcıya değil ``(organizasyon, rol + etkin izinlerin özeti, epoch)``
+üçlüsüne göre derlenir; aynı yetkilere sahip kullanıcılar aynı kaydı paylaşır.
+Epoch iki sayaçtan oluşur: add-on, add-on menüsü/rotası veya izin rebuild'inde
+artan genel sayaç ve menü tasarımcısında yapılan değişikliklerde artan
+organizasyon sayacı. Redis erişilebilirken anahtar yalnızca paylaşılan sayaçları
+içerir, böylece tüm süreçler aynı kaydı kullanır; Redis'e yazılamayan artışlar
+bekletilir ve bağlantı dönünce işlenir. Redis yoksa süreç içi sayaçlar kullanılır
+ve kayıtlar kısa ömürlüdür. Eski anahtarlar okunmaz, yalnızca süresi dolar.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.redis_client import redis_client, redis_failed
+
+KEY_PREFIX = "addons:nav"
+SHARED_TTL_SECONDS = 3600
+LOCAL_TTL_SECONDS = 300
+LOCAL_FALLBACK_TTL_SECONDS = 10
+LOCAL_MAX_ENTRIES = 256
+
+_local = OrderedDict()
+_local_epochs = {}
+_pending_bumps = set()
+_guard = threading.Lock()
+
+
+def _epoch_key(scope):
+    return f"{KEY_PREFIX}-epoch:{scope}"
+
+
+def _flush_epochs(client):
+    with _guard:
+        pending = list(_pending_bumps)
+        _pending_bumps.clear()
+    if not pending:
+        return True
+    try:
+        pipe = client.pipeline(transaction=False)
+        for scope in pending:
+            pipe.incr(_epoch_key(scope))
+        pipe.execute()
+    except redis.RedisError:
+        with _guard:
+            _pending_bumps.update(pending)
+        redis_failed()
+        return False
+    return True
+
+
+def _bump(scope):
+    with _guard:
+        _local_epochs[scope] = _local_epochs.get(scope, 0) + 1
+        _pending_bumps.add(scope)
+    client = redis_client()
+    if client is not None:
+        _flush_epochs(client)
+
+
+def bump_addon_epoch():
+    _bump("addons")
+
+
+def bump_navigation_epoch(organization_id):
+    _bump(f"org:{organization_id}")
+
+
+def _epoch(organization_id):
+    scopes = ("addons", f"org:{organization_id}")
+    local = ".".join(str(_local_epochs.get(scope, 0)) for scope in scopes)
+    client = redis_client()
+    if client is None or not _flush_epochs(client):
+        return f"{local}-x", False
+    try:
+        shared = client.mget([_epoch_key(scope) for scope in scopes])
+    except redis.RedisError:
+        redis_failed()
+        return f"{local}-x", False
+    return ".".join((value or b"0").decode() for value in shared), True
+
+
+def permission_fingerprint(role, permissions):
+    raw = json.dumps([role or "", sorted(set(permissions))])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _etag(section):
+    raw = json.dumps(section, cls=JSONEncoder, sort_keys=True).encode("utf-8")
+    return '"' + hashlib.sha256(raw).hexdigest()[:32] + '"'
+
+
+def _local_get(key):
+    with _guard:
+        entry = _local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            _local.pop(key, None)
+            return None
+        _local.move_to_end(key)
+        return value
+
+
+def _local_set(key, value, ttl):
+    with _guard:
+        _local[key] = (time.monotonic() + ttl, value)
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def clear_navigation_cache():
+    with _guard:
+        _local.clear()
+
+
+def _manifest_key(organization_id, fingerprint, epoch):
+    return f"{KEY_PREFIX}:{organization_id or 0}:{fingerprint}:{epoch}"
+
+
+def cached_manifest(organization_id, role, permissions, compute, prepare=None):
+    """``compute()`` sonucunu (``navigation`` / ``routes``) bölüm ETag'leriyle birlikte döner.
+
+    ``prepare()`` yalnızca önbellek ıskalanınca ve derlemeden önce çalışır; veri yazdıysa
+    ``True`` döner ve epoch yeniden okunur. Kayıt derlemeden önce okunan epoch altında saklanır;
+    derleme sırasında epoch değiştiyse sonuç eski veriyi içerebileceği için saklanmaz.
+    """
+    fingerprint = permission_fingerprint(role, permissions)
+    epoch, shared = _epoch(organization_id)
+    key = _manifest_key(organization_id, fingerprint, epoch)
+    manifest = _local_get(key)
+    if manifest is not None:
+        return manifest
+    client = redis_client() if shared else None
+    if client is not None:
+        try:
+            cached = client.get(key)
+        except redis.RedisError:
+            redis_failed()
+            client, cached = None, None
+        if cached is not None:
+            manifest = json.loads(cached)
+    if manifest is None:
+        if prepare is not None and prepare():
+            epoch, shared = _epoch(organization_id)
+            key = _manifest_key(organization_id, fingerprint, epoch)
+            client = redis_client() if shared else None
+        sections = json.loads(json.dumps(compute(), cls=JSONEncoder))
+        manifest = {**sections, "etags": {name: _etag(value) for name, value in sections.items()}}
+        if _epoch(organization_id)[0] != epoch:
+            return manifest
+        if client is not None:
+            try:
+                client.set(key, json.dumps(manifest), ex=SHARED_TTL_SECONDS)
+            except redis.RedisError:
+                redis_failed()
+    # Paylaşılan epoch görünmüyorsa diğer süreçlerin değişiklikleri de görünmez; kaydı kısa tut.
+    _local_set(key, manifest, LOCAL_TTL_SECONDS if shared else LOCAL_FALLBACK_TTL_SECONDS)
+    return manifest
@@ -2,6 +2,7 @@ import hashlib
 import json
 import re
 import shutil
+import time
 import zipfile
 import xml.etree.ElementTree as ET
 from pathlib import Path
@@ -10,6 +11,7 @@ from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 
+from addons.bundles import phrase_bundle_for, rebuild_bundles, style_bundle_compiled
 from addons.models import (
     Addon,
     AddonAsset,
@@ -28,6 +30,7 @@ from addons.models import (
     AddonVersion,
     NavigationItem,
 )
+from addons.navigation_cache import bump_addon_epoch, cached_manifest
 
 
 ADDON_ROOT = Path(settings.BASE_DIR) / "addons"
@@ -132,19 +135,23 @@ def discover_addons() -> list[dict]:
 
 
 def _addon_from_manifest(addon_path: Path, manifest: dict) -> Addon:
-    addon, _ = Addon.objects.update_or_create(
-        addon_id=manifest["id"],
-        defaults={
-            "title": manifest.get("title", manifest["id"]),
-            "vendor": manifest.get("vendor", manifest["id"].split("/")[0]),
-            "version": str(manifest.get("version", manifest.get("version_string", ""))),
-            "version_id": int(manifest.get("version_id") or 0),
-            "min_core_version": str(manifest.get("min_core_version", "")),
-            "manifest": manifest,
-            "path": str(addon_path),
-            "is_system": bool(manifest.get("is_system", False)),
-        },
-    )
+    values = {
+        "title": manifest.get("title", manifest["id"]),
+        "vendor": manifest.get("vendor", manifest["id"].split("/")[0]),
+        "version": str(manifest.get("version", manifest.get("version_string", ""))),
+        "version_id": int(manifest.get("version_id") or 0),
+        "min_core_version": str(manifest.get("min_core_version", "")),
+        "manifest": manifest,
+        "path": str(addon_path),
+        "is_system": bool(manifest.get("is_system", False)),
+    }
+    addon, created = Addon.objects.get_or_create(addon_id=manifest["id"], defaults=values)
+    # Keşif her istekte çalışabilir; manifest değişmediyse kayıt (ve sinyaller) tetiklenmez.
+    changed = [] if created else [field for field, value in values.items() if getattr(addon, field) != value]
+    if changed:
+        for field in changed:
+            setattr(addon, field, values[field])
+        addon.save(update_fields=[*changed, "updated_at"])
     return addon
 
 
@@ -546,7 +553,6 @@ def _import_template_modifications(addon: Addon, addon_path: Path) -> int:
                 "replace": item.get("replace", ""),
                 "execution_order": int(item.get("execution_order") or 10),
                 "enabled": bool(item.get("enabled", True)),
-                "last_error": "",
                 "is_active": True,
             },
         )
@@ -605,41 +611,93 @@ def _apply_modification(content: str, modification: AddonTemplateModification) -
     return content.replace(modification.find, modification.replace, 1), ""
 
 
+def _template_input_checksum(template: AddonTemplate, mods: list[AddonTemplateModification]) -> str:
+    return _stable_hash([
+        template.content,
+        [[mod.addon_id, mod.modification_key, mod.action, mod.find, mod.replace] for mod in mods],
+    ])
+
+
 def rebuild_templates(addon_id: str | None = None) -> int:
+    started = time.perf_counter()
     templates = AddonTemplate.objects.filter(is_active=True, addon__is_installed=True, addon__is_enabled=True)
     if addon_id:
         template_keys = AddonTemplateModification.objects.filter(addon__addon_id=addon_id).values_list("template_type", "template")
         keys = list(template_keys)
         templates = templates.filter(template_type__in=[key[0] for key in keys], title__in=[key[1] for key in keys]) | templates.filter(addon__addon_id=addon_id)
-    count = 0
-    for template in templates.distinct():
+    templates = list(templates.distinct().only("id", "template_type", "title", "content"))
+    types = {template.template_type for template in templates}
+    titles = {template.title for template in templates}
+
+    mods_by_template: dict[tuple[str, str], list[AddonTemplateModification]] = {}
+    mods = AddonTemplateModification.objects.filter(
+        template_type__in=types,
+        template__in=titles,
+        enabled=True,
+        is_active=True,
+        addon__is_installed=True,
+        addon__is_enabled=True,
+    ).order_by("template_type", "template", "execution_order", "modification_key")
+    for mod in mods:
+        mods_by_template.setdefault((mod.template_type, mod.template), []).append(mod)
+    compiled = {
+        (item.template_type, item.title): item
+        for item in AddonCompiledTemplate.objects.filter(template_type__in=types, title__in=titles)
+    }
+
+    now = timezone.now()
+    created, updated, changed_mods = [], [], []
+    for template in templates:
+        key = (template.template_type, template.title)
+        template_mods = mods_by_template.get(key, [])
+        input_checksum = _template_input_checksum(template, template_mods)
+        current = compiled.get(key)
+        if current is not None and current.input_checksum == input_checksum:
+            continue
         content = template.content
         applied = []
-        mods = AddonTemplateModification.objects.filter(
-            template_type=template.template_type,
-            template=template.title,
-            enabled=True,
-            is_active=True,
-            addon__is_installed=True,
-            addon__is_enabled=True,
-        ).select_related("addon")
-        for mod in mods:
+        for mod in template_mods:
             content, error = _apply_modification(content, mod)
-            mod.last_error = error
-            mod.save(update_fields=["last_error"])
+            if mod.last_error != error:
+                mod.last_error = error
+                changed_mods.append(mod)
             if not error:
                 applied.append(mod.modification_key)
-        AddonCompiledTemplate.objects.update_or_create(
-            template_type=template.template_type,
-            title=template.title,
-            defaults={
-                "content": content,
-                "applied_modifications": applied,
-                "checksum": hashlib.sha256(content.encode("utf-8")).hexdigest(),
-            },
-        )
-        count += 1
-    return count
+        values = {
+            "content": content,
+            "applied_modifications": applied,
+            "checksum": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+            "input_checksum": input_checksum,
+            "rebuilt_at": now,
+        }
+        if current is None:
+            created.append(AddonCompiledTemplate(template_type=template.template_type, title=template.title, **values))
+            continue
+        for field, value in values.items():
+            setattr(current, field, value)
+        updated.append(current)
+
+    AddonTemplateModification.objects.bulk_update(changed_mods, ["last_error"], batch_size=500)
+    AddonCompiledTemplate.objects.bulk_create(created, batch_size=500)
+    AddonCompiledTemplate.objects.bulk_update(
+        updated,
+        ["content", "applied_modifications", "checksum", "input_checksum", "rebuilt_at"],
+        batch_size=500,
+    )
+    AddonInstallLog.objects.create(
+        addon=Addon.objects.filter(addon_id=addon_id).first() if addon_id else None,
+        raw_addon_id=addon_id or "",
+        action="rebuild",
+        message="Şablonlar derlendi.",
+        payload={
+            "templates": len(templates),
+            "compiled": len(created) + len(updated),
+            "unchanged": len(templates) - len(created) - len(updated),
+            "modifications": sum(len(items) for items in mods_by_template.values()),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        },
+    )
+    return len(templates)
 
 
 def _record_import(addon: Addon, data_type: str, payload, count: int):
@@ -690,6 +748,7 @@ def install_addon(addon_id: str, actor=None, enable: bool = True) -> Addon:
     )
     AddonInstallLog.objects.create(addon=addon, raw_addon_id=addon.addon_id, action="install", actor=actor)
     rebuild_templates(addon.addon_id)
+    rebuild_bundles()
     rebuild_all_permission_caches()
     return addon
 
@@ -700,6 +759,7 @@ def enable_addon(addon_id: str, actor=None) -> Addon:
     addon.save(update_fields=["is_enabled", "updated_at"])
     AddonInstallLog.objects.create(addon=addon, raw_addon_id=addon.addon_id, action="enable", actor=actor)
     rebuild_templates(addon.addon_id)
+    rebuild_bundles()
     rebuild_all_permission_caches()
     return addon
 
@@ -710,6 +770,7 @@ def disable_addon(addon_id: str, actor=None) -> Addon:
     addon.save(update_fields=["is_enabled", "updated_at"])
     AddonInstallLog.objects.create(addon=addon, raw_addon_id=addon.addon_id, action="disable", actor=actor)
     rebuild_templates(addon.addon_id)
+    rebuild_bundles()
     rebuild_all_permission_caches()
     return addon
 
@@ -721,6 +782,7 @@ def uninstall_addon(addon_id: str, actor=None) -> Addon:
     addon.save(update_fields=["is_installed", "is_enabled", "updated_at"])
     AddonInstallLog.objects.create(addon=addon, raw_addon_id=addon.addon_id, action="uninstall", actor=actor)
     rebuild_templates(addon.addon_id)
+    rebuild_bundles()
     rebuild_all_permission_caches()
     return addon
 
@@ -737,6 +799,7 @@ def delete_addon(addon_id: str, actor=None) -> None:
         shutil.rmtree(addon_path)
     AddonInstallLog.objects.create(raw_addon_id=raw_id, action="uninstall", actor=actor, message="Add-on dosyaları ve metadata silindi.")
     rebuild_templates()
+    rebuild_bundles()
     rebuild_all_permission_caches()
 
 
@@ -768,30 +831,43 @@ def install_builtin_addons():
             _import_events(addon, addon_path)
             _import_assets(addon, addon_path)
             rebuild_templates(addon.addon_id)
+            rebuild_bundles()
 
 
-def filtered_navigation(user) -> list[dict]:
-    from accounts.utils import user_has_perm
+def _permission_checker(permissions):
+    from accounts.permissions_map import LEGACY_PERMISSION_ALIASES
 
-    organization = getattr(user, "organization", None)
-    ensure_organization_navigation(organization)
-    org_rows = NavigationItem.objects.filter(organization=organization, is_active=True).order_by("display_order", "label")
-    visible = []
+    granted = set(permissions)
+
+    def allowed(code: str) -> bool:
+        if not code or "*" in granted:
+            return True
+        return any(item in granted for item in [code, *LEGACY_PERMISSION_ALIASES.get(code, [])])
+
+    return allowed
+
+
+def compile_navigation_manifest(organization, role: str, permissions) -> dict:
+    """Menü ve rota manifesti; sonucu yalnızca organizasyon, rol ve izin listesi belirler."""
+    allowed = _permission_checker(permissions)
+    navigation = []
     seen = set()
-    for item in org_rows:
-        payload = navigation_item_payload(item, user=user)
-        if not payload:
+    for item in NavigationItem.objects.filter(organization=organization, is_active=True).order_by("display_order", "label"):
+        roles = item.meta.get("roles") if isinstance(item.meta, dict) else None
+        if roles and role not in roles:
+            continue
+        if item.required_permission and not allowed(item.required_permission):
             continue
-        visible.append(payload)
+        navigation.append(navigation_item_payload(item))
         seen.add(item.key)
 
     rows = AddonNavigation.objects.filter(addon__is_installed=True, addon__is_enabled=True, is_active=True).select_related("addon")
     for item in rows:
         if item.key in seen:
             continue
-        if item.required_permission and not user_has_perm(user, item.required_permission):
+        if item.required_permission and not allowed(item.required_permission):
             continue
-        visible.append({
+        navigation.append({
             "key": item.key,
             "label": item.label,
             "parent": item.parent_key,
@@ -803,24 +879,12 @@ def filtered_navigation(user) -> list[dict]:
             "meta": item.meta,
             "source": "addon",
         })
-    return visible
 
-
-def editable_navigation_payload(organization) -> list[dict]:
-    ensure_organization_navigation(organization)
-    rows = NavigationItem.objects.filter(organization=organization).order_by("display_order", "label")
-    return [navigation_item_payload(item, include_inactive=True) for item in rows]
-
-
-def filtered_routes(user) -> list[dict]:
-    from accounts.utils import user_has_perm
-
-    rows = AddonRoute.objects.filter(addon__is_installed=True, addon__is_enabled=True, is_active=True).select_related("addon")
-    visible = []
-    for route in rows:
-        if route.required_permission and not user_has_perm(user, route.required_permission):
+    routes = []
+    for route in AddonRoute.objects.filter(addon__is_installed=True, addon__is_enabled=True, is_active=True).select_related("addon"):
+        if route.required_permission and not allowed(route.required_permission):
             continue
-        visible.append({
+        routes.append({
             "kind": route.kind,
             "key": route.key,
             "path": route.path,
@@ -829,7 +893,45 @@ def filtered_routes(user) -> list[dict]:
             "addon_id": route.addon.addon_id,
             "meta": route.meta,
         })
-    return visible
+    return {"navigation": navigation, "routes": routes}
+
+
+def _ensure_manifest_navigation(organization) -> bool:
+    """Eksik menü kopyasını oluşturur; organizasyon epoch'unu artırdıysa ``True`` döner."""
+    if NavigationItem.objects.filter(organization=organization).exists():
+        return False
+    # Varsayılanları eşitleme menü tasarımcısında yapılır; manifest yalnızca eksik kopyayı oluşturur.
+    ensure_organization_navigation(organization)
+    return organization is not None
+
+
+def navigation_manifest(user) -> dict:
+    from accounts.utils import get_effective_permissions
+
+    organization = getattr(user, "organization", None)
+    role = getattr(user, "role", "") or ""
+    permissions = get_effective_permissions(user, include_role_defaults=True)
+    return cached_manifest(
+        getattr(organization, "id", None),
+        role,
+        permissions,
+        lambda: compile_navigation_manifest(organization, role, permissions),
+        prepare=lambda: _ensure_manifest_navigation(organization),
+    )
+
+
+def filtered_navigation(user) -> list[dict]:
+    return navigation_manifest(user)["navigation"]
+
+
+def editable_navigation_payload(organization) -> list[dict]:
+    ensure_organization_navigation(organization)
+    rows = NavigationItem.objects.filter(organization=organization).order_by("display_order", "label")
+    return [navigation_item_payload(item, include_inactive=True) for item in rows]
+
+
+def filtered_routes(user) -> list[dict]:
+    return navigation_manifest(user)["routes"]
 
 
 def permission_catalog_payload() -> dict:
@@ -857,22 +959,8 @@ def permission_catalog_payload() -> dict:
 
 
 def phrase_bundle(language_id: str = "tr-TR") -> dict[str, str]:
-    language = AddonLanguage.objects.filter(language_id=language_id, is_active=True).first()
-    fallback_ids = ["tr-TR"]
-    if language and language.fallback_language_id:
-        fallback_ids.insert(0, language.fallback_language_id)
-    fallback_ids.append(language_id)
-    bundle: dict[str, str] = {}
-    for lang in fallback_ids:
-        rows = AddonPhrase.objects.filter(
-            language_id=lang,
-            is_active=True,
-            addon__is_installed=True,
-            addon__is_enabled=True,
-        ).order_by("title")
-        for row in rows:
-            bundle[row.title] = row.text
-    return bundle
+    bundle = phrase_bundle_for(language_id)
+    return bundle.data if bundle else {}
 
 
 def phrase(title: str, language_id: str = "tr-TR", **params) -> str:
@@ -883,15 +971,8 @@ def phrase(title: str, language_id: str = "tr-TR", **params) -> str:
 
 
 def style_bundle() -> str:
-    rows = AddonStyleAsset.objects.filter(
-        is_active=True,
-        addon__is_installed=True,
-        addon__is_enabled=True,
-    ).select_related("addon").order_by("addon__addon_id", "display_order", "key")
-    parts = []
-    for row in rows:
-        parts.append(f"/* {row.addon.addon_id}:{row.key} */\n{row.content}")
-    return "\n\n".join(parts)
+    bundle = style_bundle_compiled()
+    return bundle.data if bundle else ""
 
 
 def safe_extract_addon_zip(uploaded_file) -> dict:
@@ -928,3 +1009,4 @@ def rebuild_all_permission_caches():
 
     sync_user_groups()
     rebuild_effective_permissions()
+    bump_addon_epoch()
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from addons.models import Addon, AddonNavigation, AddonRoute, NavigationItem
+from addons.navigation_cache import bump_addon_epoch, bump_navigation_epoch
+
+
+@receiver(post_save, sender=NavigationItem)
+@receiver(post_delete, sender=NavigationItem)
+def invalidate_organization_navigation(sender, instance, **kwargs):
+    organization_id = instance.organization_id
+    if organization_id is None:
+        # Varsayılan kayıtlar organizasyonlara yalnızca ilk kurulumda kopyalanır.
+        return
+    # Bu süreç hemen, diğerleri commit sonrası yeni epoch'u görür; commit öncesi veriyle derlenen manifest kalıcı olmaz.
+    bump_navigation_epoch(organization_id)
+    transaction.on_commit(lambda: bump_navigation_epoch(organization_id))
+
+
+# Manifest'i etkileyen Addon alanları; yalnızca manifest bilgisi değişen kayıtlar epoch'u artırmaz.
+ADDON_NAVIGATION_FIELDS = frozenset({"addon_id", "is_installed", "is_enabled"})
+
+
+@receiver(post_save, sender=Addon)
+def invalidate_addon_state(sender, instance, created=False, update_fields=None, **kwargs):
+    if not created and update_fields is not None and not ADDON_NAVIGATION_FIELDS.intersection(update_fields):
+        return
+    invalidate_addon_navigation(sender, instance)
+
+
+@receiver(post_delete, sender=Addon)
+@receiver(post_save, sender=AddonNavigation)
+@receiver(post_delete, sender=AddonNavigation)
+@receiver(post_save, sender=AddonRoute)
+@receiver(post_delete, sender=AddonRoute)
+def invalidate_addon_navigation(sender, instance, **kwargs):
+    bump_addon_epoch()
+    transaction.on_commit(bump_addon_epoch)
@@ -1,8 +1,39 @@
+import gzip
+import json
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
 from accounts.utils import ensure_permissions_seeded, get_effective_permissions, user_has_perm
-from addons.models import Addon, AddonCompiledTemplate, AddonNavigation, AddonPhrase, AddonStyleAsset
+from addons.bundles import clear_bundle_cache
+from addons.models import (
+    Addon,
+    AddonCompiledTemplate,
+    AddonInstallLog,
+    AddonNavigation,
+    AddonPhrase,
+    AddonRoute,
+    AddonStyleAsset,
+    AddonTemplate,
+    AddonTemplateModification,
+    NavigationItem,
+)
+from addons import navigation_cache
+from addons.navigation_cache import clear_navigation_cache
+from addons.services import (
+    disable_addon,
+    ensure_organization_navigation,
+    navigation_item_payload,
+    navigation_manifest,
+    phrase,
+    rebuild_templates,
+    style_bundle,
+)
+from organizations.models import Organization
 
 
 class AddonCoreSmokeTests(TestCase):
@@ -28,3 +59,256 @@ class AddonCoreSmokeTests(TestCase):
 
         self.assertEqual(get_effective_permissions(user), ["*"])
         self.assertTrue(user_has_perm(user, "addons.manage"))
+
+
+class AddonBundleTests(TestCase):
+    def setUp(self):
+        clear_bundle_cache()
+        ensure_permissions_seeded()
+        self.user = get_user_model().objects.create_user(username="bundle-user", password="test-pass-123", role="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        clear_bundle_cache()
+
+    def test_phrase_bundle_is_served_with_etag_and_precompressed_body(self):
+        response = self.client.get("/api/phrases/", {"language_id": "en-US"})
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        payload = json.loads(response.content)
+        self.assertEqual(payload["phrases"]["addon.udar_quotes.title"], "Quotes and Contracts")
+        self.assertEqual(payload["phrases"]["quotes.status.rejected"], "Ret")
+
+        response = self.client.get("/api/phrases/", {"language_id": "en-US"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get("/api/phrases/", {"language_id": "en-US"}, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), payload)
+
+        styles = self.client.get("/api/addons/styles.css")
+        self.assertEqual(styles.status_code, 200)
+        self.assertIn(b"/* Udar/Quotes:quotes.less */", styles.content)
+        self.assertEqual(self.client.get("/api/addons/styles.css", HTTP_IF_NONE_MATCH=styles["ETag"]).status_code, 304)
+
+    def test_phrase_lookup_is_cached_and_rebuilt_on_disable(self):
+        self.assertEqual(phrase("nav.quotes"), "Teklif & Sözleşmeler")
+        with self.assertNumQueries(0):
+            for _ in range(20):
+                phrase("quotes.status.pending")
+        etag = self.client.get("/api/phrases/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            disable_addon("Udar/Quotes")
+        self.assertEqual(phrase("nav.quotes"), "nav.quotes")
+        self.assertEqual(style_bundle(), "")
+        self.assertNotEqual(self.client.get("/api/phrases/")["ETag"], etag)
+
+
+class TemplateCompileTests(TestCase):
+    def setUp(self):
+        ensure_permissions_seeded()
+        self.addon = Addon.objects.get(addon_id="Udar/Quotes")
+
+    def _add_templates(self, start, count):
+        for index in range(start, start + count):
+            title = f"test.compile_{index}"
+            AddonTemplate.objects.create(addon=self.addon, template_type="document", title=title, content=f"<p>{index}</p>")
+            AddonTemplateModification.objects.create(
+                addon=self.addon,
+                template_type="document",
+                template=title,
+                modification_key=f"test.compile_{index}.append",
+                action="append",
+                replace="<footer/>",
+            )
+
+    def _rebuild_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rebuild_templates()
+        return len(ctx.captured_queries)
+
+    def test_rebuild_is_batched_and_skips_unchanged_templates(self):
+        self._add_templates(0, 3)
+        small = self._rebuild_queries()
+        self._add_templates(3, 20)
+        self.assertEqual(self._rebuild_queries(), small)
+        self.assertEqual(AddonCompiledTemplate.objects.get(title="test.compile_21").content, "<p>21</p><footer/>")
+
+        rebuild_templates()
+        log = AddonInstallLog.objects.filter(action="rebuild").order_by("-id").first()
+        self.assertEqual(log.payload["compiled"], 0)
+        self.assertEqual(log.payload["unchanged"], log.payload["templates"])
+        self.assertIn("duration_ms", log.payload)
+
+    def test_changed_modification_recompiles_only_its_template(self):
+        self._add_templates(0, 2)
+        rebuild_templates()
+        AddonTemplateModification.objects.filter(modification_key="test.compile_1.append").update(action="str_replace", find="missing")
+
+        rebuild_templates()
+        log = AddonInstallLog.objects.filter(action="rebuild").order_by("-id").first()
+        self.assertEqual(log.payload["compiled"], 1)
+        self.assertEqual(AddonCompiledTemplate.objects.get(title="test.compile_1").content, "<p>1</p>")
+        self.assertEqual(AddonCompiledTemplate.objects.get(title="test.compile_0").content, "<p>0</p><footer/>")
+        self.assertNotEqual(AddonTemplateModification.objects.get(modification_key="test.compile_1.append").last_error, "")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise navigation_cache.redis.ConnectionError("down")
+
+    def incr(self, key):
+        self._check()
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def mget(self, keys):
+        self._check()
+        return [str(self.values[key]).encode() if key in self.values else None for key in keys]
+
+    def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self._check()
+        self.values[key] = value
+
+    def pipeline(self, transaction=True):
+        redis_client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def incr(self, key):
+                self.calls.append(key)
+
+            def execute(self):
+                redis_client._check()
+                return [redis_client.incr(key) for key in self.calls]
+
+        return Pipeline()
+
+
+class NavigationEpochTests(SimpleTestCase):
+    def setUp(self):
+        navigation_cache._pending_bumps.clear()
+        navigation_cache._local_epochs.clear()
+        self.redis = FakeRedis()
+        patcher = patch.object(navigation_cache, "redis_client", lambda: self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(navigation_cache._pending_bumps.clear)
+        self.addCleanup(navigation_cache._local_epochs.clear)
+        self.addCleanup(navigation_cache.clear_navigation_cache)
+
+    def test_shared_epoch_is_the_only_key_part_while_redis_is_reachable(self):
+        navigation_cache.bump_navigation_epoch(7)
+        self.assertEqual(navigation_cache._epoch(7), ("0.1", True))
+        # Başka bir süreç kendi yerel sayacını hiç artırmamış olsa da aynı anahtarı üretir.
+        navigation_cache._local_epochs.clear()
+        self.assertEqual(navigation_cache._epoch(7), ("0.1", True))
+
+    def test_bumps_during_outage_reach_the_shared_epoch(self):
+        self.redis.down = True
+        navigation_cache.bump_addon_epoch()
+        self.assertEqual(navigation_cache._epoch(7), ("1.0-x", False))
+        self.redis.down = False
+        self.assertEqual(navigation_cache._epoch(7), ("1.0", True))
+        self.assertFalse(navigation_cache._pending_bumps)
+
+    def test_manifest_compiled_across_a_bump_is_not_cached(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                # Derleme sürerken başka bir süreç menüyü değiştirip commit etti.
+                navigation_cache.bump_navigation_epoch(7)
+            return {"navigation": [], "routes": []}
+
+        for _ in range(3):
+            navigation_cache.cached_manifest(7, "Support", [], compute)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([key for key in self.redis.values if key.startswith("addons:nav:")], [f"addons:nav:7:{navigation_cache.permission_fingerprint('Support', [])}:0.1"])
+
+
+class NavigationManifestTests(TestCase):
+    def setUp(self):
+        clear_navigation_cache()
+        ensure_permissions_seeded()
+        self.org = Organization.objects.create(name="Test", code="NAV")
+        self.user = get_user_model().objects.create_user(username="nav-support", password="x", organization=self.org, role="Support")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        clear_navigation_cache()
+
+    def test_manifest_matches_per_item_permission_checks(self):
+        for role in ["Support", "Worker", "Sales", "Admin"]:
+            user = get_user_model().objects.create_user(username=f"nav-check-{role.lower()}", password="x", organization=self.org, role=role)
+            ensure_organization_navigation(self.org)
+            expected = [
+                item.key
+                for item in NavigationItem.objects.filter(organization=self.org, is_active=True).order_by("display_order", "label")
+                if navigation_item_payload(item, user=user)
+            ]
+            expected += [
+                item.key
+                for item in AddonNavigation.objects.filter(addon__is_enabled=True, is_active=True)
+                if item.key not in expected and (not item.required_permission or user_has_perm(user, item.required_permission))
+            ]
+            expected_routes = [
+                route.key
+                for route in AddonRoute.objects.filter(addon__is_enabled=True, is_active=True)
+                if not route.required_permission or user_has_perm(user, route.required_permission)
+            ]
+            manifest = navigation_manifest(user)
+            self.assertEqual([item["key"] for item in manifest["navigation"]], expected, role)
+            self.assertEqual([route["key"] for route in manifest["routes"]], expected_routes, role)
+
+    def test_me_does_not_invalidate_cached_manifest(self):
+        self.assertEqual(self.client.get("/api/addons/navigation/").status_code, 200)
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+        with patch("addons.services.compile_navigation_manifest", return_value={"navigation": [], "routes": []}) as compile_manifest:
+            response = self.client.get("/api/addons/navigation/")
+        self.assertEqual(response.status_code, 200)
+        compile_manifest.assert_not_called()
+
+    def test_cached_manifest_is_served_with_etag_and_invalidated(self):
+        for _ in range(2):
+            response = self.client.get("/api/addons/navigation/")
+            self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        admin = APIClient()
+        admin.force_authenticate(user=get_user_model().objects.create_user(username="nav-admin", password="x", organization=self.org, role="Admin"))
+        routes = admin.get("/api/addons/routes/")
+        self.assertTrue(routes.data["routes"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/addons/navigation/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q["sql"] for q in queries.captured_queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))])
+        self.assertLessEqual(len(queries), 3)
+
+        item = NavigationItem.objects.filter(organization=self.org, key="change_password").first()
+        item.label = "Arsiv"
+        item.save()
+        response = self.client.get("/api/addons/navigation/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Arsiv", [row["label"] for row in response.data["navigation"]])
+
+        disable_addon("Udar/Quotes")
+        response = admin.get("/api/addons/routes/", HTTP_IF_NONE_MATCH=routes["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["routes"], [])
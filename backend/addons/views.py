@@ -2,12 +2,15 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
 from django.db import IntegrityError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.utils import user_has_perm
+from addons.bundles import phrase_bundle_for, rebuild_bundles, style_bundle_compiled
 from addons.models import Addon, AddonCompiledTemplate, AddonPhrase, AddonStyleAsset, AddonTemplate, AddonTemplateModification, NavigationItem
 from addons.services import (
     AddonError,
@@ -15,21 +18,22 @@ from addons.services import (
     disable_addon,
     enable_addon,
     editable_navigation_payload,
-    filtered_navigation,
-    filtered_routes,
     install_addon,
     navigation_item_payload,
+    navigation_manifest,
     permission_catalog_payload,
     rebuild_templates,
-    phrase_bundle,
     reset_organization_navigation,
     safe_extract_addon_zip,
-    style_bundle,
     sync_discovered_addons,
     uninstall_addon,
 )
 
 
+# Paket ve manifest uçları kimlik doğrulamalıdır; tarayıcı her açılışta ETag ile doğrular (304).
+BUNDLE_CACHE_CONTROL = "private, no-cache"
+
+
 def _addon_payload(addon: Addon):
     return {
         "id": addon.id,
@@ -76,6 +80,7 @@ class AddonViewSet(viewsets.ViewSet):
         if not user_has_perm(request.user, "addons.manage"):
             return Response({"detail": "Add-on rebuild yetkiniz yok"}, status=status.HTTP_403_FORBIDDEN)
         addons = sync_discovered_addons(actor=request.user)
+        rebuild_bundles()
         return Response({"count": len(addons)})
 
     @action(detail=False, methods=["post"], url_path="install")
@@ -165,7 +170,8 @@ class AddonNavigationView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        return Response({"navigation": filtered_navigation(request.user), "designed": True})
+        manifest = navigation_manifest(request.user)
+        return _manifest_response(request, manifest, "navigation", {"navigation": manifest["navigation"], "designed": True})
 
 
 class NavigationDesignerView(APIView):
@@ -256,7 +262,8 @@ class AddonRoutesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        return Response({"routes": filtered_routes(request.user)})
+        manifest = navigation_manifest(request.user)
+        return _manifest_response(request, manifest, "routes", {"routes": manifest["routes"]})
 
 
 class AddonTemplateView(APIView):
@@ -395,16 +402,51 @@ class PermissionCatalogView(APIView):
         return Response(permission_catalog_payload())
 
 
+def _etag_matches(request, etag):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in parse_etags(if_none_match))
+
+
+def _manifest_response(request, manifest, section, payload):
+    etag = manifest["etags"][section]
+    response = HttpResponseNotModified() if _etag_matches(request, etag) else Response(payload)
+    response["ETag"] = etag
+    response["Cache-Control"] = BUNDLE_CACHE_CONTROL
+    return response
+
+
+def _bundle_response(request, bundle, content_type):
+    """Derlenmiş paketi güçlü ETag ile sunar; istemci gzip kabul ediyorsa hazır sıkıştırılmış gövdeyi döner."""
+    etag = f'"{bundle.checksum}"'
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    elif "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+        response = HttpResponse(bundle.compressed, content_type=content_type)
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(bundle.body, content_type=content_type)
+    response["ETag"] = etag
+    response["Cache-Control"] = BUNDLE_CACHE_CONTROL
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
 class PhraseBundleView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         language_id = request.query_params.get("language_id") or request.query_params.get("locale") or "tr-TR"
-        return Response({"language_id": language_id, "phrases": phrase_bundle(language_id)})
+        bundle = phrase_bundle_for(language_id)
+        if bundle is None:
+            return Response({"language_id": language_id, "phrases": {}})
+        return _bundle_response(request, bundle, "application/json; charset=utf-8")
 
 
 class AddonStyleBundleView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        return HttpResponse(style_bundle(), content_type="text/css; charset=utf-8")
+        bundle = style_bundle_compiled()
+        if bundle is None:
+            return HttpResponse("", content_type="text/css; charset=utf-8")
+        return _bundle_response(request, bundle, "text/css; charset=utf-8")
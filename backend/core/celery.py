@@ -13,4 +13,20 @@ app.conf.beat_schedule = {
         'task': 'support.tasks.run_due_soon_automations',
         'schedule': 1800.0,  # Her 30 dakikada (saniye cinsinden)
     },
+    'drain-production-machine-events': {
+        'task': 'production.tasks.drain_machine_events',
+        'schedule': 5.0,  # Pi kuyruğu: kaçan tetiklemeler ve yeniden denemeler için
+    },
+    'deliver-automation-notifications': {
+        'task': 'support.tasks.deliver_notifications',
+        'schedule': 30.0,  # Bildirim outbox'ı: kaçan tetiklemeler ve yeniden denemeler için
+    },
+    'purge-expired-idempotency-keys': {
+        'task': 'organizations.tasks.purge_expired_idempotency_keys',
+        'schedule': 3600.0,  # Saatlik
+    },
+    'backfill-task-line-workflows': {
+        'task': 'support.tasks.backfill_task_line_workflows',
+        'schedule': 3600.0,  # Saatlik; liste uçları artık yazmadığı için eski görevleri bu iş dönüştürür
+    },
 }
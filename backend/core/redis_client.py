@@ -0,0 +1,29 @@
+"""Önbellek modüllerinin paylaştığı Redis bağlantısı.
+
+Bağlantı süreç başına bir kez açılır. Bir çağrı ``redis.RedisError`` alırsa
+``redis_failed()`` çağrılır ve ``RETRY_SECONDS`` boyunca ``redis_client()``
+``None`` döner; çağıranlar bu sürede süreç içi yedeklerine düşer. Bekleme süresi
+tüm modüller için ortaktır, böylece Redis kesintisi her modülde aynı davranır.
+"""
+
+import time
+
+import redis
+from django.conf import settings
+
+RETRY_SECONDS = 30
+
+_state = {"client": None, "down_until": 0.0}
+
+
+def redis_client():
+    if time.monotonic() < _state["down_until"]:
+        return None
+    if _state["client"] is None:
+        url = getattr(settings, "CELERY_BROKER_URL", "redis://redis:6379/0")
+        _state["client"] = redis.from_url(url, socket_connect_timeout=1, socket_timeout=2)
+    return _state["client"]
+
+
+def redis_failed():
+    _state["down_until"] = time.monotonic() + RETRY_SECONDS
@@ -187,8 +187,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'support.tasks.run_due_soon_automations',
         'schedule': 60 * 15,  # every 15 minutes
     },
+    'task-report-facts-stale': {
+        'task': 'support.tasks.refresh_task_report_facts',
+        'schedule': 60 * 15,  # picks up refreshes that could not be queued
+    },
 }
 
+# Production Pi ingestion: accept-then-process (202) via Redis stream, DB outbox fallback
+PRODUCTION_PI_ASYNC_INGEST = os.getenv('PRODUCTION_PI_ASYNC_INGEST', 'false').lower() == 'true'
+PRODUCTION_INGEST_REDIS_URL = os.getenv('PRODUCTION_INGEST_REDIS_URL', CELERY_BROKER_URL)
+PRODUCTION_INGEST_SHARDS = int(os.getenv('PRODUCTION_INGEST_SHARDS', '4'))
+PRODUCTION_INGEST_MAX_ATTEMPTS = int(os.getenv('PRODUCTION_INGEST_MAX_ATTEMPTS', '5'))
+
 # Notifications / SMTP / Slack
 SMTP_HOST = os.getenv('SMTP_HOST', '')
 SMTP_PORT = os.getenv('SMTP_PORT', '587')
@@ -196,3 +206,6 @@ SMTP_USER = os.getenv('SMTP_USER', '')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
 SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'True') == 'True'
 SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL', '')
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '5'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '3'))
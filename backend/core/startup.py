@@ -0,0 +1,95 @@
+"""Web / worker süreçlerinin açılış profili.
+
+``profile_boot`` temiz bir Python sürecinde ``django.setup()`` ve URL yapılandırmasının
+yüklenmesini çalıştırır; süreyi, ``-X importtime`` ağacını ve açılışta yüklenen
+ertelenmiş kütüphaneleri döner. Belge / görsel kütüphaneleri (openpyxl, reportlab,
+python-docx, PIL) ilk kullanımda fonksiyon içinde içe aktarılır; açılışta yüklenmeleri
+bir gerilemedir.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+DEFERRED_MODULES = ('openpyxl', 'reportlab', 'docx', 'PIL', 'xlrd', 'lxml')
+
+_BOOT_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().reverse_dict
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'modules': sorted(sys.modules)}))
+'''
+
+
+@dataclass
+class ImportNode:
+    name: str
+    self_us: int
+    cumulative_us: int
+    children: list = field(default_factory=list)
+
+    @property
+    def package(self):
+        return self.name.split('.', 1)[0]
+
+
+@dataclass
+class BootProfile:
+    seconds: float
+    modules: set
+    roots: list
+
+    @property
+    def deferred_loaded(self):
+        return sorted(name for name in DEFERRED_MODULES if name in self.modules)
+
+    def import_chain(self, module):
+        """Açılışta ``module``'ü ilk yükleyen içe aktarma zinciri."""
+
+        def walk(nodes, path):
+            for node in nodes:
+                if node.name == module:
+                    return [*path, node.name]
+                found = walk(node.children, [*path, node.name])
+                if found:
+                    return found
+            return None
+
+        return walk(self.roots, []) or []
+
+
+def parse_importtime(output):
+    """``-X importtime`` çıktısını köklerden başlayan ağaca çevirir."""
+    pending = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        raw = parts[2].rstrip()
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        node = ImportNode(raw.strip(), int(parts[0]), int(parts[1]))
+        # Çıktı alt modülleri üst modülden önce yazar.
+        node.children = pending.pop(depth + 1, [])
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+def profile_boot(importtime=True):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings')}
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', _BOOT_SCRIPT]
+    result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f'Açılış profili alınamadı: {result.stderr.strip()[-2000:]}')
+    payload = json.loads(result.stdout.strip().splitlines()[-1])
+    roots = parse_importtime(result.stderr) if importtime else []
+    return BootProfile(seconds=payload['seconds'], modules=set(payload['modules']), roots=roots)
@@ -46,6 +46,7 @@ from production.views import (
     ProductionDevicePayloadMapViewSet,
     ProductionDocumentViewSet,
     ProductionEventViewSet,
+    ProductionIngestEventViewSet,
     ProductRecipeMaterialViewSet,
     ProductRecipeOperationViewSet,
     ProductRecipeViewSet,
@@ -180,6 +181,7 @@ router.register(r'production/material-consumptions', ProductionMaterialConsumpti
 router.register(r'production/sessions', ProductionWorkSessionViewSet, basename='production-sessions')
 router.register(r'production/counting-windows', ProductionCountingWindowViewSet, basename='production-counting-windows')
 router.register(r'production/events', ProductionEventViewSet, basename='production-events')
+router.register(r'production/ingest-events', ProductionIngestEventViewSet, basename='production-ingest-events')
 router.register(r'production/station-alerts', ProductionStationAlertViewSet, basename='production-station-alerts')
 router.register(r'production/documents', ProductionDocumentViewSet, basename='production-documents')
 router.register(r'tickets', TicketViewSet, basename='tickets')
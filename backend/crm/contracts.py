@@ -3,6 +3,7 @@ from __future__ import annotations
 from copy import copy, deepcopy
 from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
+from functools import cache
 from io import BytesIO
 from pathlib import Path
 import math
@@ -14,18 +15,9 @@ import tempfile
 import unicodedata
 from django.conf import settings
 from accounts.price_lists import get_org_price_list_label
-from openpyxl.drawing.image import Image as XLImage
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
-from openpyxl.utils import get_column_letter, range_boundaries
-from openpyxl.worksheet.pagebreak import Break
-from openpyxl.worksheet.properties import PageSetupProperties
-from PIL import Image as PILImage
 
 XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 PDF_CONTENT_TYPE = 'application/pdf'
-EMPTY_BORDER = Border(left=Side(style=None), right=Side(style=None), top=Side(style=None), bottom=Side(style=None))
-EMPTY_FILL = PatternFill(fill_type=None)
 PLACEHOLDER_PATTERN = re.compile(r'\{([A-Za-z0-9_.]+)\}')
 DEFAULT_DOCUMENT_LEGAL_NOTICE = (
     'Bu teklif, firmamız bünyesinde kullanılan Udar CRM ERP üretim ve yönetim sistemi üzerinden oluşturulmuştur. '
@@ -54,6 +46,22 @@ DEFAULT_CONTRACT_NOTES = [
 DEFAULT_CONTRACT_NOTES_TEXT = '\n'.join(DEFAULT_CONTRACT_NOTES)
 
 
+# openpyxl ve PIL yalnızca belge üretilirken içe aktarılır; bu modül satıcı profilleri
+# için her web / worker sürecinin açılışında yükleniyor.
+@cache
+def _empty_border():
+    from openpyxl.styles import Border, Side
+
+    return Border(left=Side(style=None), right=Side(style=None), top=Side(style=None), bottom=Side(style=None))
+
+
+@cache
+def _empty_fill():
+    from openpyxl.styles import PatternFill
+
+    return PatternFill(fill_type=None)
+
+
 def _default_terms_text_for_quote(quote):
     organization = getattr(quote, 'organization', None)
     settings_row = None
@@ -800,6 +808,9 @@ def _template_entry_path(entry):
 
 
 def _default_seller_master_template_path():
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
     if SELLER_MASTER_TEMPLATE_PATH.exists():
         return SELLER_MASTER_TEMPLATE_PATH
 
@@ -1054,6 +1065,8 @@ def get_template_download(organization, template_key: str, variant: str = 'curre
 
 
 def save_template_override(organization, template_key: str, uploaded_file, user=None, seller_company_key: str | None = None):
+    from openpyxl import load_workbook
+
     template_key = str(template_key or SELLER_MASTER_TEMPLATE_KEY).strip() or SELLER_MASTER_TEMPLATE_KEY
     seller_key = normalize_seller_company_key(seller_company_key)
     is_seller_master = template_key == SELLER_MASTER_TEMPLATE_KEY
@@ -1221,6 +1234,8 @@ def list_document_exports(quote):
 
 
 def build_document_export(quote, template_key: str | None = None):
+    from openpyxl import load_workbook
+
     requested_key = str(template_key or SELLER_MASTER_TEMPLATE_KEY).strip() or SELLER_MASTER_TEMPLATE_KEY
     if requested_key == SELLER_MASTER_TEMPLATE_KEY:
         return _build_seller_master_document_export(quote)
@@ -1268,6 +1283,8 @@ def build_document_export(quote, template_key: str | None = None):
 
 
 def _build_seller_master_document_export(quote):
+    from openpyxl import load_workbook
+
     template_path = _seller_master_template_path(quote.organization, quote.seller_company_key)
     workbook = load_workbook(template_path)
     workbook.template = False
@@ -1299,6 +1316,9 @@ def _build_seller_master_document_export(quote):
 
 
 def _prepare_pdf_print_layout(worksheet):
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.properties import PageSetupProperties
+
     worksheet.page_setup.orientation = 'landscape'
     worksheet.page_setup.paperSize = worksheet.PAPERSIZE_A4
     worksheet.page_setup.fitToWidth = 1
@@ -1598,6 +1618,8 @@ def _find_product_group_anchor(ws):
 
 
 def _apply_logo_placeholders(ws, quote):
+    from openpyxl.drawing.image import Image as XLImage
+
     seller = _selected_seller_profile(quote)
     logo_path = _seller_logo_media_path(seller)
     if not logo_path:
@@ -1626,6 +1648,8 @@ def _fixed_ayka_seller_profile(organization):
 
 
 def _add_header_logo(ws, profile, anchor, max_width, max_height):
+    from openpyxl.drawing.image import Image as XLImage
+
     logo_path = _seller_logo_media_path(profile)
     if not logo_path:
         return
@@ -1655,6 +1679,8 @@ def _prepare_seller_master_header_layout(ws):
 
 
 def _set_header_detail_box(ws, row, label, value):
+    from openpyxl.styles import PatternFill
+
     styles = _tail_styles()
     label_cell = _tail_merge(ws, row, 10, 11, label, None, styles['label_font'], styles['center'], styles['section_border'])
     value_cell = _tail_merge(ws, row, 12, 13, value, None, styles['text_font'], styles['center'], styles['section_border'])
@@ -1687,12 +1713,14 @@ def _apply_seller_master_header_branding(ws, quote):
 
 
 def _clear_seller_master_spacer_row(ws, row, start_col=2, end_col=13):
+    from openpyxl.styles import PatternFill
+
     _unmerge_overlapping_range(ws, row, row, start_col, end_col)
     for column in range(start_col, end_col + 1):
         cell = ws.cell(row, column)
         cell.value = ''
         cell.fill = PatternFill(fill_type=None)
-        cell.border = EMPTY_BORDER
+        cell.border = _empty_border()
     ws.row_dimensions[row].height = 6
 
 
@@ -1706,6 +1734,8 @@ def _copy_cell_style(source, target):
 
 
 def _merge_seller_master_box(ws, cell_range, value, source):
+    from openpyxl.utils import range_boundaries
+
     min_col, min_row, max_col, max_row = range_boundaries(cell_range)
     _unmerge_overlapping_range(ws, min_row, max_row, min_col, max_col)
     ws.merge_cells(cell_range)
@@ -1795,6 +1825,9 @@ def _detach_template_banner_images(ws):
 
 
 def _render_dynamic_product_group_tables(ws, quote):
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
     anchor = _find_product_group_anchor(ws)
     start_row, start_column = anchor or (ws.max_row + 2, 1)
     groups = _build_dynamic_line_groups(quote)
@@ -1878,6 +1911,8 @@ def _dynamic_column_spans(columns, physical_width):
 
 
 def _dynamic_span_width(ws, start_column, span):
+    from openpyxl.utils import get_column_letter
+
     width = Decimal('0')
     for physical_column in range(start_column, start_column + span):
         letter = get_column_letter(physical_column)
@@ -1897,6 +1932,8 @@ def _dynamic_text_row_height(value, width_units, base=18, line_height=13, max_he
 
 
 def _seller_master_font(color='000000', bold=False, italic=False, size=SELLER_MASTER_BODY_FONT_SIZE):
+    from openpyxl.styles import Font
+
     return Font(name='Times New Roman', color=color, bold=bold, italic=italic, size=size)
 
 
@@ -1986,6 +2023,8 @@ def _section_label(section_key):
 
 
 def _write_dynamic_product_group(ws, quote, group, row, column, physical_width=None):
+    from openpyxl.styles import Alignment, Border, PatternFill, Side
+
     columns = group['columns']
     column_count = max(physical_width or len(columns), len(columns), 4)
     last_column = column + column_count - 1
@@ -2074,10 +2113,10 @@ def _write_dynamic_product_group(ws, quote, group, row, column, physical_width=N
         if left_end_column > column:
             ws.merge_cells(start_row=row, start_column=column, end_row=row, end_column=left_end_column)
         for col in range(column, left_end_column + 1):
-            ws.cell(row, col).border = EMPTY_BORDER
+            ws.cell(row, col).border = _empty_border()
         left_cell = ws.cell(row, column)
         left_cell.value = ''
-        left_cell.border = EMPTY_BORDER
+        left_cell.border = _empty_border()
         left_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
         label_cell = ws.cell(row, label_column)
         label_cell.value = _turkish_upper(label)
@@ -2204,6 +2243,8 @@ def _service_expense_tax_rate(quote):
 
 
 def _write_service_summary_group(ws, quote, groups, row, column, physical_width, service_rows=None):
+    from openpyxl.styles import Alignment, Border, PatternFill, Side
+
     column_count = max(physical_width, 6)
     last_column = column + column_count - 1
     currency_code = _quote_currency(quote)
@@ -2286,6 +2327,8 @@ def _service_tax_cell_value(tax_rate, tax_amount, currency_code):
 
 
 def _write_service_summary_row(ws, row, column, spans, values, currency_code, border, bold=False):
+    from openpyxl.styles import Alignment
+
     current_column = column
     required_height = 18
     for index, value in enumerate(values):
@@ -2358,6 +2401,8 @@ def _reset_seller_master_columns(ws):
 
 
 def _tail_styles():
+    from openpyxl.styles import Alignment, Border, PatternFill, Side
+
     title_fill = PatternFill('solid', fgColor='203864')
     soft_fill = PatternFill('solid', fgColor='EAF2F8')
     thin = Side(style='thin', color='000000')
@@ -2445,6 +2490,8 @@ def _build_yekun_summary_rows(quote):
 
 
 def _write_yekun_summary_tail(ws, quote, row, start_col=2, end_col=13):
+    from openpyxl.styles import Alignment
+
     styles = _tail_styles()
     currency_code = _quote_currency(quote)
     summary_rows = _build_yekun_summary_rows(quote)
@@ -2523,6 +2570,8 @@ def _write_terms_tail(ws, quote, row, start_col=2, end_col=13):
 
 
 def _write_bank_tail(ws, quote, row, start_col=2, end_col=13):
+    from openpyxl.styles import Alignment
+
     seller = _selected_seller_profile(quote)
     styles = _tail_styles()
     text_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True, shrink_to_fit=True)
@@ -2557,6 +2606,8 @@ def _write_bank_tail(ws, quote, row, start_col=2, end_col=13):
 
 
 def _write_signature_tail(ws, quote, row):
+    from openpyxl.styles import Alignment
+
     customer = _customer_snapshot(quote.contract_config or {})
     seller = _selected_seller_profile(quote)
     styles = _tail_styles()
@@ -2569,6 +2620,8 @@ def _write_signature_tail(ws, quote, row):
 
 
 def _write_legal_notice_tail(ws, row):
+    from openpyxl.styles import Alignment
+
     styles = _tail_styles()
     _tail_merge(
         ws,
@@ -2649,6 +2702,8 @@ def _write_bottom_banner_tail(ws, row, prepared_banner):
 
 
 def _add_manual_page_break_before(ws, row):
+    from openpyxl.worksheet.pagebreak import Break
+
     if row <= 1:
         return
     break_id = row - 1
@@ -3453,8 +3508,8 @@ def _set_currency_value(ws, coordinate, value, currency):
 def _clear_visual_cell(ws, coordinate):
     cell = _resolve_cell(ws, coordinate)
     cell.value = ''
-    cell.border = EMPTY_BORDER
-    cell.fill = EMPTY_FILL
+    cell.border = _empty_border()
+    cell.fill = _empty_fill()
     cell.number_format = 'General'
 
 
@@ -3523,6 +3578,9 @@ def _fit_excel_image(image, max_width, max_height):
 
 
 def _scale_excel_image_to_width(image, target_width):
+    from openpyxl.drawing.image import Image as XLImage
+    from PIL import Image as PILImage
+
     width = float(getattr(image, 'width', target_width) or target_width)
     height = float(getattr(image, 'height', 0) or 0)
     if width <= 0 or height <= 0:
@@ -3543,6 +3601,9 @@ def _scale_excel_image_to_width(image, target_width):
 
 
 def _crop_excel_image_content(image, padding=0):
+    from openpyxl.drawing.image import Image as XLImage
+    from PIL import Image as PILImage
+
     try:
         source = PILImage.open(BytesIO(image._data())).convert('RGBA')
     except Exception:
@@ -3595,6 +3656,9 @@ def _excel_image_content_bbox(source):
 
 
 def _crop_excel_image_vertical_content(image):
+    from openpyxl.drawing.image import Image as XLImage
+    from PIL import Image as PILImage
+
     try:
         source = PILImage.open(BytesIO(image._data())).convert('RGBA')
     except Exception:
@@ -3629,6 +3693,8 @@ def _worksheet_printable_width_pixels(ws):
 
 
 def _worksheet_column_range_width_pixels(ws, start_column, end_column):
+    from openpyxl.utils import get_column_letter
+
     total = 0
     for column in range(start_column, end_column + 1):
         width = float(ws.column_dimensions[get_column_letter(column)].width or 10)
@@ -3637,6 +3703,8 @@ def _worksheet_column_range_width_pixels(ws, start_column, end_column):
 
 
 def _clear_logo_frame(ws, cell):
+    from openpyxl.utils import range_boundaries
+
     for merged_range in ws.merged_cells.ranges:
         if cell.coordinate in merged_range:
             min_col, min_row, max_col, max_row = range_boundaries(str(merged_range))
@@ -3647,8 +3715,8 @@ def _clear_logo_frame(ws, cell):
     for row in range(min_row, max_row + 1):
         for column in range(min_col, max_col + 1):
             target = ws.cell(row, column)
-            target.border = EMPTY_BORDER
-            target.fill = EMPTY_FILL
+            target.border = _empty_border()
+            target.fill = _empty_fill()
 
 
 def _strip_header_logos(ws):
@@ -3663,6 +3731,8 @@ def _strip_header_logos(ws):
 
 
 def _apply_seller_logo(ws, profile, seller_side):
+    from openpyxl.drawing.image import Image as XLImage
+
     _strip_header_logos(ws)
     logo_path = _seller_logo_media_path(profile)
     if not logo_path:
@@ -3855,6 +3925,8 @@ def _strip_header_logos(ws):
 
 
 def _apply_seller_logo(ws, profile, seller_side):
+    from openpyxl.drawing.image import Image as XLImage
+
     _strip_header_logos(ws)
     logo_path = _seller_logo_media_path(profile)
     if not logo_path:
@@ -3980,6 +4052,8 @@ def _safe_unmerge(ws, cell_range):
 
 
 def _merge_value_row(ws, cell_range, value, source_cell):
+    from openpyxl.styles import Alignment
+
     _safe_unmerge(ws, cell_range)
     ws.merge_cells(cell_range)
     target = ws[source_cell]
@@ -0,0 +1,176 @@
+"""Tekliften sözleşmeye dönüşüm.
+
+Tek teklif dönüşümü kaynak teklifi satır kilidiyle okur, satırları tek
+``bulk_create`` ile kopyalar ve toplamları bellekteki satırlardan hesaplar.
+Toplu dönüşüm her teklifi kendi transaction'ında işler; numaralar satıcı öneki
+başına önceden blok olarak ayrılır ve sonuç satır başına kısa bir özet olarak
+döner. Dönüşümü başarısız olan teklifin ayrılmış numarası kullanılmaz.
+"""
+
+from copy import deepcopy
+
+from django.db import DatabaseError, transaction
+
+from audit.utils import log_entity_action
+from organizations.numbering import allocate_numbers
+
+from .contracts import get_default_seller_profiles, get_seller_profiles, normalize_seller_company_key
+from .models import Quote, QuoteLine
+from .serializers import QuoteSerializer
+
+SALES_DOCUMENT_NUMBER_PADDING = 6
+BULK_CONVERT_LIMIT = 200
+
+
+def seller_number_prefix(organization, seller_company_key):
+    selected_key = normalize_seller_company_key(seller_company_key or '')
+    profiles = [profile for profile in get_seller_profiles(organization) if profile.get('is_active', True)] or get_default_seller_profiles()
+    selected_profile = None
+    for profile in profiles:
+        if normalize_seller_company_key(profile.get('key')) == selected_key:
+            selected_profile = profile
+            break
+    selected_profile = selected_profile or profiles[0]
+    source = (
+        selected_profile.get('short_name')
+        or selected_profile.get('key')
+        or selected_profile.get('display_name')
+        or organization.code
+        or organization.name
+        or 'UD'
+    )
+    normalized = normalize_seller_company_key(source)
+    return (normalized[:2] or 'UD').upper()
+
+
+def sales_document_numbers(organization, document_type, seller_company_key, count=1):
+    # Sayaç satıcı öneki başına tutulur; aynı öneki paylaşan firmalar numara çakıştıramaz.
+    document_letter = 'S' if document_type == 'Contract' else 'T'
+    seller_prefix = seller_number_prefix(organization, seller_company_key)
+    return allocate_numbers(
+        organization,
+        'CONTRACT' if document_type == 'Contract' else 'QUOTE',
+        count,
+        scope=seller_prefix,
+        prefix=f'{seller_prefix}-{document_letter}-',
+        padding=SALES_DOCUMENT_NUMBER_PADDING,
+    )
+
+
+def sales_document_number(organization, document_type, seller_company_key):
+    return sales_document_numbers(organization, document_type, seller_company_key)[0]
+
+
+def _existing_contract(quote):
+    contract_id = (quote.contract_config or {}).get('converted_contract_id')
+    if not contract_id:
+        return None
+    return Quote.objects.filter(organization_id=quote.organization_id, pk=contract_id, document_type='Contract').first()
+
+
+def convert_quote(quote, user=None, number=None):
+    """Teklifi sözleşmeye dönüştürür; ``(sözleşme, yeni_mi)`` döner.
+
+    Daha önce dönüştürülmüş teklif için mevcut sözleşme döner. ``number``
+    verilmezse numara dönüşüm transaction'ı içinde ayrılır.
+    """
+    with transaction.atomic():
+        source = Quote.objects.select_for_update().select_related('organization').get(pk=quote.pk)
+        existing = _existing_contract(source)
+        if existing is not None:
+            return existing, False
+
+        contract_config = deepcopy(source.contract_config or {})
+        contract_config['source_quote_id'] = source.id
+        contract_config['source_quote_number'] = source.number
+        contract = Quote(
+            organization=source.organization,
+            document_type='Contract',
+            number=number or sales_document_number(source.organization, 'Contract', source.seller_company_key),
+            customer_id=source.customer_id,
+            opportunity_id=source.opportunity_id,
+            owner_id=source.owner_id or getattr(user, 'pk', None),
+            prepared_by_id=source.prepared_by_id or getattr(user, 'pk', None),
+            seller_company_key=source.seller_company_key,
+            status='Pending',
+            valid_until=source.valid_until,
+            currency=source.currency,
+            payment_terms=source.payment_terms,
+            delivery_terms=source.delivery_terms,
+            notes=source.notes,
+            vat_rate=source.vat_rate,
+            contract_config=contract_config,
+        )
+        contract._audit_user = user
+        contract.save()
+
+        lines = QuoteLine.objects.bulk_create(
+            [
+                QuoteLine(
+                    quote=contract,
+                    product_id=line.product_id,
+                    section_key=line.section_key,
+                    name=line.name,
+                    unit=line.unit,
+                    qty=line.qty,
+                    unit_price=line.unit_price,
+                    discount=line.discount,
+                    discount_secondary=line.discount_secondary,
+                    tax=line.tax,
+                    sort_order=line.sort_order,
+                    details=deepcopy(line.details or {}),
+                )
+                for line in source.lines.order_by('sort_order', 'id')
+            ]
+        )
+        QuoteSerializer()._recalc(contract, lines)
+
+        source_config = deepcopy(source.contract_config or {})
+        source_config['converted_contract_id'] = contract.id
+        source_config['converted_contract_number'] = contract.number
+        source.contract_config = source_config
+        source.status = 'Approved'
+        source._audit_user = user
+        source.save(update_fields=['status', 'contract_config'])
+
+        log_entity_action(source, 'converted', user=user, field='converted_contract_id', new_value=str(contract.id))
+        log_entity_action(contract, 'created_from_quote', user=user, field='source_quote_id', new_value=str(source.id))
+    quote.refresh_from_db(fields=['status', 'contract_config'])
+    return contract, True
+
+
+def _result(quote, status, contract=None, detail=''):
+    result = {'quote_id': quote.id, 'quote_number': quote.number, 'status': status}
+    if contract is not None:
+        result.update(contract_id=contract.id, contract_number=contract.number, total=str(contract.total))
+    if detail:
+        result['detail'] = detail
+    return result
+
+
+def convert_quotes(quotes, user=None):
+    """Teklifleri sırayla dönüştürür; her teklif için kısa bir sonuç döner."""
+    quotes = list(quotes)
+    pending = {}
+    for quote in quotes:
+        if quote.document_type == 'Quote' and not (quote.contract_config or {}).get('converted_contract_id'):
+            prefix = seller_number_prefix(quote.organization, quote.seller_company_key)
+            pending.setdefault((quote.organization_id, prefix), []).append(quote)
+    numbers = {}
+    for group in pending.values():
+        sample = group[0]
+        block = sales_document_numbers(sample.organization, 'Contract', sample.seller_company_key, len(group))
+        numbers.update(zip((quote.id for quote in group), block))
+
+    results = []
+    for quote in quotes:
+        if quote.document_type != 'Quote':
+            results.append(_result(quote, 'skipped', detail='Yalnizca teklifler sozlesmeye donusturulebilir.'))
+            continue
+        try:
+            contract, created = convert_quote(quote, user=user, number=numbers.get(quote.id))
+        except DatabaseError as exc:
+            results.append(_result(quote, 'error', detail=str(exc)[:200]))
+            continue
+        results.append(_result(quote, 'converted' if created else 'already_converted', contract))
+    return results
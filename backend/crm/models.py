@@ -27,6 +27,32 @@ class BusinessPartner(models.Model):
         return self.name
 
 
+class PartnerImportJob(models.Model):
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='partner_import_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    filename = models.CharField(max_length=255, blank=True, default='')
+    # Yüklenen dosya iş bitene kadar tutulur; sonuçla birlikte boşaltılır.
+    source = models.BinaryField(blank=True, default=b'')
+    update_existing = models.BooleanField(default=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued')
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+
 class Contact(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='contacts')
     company = models.ForeignKey(BusinessPartner, on_delete=models.CASCADE, related_name='contacts')
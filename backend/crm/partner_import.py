@@ -1,12 +1,30 @@
+"""Cari listesi (Excel) içe aktarımı.
+
+Satırlar önce bellekte ayrıştırılır; mevcut cariler vergi numarası ve
+küçük harfe indirgenmiş ad haritalarına bir kez yüklenir ve yazma işlemleri
+``IMPORT_CHUNK_SIZE`` satırlık parçalarda ``bulk_create`` / ``bulk_update`` ile
+yapılır. ``.xls`` dosyaları ``xlrd`` kuruluysa süreç içinde okunur, değilse
+LibreOffice ile dönüştürülür. Yazılamayan bir parça satır satır yeniden denenir.
+İstemci ``background=1`` gönderdiğinde dosya ``PartnerImportJob`` kaydıyla
+Celery'de işlenir ve ilerleme kayıtta tutulur.
+"""
+
+import os
 import re
 import shutil
 import subprocess
 import tempfile
+from io import BytesIO
 from pathlib import Path
 
-from openpyxl import load_workbook
+from django.db import DatabaseError, transaction
+from django.utils import timezone
 
-from .models import BusinessPartner
+from .models import BusinessPartner, PartnerImportJob
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_COLUMNS = 18
+PARTNER_IMPORT_FIELDS = ['name', 'currency', 'tax_office', 'tax_number', 'phone', 'email', 'address', 'city', 'country', 'group', 'owner']
 
 
 TURKEY_PROVINCES = {
@@ -198,85 +216,249 @@ def _address(address, postcode, location):
     return ' / '.join(part for part in parts if part)
 
 
-def _xlsx_path(uploaded_file):
-    suffix = Path(uploaded_file.name or '').suffix.lower()
-    temp_dir = tempfile.TemporaryDirectory()
-    source = Path(temp_dir.name) / f'import{suffix or ".xls"}'
-    with source.open('wb') as handle:
-        for chunk in uploaded_file.chunks():
-            handle.write(chunk)
-    if suffix == '.xlsx':
-        return temp_dir, source
-    if suffix != '.xls':
-        raise ValueError('Yalnızca .xls veya .xlsx cari listesi yükleyebilirsiniz.')
+def _xls_to_xlsx(data):
     soffice = shutil.which('libreoffice') or shutil.which('soffice')
     if not soffice:
         raise ValueError('.xls dosyasını okuyabilmek için LibreOffice gereklidir.')
-    result = subprocess.run(
-        [soffice, '--headless', '--convert-to', 'xlsx', '--outdir', temp_dir.name, str(source)],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        timeout=60,
-        check=False,
-    )
-    converted = source.with_suffix('.xlsx')
-    if result.returncode != 0 or not converted.exists():
-        raise ValueError(f'Excel dosyası dönüştürülemedi: {(result.stderr or result.stdout).strip()}')
-    return temp_dir, converted
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = Path(temp_dir) / 'import.xls'
+        source.write_bytes(data)
+        result = subprocess.run(
+            [soffice, '--headless', '--convert-to', 'xlsx', '--outdir', temp_dir, str(source)],
+            env={**os.environ, 'HOME': temp_dir},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=60,
+            check=False,
+        )
+        converted = source.with_suffix('.xlsx')
+        if result.returncode != 0 or not converted.exists():
+            raise ValueError(f'Excel dosyası dönüştürülemedi: {(result.stderr or result.stdout).strip()}')
+        return converted.read_bytes()
 
 
-def import_business_partners_from_excel(organization, uploaded_file, update_existing=True):
-    temp_dir, path = _xlsx_path(uploaded_file)
+def _xlsx_rows(data):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(min_row=2, values_only=True)
+    finally:
+        wb.close()
+
+
+def _xls_rows(data):
+    try:
+        import xlrd
+    except ImportError:
+        yield from _xlsx_rows(_xls_to_xlsx(data))
+        return
+    try:
+        book = xlrd.open_workbook(file_contents=data, on_demand=True)
+    except xlrd.XLRDError as exc:
+        raise ValueError(f'Excel dosyası okunamadı: {exc}') from exc
     try:
-        wb = load_workbook(path, read_only=True, data_only=True)
-        ws = wb.active
-        created = updated = skipped = 0
-        errors = []
-        rows = []
-        for row_number, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-            cells = [_clean(cell) for cell in row[:18]]
-            if len(cells) < 18:
-                cells += [''] * (18 - len(cells))
-            name = cells[1]
-            if not name or name.startswith('---------------'):
+        sheet = book.sheet_by_index(0)
+        for index in range(1, sheet.nrows):
+            yield sheet.row_values(index)
+    finally:
+        book.release_resources()
+
+
+def sheet_rows(filename, data):
+    suffix = Path(filename or '').suffix.lower()
+    if suffix == '.xlsx':
+        return _xlsx_rows(data)
+    if suffix == '.xls':
+        return _xls_rows(data)
+    raise ValueError('Yalnızca .xls veya .xlsx cari listesi yükleyebilirsiniz.')
+
+
+def _payload(row):
+    cells = [_clean(cell) for cell in row[:IMPORT_COLUMNS]]
+    if len(cells) < IMPORT_COLUMNS:
+        cells += [''] * (IMPORT_COLUMNS - len(cells))
+    name = cells[1]
+    if not name or name.startswith('---------------'):
+        return None
+    country, city = _country_and_city(cells[9] or cells[13], cells[7])
+    return {
+        'name': name[:255],
+        'currency': _currency(cells[2]),
+        'tax_office': cells[3][:100],
+        'tax_number': re.sub(r'\D+', '', cells[4])[:64],
+        'phone': _phone(cells[5], cells[10], cells[11] or cells[14])[:50],
+        'email': _email_from(cells[6], cells[16], cells[15]),
+        'address': _address(cells[7], cells[8] or cells[12], cells[9] or cells[13]),
+        'city': city[:100],
+        'country': country[:50],
+        'group': '',
+        'owner': '',
+    }
+
+
+class _PartnerIndex:
+    """Vergi numarası ve ad (casefold) ile cari eşleştirmesi; dosyadaki yeni cariler de eklenir."""
+
+    def __init__(self, organization):
+        self.by_tax = {}
+        self.by_name = {}
+        partners = BusinessPartner.objects.filter(organization=organization).order_by('id').only('id', *PARTNER_IMPORT_FIELDS)
+        for partner in partners.iterator(chunk_size=2000):
+            self.add(partner)
+
+    def add(self, partner):
+        if partner.tax_number:
+            self.by_tax.setdefault(partner.tax_number, partner)
+        self.by_name.setdefault(partner.name.casefold(), partner)
+
+    def discard(self, partner):
+        for index, key in ((self.by_tax, partner.tax_number), (self.by_name, partner.name.casefold())):
+            if index.get(key) is partner:
+                index.pop(key)
+
+    def find(self, payload):
+        existing = self.by_tax.get(payload['tax_number']) if payload['tax_number'] else None
+        return existing or self.by_name.get(payload['name'].casefold())
+
+
+def _apply(index, organization, payload, update_existing):
+    """Satırı indekse uygular; ``(cari, önceki değerler)`` ya da atlanacaksa ``None`` döner."""
+    existing = index.find(payload)
+    if existing is not None and not update_existing:
+        return None
+    if existing is None:
+        partner = BusinessPartner(organization=organization, **payload)
+        previous = None
+    else:
+        partner = existing
+        previous = {field: getattr(existing, field) for field in PARTNER_IMPORT_FIELDS}
+        index.discard(existing)
+        for key, value in payload.items():
+            setattr(existing, key, value)
+    index.add(partner)
+    return partner, previous
+
+
+def _revert(index, partner, previous):
+    index.discard(partner)
+    if previous is None:
+        return
+    for key, value in previous.items():
+        setattr(partner, key, value)
+    index.add(partner)
+
+
+def _write_chunk(applied):
+    to_create = {id(partner): partner for _, _, partner, _ in applied if partner.pk is None}
+    to_update = {partner.pk: partner for _, _, partner, _ in applied if partner.pk is not None}
+    with transaction.atomic():
+        BusinessPartner.objects.bulk_create(list(to_create.values()))
+        BusinessPartner.objects.bulk_update(list(to_update.values()), PARTNER_IMPORT_FIELDS)
+
+
+def import_business_partners(organization, filename, data, update_existing=True, progress=None):
+    entries, skipped = [], 0
+    for row_number, row in enumerate(sheet_rows(filename, data), start=2):
+        payload = _payload(row)
+        if payload is None:
+            skipped += 1
+        else:
+            entries.append((row_number, payload))
+    total = len(entries)
+    if progress:
+        progress(0, total)
+
+    index = _PartnerIndex(organization)
+    created = updated = 0
+    errors, preview = [], []
+
+    def written(row_number, payload, previous):
+        nonlocal created, updated
+        if previous is None:
+            created += 1
+        else:
+            updated += 1
+        if len(preview) < 20:
+            preview.append({'row': row_number, 'name': payload['name'], 'city': payload['city'], 'country': payload['country']})
+
+    for start in range(0, total, IMPORT_CHUNK_SIZE):
+        chunk = entries[start:start + IMPORT_CHUNK_SIZE]
+        applied = []
+        for row_number, payload in chunk:
+            change = _apply(index, organization, payload, update_existing)
+            if change is None:
                 skipped += 1
-                continue
-            country, city = _country_and_city(cells[9] or cells[13], cells[7])
-            payload = {
-                'name': name[:255],
-                'currency': _currency(cells[2]),
-                'tax_office': cells[3][:100],
-                'tax_number': re.sub(r'\D+', '', cells[4])[:64],
-                'phone': _phone(cells[5], cells[10], cells[11] or cells[14])[:50],
-                'email': _email_from(cells[6], cells[16], cells[15]),
-                'address': _address(cells[7], cells[8] or cells[12], cells[9] or cells[13]),
-                'city': city[:100],
-                'country': country[:50],
-                'group': '',
-                'owner': '',
-            }
-            lookup = BusinessPartner.objects.filter(organization=organization)
-            existing = None
-            if payload['tax_number']:
-                existing = lookup.filter(tax_number=payload['tax_number']).first()
-            if existing is None:
-                existing = lookup.filter(name__iexact=payload['name']).first()
-            try:
-                if existing:
-                    if update_existing:
-                        for key, value in payload.items():
-                            setattr(existing, key, value)
-                        existing.save()
-                        updated += 1
-                    else:
-                        skipped += 1
+            else:
+                applied.append((row_number, payload, *change))
+        try:
+            _write_chunk(applied)
+        except DatabaseError:
+            # Parça geri alındı: indeksi eski haline döndür ve satırları tek tek yaz ki
+            # hatalar satır bazında raporlansın.
+            for _, _, partner, previous in reversed(applied):
+                _revert(index, partner, previous)
+            for row_number, payload, _, _ in applied:
+                change = _apply(index, organization, payload, update_existing)
+                if change is None:
+                    skipped += 1
+                    continue
+                partner, previous = change
+                try:
+                    with transaction.atomic():
+                        partner.save()
+                except DatabaseError as exc:
+                    _revert(index, partner, previous)
+                    errors.append({'row': row_number, 'name': payload['name'], 'detail': str(exc)})
                 else:
-                    BusinessPartner.objects.create(organization=organization, **payload)
-                    created += 1
-                rows.append({'row': row_number, 'name': payload['name'], 'city': payload['city'], 'country': payload['country']})
-            except Exception as exc:
-                errors.append({'row': row_number, 'name': name, 'detail': str(exc)})
-        return {'created': created, 'updated': updated, 'skipped': skipped, 'errors': errors[:50], 'preview': rows[:20]}
-    finally:
-        temp_dir.cleanup()
+                    written(row_number, payload, previous)
+        else:
+            for row_number, payload, _, previous in applied:
+                written(row_number, payload, previous)
+        if progress:
+            progress(start + len(chunk), total)
+    return {'created': created, 'updated': updated, 'skipped': skipped, 'errors': errors[:50], 'preview': preview}
+
+
+def import_business_partners_from_excel(organization, uploaded_file, update_existing=True):
+    data = b''.join(uploaded_file.chunks())
+    return import_business_partners(organization, uploaded_file.name, data, update_existing=update_existing)
+
+
+def queue_partner_import(organization, uploaded_file, update_existing=True, user=None):
+    if Path(uploaded_file.name or '').suffix.lower() not in {'.xls', '.xlsx'}:
+        raise ValueError('Yalnızca .xls veya .xlsx cari listesi yükleyebilirsiniz.')
+    job = PartnerImportJob.objects.create(
+        organization=organization,
+        created_by=user,
+        filename=(uploaded_file.name or '')[:255],
+        source=b''.join(uploaded_file.chunks()),
+        update_existing=update_existing,
+    )
+
+    def _kick():
+        from .tasks import run_partner_import
+
+        run_partner_import.delay(job.id)
+
+    transaction.on_commit(_kick)
+    return job
+
+
+def run_partner_import_job(job_id):
+    claimed = PartnerImportJob.objects.filter(pk=job_id, status='queued').update(status='running', started_at=timezone.now())
+    if not claimed:
+        return None
+    job = PartnerImportJob.objects.select_related('organization').get(pk=job_id)
+
+    def progress(processed, total):
+        PartnerImportJob.objects.filter(pk=job_id).update(processed_rows=processed, total_rows=total)
+
+    try:
+        result = import_business_partners(job.organization, job.filename, bytes(job.source), job.update_existing, progress=progress)
+    except Exception as exc:
+        PartnerImportJob.objects.filter(pk=job_id).update(status='failed', error=str(exc)[:2000], source=b'', finished_at=timezone.now())
+        return None
+    PartnerImportJob.objects.filter(pk=job_id).update(status='completed', result=result, source=b'', finished_at=timezone.now())
+    return result
@@ -1,6 +1,7 @@
 from datetime import timedelta
 from decimal import Decimal, InvalidOperation
 
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 
@@ -23,12 +24,26 @@ from .contracts import (
     parse_terms_text,
     resolve_product_document_defaults,
 )
-from .models import BusinessPartner, Contact, Lead, Opportunity, PricingRule, Quote, QuoteLine
+from .models import BusinessPartner, Contact, Lead, Opportunity, PartnerImportJob, PricingRule, Quote, QuoteLine
 
 SUPPORTED_CURRENCIES = {'TRY', 'USD', 'EUR'}
 TURKEY_ALIASES = {'turkiye', 'türkiye', 'turkey', 'turk', 'türk', 'tr', 'tur'}
 MAX_LINE_DISCOUNT = Decimal('50')
 MAX_SECONDARY_DISCOUNT = Decimal('12')
+QUOTE_LINE_UPDATE_FIELDS = [
+    'product',
+    'section_key',
+    'name',
+    'unit',
+    'qty',
+    'unit_price',
+    'discount',
+    'discount_secondary',
+    'tax',
+    'sort_order',
+    'details',
+]
+QUOTE_LINE_DIFF_FIELDS = ['product_id', *QUOTE_LINE_UPDATE_FIELDS[1:]]
 
 
 def normalize_currency_code(value, default='TRY'):
@@ -135,6 +150,13 @@ class BusinessPartnerSerializer(serializers.ModelSerializer):
         return super().validate(attrs)
 
 
+class PartnerImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PartnerImportJob
+        fields = ['id', 'filename', 'status', 'update_existing', 'total_rows', 'processed_rows', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
 class ContactSerializer(serializers.ModelSerializer):
     class Meta:
         model = Contact
@@ -232,6 +254,8 @@ class ProductSerializer(serializers.ModelSerializer):
 
 
 class QuoteLineSerializer(serializers.ModelSerializer):
+    # Güncellemede mevcut satırı eşleştirmek için yazılabilir.
+    id = serializers.IntegerField(required=False, allow_null=True)
     product_sku = serializers.SerializerMethodField()
     product_name = serializers.SerializerMethodField()
 
@@ -371,6 +395,7 @@ class QuoteSerializer(serializers.ModelSerializer):
 
             normalized_lines.append(
                 {
+                    'id': line.get('id') or None,
                     'product': line.get('product') or line.get('productId'),
                     'section_key': line.get('section_key') or line.get('sectionKey') or '',
                     'name': line.get('name') or line.get('productName') or 'Satır',
@@ -407,8 +432,8 @@ class QuoteSerializer(serializers.ModelSerializer):
             )
         quote = Quote.objects.create(**validated_data)
         quote._audit_user = self.context.get('request').user if self.context.get('request') else None
-        self._create_lines(quote, lines_data)
-        self._recalc(quote)
+        lines = self._create_lines(quote, lines_data)
+        self._recalc(quote, lines)
         send_to_production = True
         request = self.context.get('request')
         if request and 'send_to_production' in request.data:
@@ -442,7 +467,6 @@ class QuoteSerializer(serializers.ModelSerializer):
         lines_data = validated_data.pop('lines', None)
         contract_config = validated_data.pop('contract_config', None)
         request_user = self.context.get('request').user if self.context.get('request') else None
-        previous_lines_snapshot = self._serialize_quote_lines(instance.lines.all()) if lines_data is not None else None
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         if contract_config is not None:
@@ -456,13 +480,12 @@ class QuoteSerializer(serializers.ModelSerializer):
             )
         instance._audit_user = request_user
         instance.save()
+        lines = None
         if lines_data is not None:
-            instance.lines.all().delete()
-            self._create_lines(instance, lines_data)
-            next_lines_snapshot = self._serialize_quote_lines(instance.lines.all())
-            if previous_lines_snapshot != next_lines_snapshot:
-                log_entity_action(instance, 'updated', user=request_user, field='lines', old_value=previous_lines_snapshot, new_value=next_lines_snapshot)
-        self._recalc(instance)
+            lines, previous_snapshot, next_snapshot = self._sync_lines(instance, lines_data)
+            if previous_snapshot or next_snapshot:
+                log_entity_action(instance, 'updated', user=request_user, field='lines', old_value=previous_snapshot, new_value=next_snapshot)
+        self._recalc(instance, lines)
         send_to_production = True
         request = self.context.get('request')
         if request and 'send_to_production' in request.data:
@@ -679,69 +702,134 @@ class QuoteSerializer(serializers.ModelSerializer):
             )
         return normalized
 
+    def _build_line(self, quote, line, idx, price_list_key):
+        product = line.get('product')
+        details = dict(line.get('details') or {})
+        section_key = line.get('section_key') or ''
+        unit = line.get('unit') or ''
+
+        if product:
+            defaults = product.template_defaults or {}
+            document_defaults = resolve_product_document_defaults(product, fallback_section_key=section_key, line_name=line.get('name') or '')
+            section_key = document_defaults.get('section_key') or section_key
+            unit = unit or defaults.get('unit') or ''
+            details.setdefault('code', product.sku)
+            if defaults.get('primary') and 'primary' not in details:
+                details['primary'] = defaults.get('primary')
+            if defaults.get('secondary') and 'secondary' not in details:
+                details['secondary'] = defaults.get('secondary')
+            if product.attribute_values and 'attributes' not in details:
+                details['attributes'] = product.attribute_values
+            if 'technicalItems' not in details and 'technical_items' not in details:
+                technical_items = document_defaults.get('technical_items') or []
+                details['technicalItems'] = [str(item or '').strip() for item in technical_items if str(item or '').strip()]
+            if line.get('unit_price') in [None, '']:
+                line['unit_price'] = get_product_price_for_list(product, price_list_key)
+
+        return QuoteLine(
+            quote=quote,
+            product=product,
+            section_key=section_key,
+            name=line.get('name') or 'Satır',
+            unit=unit,
+            qty=line.get('qty') or 0,
+            unit_price=line.get('unit_price') or 0,
+            discount=line.get('discount') or 0,
+            discount_secondary=line.get('discount_secondary') or 0,
+            tax=line.get('tax') or 0,
+            sort_order=line.get('sort_order') if line.get('sort_order') is not None else idx,
+            details=details,
+        )
+
     def _create_lines(self, quote, lines_data):
         price_list_key = (quote.contract_config or {}).get('price_list_key') or ''
-        for idx, line in enumerate(lines_data):
-            product = line.get('product')
-            details = dict(line.get('details') or {})
-            section_key = line.get('section_key') or ''
-            unit = line.get('unit') or ''
-
-            if product:
-                defaults = product.template_defaults or {}
-                document_defaults = resolve_product_document_defaults(product, fallback_section_key=section_key, line_name=line.get('name') or '')
-                section_key = document_defaults.get('section_key') or section_key
-                unit = unit or defaults.get('unit') or ''
-                details.setdefault('code', product.sku)
-                if defaults.get('primary') and 'primary' not in details:
-                    details['primary'] = defaults.get('primary')
-                if defaults.get('secondary') and 'secondary' not in details:
-                    details['secondary'] = defaults.get('secondary')
-                if product.attribute_values and 'attributes' not in details:
-                    details['attributes'] = product.attribute_values
-                if 'technicalItems' not in details and 'technical_items' not in details:
-                    technical_items = document_defaults.get('technical_items') or []
-                    details['technicalItems'] = [str(item or '').strip() for item in technical_items if str(item or '').strip()]
-                if line.get('unit_price') in [None, '']:
-                    line['unit_price'] = get_product_price_for_list(product, price_list_key)
-
-            QuoteLine.objects.create(
-                quote=quote,
-                product=product,
-                section_key=section_key,
-                name=line.get('name') or 'Satır',
-                unit=unit,
-                qty=line.get('qty') or 0,
-                unit_price=line.get('unit_price') or 0,
-                discount=line.get('discount') or 0,
-                discount_secondary=line.get('discount_secondary') or 0,
-                tax=line.get('tax') or 0,
-                sort_order=line.get('sort_order') if line.get('sort_order') is not None else idx,
-                details=details,
-            )
+        lines = [self._build_line(quote, line, idx, price_list_key) for idx, line in enumerate(lines_data)]
+        return QuoteLine.objects.bulk_create(lines)
+
+    def _sync_lines(self, quote, lines_data):
+        """Gelen satırları mevcutlarla eşleştirip yalnızca farkı yazar.
 
-    def _recalc(self, quote):
+        Eşleştirme önce satır ``id``'si, id gönderilmeyen satırlar için
+        ``sort_order`` ile yapılır. Dönüş: güncel satır listesi ve audit için
+        yalnızca değişen/eklenen/silinen satırların önceki ve sonraki hali.
+        """
+        price_list_key = (quote.contract_config or {}).get('price_list_key') or ''
+        existing = list(quote.lines.select_related('product').order_by('sort_order', 'id'))
+        unmatched = {line.id: line for line in existing}
+        pairs, pending = [], []
+        for idx, data in enumerate(lines_data):
+            candidate = self._build_line(quote, data, idx, price_list_key)
+            current = unmatched.pop(data.get('id'), None) if data.get('id') else None
+            if current is None:
+                pending.append(candidate)
+            else:
+                pairs.append((current, candidate))
+        by_order = {}
+        for line in unmatched.values():
+            by_order.setdefault(line.sort_order, []).append(line)
+        created = []
+        for candidate in pending:
+            bucket = by_order.get(candidate.sort_order)
+            if bucket:
+                current = bucket.pop(0)
+                unmatched.pop(current.id)
+                pairs.append((current, candidate))
+            else:
+                created.append(candidate)
+
+        changed, previous_lines, next_lines = [], [], []
+        for current, candidate in pairs:
+            if all(getattr(current, field) == getattr(candidate, field) for field in QUOTE_LINE_DIFF_FIELDS):
+                continue
+            previous_lines.append(self._serialize_quote_lines([current])[0])
+            for field in QUOTE_LINE_DIFF_FIELDS:
+                setattr(current, field, getattr(candidate, field))
+            current.product = candidate.product
+            changed.append(current)
+            next_lines.append(self._serialize_quote_lines([current])[0])
+        removed = list(unmatched.values())
+        previous_lines.extend(self._serialize_quote_lines(removed))
+        next_lines.extend(self._serialize_quote_lines(created))
+
+        with transaction.atomic():
+            if removed:
+                QuoteLine.objects.filter(pk__in=[line.id for line in removed]).delete()
+            QuoteLine.objects.bulk_update(changed, QUOTE_LINE_UPDATE_FIELDS)
+            QuoteLine.objects.bulk_create(created)
+        lines = [current for current, _ in pairs] + created
+        return lines, sorted(previous_lines, key=lambda item: item['index']), sorted(next_lines, key=lambda item: item['index'])
+
+    def _recalc(self, quote, lines=None):
         org = quote.organization
-        rules = PricingRule.objects.filter(organization=org)
+        rules = list(PricingRule.objects.filter(organization=org))
         hundred = Decimal('100')
-        subtotal = sum((l.qty * l.unit_price for l in quote.lines.all()), Decimal('0'))
+        if lines is None:
+            lines = list(quote.lines.all())
+        subtotal = sum((Decimal(l.qty) * Decimal(l.unit_price) for l in lines), Decimal('0'))
         discount = Decimal('0')
 
-        for line in quote.lines.select_related('product__category'):
-            base = line.qty * line.unit_price
-            discounted_base = base * (Decimal('1') - (line.discount / hundred))
-            discounted_base *= Decimal('1') - (line.discount_secondary / hundred)
+        category_names = {}
+        if any(r.type == 'category' for r in rules):
+            product_ids = {l.product_id for l in lines if l.product_id}
+            category_names = dict(Product.objects.filter(pk__in=product_ids, category__isnull=False).values_list('id', 'category__name'))
+        for line in lines:
+            base = Decimal(line.qty) * Decimal(line.unit_price)
+            discounted_base = base * (Decimal('1') - (Decimal(line.discount) / hundred))
+            discounted_base *= Decimal('1') - (Decimal(line.discount_secondary) / hundred)
             discount += base - discounted_base
-            if line.product and line.product.category:
-                for r in rules.filter(type='category', target=line.product.category.name):
-                    discount += base * (r.value / hundred)
+            category_name = category_names.get(line.product_id)
+            if category_name is not None:
+                for r in rules:
+                    if r.type == 'category' and r.target == category_name:
+                        discount += base * (r.value / hundred)
 
         partner_group = quote.customer.group if quote.customer else None
         if partner_group:
-            for r in rules.filter(type='customer', target=partner_group):
-                discount += subtotal * (r.value / hundred)
+            for r in rules:
+                if r.type == 'customer' and r.target == partner_group:
+                    discount += subtotal * (r.value / hundred)
 
-        for r in rules.filter(type='volume'):
+        for r in (r for r in rules if r.type == 'volume'):
             try:
                 threshold = Decimal(str(r.target))
             except (InvalidOperation, TypeError, ValueError):
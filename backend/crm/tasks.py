@@ -21,3 +21,11 @@ def recompute_kpis():
     logger.info("KPI recompute job ran")
     return True
 
+
+
+@shared_task
+def run_partner_import(job_id: int):
+    from .partner_import import run_partner_import_job
+
+    result = run_partner_import_job(job_id)
+    return {'job_id': job_id, 'completed': result is not None}
@@ -1,3 +1,196 @@
+import json
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from audit.models import AuditLog
+from organizations.models import Organization
+
+from .models import BusinessPartner, PartnerImportJob, PricingRule, QuoteLine
+from .partner_import import run_partner_import_job
+
+
+class QuoteApiMixin:
+    def setUp(self):
+        self.org = Organization.objects.create(name='Teklif Org', code='TKL')
+        self.user = User.objects.create_user(username='quote-admin', password='x', organization=self.org, role='Admin')
+        self.customer = BusinessPartner.objects.create(organization=self.org, name='Müşteri', currency='TRY', country='Türkiye')
+        PricingRule.objects.create(organization=self.org, name='Hacim', type='volume', target='0', value=Decimal('1'))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _line(self, idx, **overrides):
+        return {'name': f'Satır {idx}', 'qty': 2, 'unitPrice': 100, 'tax': 20, 'sortOrder': idx, **overrides}
+
+    def _create_quote(self, count):
+        response = self.client.post(
+            '/api/quotes/',
+            {'customer': self.customer.id, 'delivery': '2 hafta', 'currency': 'TRY', 'lines': [self._line(idx) for idx in range(count)]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+
+class QuoteLineSyncTests(QuoteApiMixin, TestCase):
+    def test_update_writes_only_changed_lines_and_keeps_ids(self):
+        quote = self._create_quote(30)
+        self.assertEqual(Decimal(quote['subtotal']), Decimal('6000'))
+        lines = [{**line, 'unitPrice': line['unit_price']} for line in quote['lines']]
+        ids = [line['id'] for line in lines]
+        lines[3]['qty'] = 5
+        lines.pop(7)
+        lines.append(self._line(99))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(f"/api/quotes/{quote['id']}/", {'lines': lines}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        line_writes = [q['sql'].split(' ')[0] for q in ctx.captured_queries if q['sql'].startswith(('INSERT INTO "crm_quoteline"', 'UPDATE "crm_quoteline"', 'DELETE FROM "crm_quoteline"'))]
+        self.assertEqual(sorted(line_writes), ['DELETE', 'INSERT', 'UPDATE'])
+        payload = response.json()
+        self.assertEqual(Decimal(payload['subtotal']), Decimal('6300'))
+        self.assertEqual(Decimal(payload['discount_total']), Decimal('63'))
+        current = set(QuoteLine.objects.filter(quote_id=quote['id']).values_list('id', flat=True))
+        self.assertEqual(len(current), 30)
+        self.assertEqual(len(current & set(ids)), 29)
+        self.assertNotIn(ids[7], current)
+
+        log = AuditLog.objects.get(entity='Quote', entity_id=str(quote['id']), field='lines')
+        self.assertEqual([item['index'] for item in json.loads(log.old_value)], [3, 7])
+        self.assertEqual([(item['index'], item['qty']) for item in json.loads(log.new_value)], [(3, '5.00'), (99, '2.00')])
+
+    def test_lines_without_ids_are_matched_by_sort_order(self):
+        quote = self._create_quote(3)
+        ids = sorted(line['id'] for line in quote['lines'])
+        response = self.client.patch(
+            f"/api/quotes/{quote['id']}/",
+            {'lines': [self._line(0), self._line(1, name='Yeni ad'), self._line(2)]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(sorted(QuoteLine.objects.filter(quote_id=quote['id']).values_list('id', flat=True)), ids)
+        log = AuditLog.objects.get(entity='Quote', entity_id=str(quote['id']), field='lines')
+        self.assertEqual([item['name'] for item in json.loads(log.new_value)], ['Yeni ad'])
+
+
+class QuoteConversionTests(QuoteApiMixin, TestCase):
+    def test_convert_copies_lines_in_one_insert(self):
+        quote = self._create_quote(12)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f"/api/quotes/{quote['id']}/convert/")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "crm_quoteline"')]), 1)
+        contract = response.json()['contract']
+        self.assertEqual(contract['number'], 'OR-S-000001')
+        self.assertEqual(len(contract['lines']), 12)
+        self.assertEqual(contract['total'], quote['total'])
+        self.assertEqual(response.json()['source']['status'], 'Approved')
+
+        again = self.client.post(f"/api/quotes/{quote['id']}/convert/")
+        self.assertEqual(again.json()['contract']['id'], contract['id'])
+
+    def test_bulk_convert_returns_compact_results(self):
+        first, second, third = (self._create_quote(2) for _ in range(3))
+        self.client.post(f"/api/quotes/{third['id']}/convert/")
+
+        response = self.client.post('/api/quotes/bulk-convert/', {'ids': [first['id'], second['id'], third['id'], 999999]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        payload = response.json()
+        self.assertEqual(payload['converted'], 2)
+        self.assertEqual(
+            [(item['quote_id'], item['status'], item.get('contract_number')) for item in payload['results']],
+            [
+                (first['id'], 'converted', 'OR-S-000002'),
+                (second['id'], 'converted', 'OR-S-000003'),
+                (third['id'], 'already_converted', 'OR-S-000001'),
+                (999999, 'not_found', None),
+            ],
+        )
+        self.assertNotIn('lines', payload['results'][0])
+        self.assertEqual(QuoteLine.objects.filter(quote__document_type='Contract').count(), 6)
+
+
+class PartnerImportTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Cari Org', code='CRI')
+        self.user = User.objects.create_user(username='partner-admin', password='x', organization=self.org, role='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.by_tax = BusinessPartner.objects.create(organization=self.org, name='Eski Ad', tax_number='1234567890')
+        self.by_name = BusinessPartner.objects.create(organization=self.org, name='Deniz Ticaret')
+
+    def _upload(self, rows, name='cariler.xlsx'):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['Kod', 'Unvan', 'Döviz', 'Vergi Dairesi', 'Vergi No'])
+        for row in rows:
+            ws.append(row)
+        stream = BytesIO()
+        wb.save(stream)
+        return SimpleUploadedFile(name, stream.getvalue())
+
+    def _rows(self, count):
+        rows = [
+            ['1', 'Yeni Unvan', 'TL', 'Malatya', '1234567890', '05321234567', 'a@b.com', 'Adres', '', 'MALATYA'],
+            ['2', 'DENIZ TICARET', 'USD', '', ''],
+            ['---------------', '---------------'],
+        ]
+        rows += [[str(idx), f'Cari {idx}', 'EUR', '', f'9{idx:09d}'] for idx in range(count)]
+        rows.append(['x', 'cari 0', 'TL', '', ''])
+        return rows
+
+    def test_import_matches_existing_partners_with_constant_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/partners/import-excel/', {'file': self._upload(self._rows(40))}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['created'], 40)
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertEqual(response.json()['skipped'], 1)
+        self.assertLess(len(ctx.captured_queries), 20)
+
+        self.by_tax.refresh_from_db()
+        self.assertEqual((self.by_tax.name, self.by_tax.city, self.by_tax.currency), ('Yeni Unvan', 'Malatya', 'TRY'))
+        self.by_name.refresh_from_db()
+        self.assertEqual(self.by_name.currency, 'USD')
+        self.assertEqual(BusinessPartner.objects.get(name='cari 0').currency, 'TRY')
+        self.assertEqual(BusinessPartner.objects.filter(organization=self.org).count(), 42)
+
+    def test_failed_chunk_falls_back_to_row_writes_and_restores_matches(self):
+        rows = [
+            ['1', 'Kötü Ad', 'TL', '', '1234567890', '', 'x' * 250 + '@b.com'],
+            ['2', 'Yeni Cari', 'TL', '', '', '', 'y' * 250 + '@b.com'],
+            ['3', 'Eski Ad', 'USD', '', ''],
+            ['4', 'Sağlam Cari', 'EUR', '', '555'],
+        ]
+        response = self.client.post('/api/partners/import-excel/', {'file': self._upload(rows)}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()
+        self.assertEqual((result['created'], result['updated'], result['skipped']), (1, 1, 0))
+        self.assertEqual([error['row'] for error in result['errors']], [2, 3])
+        self.by_tax.refresh_from_db()
+        self.assertEqual((self.by_tax.name, self.by_tax.currency), ('Eski Ad', 'USD'))
+        self.assertEqual(set(BusinessPartner.objects.filter(organization=self.org).values_list('name', flat=True)), {'Eski Ad', 'Deniz Ticaret', 'Sağlam Cari'})
+
+    def test_background_import_records_progress(self):
+        response = self.client.post(
+            '/api/partners/import-excel/',
+            {'file': self._upload(self._rows(3)), 'background': '1', 'update_existing': 'false'},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 202, response.content)
+        job_id = response.json()['job']['id']
+        self.assertEqual(response.json()['job']['status'], 'queued')
 
-# Create your tests here.
+        run_partner_import_job(job_id)
+        job = self.client.get(f'/api/partners/import-jobs/{job_id}/').json()
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['total_rows'], job['processed_rows']), (6, 6))
+        self.assertEqual((job['result']['created'], job['result']['skipped']), (3, 4))
+        self.assertEqual(PartnerImportJob.objects.get(pk=job_id).source.tobytes(), b'')
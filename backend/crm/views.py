@@ -1,4 +1,3 @@
-from copy import deepcopy
 from io import BytesIO
 from pathlib import Path
 from uuid import uuid4
@@ -12,12 +11,11 @@ from rest_framework.response import Response
 import mimetypes
 
 from django.conf import settings
+from django.db import transaction
 from django.db.models.deletion import ProtectedError
-from django.utils import timezone
 from django.http import FileResponse
-from PIL import Image, UnidentifiedImageError
 
-from .models import Quote, QuoteLine, PricingRule, BusinessPartner, Lead, Opportunity, Contact
+from .models import Quote, PricingRule, BusinessPartner, PartnerImportJob, Lead, Opportunity, Contact
 from .contracts import (
     build_document_export,
     build_document_pdf_export,
@@ -32,10 +30,11 @@ from .contracts import (
     save_template_override,
     _normalize_seller_profile,
 )
-from .partner_import import import_business_partners_from_excel
+from .conversion import BULK_CONVERT_LIMIT, convert_quote, convert_quotes, sales_document_number
+from .partner_import import import_business_partners_from_excel, queue_partner_import
 from workflow.models import ApprovalInstance, ApprovalStep
 from erp.models import Product
-from .serializers import QuoteListSerializer, QuoteSerializer, PricingRuleSerializer, BusinessPartnerSerializer, ProductSerializer, LeadSerializer, OpportunitySerializer, ContactSerializer
+from .serializers import QuoteListSerializer, QuoteSerializer, PricingRuleSerializer, BusinessPartnerSerializer, PartnerImportJobSerializer, ProductSerializer, LeadSerializer, OpportunitySerializer, ContactSerializer
 from permissions import IsOrgMember, IsOwnerOrManager, HasAPIPermission
 from accounts.utils import user_has_perm
 from audit.utils import log_entity_action
@@ -78,6 +77,8 @@ def _delete_logo_file(relative_path):
 
 
 def _validate_raster_logo(content, extension):
+    from PIL import Image, UnidentifiedImageError
+
     try:
         image = Image.open(BytesIO(content))
         image.verify()
@@ -146,39 +147,6 @@ def _save_seller_logo_file(org, key, uploaded_file):
     return f"{settings.MEDIA_URL.rstrip('/')}/seller-logos/org_{org.id}/{filename}"
 
 
-def _seller_number_prefix(organization, seller_company_key):
-    selected_key = normalize_seller_company_key(seller_company_key or '')
-    profiles = [profile for profile in get_seller_profiles(organization) if profile.get('is_active', True)] or get_default_seller_profiles()
-    selected_profile = None
-    for profile in profiles:
-        if normalize_seller_company_key(profile.get('key')) == selected_key:
-            selected_profile = profile
-            break
-    selected_profile = selected_profile or profiles[0]
-    source = (
-        selected_profile.get('short_name')
-        or selected_profile.get('key')
-        or selected_profile.get('display_name')
-        or organization.code
-        or organization.name
-        or 'UD'
-    )
-    normalized = normalize_seller_company_key(source)
-    return (normalized[:2] or 'UD').upper()
-
-
-def _generate_sales_document_number(organization, document_type, seller_company_key):
-    document_letter = 'S' if document_type == 'Contract' else 'T'
-    timestamp = timezone.localtime(timezone.now()).strftime('%y%m%d%H%M')
-    base = f'{_seller_number_prefix(organization, seller_company_key)}-{document_letter}-{timestamp}'
-    candidate = base
-    suffix = 2
-    while Quote.objects.filter(organization=organization, number=candidate).exists():
-        candidate = f'{base}-{suffix}'
-        suffix += 1
-    return candidate
-
-
 class OrgScopedMixin:
     def get_queryset(self):
         qs = super().get_queryset()
@@ -205,6 +173,7 @@ class QuoteViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         'destroy': 'quotes.delete',
         'send': 'quotes.status.change',
         'convert': 'quotes.convert',
+        'bulk_convert': 'quotes.convert',
         'request_approval': 'quotes.status.change',
         'resubmit': 'quotes.status.change',
         'approve': 'quotes.approve',
@@ -249,8 +218,9 @@ class QuoteViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         org = self.request.user.organization
         document_type = serializer.validated_data.get('document_type', 'Quote')
         seller_company_key = serializer.validated_data.get('seller_company_key', '')
-        number = _generate_sales_document_number(org, document_type, seller_company_key)
-        serializer.save(organization=org, number=number, owner=self.request.user, prepared_by=self.request.user)
+        with transaction.atomic():
+            number = sales_document_number(org, document_type, seller_company_key)
+            serializer.save(organization=org, number=number, owner=self.request.user, prepared_by=self.request.user)
 
     def perform_update(self, serializer):
         serializer.instance._audit_user = self.request.user
@@ -274,79 +244,14 @@ class QuoteViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         if quote.document_type != 'Quote':
             return Response({'detail': 'Yalnizca teklifler sozlesmeye donusturulebilir.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        source_config = deepcopy(quote.contract_config or {})
-        existing_contract_id = source_config.get('converted_contract_id')
-        if existing_contract_id:
-            existing_contract = (
-                Quote.objects.filter(organization=quote.organization, pk=existing_contract_id, document_type='Contract')
+        contract, created = convert_quote(quote, user=request.user)
+        if not created:
+            contract = (
+                Quote.objects.filter(pk=contract.pk)
                 .select_related('customer', 'owner', 'prepared_by')
                 .prefetch_related('lines__product__category')
-                .first()
+                .get()
             )
-            if existing_contract:
-                return Response(
-                    {
-                        'status': 'converted',
-                        'contract': QuoteSerializer(existing_contract, context={'request': request}).data,
-                        'source': QuoteSerializer(quote, context={'request': request}).data,
-                    }
-                )
-
-        contract_number = _generate_sales_document_number(
-            quote.organization,
-            'Contract',
-            quote.seller_company_key,
-        )
-        contract_config = deepcopy(quote.contract_config or {})
-        contract_config['source_quote_id'] = quote.id
-        contract_config['source_quote_number'] = quote.number
-
-        contract = Quote.objects.create(
-            organization=quote.organization,
-            document_type='Contract',
-            number=contract_number,
-            customer=quote.customer,
-            opportunity=quote.opportunity,
-            owner=quote.owner or request.user,
-            prepared_by=quote.prepared_by or request.user,
-            seller_company_key=quote.seller_company_key,
-            status='Pending',
-            valid_until=quote.valid_until,
-            currency=quote.currency,
-            payment_terms=quote.payment_terms,
-            delivery_terms=quote.delivery_terms,
-            notes=quote.notes,
-            vat_rate=quote.vat_rate,
-            contract_config=contract_config,
-        )
-        contract._audit_user = request.user
-
-        for line in quote.lines.all().order_by('sort_order', 'id'):
-            QuoteLine.objects.create(
-                quote=contract,
-                product=line.product,
-                section_key=line.section_key,
-                name=line.name,
-                unit=line.unit,
-                qty=line.qty,
-                unit_price=line.unit_price,
-                discount=line.discount,
-                discount_secondary=line.discount_secondary,
-                tax=line.tax,
-                sort_order=line.sort_order,
-                details=deepcopy(line.details or {}),
-            )
-
-        QuoteSerializer(context={'request': request})._recalc(contract)
-
-        source_config['converted_contract_id'] = contract.id
-        source_config['converted_contract_number'] = contract.number
-        quote.contract_config = source_config
-        quote.status = 'Approved'
-        quote.save(update_fields=['status', 'contract_config'])
-
-        log_entity_action(quote, 'converted', user=request.user, field='converted_contract_id', new_value=str(contract.id))
-        log_entity_action(contract, 'created_from_quote', user=request.user, field='source_quote_id', new_value=str(quote.id))
         return Response(
             {
                 'status': 'converted',
@@ -355,6 +260,41 @@ class QuoteViewSet(OrgScopedMixin, viewsets.ModelViewSet):
             }
         )
 
+    @action(detail=False, methods=['post'], url_path='bulk-convert')
+    def bulk_convert(self, request):
+        raw_ids = request.data.get('ids') or []
+        if not isinstance(raw_ids, list) or not raw_ids:
+            return Response({'detail': 'Donusturulecek teklif secilmedi.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_ids) > BULK_CONVERT_LIMIT:
+            return Response({'detail': f'Tek seferde en fazla {BULK_CONVERT_LIMIT} teklif donusturulebilir.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw_ids))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Gecersiz teklif kimligi.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        found = {quote.id: quote for quote in self.get_queryset().filter(pk__in=ids).select_related('organization')}
+        allowed, results = [], []
+        for quote_id in ids:
+            quote = found.get(quote_id)
+            if quote is None:
+                results.append({'quote_id': quote_id, 'status': 'not_found'})
+                continue
+            try:
+                self.check_object_permissions(request, quote)
+            except PermissionDenied:
+                results.append({'quote_id': quote_id, 'quote_number': quote.number, 'status': 'forbidden'})
+                continue
+            allowed.append(quote)
+        results.extend(convert_quotes(allowed, user=request.user))
+        order = {quote_id: idx for idx, quote_id in enumerate(ids)}
+        results.sort(key=lambda item: order[item['quote_id']])
+        return Response(
+            {
+                'converted': sum(1 for item in results if item['status'] == 'converted'),
+                'results': results,
+            }
+        )
+
     @action(detail=True, methods=['post'])
     def request_approval(self, request, pk=None):
         quote = self._attach_audit_user(self.get_object())
@@ -741,6 +681,7 @@ class BusinessPartnerViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         'partial_update': 'partners.edit',
         'destroy': 'partners.delete',
         'import_excel': 'partners.import',
+        'import_job': 'partners.import',
     }
     queryset = BusinessPartner.objects.all()
 
@@ -762,6 +703,13 @@ class BusinessPartnerViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         if not org:
             return Response({'detail': 'Organizasyon bulunamadı.'}, status=status.HTTP_400_BAD_REQUEST)
         update_existing = str(request.data.get('update_existing', 'true')).lower() not in {'0', 'false', 'hayir', 'hayır'}
+        background = str(request.data.get('background', '')).lower() in {'1', 'true', 'evet'}
+        if background:
+            try:
+                job = queue_partner_import(org, uploaded_file, update_existing=update_existing, user=request.user)
+            except ValueError as exc:
+                return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'job': PartnerImportJobSerializer(job).data}, status=status.HTTP_202_ACCEPTED)
         try:
             result = import_business_partners_from_excel(org, uploaded_file, update_existing=update_existing)
         except ValueError as exc:
@@ -770,6 +718,13 @@ class BusinessPartnerViewSet(OrgScopedMixin, viewsets.ModelViewSet):
             return Response({'detail': f'Excel dosyası okunamadı: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
         return Response(result)
 
+    @action(detail=False, methods=['get'], url_path=r'import-jobs/(?P<job_id>\d+)')
+    def import_job(self, request, job_id=None):
+        job = PartnerImportJob.objects.filter(organization=getattr(request.user, 'organization', None), pk=job_id).defer('source').first()
+        if job is None:
+            return Response({'detail': 'İçe aktarma işi bulunamadı.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PartnerImportJobSerializer(job).data)
+
 
 class LeadViewSet(OrgScopedMixin, viewsets.ModelViewSet):
     serializer_class = LeadSerializer
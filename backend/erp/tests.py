@@ -85,6 +85,39 @@ class WarehouseApiTests(TestCase):
         self.assertEqual(self.client.get('/api/warehouse-stocks/?q=API').status_code, 200)
         self.assertEqual(self.client.get('/api/warehouse-dashboard/').status_code, 200)
 
+    def test_stock_action_replays_response_for_repeated_idempotency_key(self):
+        url = '/api/warehouse-stocks/stock-in/'
+        payload = {'product_id': self.product.id, 'location_id': self.location.id, 'quantity': 5}
+        first = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='stock-in-1')
+        second = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='stock-in-1')
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(StockMovement.objects.filter(product=self.product).count(), 1)
+
+        failed = self.client.post(url, {**payload, 'quantity': -1}, format='json', HTTP_IDEMPOTENCY_KEY='stock-in-2')
+        self.assertEqual(failed.status_code, 400)
+        retried = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='stock-in-2')
+        self.assertEqual(retried.status_code, 201, retried.data)
+        self.assertEqual(StockMovement.objects.filter(product=self.product).count(), 2)
+
+    def test_reused_idempotency_key_with_other_payload_or_user_conflicts(self):
+        url = '/api/warehouse-stocks/stock-in/'
+        payload = {'product_id': self.product.id, 'location_id': self.location.id, 'quantity': 5}
+        first = self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='stock-in-shared')
+        self.assertEqual(first.status_code, 201, first.data)
+
+        changed = self.client.post(url, {**payload, 'quantity': 7}, format='json', HTTP_IDEMPOTENCY_KEY='stock-in-shared')
+        self.assertEqual(changed.status_code, 422)
+
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user(username='depo-2', password='x', organization=self.org, role='Admin', is_superuser=True))
+        replayed = other.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY='stock-in-shared')
+        self.assertEqual(replayed.status_code, 422)
+        self.assertNotIn('Idempotent-Replayed', replayed)
+        self.assertEqual(StockMovement.objects.filter(product=self.product).count(), 1)
+
     def test_warehouse_and_location_create_use_authenticated_organization(self):
         warehouse_response = self.client.post('/api/warehouses/', {'code': 'YENI', 'name': 'Yeni Depo'}, format='json')
         self.assertEqual(warehouse_response.status_code, 201, warehouse_response.data)
@@ -5,13 +5,14 @@ from django.db.models import Count, F, Q, Sum
 from django.db.models.functions import TruncDate
 from django.http import HttpResponse
 from django.utils import timezone
-from openpyxl import Workbook, load_workbook
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from permissions import IsOrgMember, HasAPIPermission
-from organizations.models import Organization, NumberRange, Warehouse
+from organizations.idempotency import idempotent_response
+from organizations.models import Organization, Warehouse
+from organizations.numbering import allocate_number
 from core.events import push_event
 from .inventory_service import InventoryError, adjust, allocate_opening_balance, as_decimal, stock_in, stock_out, transfer
 from .models import (
@@ -333,14 +334,15 @@ class SalesOrderViewSet(OrgScopedMixin, viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         org = _ensure_org(request)
-        number_range, _ = NumberRange.objects.get_or_create(organization=org, doc_type='SO', defaults={'prefix': 'SO-'})
-        number = number_range.next_number()
         data = request.data.copy()
         data.setdefault('organization', org.id if hasattr(org, 'id') else org)
-        data.setdefault('number', number)
-        serializer = self.get_serializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        # Numara siparişle aynı transaction'da ayrılır; kayıt başarısız olursa sayaç geri alınır.
+        with transaction.atomic():
+            if 'number' not in data:
+                data['number'] = allocate_number(org, 'SO', prefix='SO-')
+            serializer = self.get_serializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=201, headers=headers)
 
@@ -463,6 +465,14 @@ class WarehouseStockViewSet(OrgScopedMixin, viewsets.ReadOnlyModelViewSet):
             return None, Response({'detail': 'Ürün veya raf seçimi geçersiz.'}, status=status.HTTP_400_BAD_REQUEST)
 
     def _run(self, request, service, **kwargs):
+        return idempotent_response(
+            request,
+            organization_id=kwargs['organization'].id,
+            scope=f'erp.{service.__name__}',
+            handler=lambda: self._apply(request, service, **kwargs),
+        )
+
+    def _apply(self, request, service, **kwargs):
         try:
             movement = service(user=request.user, **kwargs)
         except (InventoryError, Product.DoesNotExist, InventoryLocation.DoesNotExist) as exc:
@@ -519,6 +529,8 @@ class WarehouseStockViewSet(OrgScopedMixin, viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def export(self, request):
+        from openpyxl import Workbook
+
         workbook = Workbook()
         sheet = workbook.active
         sheet.title = 'Depo Sayımı'
@@ -534,6 +546,8 @@ class WarehouseStockViewSet(OrgScopedMixin, viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['post'], url_path='import-count')
     def import_count(self, request):
+        from openpyxl import load_workbook
+
         file = request.FILES.get('file')
         if not file:
             return Response({'detail': 'Excel dosyası zorunludur.'}, status=status.HTTP_400_BAD_REQUEST)
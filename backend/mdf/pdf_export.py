@@ -1,17 +1,17 @@
 """Basit MDF stok / çıkış PDF raporları (reportlab)."""
 from io import BytesIO
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import mm
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
-
 
 def build_mdf_stock_pdf(title: str, rows: list[tuple]) -> bytes:
     """
     rows: list of (kalınlık str, en x boy, adet str, eşik str, durum str)
     """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
     buf = BytesIO()
     doc = SimpleDocTemplate(buf, pagesize=landscape(A4), rightMargin=16 * mm, leftMargin=16 * mm, topMargin=14 * mm, bottomMargin=14 * mm)
     styles = getSampleStyleSheet()
@@ -40,6 +40,12 @@ def build_mdf_exits_pdf(title: str, rows: list[tuple]) -> bytes:
     """
     rows: list of (tarih, kalınlık, en×boy, adet str, kullanım yeri)
     """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
     buf = BytesIO()
     doc = SimpleDocTemplate(buf, pagesize=landscape(A4), rightMargin=16 * mm, leftMargin=16 * mm, topMargin=14 * mm, bottomMargin=14 * mm)
     styles = getSampleStyleSheet()
@@ -0,0 +1,110 @@
+"""Idempotency-key registry shared by write endpoints.
+
+Clients send an ``Idempotency-Key`` header (or ``idempotency_key`` field).
+The first request claims the key with ``INSERT ... ON CONFLICT DO NOTHING``
+and stores its successful response in the same transaction. Retries get the
+stored response back, and concurrent duplicates wait on the row lock instead
+of running the write twice. Failed requests roll the claim back so the client
+can retry with the same key. The claim records the requesting user and a hash
+of the request; the same key sent by another user or with a different payload
+is rejected with 422 instead of replaying someone else's response.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+DEFAULT_TTL = timedelta(hours=24)
+HEADER_NAME = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+
+def request_idempotency_key(request):
+    key = request.headers.get(HEADER_NAME) or ''
+    if not key and hasattr(request.data, 'get'):
+        key = request.data.get('idempotency_key') or ''
+    return str(key).strip()[:160]
+
+
+def request_fingerprint(request):
+    data = request.data
+    if hasattr(data, 'getlist'):
+        data = {name: data.getlist(name) for name in data}
+    raw = json.dumps([request.method, request.path, data], cls=DjangoJSONEncoder, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _claim(organization_id, scope, key, ttl, user_pk, request_hash):
+    now = timezone.now()
+    IdempotencyKey.objects.bulk_create(
+        [
+            IdempotencyKey(
+                organization_id=organization_id,
+                scope=scope,
+                key=key,
+                user_pk=user_pk,
+                request_hash=request_hash,
+                expires_at=now + ttl,
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    record = IdempotencyKey.objects.select_for_update().get(organization_id=organization_id, scope=scope, key=key)
+    if record.completed_at and record.expires_at <= now:
+        record.completed_at = None
+        record.response = {}
+        record.user_pk = user_pk
+        record.request_hash = request_hash
+        record.expires_at = now + ttl
+    return record
+
+
+def idempotent_response(request, *, organization_id, scope, handler, ttl=DEFAULT_TTL):
+    """Run ``handler`` once per (organization, scope, key).
+
+    ``organization_id`` may be a callable; it is only evaluated when the request
+    carries a key, so token-authenticated endpoints pay the lookup on demand.
+    """
+    key = request_idempotency_key(request)
+    if not key:
+        return handler()
+    if callable(organization_id):
+        organization_id = organization_id()
+    if not organization_id:
+        return handler()
+    user_pk = getattr(request.user, 'pk', None)
+    request_hash = request_fingerprint(request)
+    with transaction.atomic():
+        record = _claim(organization_id, scope, key, ttl, user_pk, request_hash)
+        if record.user_pk != user_pk or record.request_hash != request_hash:
+            return Response(
+                {'detail': 'Bu Idempotency-Key farklı bir istek için kullanılmış.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record.completed_at:
+            response = Response(record.response, status=record.status_code)
+            response[REPLAY_HEADER] = 'true'
+            return response
+        response = handler()
+        if status.is_success(response.status_code):
+            record.response = response.data
+            record.status_code = response.status_code
+            record.completed_at = timezone.now()
+            record.save(update_fields=['user_pk', 'request_hash', 'response', 'status_code', 'completed_at', 'expires_at'])
+        else:
+            transaction.set_rollback(True)
+        return response
+
+
+def purge_expired_idempotency_keys(now=None):
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lt=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,57 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import profile_boot
+
+
+class Command(BaseCommand):
+    help = "Temiz bir surecte django.setup() + URL yuklemesini profiller ve uygulama basina import agacini yazar."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--app", action="append", default=[], help="Sadece bu paket(ler)in agaci; tekrarlanabilir.")
+        parser.add_argument("--min-ms", type=float, default=5.0, help="Bundan kisa suren importlari gizle.")
+        parser.add_argument("--depth", type=int, default=3, help="Agac derinligi.")
+        parser.add_argument("--check", action="store_true", help="Butce asilirsa veya ertelenmis kutuphane yuklenirse hata ver.")
+
+    def handle(self, *args, **options):
+        min_us = options["min_ms"] * 1000
+        profile = profile_boot()
+        timed = profile_boot(importtime=False)
+
+        totals = defaultdict(int)
+        by_package = defaultdict(list)
+        for node in profile.roots:
+            totals[node.package] += node.cumulative_us
+            by_package[node.package].append(node)
+
+        budget = settings.STARTUP_BUDGET_SECONDS
+        self.stdout.write(f"Acilis: {timed.seconds:.3f} sn (butce {budget:.1f} sn), importtime ile {profile.seconds:.3f} sn")
+        for package, total in sorted(totals.items(), key=lambda item: -item[1]):
+            if options["app"] and package not in options["app"]:
+                continue
+            if total < min_us:
+                continue
+            self.stdout.write(f"\n{package}: {total / 1000:.1f} ms")
+            for node in sorted(by_package[package], key=lambda item: -item.cumulative_us):
+                self._write_node(node, 1, options["depth"], min_us)
+
+        deferred = profile.deferred_loaded
+        for module in deferred:
+            chain = " > ".join(profile.import_chain(module)) or module
+            self.stdout.write(self.style.WARNING(f"Ertelenmis kutuphane acilista yuklendi: {chain}"))
+        if options["check"]:
+            if deferred:
+                raise CommandError(f"Acilista yuklenmemesi gereken kutuphaneler: {', '.join(deferred)}")
+            if timed.seconds > budget:
+                raise CommandError(f"Acilis {timed.seconds:.3f} sn; butce {budget:.1f} sn.")
+        if not deferred:
+            self.stdout.write(self.style.SUCCESS("Ertelenmis kutuphaneler acilista yuklenmedi."))
+
+    def _write_node(self, node, level, max_depth, min_us):
+        if node.cumulative_us < min_us or level > max_depth:
+            return
+        self.stdout.write(f"{'  ' * level}{node.name}  {node.cumulative_us / 1000:.1f} ms (kendi {node.self_us / 1000:.1f} ms)")
+        for child in sorted(node.children, key=lambda item: -item.cumulative_us):
+            self._write_node(child, level + 1, max_depth, min_us)
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0006_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='numberrange',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='numberrange',
+            name='padding',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='numberrange',
+            name='scope',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AlterField(
+            model_name='numberrange',
+            name='doc_type',
+            field=models.CharField(choices=[('QUOTE', 'Quote'), ('CONTRACT', 'Contract'), ('ORDER', 'SalesOrder'), ('INVOICE', 'Invoice'), ('WORK_ORDER', 'WorkOrder')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='numberrange',
+            name='prefix',
+            field=models.CharField(default='', max_length=40),
+        ),
+        migrations.AddConstraint(
+            model_name='numberrange',
+            constraint=models.UniqueConstraint(fields=('organization', 'doc_type', 'scope'), name='unique_number_range_scope'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0007_number_range_scope'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='request_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='user_pk',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
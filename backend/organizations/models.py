@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -55,17 +56,47 @@ class NumberRange(models.Model):
         ('CONTRACT', 'Contract'),
         ('ORDER', 'SalesOrder'),
         ('INVOICE', 'Invoice'),
+        ('WORK_ORDER', 'WorkOrder'),
     ]
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='number_ranges')
     doc_type = models.CharField(max_length=20, choices=DOC_TYPES)
-    prefix = models.CharField(max_length=10, default='')
+    # Aynı belge tipinde ayrı sayaç gereken alt kapsam (ör. satıcı firma öneki).
+    scope = models.CharField(max_length=40, blank=True, default='')
+    prefix = models.CharField(max_length=40, default='')
+    padding = models.PositiveSmallIntegerField(default=0)
     current = models.PositiveIntegerField(default=1)
 
     class Meta:
-        unique_together = ('organization', 'doc_type')
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'doc_type', 'scope'], name='unique_number_range_scope'),
+        ]
+
+    def format_number(self, value):
+        return f"{self.prefix}{value:0{self.padding}d}"
 
     def next_number(self):
-        value = self.current
-        self.current += 1
-        self.save(update_fields=['current'])
-        return f"{self.prefix}{value}"
+        from .numbering import allocate_numbers
+
+        return allocate_numbers(self.organization_id, self.doc_type, scope=self.scope)[0]
+
+
+class IdempotencyKey(models.Model):
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='idempotency_keys')
+    scope = models.CharField(max_length=80)
+    key = models.CharField(max_length=160)
+    # Anahtarı alan kullanıcı (tablet gibi kullanıcısız uçlarda boş) ve istek gövdesinin özeti.
+    user_pk = models.PositiveBigIntegerField(null=True, blank=True)
+    request_hash = models.CharField(max_length=64, blank=True, default='')
+    response = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status_code = models.PositiveSmallIntegerField(default=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'scope', 'key'], name='unique_idempotency_key_per_scope'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
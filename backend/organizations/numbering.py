@@ -0,0 +1,51 @@
+"""Belge numarası sayaçları.
+
+Numaralar ``NumberRange`` satırından tek bir ``UPDATE ... RETURNING`` ile
+ayrılır: sayaç veritabanında artırılır, ayrılan aralığın sonu ve satırın biçimi
+(önek, sıfır dolgusu) aynı ifadede okunur. Artış çağıranın transaction'ı içinde
+olduğu için geri alınan işlem numarayı da geri verir (boşluk kalmaz); aynı
+sayaç üzerindeki eşzamanlı çağrılar satır kilidinde sıralanır ve aynı numarayı
+iki kez alamaz. Kilit commit'e kadar tutulduğundan numara transaction'ın
+sonuna yakın ayrılmalıdır. Toplu işler ``count`` ile bir blok ayırır.
+"""
+
+from django.db import connection
+
+from .models import NumberRange
+
+_ALLOCATE_SQL = (
+    f'UPDATE {NumberRange._meta.db_table} SET current = current + %s '
+    'WHERE organization_id = %s AND doc_type = %s AND scope = %s '
+    'RETURNING current, prefix, padding'
+)
+
+
+def _allocate(organization_id, doc_type, scope, count):
+    with connection.cursor() as cursor:
+        cursor.execute(_ALLOCATE_SQL, [count, organization_id, doc_type, scope])
+        return cursor.fetchone()
+
+
+def allocate_numbers(organization, doc_type, count=1, *, scope='', prefix='', padding=0):
+    """``count`` adet ardışık numara döner.
+
+    Sayaç yoksa ``prefix`` ve ``padding`` ile oluşturulur; mevcut satırın biçimi
+    değiştirilmez, böylece önek/dolgu yönetim tarafından ayarlanabilir.
+    """
+    if count < 1:
+        return []
+    organization_id = getattr(organization, 'pk', organization)
+    row = _allocate(organization_id, doc_type, scope, count)
+    if row is None:
+        NumberRange.objects.bulk_create(
+            [NumberRange(organization_id=organization_id, doc_type=doc_type, scope=scope, prefix=prefix, padding=padding)],
+            ignore_conflicts=True,
+        )
+        row = _allocate(organization_id, doc_type, scope, count)
+    end, row_prefix, row_padding = row
+    number_range = NumberRange(prefix=row_prefix, padding=row_padding)
+    return [number_range.format_number(value) for value in range(end - count, end)]
+
+
+def allocate_number(organization, doc_type, *, scope='', prefix='', padding=0):
+    return allocate_numbers(organization, doc_type, scope=scope, prefix=prefix, padding=padding)[0]
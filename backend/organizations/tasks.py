@@ -0,0 +1,8 @@
+from celery import shared_task
+
+
+@shared_task
+def purge_expired_idempotency_keys():
+    from .idempotency import purge_expired_idempotency_keys as purge
+
+    return purge()
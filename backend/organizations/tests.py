@@ -1,3 +1,83 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from core.startup import parse_importtime, profile_boot
+
+from .models import NumberRange, Organization
+from .numbering import allocate_number, allocate_numbers
+
+
+class NumberRangeAllocationTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Numara Org', code='NUM')
+
+    def test_allocates_formatted_blocks_per_scope(self):
+        self.assertEqual(allocate_number(self.org, 'QUOTE', scope='AY', prefix='AY-T-', padding=4), 'AY-T-0001')
+        self.assertEqual(allocate_numbers(self.org, 'QUOTE', 3, scope='AY'), ['AY-T-0002', 'AY-T-0003', 'AY-T-0004'])
+        self.assertEqual(allocate_number(self.org, 'QUOTE', scope='BE', prefix='BE-T-'), 'BE-T-1')
+
+        NumberRange.objects.filter(organization=self.org, scope='AY').update(prefix='AY/')
+        with self.assertNumQueries(1):
+            self.assertEqual(allocate_number(self.org, 'QUOTE', scope='AY', prefix='ignored'), 'AY/0005')
+
+    def test_rolled_back_allocation_leaves_no_gap(self):
+        allocate_number(self.org, 'WORK_ORDER', prefix='UR-')
+        try:
+            with transaction.atomic():
+                allocate_numbers(self.org, 'WORK_ORDER', 5)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(allocate_number(self.org, 'WORK_ORDER'), 'UR-2')
+
+
+class NumberRangeConcurrencyTests(TransactionTestCase):
+    def test_concurrent_allocations_are_unique_and_contiguous(self):
+        org = Organization.objects.create(name='Paralel Org', code='PAR')
+        allocate_number(org, 'CONTRACT', prefix='S-')
+        results, errors = [], []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(5):
+                    with transaction.atomic():
+                        results.extend(allocate_numbers(org, 'CONTRACT', 2))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(int(number[2:]) for number in results), list(range(2, 82)))
+
+
+class StartupBudgetTests(SimpleTestCase):
+    def test_parse_importtime_builds_tree_from_post_order_output(self):
+        roots = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       300 |        300 |     openpyxl\n"
+            "import time:       100 |        400 |   crm.contracts\n"
+            "import time:        50 |        450 | crm.views\n"
+            "import time:        20 |         20 | support.views\n"
+        )
+        self.assertEqual([(node.name, node.cumulative_us) for node in roots], [('crm.views', 450), ('support.views', 20)])
+        self.assertEqual(roots[0].children[0].children[0].name, 'openpyxl')
+
+    def test_boot_skips_document_libraries_and_stays_within_budget(self):
+        profile = profile_boot()
+        chains = [' > '.join(profile.import_chain(module)) for module in profile.deferred_loaded]
+        self.assertEqual(profile.deferred_loaded, [], chains)
+        self.assertIn('crm.views', profile.modules)
+        seconds = min(profile_boot(importtime=False).seconds for _ in range(2))
+        self.assertLess(seconds, settings.STARTUP_BUDGET_SECONDS)
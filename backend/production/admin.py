@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from .ingest import requeue_dead_letters
 from .models import (
     ProductionDataField,
     ProductionCountingParticipant,
@@ -9,6 +10,7 @@ from .models import (
     ProductionDevicePayloadMap,
     ProductionDocument,
     ProductionEvent,
+    ProductionIngestEvent,
     ProductionOperatorProfile,
     ProductionRuleBlock,
     ProductionRuleSet,
@@ -64,3 +66,17 @@ admin.site.register(ProductionEvent)
 admin.site.register(ProductionStationAlert)
 admin.site.register(ProductionStationAlertAck)
 admin.site.register(ProductionDocument)
+
+
+@admin.register(ProductionIngestEvent)
+class ProductionIngestEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'organization', 'station_code', 'line_id', 'backend', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'backend', 'organization')
+    search_fields = ('station_code', 'idempotency_key', 'last_error')
+    readonly_fields = ('event', 'stream_id', 'received_at', 'claimed_at', 'processed_at')
+    actions = ['requeue_selected']
+
+    @admin.action(description='Secili hatali Pi olaylarini yeniden kuyruga al')
+    def requeue_selected(self, request, queryset):
+        count = requeue_dead_letters(queryset)
+        self.message_user(request, f'{count} olay yeniden kuyruga alindi.')
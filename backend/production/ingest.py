@@ -0,0 +1,343 @@
+"""Accept-then-process ingestion for Raspberry Pi machine events.
+
+The Pi endpoint only validates the device token and appends the event to a
+Redis stream (sharded by ``line_id``) or, when Redis is unreachable, to the
+``ProductionIngestEvent`` outbox table. ``drain_machine_events`` applies the
+queued events through ``record_machine_session_event``. Events of the same
+line are always applied in arrival order: a failing event blocks the rest of
+its line until it succeeds or is moved to the dead-letter list, and is not
+retried before ``_backoff(attempts)`` has passed.
+"""
+
+import json
+import logging
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    ProductionDevice,
+    ProductionIngestEvent,
+    ProductionStation,
+    ProductionStepProgress,
+    ProductionWorkOrderLine,
+)
+from .services import ProductionError, record_machine_session_event
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = 'production:pi-events'
+CONSUMER_GROUP = 'production-ingest'
+CONSUMER_NAME = 'drainer'
+LOCK_TTL_SECONDS = 60
+KICK_TTL_SECONDS = 1
+STALE_CLAIM_SECONDS = 300
+MAX_BACKOFF_SECONDS = 300
+PROCESSED_RETENTION_DAYS = 7
+
+PERMANENT_ERRORS = (
+    ProductionError,
+    ProductionDevice.DoesNotExist,
+    ProductionStation.DoesNotExist,
+    ProductionStepProgress.DoesNotExist,
+    ProductionWorkOrderLine.DoesNotExist,
+)
+
+
+def _redis_client():
+    url = getattr(settings, 'PRODUCTION_INGEST_REDIS_URL', None) or getattr(settings, 'CELERY_BROKER_URL', 'redis://redis:6379/0')
+    return redis.from_url(url, decode_responses=True, socket_connect_timeout=1, socket_timeout=2)
+
+
+def _shard_count():
+    return max(1, int(getattr(settings, 'PRODUCTION_INGEST_SHARDS', 4) or 1))
+
+
+def _max_attempts():
+    return max(1, int(getattr(settings, 'PRODUCTION_INGEST_MAX_ATTEMPTS', 5) or 1))
+
+
+def stream_key(shard):
+    return f'{STREAM_PREFIX}:{shard}'
+
+
+def shard_for_line(line_id):
+    try:
+        return int(line_id) % _shard_count()
+    except (TypeError, ValueError):
+        return 0
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(MAX_BACKOFF_SECONDS, 2 ** max(0, attempts)))
+
+
+def _stream_entry_age_seconds(entry_id, now_ms=None):
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    try:
+        return max(0.0, (now_ms - int(str(entry_id).split('-', 1)[0])) / 1000)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def build_ingest_message(*, device, line_id, station_code, quantity_delta=0, counter_value=None, note='', idempotency_key='',
+                         raw_payload=None, normalized_payload=None, mapping_errors=None):
+    return {
+        'organization_id': device.organization_id,
+        'device_id': device.id,
+        'line_id': line_id,
+        'station_code': station_code,
+        'quantity_delta': str(quantity_delta or 0),
+        'counter_value': None if counter_value in (None, '') else str(counter_value),
+        'note': note or '',
+        'idempotency_key': idempotency_key or '',
+        'raw_payload': raw_payload or {},
+        'normalized_payload': normalized_payload or {},
+        'mapping_errors': mapping_errors or [],
+        'received_at': timezone.now().isoformat(),
+    }
+
+
+def _outbox_row(message, *, backend='db', stream_id='', status='pending', attempts=0, last_error=''):
+    return ProductionIngestEvent(
+        organization_id=message['organization_id'],
+        device_id=message.get('device_id'),
+        line_id=message.get('line_id'),
+        station_code=message.get('station_code') or '',
+        idempotency_key=message.get('idempotency_key') or '',
+        backend=backend,
+        stream_id=stream_id,
+        payload=message,
+        status=status,
+        attempts=attempts,
+        last_error=last_error,
+    )
+
+
+def _kick_drain(client):
+    try:
+        if not client.set(f'{STREAM_PREFIX}:kick', '1', nx=True, ex=KICK_TTL_SECONDS):
+            return
+        from .tasks import drain_machine_events
+
+        drain_machine_events.delay()
+    except Exception:
+        logger.warning('Production ingest drain could not be scheduled.', exc_info=True)
+
+
+def enqueue_machine_event(**kwargs):
+    """Queue a Pi event; returns ``{'backend': 'redis'|'db', 'id': ...}``."""
+    message = build_ingest_message(**kwargs)
+    body = json.dumps(message, default=str)
+    try:
+        client = _redis_client()
+        entry_id = client.xadd(stream_key(shard_for_line(message['line_id'])), {'body': body})
+    except redis.RedisError as exc:
+        logger.warning('Redis unavailable, production event written to DB outbox: %s', exc)
+        row = _outbox_row(json.loads(body))
+        row.save()
+        return {'backend': 'db', 'id': str(row.id)}
+    transaction.on_commit(lambda: _kick_drain(client))
+    return {'backend': 'redis', 'id': entry_id}
+
+
+def _apply_message(message):
+    device = ProductionDevice.objects.select_related('organization').get(pk=message.get('device_id'))
+    return record_machine_session_event(
+        organization=device.organization,
+        device=device,
+        line_id=message.get('line_id'),
+        station_code=message.get('station_code'),
+        quantity_delta=message.get('quantity_delta') or 0,
+        counter_value=message.get('counter_value'),
+        note=message.get('note', ''),
+        idempotency_key=message.get('idempotency_key', ''),
+        raw_payload=message.get('raw_payload') or {},
+        normalized_payload=message.get('normalized_payload') or {},
+        mapping_errors=message.get('mapping_errors') or [],
+    )
+
+
+def _ensure_group(client, key):
+    try:
+        client.xgroup_create(key, CONSUMER_GROUP, id='0', mkstream=True)
+    except redis.ResponseError as exc:
+        if 'BUSYGROUP' not in str(exc):
+            raise
+
+
+def _read_group(client, key, start, count):
+    if count <= 0:
+        return []
+    response = client.xreadgroup(CONSUMER_GROUP, CONSUMER_NAME, {key: start}, count=count)
+    return [entry for _, entries in (response or []) for entry in entries if entry[1]]
+
+
+def _drain_stream_shard(client, shard, batch_size):
+    key = stream_key(shard)
+    lock_key = f'{key}:lock'
+    token = uuid4().hex
+    if not client.set(lock_key, token, nx=True, ex=LOCK_TTL_SECONDS):
+        return None
+    stats = {'processed': 0, 'retried': 0, 'dead': 0}
+    attempts_key = f'{key}:attempts'
+    retry_key = f'{key}:retry-at'
+    try:
+        _ensure_group(client, key)
+        # Entries already delivered to this consumer but not acked come back first, in id order.
+        entries = _read_group(client, key, '0', batch_size)
+        entries += _read_group(client, key, '>', batch_size - len(entries))
+        entry_ids = [entry_id for entry_id, _ in entries]
+        retry_at = dict(zip(entry_ids, client.hmget(retry_key, entry_ids))) if entry_ids else {}
+        now_ms = int(time.time() * 1000)
+        blocked_lines = set()
+        for entry_id, fields in entries:
+            message = json.loads(fields.get('body') or '{}')
+            line_key = message.get('line_id')
+            if line_key in blocked_lines:
+                continue
+            if retry_at.get(entry_id) and int(retry_at[entry_id]) > now_ms:
+                blocked_lines.add(line_key)
+                continue
+            try:
+                _apply_message(message)
+            except PERMANENT_ERRORS as exc:
+                attempts = int(client.hincrby(attempts_key, entry_id, 1))
+                _outbox_row(message, backend='redis', stream_id=entry_id, status='dead', attempts=attempts, last_error=str(exc)).save()
+                stats['dead'] += 1
+            except Exception as exc:
+                attempts = int(client.hincrby(attempts_key, entry_id, 1))
+                if attempts < _max_attempts():
+                    logger.warning('Production ingest entry %s failed (attempt %s).', entry_id, attempts, exc_info=True)
+                    client.hset(retry_key, entry_id, now_ms + int(_backoff(attempts).total_seconds() * 1000))
+                    blocked_lines.add(line_key)
+                    stats['retried'] += 1
+                    continue
+                _outbox_row(message, backend='redis', stream_id=entry_id, status='dead', attempts=attempts, last_error=str(exc)).save()
+                stats['dead'] += 1
+            else:
+                stats['processed'] += 1
+            client.xack(key, CONSUMER_GROUP, entry_id)
+            client.xdel(key, entry_id)
+            client.hdel(attempts_key, entry_id)
+            client.hdel(retry_key, entry_id)
+    finally:
+        if client.get(lock_key) == token:
+            client.delete(lock_key)
+    return stats
+
+
+def drain_redis_streams(batch_size=200):
+    try:
+        client = _redis_client()
+        client.ping()
+    except redis.RedisError:
+        return {'available': False}
+    totals = {'available': True, 'processed': 0, 'retried': 0, 'dead': 0, 'skipped_shards': 0}
+    for shard in range(_shard_count()):
+        stats = _drain_stream_shard(client, shard, batch_size)
+        if stats is None:
+            totals['skipped_shards'] += 1
+            continue
+        for key, value in stats.items():
+            totals[key] += value
+    return totals
+
+
+def drain_outbox(batch_size=200):
+    now = timezone.now()
+    ProductionIngestEvent.objects.filter(status='processing', claimed_at__lt=now - timedelta(seconds=STALE_CLAIM_SECONDS)).update(status='pending')
+    ProductionIngestEvent.objects.filter(status='done', processed_at__lt=now - timedelta(days=PROCESSED_RETENTION_DAYS)).delete()
+    stats = {'processed': 0, 'retried': 0, 'dead': 0}
+    rows = ProductionIngestEvent.objects.filter(status__in=['pending', 'processing']).order_by('id')[:batch_size]
+    blocked_lines = set()
+    for row in rows:
+        if row.line_id in blocked_lines:
+            continue
+        if row.status == 'processing' or row.available_at > now:
+            blocked_lines.add(row.line_id)
+            continue
+        claimed = ProductionIngestEvent.objects.filter(pk=row.pk, status='pending').update(status='processing', claimed_at=timezone.now())
+        if not claimed:
+            blocked_lines.add(row.line_id)
+            continue
+        row.attempts += 1
+        try:
+            event = _apply_message(row.payload)
+        except Exception as exc:
+            row.last_error = str(exc)
+            if isinstance(exc, PERMANENT_ERRORS) or row.attempts >= _max_attempts():
+                row.status = 'dead'
+                stats['dead'] += 1
+            else:
+                row.status = 'pending'
+                row.available_at = timezone.now() + _backoff(row.attempts)
+                blocked_lines.add(row.line_id)
+                stats['retried'] += 1
+            row.save(update_fields=['status', 'attempts', 'last_error', 'available_at'])
+            continue
+        row.status = 'done'
+        row.event = event
+        row.last_error = ''
+        row.processed_at = timezone.now()
+        row.save(update_fields=['status', 'attempts', 'event', 'last_error', 'processed_at'])
+        stats['processed'] += 1
+    return stats
+
+
+def drain_machine_events(batch_size=200):
+    return {
+        'redis': drain_redis_streams(batch_size),
+        'outbox': drain_outbox(batch_size),
+    }
+
+
+def requeue_dead_letters(queryset):
+    """Put dead-lettered rows back into the outbox; they are drained from the DB regardless of origin."""
+    return queryset.filter(status='dead').update(
+        status='pending',
+        attempts=0,
+        last_error='',
+        available_at=timezone.now(),
+        claimed_at=None,
+    )
+
+
+def ingest_metrics(organization=None):
+    now = timezone.now()
+    streams = []
+    redis_available = True
+    try:
+        client = _redis_client()
+        now_ms = int(time.time() * 1000)
+        for shard in range(_shard_count()):
+            key = stream_key(shard)
+            depth = int(client.xlen(key) or 0)
+            oldest = client.xrange(key, count=1) if depth else []
+            streams.append({
+                'shard': shard,
+                'depth': depth,
+                'lag_seconds': _stream_entry_age_seconds(oldest[0][0], now_ms) if oldest else 0.0,
+            })
+    except redis.RedisError:
+        redis_available = False
+        streams = []
+    outbox = ProductionIngestEvent.objects.all()
+    if organization is not None:
+        outbox = outbox.filter(organization=organization)
+    oldest_pending = outbox.filter(status__in=['pending', 'processing']).order_by('id').values_list('received_at', flat=True).first()
+    outbox_depth = outbox.filter(status__in=['pending', 'processing']).count()
+    outbox_lag = max(0.0, (now - oldest_pending).total_seconds()) if oldest_pending else 0.0
+    return {
+        'redis_available': redis_available,
+        'streams': streams,
+        'outbox': {'depth': outbox_depth, 'lag_seconds': outbox_lag},
+        'dead_letters': outbox.filter(status='dead').count(),
+        'queue_depth': sum(item['depth'] for item in streams) + outbox_depth,
+        'processing_lag_seconds': max([item['lag_seconds'] for item in streams] + [outbox_lag]),
+    }
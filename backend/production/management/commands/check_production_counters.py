@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from organizations.models import Organization
+from production.models import ProductionWorkOrder
+from production.services import recount_work_order_progress
+
+
+class Command(BaseCommand):
+    help = "Is emri ilerleme sayaclarini kalem ve adimlardan yeniden sayarak dogrular."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organization", "-o", default="", help="Sadece bu Organization.code")
+        parser.add_argument("--fix", action="store_true", help="Tutarsiz sayaclari ve durumlari duzelt.")
+
+    def handle(self, *args, **options):
+        orders = ProductionWorkOrder.objects.order_by("id")
+        if options["organization"]:
+            org = Organization.objects.filter(code=options["organization"]).first()
+            if not org:
+                raise CommandError("Organizasyon bulunamadi.")
+            orders = orders.filter(organization=org)
+
+        checked = 0
+        mismatched = 0
+        for order in orders.iterator(chunk_size=500):
+            checked += 1
+            expected = recount_work_order_progress(order)
+            drift = {
+                field: (getattr(order, field), value)
+                for field, value in expected.items()
+                if getattr(order, field) != value
+            }
+            if not drift:
+                continue
+            mismatched += 1
+            details = ", ".join(f"{field}: {stored} != {actual}" for field, (stored, actual) in drift.items())
+            self.stdout.write(self.style.WARNING(f"{order.number}: {details}"))
+            if options["fix"]:
+                for field, value in expected.items():
+                    setattr(order, field, value)
+                update_fields = [*expected]
+                if order.status in {"waiting", "in_progress", "completed"} and order.status != order.progress_status():
+                    order.status = order.progress_status()
+                    update_fields.append("status")
+                ProductionWorkOrder.objects.filter(pk=order.pk).update(**{field: getattr(order, field) for field in update_fields})
+
+        summary = f"{checked} is emri kontrol edildi, {mismatched} tutarsiz."
+        if mismatched and not options["fix"]:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
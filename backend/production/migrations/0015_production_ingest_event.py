@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0005_warehouse_operational_fields'),
+        ('production', '0014_productrecipe_productrecipematerial_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionIngestEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_id', models.BigIntegerField(blank=True, null=True)),
+                ('station_code', models.CharField(blank=True, default='', max_length=50)),
+                ('idempotency_key', models.CharField(blank=True, default='', max_length=160)),
+                ('backend', models.CharField(choices=[('redis', 'Redis stream'), ('db', 'Veritabani outbox')], default='db', max_length=10)),
+                ('stream_id', models.CharField(blank=True, default='', max_length=40)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Bekliyor'), ('processing', 'Isleniyor'), ('done', 'Islendi'), ('dead', 'Islenemedi')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ingest_events', to='production.productiondevice')),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ingest_rows', to='production.productionevent')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='production_ingest_events', to='organizations.organization')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='prod_ingest_status_idx'), models.Index(fields=['organization', 'status'], name='prod_ingest_org_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:36
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def populate_progress_counters(apps, schema_editor):
+    ProductionWorkOrder = apps.get_model('production', 'ProductionWorkOrder')
+    ProductionWorkOrderLine = apps.get_model('production', 'ProductionWorkOrderLine')
+    ProductionStepProgress = apps.get_model('production', 'ProductionStepProgress')
+    line_totals = {
+        row['work_order_id']: row
+        for row in ProductionWorkOrderLine.objects.values('work_order_id').annotate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(completed_quantity__gte=F('quantity'))),
+            quantity=Sum('completed_quantity'),
+        )
+    }
+    in_progress = dict(
+        ProductionStepProgress.objects.filter(status='in_progress')
+        .values('line__work_order_id')
+        .annotate(total=Count('id'))
+        .values_list('line__work_order_id', 'total')
+    )
+    for order_id in set(line_totals) | set(in_progress):
+        row = line_totals.get(order_id, {})
+        ProductionWorkOrder.objects.filter(pk=order_id).update(
+            lines_total=row.get('total', 0),
+            lines_completed=row.get('completed', 0),
+            completed_quantity=row.get('quantity') or 0,
+            steps_in_progress=in_progress.get(order_id, 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0015_production_ingest_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productionworkorder',
+            name='completed_quantity',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='productionworkorder',
+            name='lines_completed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productionworkorder',
+            name='lines_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productionworkorder',
+            name='steps_in_progress',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_progress_counters, migrations.RunPython.noop),
+    ]
@@ -397,9 +397,16 @@ class ProductionWorkOrder(models.Model):
     due_date = models.DateField(null=True, blank=True)
     notes = models.TextField(blank=True, default='')
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_production_orders')
+    # Denormalized progress counters, maintained with F() deltas by production.signals.
+    lines_total = models.IntegerField(default=0)
+    lines_completed = models.IntegerField(default=0)
+    steps_in_progress = models.IntegerField(default=0)
+    completed_quantity = models.DecimalField(max_digits=16, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    PROGRESS_COUNTER_FIELDS = ('lines_total', 'lines_completed', 'steps_in_progress', 'completed_quantity')
+
     class Meta:
         ordering = ['-created_at', '-id']
         constraints = [
@@ -413,6 +420,13 @@ class ProductionWorkOrder(models.Model):
     def __str__(self):
         return self.number
 
+    def progress_status(self):
+        if self.lines_total > 0 and self.lines_completed >= self.lines_total:
+            return 'completed'
+        if self.steps_in_progress > 0:
+            return 'in_progress'
+        return 'waiting'
+
 
 class ProductionWorkOrderLine(models.Model):
     work_order = models.ForeignKey(ProductionWorkOrder, on_delete=models.CASCADE, related_name='lines')
@@ -436,6 +450,19 @@ class ProductionWorkOrderLine(models.Model):
     def __str__(self):
         return self.product_name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_progress = instance.progress_snapshot()
+        return instance
+
+    def progress_snapshot(self):
+        quantity = self.__dict__.get('quantity')
+        completed = self.__dict__.get('completed_quantity')
+        if quantity is None or completed is None:
+            return None
+        return {'completed': completed >= quantity, 'completed_quantity': completed}
+
 
 class ProductRecipe(models.Model):
     STATUSES = [
@@ -619,6 +646,12 @@ class ProductionStepProgress(models.Model):
     def __str__(self):
         return f'{self.line_id} - {self.station.code}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
 
 class ProductionStepTabletAssignment(models.Model):
     organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='production_step_tablet_assignments')
@@ -913,6 +946,45 @@ class ProductionEvent(models.Model):
         raise RuntimeError('Production events cannot be deleted.')
 
 
+class ProductionIngestEvent(models.Model):
+    STATUSES = [
+        ('pending', 'Bekliyor'),
+        ('processing', 'Isleniyor'),
+        ('done', 'Islendi'),
+        ('dead', 'Islenemedi'),
+    ]
+    BACKENDS = [
+        ('redis', 'Redis stream'),
+        ('db', 'Veritabani outbox'),
+    ]
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='production_ingest_events')
+    device = models.ForeignKey(ProductionDevice, on_delete=models.SET_NULL, null=True, blank=True, related_name='ingest_events')
+    line_id = models.BigIntegerField(null=True, blank=True)
+    station_code = models.CharField(max_length=50, blank=True, default='')
+    idempotency_key = models.CharField(max_length=160, blank=True, default='')
+    backend = models.CharField(max_length=10, choices=BACKENDS, default='db')
+    stream_id = models.CharField(max_length=40, blank=True, default='')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    event = models.ForeignKey(ProductionEvent, on_delete=models.SET_NULL, null=True, blank=True, related_name='ingest_rows')
+    received_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='prod_ingest_status_idx'),
+            models.Index(fields=['organization', 'status'], name='prod_ingest_org_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.station_code} - {self.line_id} - {self.status}'
+
+
 class ProductionRuleSet(models.Model):
     SCOPES = [
         ('global', 'Genel'),
@@ -0,0 +1,229 @@
+"""Versioned, single-flight cache for production report summary sections.
+
+Each section of ``build_report_summary`` is cached under
+``production:report:{org}:{section}:{revision}:{filters}``. The revision is bumped
+by ``production.signals`` whenever report data changes, so stale entries are
+never read, only left to expire. Two revisions exist per organization:
+
+* ``live`` moves on every change and keys ranges that include today;
+* ``past`` only moves when a row dated before today changes, so summaries of
+  closed days keep their entries and are served from cache for a long time.
+
+While Redis is reachable keys carry only the shared revision, so every web and
+worker process reads the same entries; the process-local counters key the short
+lived fallback entries and bumps made while Redis was down are replayed once it
+is back. Identical concurrent requests compute a section once: threads of a
+process share a lock per key and processes coordinate through a Redis ``SET NX``
+lock owned by a token, the others wait for the stored result.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from uuid import uuid4
+
+import redis
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.redis_client import redis_client, redis_failed
+
+from .reporting import build_report_summary
+
+KEY_PREFIX = 'production:report'
+LIVE_TTL_SECONDS = 60
+OVERVIEW_TTL_SECONDS = 10
+PAST_TTL_SECONDS = 7 * 24 * 3600
+LOCAL_TTL_SECONDS = 10
+LOCAL_MAX_ENTRIES = 512
+LOCK_TTL_SECONDS = 30
+WAIT_SECONDS = 10
+
+_local = OrderedDict()
+_local_revisions = {}
+_pending_bumps = set()
+_key_locks = {}
+_guard = threading.Lock()
+
+# Deletes the lock only while it still holds our token; an expired lock may already belong to another process.
+RELEASE_LOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+def _revision_key(organization_id, scope):
+    return f'{KEY_PREFIX}-revision:{organization_id}:{scope}'
+
+
+def _flush_revisions(client):
+    with _guard:
+        pending = list(_pending_bumps)
+        _pending_bumps.clear()
+    if not pending:
+        return True
+    try:
+        pipe = client.pipeline(transaction=False)
+        for organization_id, scope in pending:
+            pipe.incr(_revision_key(organization_id, scope))
+        pipe.execute()
+    except redis.RedisError:
+        with _guard:
+            _pending_bumps.update(pending)
+        redis_failed()
+        return False
+    return True
+
+
+def bump_report_revision(organization_id, past=False):
+    scopes = ('live', 'past') if past else ('live',)
+    with _guard:
+        for scope in scopes:
+            _local_revisions[(organization_id, scope)] = _local_revisions.get((organization_id, scope), 0) + 1
+            _pending_bumps.add((organization_id, scope))
+    client = redis_client()
+    if client is not None:
+        _flush_revisions(client)
+
+
+def _revision(organization_id, scope):
+    local = f'{_local_revisions.get((organization_id, scope), 0)}-x'
+    client = redis_client()
+    if client is None or not _flush_revisions(client):
+        return local, False
+    try:
+        shared = int(client.get(_revision_key(organization_id, scope)) or 0)
+    except redis.RedisError:
+        redis_failed()
+        return local, False
+    return str(shared), True
+
+
+def _filters_digest(filters):
+    raw = json.dumps({key: str(value) if value is not None else None for key, value in sorted(filters.items())})
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _local_get(key):
+    with _guard:
+        entry = _local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            _local.pop(key, None)
+            return None
+        _local.move_to_end(key)
+        return value
+
+
+def _local_set(key, value, ttl):
+    with _guard:
+        _local[key] = (time.monotonic() + ttl, value)
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+@contextmanager
+def _key_lock(key):
+    # The lock stays registered while any thread holds or waits for it.
+    with _guard:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _guard:
+            entry[1] -= 1
+            if entry[1] == 0 and _key_locks.get(key) is entry:
+                del _key_locks[key]
+
+
+def clear_report_cache():
+    with _guard:
+        _local.clear()
+
+
+def _encode(value):
+    return json.dumps(value, cls=JSONEncoder)
+
+
+def _shared_get_or_compute(client, key, compute, ttl):
+    cached = client.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    lock_key = f'{key}:lock'
+    token = uuid4().hex
+    if client.set(lock_key, token, nx=True, ex=LOCK_TTL_SECONDS):
+        try:
+            value = json.loads(_encode(compute()))
+            client.set(key, _encode(value), ex=ttl)
+            return value
+        finally:
+            client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        cached = client.get(key)
+        if cached is not None:
+            return json.loads(cached)
+        if not client.exists(lock_key):
+            break
+    return json.loads(_encode(compute()))
+
+
+def cached_section(organization_id, name, compute, *, filters, scope, revision, shared, ttl):
+    key = f'{KEY_PREFIX}:{organization_id}:{name}:{scope}:{revision}:{_filters_digest(filters)}'
+    value = _local_get(key)
+    if value is not None:
+        return value
+    with _key_lock(key):
+        value = _local_get(key)
+        if value is not None:
+            return value
+        client = redis_client() if shared else None
+        if client is not None:
+            try:
+                value = _shared_get_or_compute(client, key, compute, ttl)
+            except redis.RedisError:
+                redis_failed()
+                value = None
+        if value is None:
+            value = json.loads(_encode(compute()))
+        # Without the shared revision other processes' writes are invisible here, so keep it short.
+        _local_set(key, value, ttl if shared else min(ttl, LOCAL_TTL_SECONDS))
+    return value
+
+
+def _is_closed_range(filters):
+    return bool(filters['end']) and filters['end'] < timezone.localdate()
+
+
+def cached_report_summary(organization, filters):
+    past = _is_closed_range(filters)
+    no_filters = {key: None for key in filters}
+    revisions = {scope: _revision(organization.id, scope) for scope in ('live', 'past')}
+
+    def load(name, builder, filter_dependent):
+        section_filters = filters if filter_dependent else no_filters
+        if name == 'overview':
+            scope, ttl = 'live', OVERVIEW_TTL_SECONDS
+        elif past and filter_dependent:
+            scope, ttl = 'past', PAST_TTL_SECONDS
+        else:
+            scope, ttl = 'live', LIVE_TTL_SECONDS
+        revision, shared = revisions[scope]
+        return cached_section(
+            organization.id,
+            name,
+            lambda: builder(organization, section_filters),
+            filters=section_filters,
+            scope=scope,
+            revision=revision,
+            shared=shared,
+            ttl=ttl,
+        )
+
+    return build_report_summary(organization, filters, section_loader=load)
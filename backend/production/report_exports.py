@@ -5,9 +5,6 @@ from decimal import Decimal
 from io import BytesIO
 
 from django.http import FileResponse
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.page import PageMargins
 
 from crm.contracts import PDF_CONTENT_TYPE, _convert_xlsx_stream_to_pdf, resolve_product_document_defaults
 from crm.models import Quote
@@ -80,6 +77,8 @@ def response_for_export(export):
 
 
 def _render_template_export(template, general_context, line_contexts, output_format, base_name):
+    from openpyxl import load_workbook
+
     if not isinstance(template, ProductionReportTemplate):
         raise ValueError('Geçerli rapor şablonu bulunamadı.')
     output_format = str(output_format or template.default_format or 'xlsx').lower()
@@ -259,6 +258,12 @@ def _line_context_from_quote(line, index):
 
 
 def _expand_line_rows(worksheet, line_count):
+    """Expand the ``{kalem1.*}`` template row into ``line_count`` rows.
+
+    Merged ranges are dropped before ``insert_rows`` and re-created once from
+    their shifted refs, and row dimensions are moved in one pass, instead of
+    repairing heights and merges row by row after the insert.
+    """
     template_row = None
     for row in worksheet.iter_rows():
         if any(isinstance(cell.value, str) and LINE_TOKEN_PATTERN.search(cell.value) for cell in row):
@@ -268,53 +273,53 @@ def _expand_line_rows(worksheet, line_count):
         return
 
     amount = line_count - 1
-    max_row_before = worksheet.max_row
-    merged_ranges = list(worksheet.merged_cells.ranges)
-    row_dimensions = {
-        row_index: _row_dimension_snapshot(worksheet.row_dimensions[row_index])
-        for row_index in range(template_row + 1, max_row_before + 1)
-    }
-    template_row_dimension = _row_dimension_snapshot(worksheet.row_dimensions[template_row])
-
-    for merged in merged_ranges:
+    merged_refs = _shifted_merge_refs(worksheet.merged_cells.ranges, template_row, amount)
+    for merged in list(worksheet.merged_cells.ranges):
         worksheet.unmerge_cells(str(merged))
 
     worksheet.insert_rows(template_row + 1, amount=amount)
-    for source_row, snapshot in sorted(row_dimensions.items(), reverse=True):
-        _apply_row_dimension_snapshot(worksheet.row_dimensions[source_row + amount], snapshot)
-    for row_index in range(template_row + 1, template_row + line_count):
-        _apply_row_dimension_snapshot(worksheet.row_dimensions[row_index], template_row_dimension)
-
-    for row_index in range(template_row + 1, template_row + line_count):
-        _copy_row(worksheet, template_row, row_index)
-
-    _restore_shifted_merges(worksheet, merged_ranges, template_row, amount)
-
-    for row_index in range(template_row, template_row + line_count):
-        line_number = row_index - template_row + 1
-        for cell in worksheet[row_index]:
-            if isinstance(cell.value, str):
-                cell.value = cell.value.replace('{kalem1.', f'{{kalem{line_number}.')
-
+    _shift_row_dimensions(worksheet, template_row, amount)
+    template_cells = [cell for cell in worksheet[template_row] if cell.value is not None or cell.has_style]
+    for offset in range(1, line_count):
+        token = f'{{kalem{offset + 1}.'
+        for source in template_cells:
+            value = source.value
+            if isinstance(value, str):
+                value = value.replace('{kalem1.', token)
+            target = worksheet.cell(template_row + offset, source.column, value)
+            target._style = copy.copy(source._style)
 
-def _row_dimension_snapshot(row_dimension):
-    return {
-        'height': row_dimension.height,
-        'hidden': row_dimension.hidden,
-        'outlineLevel': row_dimension.outlineLevel,
-        'collapsed': row_dimension.collapsed,
-    }
+    for ref in merged_refs:
+        worksheet.merge_cells(ref)
 
 
-def _apply_row_dimension_snapshot(row_dimension, snapshot):
-    row_dimension.height = snapshot.get('height')
-    row_dimension.hidden = snapshot.get('hidden')
-    row_dimension.outlineLevel = snapshot.get('outlineLevel') or 0
-    row_dimension.collapsed = snapshot.get('collapsed') or False
+def _shift_row_dimensions(worksheet, template_row, inserted_count):
+    from openpyxl.worksheet.dimensions import RowDimension
 
+    dimensions = worksheet.row_dimensions
+    shifted = sorted((index, dimension) for index, dimension in dimensions.items() if index > template_row)
+    for index, _ in shifted:
+        del dimensions[index]
+    for index, dimension in shifted:
+        dimension.index = index + inserted_count
+        dimensions[index + inserted_count] = dimension
 
-def _restore_shifted_merges(worksheet, merged_ranges, template_row, inserted_count):
-    restored = set()
+    template_dimension = dimensions.get(template_row)
+    if template_dimension is None:
+        return
+    for index in range(template_row + 1, template_row + inserted_count + 1):
+        dimensions[index] = RowDimension(
+            worksheet,
+            index=index,
+            ht=template_dimension.ht,
+            hidden=template_dimension.hidden,
+            outlineLevel=template_dimension.outlineLevel,
+            collapsed=template_dimension.collapsed,
+        )
+
+
+def _shifted_merge_refs(merged_ranges, template_row, inserted_count):
+    refs = {}
     for merged in merged_ranges:
         if merged.min_row > template_row:
             ref = _merge_ref(
@@ -327,48 +332,19 @@ def _restore_shifted_merges(worksheet, merged_ranges, template_row, inserted_cou
             ref = _merge_ref(merged.min_row, merged.min_col, merged.max_row + inserted_count, merged.max_col)
         else:
             ref = _merge_ref(merged.min_row, merged.min_col, merged.max_row, merged.max_col)
-        if ref not in restored:
-            worksheet.merge_cells(ref)
-            restored.add(ref)
+        refs[ref] = True
 
         if merged.min_row == template_row and merged.max_row == template_row:
             for offset in range(1, inserted_count + 1):
-                copied_ref = _merge_ref(
-                    merged.min_row + offset,
-                    merged.min_col,
-                    merged.max_row + offset,
-                    merged.max_col,
-                )
-                if copied_ref not in restored:
-                    worksheet.merge_cells(copied_ref)
-                    restored.add(copied_ref)
+                refs[_merge_ref(merged.min_row + offset, merged.min_col, merged.max_row + offset, merged.max_col)] = True
+    return list(refs)
 
 
 def _merge_ref(min_row, min_col, max_row, max_col):
-    return f'{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}'
+    from openpyxl.utils import get_column_letter
 
+    return f'{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}'
 
-def _copy_row(worksheet, source_row, target_row):
-    worksheet.row_dimensions[target_row].height = worksheet.row_dimensions[source_row].height
-    worksheet.row_dimensions[target_row].hidden = worksheet.row_dimensions[source_row].hidden
-    for col in range(1, worksheet.max_column + 1):
-        source = worksheet.cell(source_row, col)
-        target = worksheet.cell(target_row, col)
-        target.value = source.value
-        if source.has_style:
-            target._style = copy.copy(source._style)
-        if source.number_format:
-            target.number_format = source.number_format
-        if source.font:
-            target.font = copy.copy(source.font)
-        if source.fill:
-            target.fill = copy.copy(source.fill)
-        if source.border:
-            target.border = copy.copy(source.border)
-        if source.alignment:
-            target.alignment = copy.copy(source.alignment)
-        if source.protection:
-            target.protection = copy.copy(source.protection)
 
 def _apply_placeholders(worksheet, context):
     for row in worksheet.iter_rows():
@@ -393,6 +369,8 @@ def _replace_placeholder_in_cell(cell, context):
 
 
 def _prepare_report_print_layout(worksheet):
+    from openpyxl.worksheet.page import PageMargins
+
     worksheet.sheet_properties.pageSetUpPr.fitToPage = True
     worksheet.page_setup.orientation = 'landscape'
     worksheet.page_setup.paperSize = worksheet.PAPERSIZE_A4
@@ -0,0 +1,363 @@
+"""Shared filters, summary sections and streaming writers for production reports.
+
+``ProductionReportSummaryView`` and ``ProductionReportExportView`` read the same
+query parameters (``start``, ``end``, ``department``, ``station``, ``worker``);
+``parse_report_filters`` normalizes them once and ``filter_report_queryset``
+applies them to any queryset given the lookups of its date/station/user fields.
+The summary is assembled from the independent ``SUMMARY_SECTIONS`` so each part
+can be cached on its own (see ``report_cache``). Exports iterate a ``values()``
+projection in chunks and write rows as they are read, so memory use does not
+depend on the size of the date range.
+"""
+
+import csv
+import tempfile
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import (
+    ProductionCountingWindow,
+    ProductionDepartment,
+    ProductionEvent,
+    ProductionSessionBreak,
+    ProductionStation,
+    ProductionStationTarget,
+    ProductionWorkSession,
+)
+from .services import dashboard_summary
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_CHUNK_SIZE = 2000
+
+SESSION_EXPORT_COLUMNS = [
+    ('Baslangic', 'started_at'),
+    ('Bitis', 'ended_at'),
+    ('Is Emri', 'work_order__number'),
+    ('Istasyon', 'station__code'),
+    ('Urun', 'line__product_name'),
+    ('Saglam Adet', 'declared_good_quantity'),
+    ('Makine Adedi', 'machine_quantity'),
+    ('Fark', 'discrepancy_quantity'),
+    ('Fark Durumu', 'discrepancy_status'),
+    ('Kullanici', 'user__username'),
+    ('Not', 'note'),
+]
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _selected(value):
+    return None if value in (None, '', 'all') else value
+
+
+def parse_report_filters(params):
+    return {
+        'start': _parse_date(params.get('start')),
+        'end': _parse_date(params.get('end')),
+        'department': _selected(params.get('department')),
+        'station': _selected(params.get('station')),
+        'worker': _selected(params.get('worker')),
+    }
+
+
+def filter_report_queryset(queryset, filters, *, date_field, department_field=None, station_field=None, user_field=None):
+    if filters['start']:
+        queryset = queryset.filter(**{f'{date_field}__gte': filters['start']})
+    if filters['end']:
+        queryset = queryset.filter(**{f'{date_field}__lte': filters['end']})
+    if filters['department'] and department_field:
+        queryset = queryset.filter(**{department_field: filters['department']})
+    if filters['station'] and station_field:
+        queryset = queryset.filter(**{station_field: filters['station']})
+    if filters['worker'] and user_field:
+        queryset = queryset.filter(**{user_field: filters['worker']})
+    return queryset
+
+
+def report_sessions(organization, filters):
+    return filter_report_queryset(
+        ProductionWorkSession.objects.filter(organization=organization),
+        filters,
+        date_field='started_at__date',
+        department_field='station__department_id',
+        station_field='station_id',
+        user_field='user_id',
+    )
+
+
+def report_events(organization, filters):
+    return filter_report_queryset(
+        ProductionEvent.objects.filter(organization=organization),
+        filters,
+        date_field='created_at__date',
+        department_field='station__department_id',
+        station_field='station_id',
+        user_field='user_id',
+    )
+
+
+def _overview(organization, filters):
+    return dashboard_summary(organization)
+
+
+def _by_station(organization, filters):
+    return list(
+        report_events(organization, filters)
+        .values('station_id', 'station__code', 'station__name', 'station__department__name')
+        .annotate(total=Sum('quantity_delta'))
+        .order_by('station__department__order', 'station__order')
+    )
+
+
+def _by_worker(organization, filters):
+    return list(
+        report_sessions(organization, filters)
+        .values('user_id', 'user__username', 'user__first_name', 'user__last_name')
+        .annotate(
+            total=Sum('declared_good_quantity'),
+            machine_total=Sum('machine_quantity'),
+            discrepancy_total=Sum('discrepancy_quantity'),
+        )
+        .order_by('-total')[:100]
+    )
+
+
+def _by_date(organization, filters):
+    rows = list(
+        report_events(organization, filters)
+        .values('created_at__date')
+        .annotate(total=Sum('quantity_delta'))
+        .order_by('created_at__date')
+    )
+    for item in rows:
+        if item['created_at__date']:
+            item['date'] = item['created_at__date'].strftime('%Y-%m-%d')
+            del item['created_at__date']
+    return rows
+
+
+def _worker_station(organization, filters):
+    return list(
+        report_sessions(organization, filters)
+        .values('user__username', 'user__first_name', 'user__last_name', 'station__code', 'station__name')
+        .annotate(total=Sum('declared_good_quantity'))
+        .order_by('-total')[:200]
+    )
+
+
+def _station_target_performance(organization, filters):
+    targets = filter_report_queryset(
+        ProductionStationTarget.objects.filter(organization=organization).select_related('station__department'),
+        filters,
+        date_field='target_date',
+        department_field='station__department_id',
+        station_field='station_id',
+    )
+    windows = filter_report_queryset(
+        ProductionCountingWindow.objects.filter(organization=organization, status='closed').select_related('station__department'),
+        filters,
+        date_field='closed_at__date',
+        department_field='station__department_id',
+        station_field='station_id',
+    )
+    actual_by_station_date = {
+        (row['station_id'], row['closed_at__date']): row['total'] or 0
+        for row in windows.values('station_id', 'closed_at__date').annotate(total=Sum('official_delta'))
+    }
+    override_by_station_date = {
+        (target.station_id, target.target_date): target
+        for target in targets
+    }
+    if filters['start']:
+        start_day = filters['start']
+    elif actual_by_station_date:
+        start_day = min(day for _, day in actual_by_station_date.keys())
+    else:
+        start_day = timezone.localdate()
+    if filters['end']:
+        end_day = filters['end']
+    elif actual_by_station_date:
+        end_day = max(day for _, day in actual_by_station_date.keys())
+    else:
+        end_day = start_day
+    if end_day < start_day:
+        end_day = start_day
+    date_rows = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+    target_stations = ProductionStation.objects.filter(organization=organization, is_active=True).select_related('department')
+    if filters['department']:
+        target_stations = target_stations.filter(department_id=filters['department'])
+    if filters['station']:
+        target_stations = target_stations.filter(id=filters['station'])
+    rows = []
+    for station in target_stations.order_by('department__order', 'order', 'id'):
+        for target_date in date_rows:
+            override = override_by_station_date.get((station.id, target_date))
+            target_quantity = (override.target_quantity if override else station.default_daily_target) or 0
+            actual = actual_by_station_date.get((station.id, target_date), 0)
+            if not target_quantity and not actual and not override:
+                continue
+            percent = float((actual / target_quantity) * 100) if target_quantity else 0
+            rows.append({
+                'station_id': station.id,
+                'station_code': station.code,
+                'station_name': station.name,
+                'department_name': station.department.name,
+                'target_date': target_date.isoformat(),
+                'target_quantity': target_quantity,
+                'actual_quantity': actual,
+                'remaining_quantity': max(target_quantity - actual, 0),
+                'completion_percent': min(999, round(percent, 1)),
+                'is_override': bool(override),
+            })
+    return rows
+
+
+def _detailed_sessions(organization, filters):
+    rows = []
+    sessions = report_sessions(organization, filters).select_related('user', 'station', 'line__work_order', 'line')
+    for s in sessions.order_by('-started_at')[:200]:
+        rows.append({
+            'id': s.id,
+            'type': 'work',
+            'started_at': s.started_at.isoformat() if s.started_at else None,
+            'ended_at': s.ended_at.isoformat() if s.ended_at else None,
+            'username': s.user.username,
+            'fullname': s.user.get_full_name(),
+            'station_code': s.station.code,
+            'station_name': s.station.name,
+            'work_order_number': s.work_order.number if s.work_order else '',
+            'product_name': s.line.product_name if s.line else 'Genel Çalışma',
+            'quantity': float(s.declared_good_quantity or 0),
+        })
+
+    breaks = filter_report_queryset(
+        ProductionSessionBreak.objects.filter(organization=organization).select_related('user', 'session__station'),
+        filters,
+        date_field='started_at__date',
+        department_field='session__station__department_id',
+        station_field='session__station_id',
+        user_field='user_id',
+    )
+    for b in breaks.order_by('-started_at')[:200]:
+        rows.append({
+            'id': f"break-{b.id}",
+            'type': 'break',
+            'started_at': b.started_at.isoformat() if b.started_at else None,
+            'ended_at': b.ended_at.isoformat() if b.ended_at else None,
+            'username': b.user.username,
+            'fullname': b.user.get_full_name(),
+            'station_code': b.session.station.code if b.session else '',
+            'station_name': b.session.station.name if b.session else '',
+            'work_order_number': 'MOLA',
+            'product_name': b.note or 'Kişisel Mola',
+            'quantity': 0.0,
+        })
+
+    rows.sort(key=lambda x: x['started_at'] or '', reverse=True)
+    return rows[:200]
+
+
+def _lookups(organization, filters):
+    return {
+        'departments_list': list(ProductionDepartment.objects.filter(organization=organization, is_active=True).values('id', 'name')),
+        'stations_list': list(ProductionStation.objects.filter(organization=organization, is_active=True).values('id', 'name', 'code', 'department_id')),
+        'workers_list': list(get_user_model().objects.filter(organization=organization, is_active=True).values('id', 'username', 'first_name', 'last_name')),
+    }
+
+
+def _session_counts(organization, filters):
+    sessions = report_sessions(organization, filters)
+    return {
+        'open_sessions': sessions.filter(status__in=['started', 'paused']).count(),
+        'discrepancies_pending': sessions.filter(discrepancy_status='needs_review').count(),
+    }
+
+
+# name -> (builder, filter dependent, response key or None to merge a dict into the response)
+SUMMARY_SECTIONS = {
+    'overview': (_overview, False, None),
+    'by_station': (_by_station, True, 'by_station'),
+    'by_worker': (_by_worker, True, 'by_worker'),
+    'by_date': (_by_date, True, 'by_date'),
+    'worker_station': (_worker_station, True, 'worker_station'),
+    'station_target_performance': (_station_target_performance, True, 'station_target_performance'),
+    'detailed_sessions': (_detailed_sessions, True, 'detailed_sessions'),
+    'lookups': (_lookups, False, None),
+    'session_counts': (_session_counts, True, None),
+}
+
+
+def build_report_summary(organization, filters, section_loader=None):
+    """Assemble the summary payload; ``section_loader(name, builder, filter_dependent)`` may serve sections from a cache."""
+    data = {}
+    for name, (builder, filter_dependent, key) in SUMMARY_SECTIONS.items():
+        if section_loader is None:
+            value = builder(organization, filters)
+        else:
+            value = section_loader(name, builder, filter_dependent)
+        if key is None:
+            data.update(value)
+        else:
+            data[key] = value
+    return data
+
+
+def _format_datetime(value):
+    return timezone.localtime(value).strftime('%d.%m.%Y %H:%M') if value else ''
+
+
+def _session_export_rows(organization, filters):
+    fields = [field for _, field in SESSION_EXPORT_COLUMNS]
+    rows = report_sessions(organization, filters).order_by('-started_at', '-id').values_list(*fields)
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        record = dict(zip(fields, row))
+        record['started_at'] = _format_datetime(record['started_at'])
+        record['ended_at'] = _format_datetime(record['ended_at'])
+        record['work_order__number'] = record['work_order__number'] or ''
+        record['line__product_name'] = record['line__product_name'] or 'Genel Çalışma'
+        record['note'] = record['note'] or ''
+        yield [record[field] for field in fields]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_sessions_csv(organization, filters, filename='imalat_raporu.csv'):
+    writer = csv.writer(_Echo())
+
+    def generate():
+        yield writer.writerow([header for header, _ in SESSION_EXPORT_COLUMNS])
+        for row in _session_export_rows(organization, filters):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def sessions_xlsx_response(organization, filters, filename='imalat_raporu.xlsx'):
+    from openpyxl import Workbook
+
+    # Write-only worksheets spill rows to disk; the finished zip goes to a temp file, not memory.
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Imalat')
+    worksheet.append([header for header, _ in SESSION_EXPORT_COLUMNS])
+    for row in _session_export_rows(organization, filters):
+        worksheet.append(row)
+    handle = tempfile.TemporaryFile()
+    workbook.save(handle)
+    handle.seek(0)
+    return FileResponse(handle, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
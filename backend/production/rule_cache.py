@@ -0,0 +1,293 @@
+"""Compiled, in-process cache for production rule sets and device payload maps.
+
+Rule sets, their blocks and Pi payload maps change rarely but are evaluated on
+every station and machine event. Each organization's configuration is loaded
+once, compiled into immutable evaluators and kept in process memory. Saves and
+deletes bump a per-organization version (locally and in Redis); workers compare
+their compiled version with Redis at most every ``VERSION_CHECK_SECONDS`` and
+recompile when it moved. Without Redis, compiled entries expire after
+``LOCAL_TTL_SECONDS``.
+"""
+
+import threading
+import time
+from copy import deepcopy
+from decimal import Decimal
+
+import redis
+
+from core.redis_client import redis_client, redis_failed
+
+from .models import ProductionDevicePayloadMap, ProductionRuleSet
+from .services import ProductionError, _cast_mapping_value
+
+VERSION_KEY_PREFIX = 'production:config-version'
+VERSION_CHECK_SECONDS = 2
+LOCAL_TTL_SECONDS = 30
+
+_cache = {}
+_local_generations = {}
+_lock = threading.Lock()
+
+
+def _shared_version(organization_id):
+    client = redis_client()
+    if client is None:
+        return None
+    try:
+        return int(client.get(f'{VERSION_KEY_PREFIX}:{organization_id}') or 0)
+    except redis.RedisError:
+        redis_failed()
+        return None
+
+
+def bump_config_version(organization_id):
+    with _lock:
+        _local_generations[organization_id] = _local_generations.get(organization_id, 0) + 1
+        _cache.pop(organization_id, None)
+    client = redis_client()
+    if client is None:
+        return
+    try:
+        client.incr(f'{VERSION_KEY_PREFIX}:{organization_id}')
+    except redis.RedisError:
+        redis_failed()
+
+
+def clear_compiled_config_cache():
+    with _lock:
+        _cache.clear()
+
+
+def _compile_value(config, key='value'):
+    source = config.get(f'{key}_source')
+    if source == 'normalized':
+        name = config.get(f'{key}_key', '')
+        return lambda context: context.get('normalized_payload', {}).get(name)
+    if source == 'context':
+        name = config.get(f'{key}_key', '')
+        return lambda context: context.get(name)
+    constant = config.get(key)
+    if isinstance(constant, (dict, list)):
+        return lambda context: deepcopy(constant)
+    return lambda context: constant
+
+
+def _as_decimal(value):
+    return Decimal(str(value or 0))
+
+
+_CONDITION_OPERATORS = {
+    'neq': lambda left, right: left != right,
+    'gt': lambda left, right: _as_decimal(left) > _as_decimal(right),
+    'gte': lambda left, right: _as_decimal(left) >= _as_decimal(right),
+    'lt': lambda left, right: _as_decimal(left) < _as_decimal(right),
+    'lte': lambda left, right: _as_decimal(left) <= _as_decimal(right),
+    'contains': lambda left, right: str(right) in str(left),
+}
+
+
+def _compile_block(block_type, config):
+    """Return ``step(context, active) -> active`` for one rule block."""
+    if block_type == 'condition':
+        left = _compile_value(config, 'left')
+        right = _compile_value(config, 'right')
+        compare = _CONDITION_OPERATORS.get(config.get('operator', 'eq'), lambda a, b: a == b)
+        return lambda context, active: compare(left(context), right(context))
+    if block_type == 'assign':
+        target = config.get('target_key')
+        value = _compile_value(config)
+
+        def assign(context, active):
+            if target:
+                context['normalized_payload'][target] = value(context)
+            return active
+        return assign
+    if block_type == 'increment_quantity':
+        delta = _compile_value(config, 'delta')
+
+        def increment(context, active):
+            context['event_type'] = 'quantity'
+            context['quantity_delta'] = delta(context) or context.get('quantity_delta') or 0
+            return active
+        return increment
+    if block_type == 'change_status':
+        event_type = config.get('event_type')
+
+        def change_status(context, active):
+            context['event_type'] = event_type or context.get('event_type') or 'quantity'
+            return active
+        return change_status
+    if block_type in {'open_next_step', 'stock_in'}:
+        def post_action(context, active):
+            context.setdefault('post_actions', []).append(block_type)
+            return active
+        return post_action
+    return lambda context, active: active
+
+
+class CompiledRuleSet:
+    __slots__ = ('id', 'scope', 'station_id', 'route_id', 'trigger_event', 'steps')
+
+    def __init__(self, rule_set):
+        self.id = rule_set.id
+        self.scope = rule_set.scope
+        self.station_id = rule_set.station_id
+        self.route_id = rule_set.route_id
+        self.trigger_event = rule_set.trigger_event
+        self.steps = tuple(
+            _compile_block(block.block_type, dict(block.config or {}))
+            for block in rule_set.blocks.all()
+            if block.is_active
+        )
+
+    def applies_to(self, station_id, route_id, trigger_event):
+        if self.trigger_event != trigger_event:
+            return False
+        if self.scope == 'global':
+            return True
+        if self.scope == 'station':
+            return self.station_id == station_id
+        if self.scope == 'route':
+            return self.route_id == route_id
+        return False
+
+
+class RuleEvaluator:
+    __slots__ = ('rule_sets',)
+
+    def __init__(self, rule_sets):
+        self.rule_sets = tuple(rule_sets)
+
+    def apply(self, context):
+        for rule_set in self.rule_sets:
+            active = True
+            for step in rule_set.steps:
+                if not active:
+                    break
+                active = step(context, active)
+        return context
+
+
+class CompiledPayloadMap:
+    __slots__ = ('source_path', 'parts', 'target_key', 'target_type', 'default_value', 'is_required')
+
+    def __init__(self, row):
+        self.source_path = row.source_path
+        self.parts = tuple(row.source_path[2:].split('.')) if (row.source_path or '').startswith('$.') else None
+        self.target_key = row.target_key
+        self.target_type = row.target_type
+        self.default_value = row.default_value
+        self.is_required = row.is_required
+
+    def extract(self, payload):
+        if self.parts is None:
+            raise ProductionError('JSON path $. ile baslamalidir.')
+        current = payload
+        for part in self.parts:
+            if isinstance(current, list):
+                try:
+                    current = current[int(part)]
+                except (ValueError, IndexError) as exc:
+                    raise KeyError(self.source_path) from exc
+            elif isinstance(current, dict) and part in current:
+                current = current[part]
+            else:
+                raise KeyError(self.source_path)
+        return current
+
+
+class PayloadMapper:
+    __slots__ = ('maps',)
+
+    def __init__(self, maps):
+        self.maps = tuple(maps)
+
+    def apply(self, raw_payload):
+        normalized = {}
+        errors = []
+        for row in self.maps:
+            try:
+                value = row.extract(raw_payload)
+            except KeyError:
+                if row.is_required:
+                    errors.append({'source_path': row.source_path, 'target_key': row.target_key, 'error': 'missing'})
+                    if row.default_value == '':
+                        continue
+                elif row.default_value != '':
+                    value = row.default_value
+                else:
+                    continue
+            try:
+                normalized[row.target_key] = _cast_mapping_value(value, row.target_type)
+            except ProductionError as exc:
+                errors.append({'source_path': row.source_path, 'target_key': row.target_key, 'error': str(exc)})
+        return normalized, errors
+
+
+EMPTY_PAYLOAD_MAPPER = PayloadMapper(())
+
+
+class _OrganizationConfig:
+    __slots__ = ('shared_version', 'local_generation', 'compiled_at', 'checked_at', 'rule_sets', 'evaluators', 'payload_mappers')
+
+    def __init__(self, organization_id, shared_version, local_generation):
+        now = time.monotonic()
+        self.shared_version = shared_version
+        self.local_generation = local_generation
+        self.compiled_at = now
+        self.checked_at = now
+        self.evaluators = {}
+        self.rule_sets = tuple(
+            CompiledRuleSet(rule_set)
+            for rule_set in ProductionRuleSet.objects.filter(organization_id=organization_id, is_active=True)
+            .prefetch_related('blocks')
+            .order_by('order', 'id')
+        )
+        grouped = {}
+        for row in ProductionDevicePayloadMap.objects.filter(device__organization_id=organization_id, is_active=True).order_by('order', 'id'):
+            grouped.setdefault(row.device_id, []).append(CompiledPayloadMap(row))
+        self.payload_mappers = {device_id: PayloadMapper(rows) for device_id, rows in grouped.items()}
+
+    def evaluator(self, station_id, route_id, trigger_event):
+        key = (station_id, route_id, trigger_event)
+        evaluator = self.evaluators.get(key)
+        if evaluator is None:
+            evaluator = RuleEvaluator(item for item in self.rule_sets if item.applies_to(station_id, route_id, trigger_event))
+            self.evaluators[key] = evaluator
+        return evaluator
+
+
+def _is_fresh(entry, organization_id, now):
+    if entry.local_generation != _local_generations.get(organization_id, 0):
+        return False
+    if now - entry.checked_at < VERSION_CHECK_SECONDS:
+        return True
+    shared = _shared_version(organization_id)
+    if shared is None:
+        fresh = now - entry.compiled_at < LOCAL_TTL_SECONDS
+    else:
+        fresh = shared == entry.shared_version
+    if fresh:
+        entry.checked_at = now
+    return fresh
+
+
+def organization_config(organization_id):
+    entry = _cache.get(organization_id)
+    if entry is not None and _is_fresh(entry, organization_id, time.monotonic()):
+        return entry
+    local_generation = _local_generations.get(organization_id, 0)
+    entry = _OrganizationConfig(organization_id, _shared_version(organization_id), local_generation)
+    with _lock:
+        if _local_generations.get(organization_id, 0) == local_generation:
+            _cache[organization_id] = entry
+    return entry
+
+
+def rule_evaluator_for(organization_id, station_id, route_id, trigger_event):
+    return organization_config(organization_id).evaluator(station_id, route_id, trigger_event)
+
+
+def payload_mapper_for(device):
+    return organization_config(device.organization_id).payload_mappers.get(device.id, EMPTY_PAYLOAD_MAPPER)
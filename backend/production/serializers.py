@@ -1,8 +1,12 @@
+from decimal import Decimal
 from pathlib import Path
 
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Trim
 from rest_framework import serializers
 
 from accounts.utils import user_has_any_perm
+from erp.models import ProductTechnicalDrawing, WarehouseStock
 from erp.serializers import serialize_technical_drawing_summary, technical_drawing_summary_queryset
 
 from .models import (
@@ -14,6 +18,7 @@ from .models import (
     ProductionDevicePayloadMap,
     ProductionDocument,
     ProductionEvent,
+    ProductionIngestEvent,
     ProductRecipe,
     ProductRecipeMaterial,
     ProductRecipeOperation,
@@ -270,7 +275,7 @@ class ProductionShiftOccurrenceSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductionShiftOccurrence
         fields = '__all__'
-        read_only_fields = fields
+        read_only_fields = [field.name for field in ProductionShiftOccurrence._meta.fields]
 
 
 class ProductionShiftCheckpointSerializer(serializers.ModelSerializer):
@@ -282,7 +287,7 @@ class ProductionShiftCheckpointSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductionShiftCheckpoint
         fields = '__all__'
-        read_only_fields = fields
+        read_only_fields = [field.name for field in ProductionShiftCheckpoint._meta.fields]
 
 
 class ProductionDataFieldSerializer(serializers.ModelSerializer):
@@ -452,6 +457,77 @@ class ProductionStepTabletAssignmentSerializer(serializers.ModelSerializer):
         return attrs
 
 
+TECHNICAL_DRAWINGS_PER_LINE = 10
+MATERIAL_REQUIREMENTS_PER_LINE = 50
+
+
+def _location_stocks():
+    return WarehouseStock.objects.filter(location=OuterRef('default_location'), product=OuterRef('material_product')).order_by()
+
+
+def with_location_stock(queryset):
+    """Annotate rows having ``material_product`` and ``default_location`` with ``location_stock_total``."""
+    return queryset.annotate(
+        location_stock_total=Subquery(_location_stocks().values('location').annotate(total=Sum('quantity')).values('total')[:1]),
+    )
+
+
+def material_requirement_queryset(queryset=None):
+    """Requirements with their related rows and stock figures resolved in the same query."""
+    if queryset is None:
+        queryset = ProductionMaterialRequirement.objects.all()
+    stocks = _location_stocks()
+    return with_location_stock(queryset.select_related('station', 'material_product', 'default_location__warehouse')).annotate(
+        matching_stock_total=Subquery(
+            stocks.filter(
+                detail_1_override=Trim(OuterRef('detail_1_override')),
+                detail_2_override=Trim(OuterRef('detail_2_override')),
+            ).values('quantity')[:1]
+        ),
+    ).order_by('station__order', 'id')
+
+
+def work_order_detail_queryset(queryset):
+    """Prefetch plan for ``ProductionWorkOrderSerializer``; the query count does not grow with the list size."""
+    steps = ProductionStepProgress.objects.select_related('station__department', 'route_step').prefetch_related(
+        Prefetch('tablet_assignments', queryset=ProductionStepTabletAssignment.objects.select_related('tablet')),
+    )
+    drawings = (
+        ProductTechnicalDrawing.objects.filter(is_active=True)
+        .select_related('product', 'folder')
+        .order_by('-uploaded_at', '-id')[:TECHNICAL_DRAWINGS_PER_LINE]
+    )
+    return queryset.select_related('route').prefetch_related(
+        Prefetch('lines', queryset=ProductionWorkOrderLine.objects.select_related('product')),
+        Prefetch('lines__steps', queryset=steps),
+        Prefetch(
+            'lines__material_requirements',
+            queryset=material_requirement_queryset()[:MATERIAL_REQUIREMENTS_PER_LINE],
+            to_attr='prefetched_material_requirements',
+        ),
+        Prefetch('lines__product__technical_drawings', queryset=drawings, to_attr='prefetched_technical_drawings'),
+    )
+
+
+def work_order_summary_queryset(queryset):
+    """Annotate list rows with progress aggregates computed by the database."""
+    lines = ProductionWorkOrderLine.objects.filter(work_order=OuterRef('pk')).order_by().values('work_order')
+    steps = ProductionStepProgress.objects.filter(line__work_order=OuterRef('pk')).order_by().values('line__work_order')
+    return queryset.select_related('route').annotate(
+        total_quantity=Coalesce(
+            Subquery(lines.annotate(total=Sum('quantity')).values('total')),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=16, decimal_places=2),
+        ),
+        steps_total=Coalesce(Subquery(steps.annotate(total=Count('id')).values('total')), Value(0), output_field=IntegerField()),
+        steps_completed=Coalesce(
+            Subquery(steps.filter(status__in=['completed', 'skipped']).annotate(total=Count('id')).values('total')),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+
+
 class ProductionWorkOrderLineSerializer(serializers.ModelSerializer):
     steps = ProductionStepProgressSerializer(many=True, read_only=True)
     technical_drawings = serializers.SerializerMethodField()
@@ -466,13 +542,15 @@ class ProductionWorkOrderLineSerializer(serializers.ModelSerializer):
         if not obj.product_id:
             return []
         request = self.context.get('request')
-        return [
-            serialize_technical_drawing_summary(row, request)
-            for row in technical_drawing_summary_queryset(obj.product).select_related('product', 'folder')[:10]
-        ]
+        rows = getattr(obj.product, 'prefetched_technical_drawings', None)
+        if rows is None:
+            rows = technical_drawing_summary_queryset(obj.product).select_related('product', 'folder')[:TECHNICAL_DRAWINGS_PER_LINE]
+        return [serialize_technical_drawing_summary(row, request) for row in rows]
 
     def get_material_requirements(self, obj):
-        rows = obj.material_requirements.select_related('station', 'material_product', 'default_location__warehouse').order_by('station__order', 'id')[:50]
+        rows = getattr(obj, 'prefetched_material_requirements', None)
+        if rows is None:
+            rows = material_requirement_queryset(obj.material_requirements.all())[:MATERIAL_REQUIREMENTS_PER_LINE]
         return ProductionMaterialRequirementSerializer(rows, many=True, context=self.context).data
 
 
@@ -491,12 +569,56 @@ class ProductionWorkOrderSerializer(serializers.ModelSerializer):
             'source_number',
             'route_name',
             'created_by',
+            'lines_total',
+            'lines_completed',
+            'steps_in_progress',
+            'completed_quantity',
             'created_at',
             'updated_at',
             'lines',
         ]
 
 
+class ProductionWorkOrderSummarySerializer(serializers.ModelSerializer):
+    route_name = serializers.CharField(source='route.name', read_only=True, default='')
+    total_quantity = serializers.DecimalField(max_digits=16, decimal_places=2, read_only=True)
+    steps_total = serializers.IntegerField(read_only=True)
+    steps_completed = serializers.IntegerField(read_only=True)
+    progress_percent = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductionWorkOrder
+        fields = [
+            'id',
+            'number',
+            'source_type',
+            'source_id',
+            'source_number',
+            'customer_name',
+            'status',
+            'route',
+            'route_name',
+            'planned_start',
+            'due_date',
+            'lines_total',
+            'lines_completed',
+            'steps_in_progress',
+            'completed_quantity',
+            'total_quantity',
+            'steps_total',
+            'steps_completed',
+            'progress_percent',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = fields
+
+    def get_progress_percent(self, obj):
+        if not obj.steps_total:
+            return 0
+        return round(obj.steps_completed * 100 / obj.steps_total, 1)
+
+
 class ProductRecipeSerializer(serializers.ModelSerializer):
     product_sku = serializers.CharField(source='product.sku', read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -516,7 +638,9 @@ class ProductRecipeSerializer(serializers.ModelSerializer):
 
     def get_operations(self, obj):
         return ProductRecipeOperationSerializer(
-            obj.operations.select_related('station__department').prefetch_related('materials__material_product', 'materials__default_location__warehouse').all(),
+            obj.operations.select_related('station__department').prefetch_related(
+                Prefetch('materials', queryset=with_location_stock(ProductRecipeMaterial.objects.select_related('material_product', 'default_location__warehouse'))),
+            ).all(),
             many=True,
             context=self.context,
         ).data
@@ -535,7 +659,8 @@ class ProductRecipeOperationSerializer(serializers.ModelSerializer):
 
     def get_materials(self, obj):
         return ProductRecipeMaterialSerializer(
-            obj.materials.select_related('material_product', 'default_location__warehouse').all(),
+            obj.materials.all() if 'materials' in getattr(obj, '_prefetched_objects_cache', {})
+            else with_location_stock(obj.materials.select_related('material_product', 'default_location__warehouse')),
             many=True,
             context=self.context,
         ).data
@@ -594,7 +719,8 @@ class ProductRecipeMaterialSerializer(serializers.ModelSerializer):
     def get_location_stock(self, obj):
         if not obj.default_location:
             return 0
-        from django.db.models import Sum
+        if hasattr(obj, 'location_stock_total'):
+            return obj.location_stock_total or 0
         return obj.default_location.stocks.filter(product=obj.material_product).aggregate(total=Sum('quantity'))['total'] or 0
 
 
@@ -627,12 +753,15 @@ class ProductionMaterialRequirementSerializer(serializers.ModelSerializer):
     def get_location_stock(self, obj):
         if not obj.default_location:
             return 0
-        from django.db.models import Sum
+        if hasattr(obj, 'location_stock_total'):
+            return obj.location_stock_total or 0
         return obj.default_location.stocks.filter(product=obj.material_product).aggregate(total=Sum('quantity'))['total'] or 0
 
     def get_matching_stock(self, obj):
         if not obj.default_location:
             return 0
+        if hasattr(obj, 'matching_stock_total'):
+            return obj.matching_stock_total or 0
         d1 = str(obj.detail_1_override or '').strip()
         d2 = str(obj.detail_2_override or '').strip()
         stock = obj.default_location.stocks.filter(
@@ -698,6 +827,15 @@ class ProductionEventSerializer(serializers.ModelSerializer):
         return obj.user.get_full_name() or obj.user.username
 
 
+class ProductionIngestEventSerializer(serializers.ModelSerializer):
+    device_name = serializers.CharField(source='device.name', read_only=True, default='')
+
+    class Meta:
+        model = ProductionIngestEvent
+        fields = '__all__'
+        read_only_fields = [field.name for field in ProductionIngestEvent._meta.fields]
+
+
 class ProductionWorkSessionSerializer(serializers.ModelSerializer):
     station_code = serializers.CharField(source='station.code', read_only=True)
     station_name = serializers.CharField(source='station.name', read_only=True)
@@ -782,7 +920,7 @@ class ProductionCountingParticipantSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductionCountingParticipant
         fields = '__all__'
-        read_only_fields = fields
+        read_only_fields = [field.name for field in ProductionCountingParticipant._meta.fields]
 
     def get_user_name(self, obj):
         return obj.user.get_full_name() or obj.user.username
@@ -798,7 +936,7 @@ class ProductionCountingWindowSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductionCountingWindow
         fields = '__all__'
-        read_only_fields = fields
+        read_only_fields = [field.name for field in ProductionCountingWindow._meta.fields]
 
 
 class ProductionStationAlertAckSerializer(serializers.ModelSerializer):
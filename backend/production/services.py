@@ -9,6 +9,7 @@ import unicodedata
 from copy import deepcopy
 from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
+from functools import wraps
 from uuid import uuid4
 
 from django.contrib.auth import get_user_model
@@ -21,6 +22,7 @@ from core.events import push_event
 from erp.inventory_service import InventoryError, stock_in, stock_out
 from erp.models import InventoryLocation, Product
 from erp.serializers import serialize_technical_drawing_summary, technical_drawing_summary_queryset
+from organizations.numbering import allocate_numbers
 
 from .models import (
     ProductionDataField,
@@ -35,7 +37,6 @@ from .models import (
     ProductionMaterialConsumption,
     ProductionMaterialRequirement,
     ProductionOperatorProfile,
-    ProductionRuleSet,
     ProductionRouteStep,
     ProductionRouteTemplate,
     ProductionSettings,
@@ -83,6 +84,7 @@ class ProductionError(ValueError):
 
 
 ACTIVE_SESSION_STATUSES = ['started', 'paused']
+EVENT_IDEMPOTENCY_CONSTRAINT = 'unique_production_event_idempotency'
 User = get_user_model()
 SHIFT_BLOCKING_STATES = {'break_locked', 'off_shift', 'checkpoint_required'}
 
@@ -861,16 +863,17 @@ def clone_template_preset(preset, organization):
     }
 
 
-def generate_work_order_number(organization):
-    timestamp = timezone.localtime(timezone.now()).strftime('%y%m%d%H%M')
+WORK_ORDER_NUMBER_PADDING = 6
+
+
+def generate_work_order_numbers(organization, count):
+    """Toplu işler için ardışık ``count`` numaralık blok."""
     prefix = (getattr(organization, 'code', '') or 'ORG')[:4].upper()
-    base = f'UR-{prefix}-{timestamp}'
-    candidate = base
-    suffix = 2
-    while ProductionWorkOrder.objects.filter(organization=organization, number=candidate).exists():
-        candidate = f'{base}-{suffix}'
-        suffix += 1
-    return candidate
+    return allocate_numbers(organization, 'WORK_ORDER', count, prefix=f'UR-{prefix}-', padding=WORK_ORDER_NUMBER_PADDING)
+
+
+def generate_work_order_number(organization):
+    return generate_work_order_numbers(organization, 1)[0]
 
 
 def create_progress_steps(line, route):
@@ -1064,23 +1067,6 @@ def add_manual_work_order_line(*, work_order, product=None, product_sku='', prod
     return line
 
 
-def _json_path(payload, path):
-    if not path or not path.startswith('$.'):
-        raise ProductionError('JSON path $. ile baslamalidir.')
-    current = payload
-    for part in path[2:].split('.'):
-        if isinstance(current, list):
-            try:
-                current = current[int(part)]
-            except (ValueError, IndexError) as exc:
-                raise KeyError(path) from exc
-        elif isinstance(current, dict) and part in current:
-            current = current[part]
-        else:
-            raise KeyError(path)
-    return current
-
-
 def _cast_mapping_value(value, target_type):
     if value in ('', None):
         return value
@@ -1096,26 +1082,9 @@ def _cast_mapping_value(value, target_type):
 
 
 def apply_device_payload_maps(device, raw_payload):
-    normalized = {}
-    errors = []
-    maps = ProductionDevicePayloadMap.objects.filter(device=device, is_active=True).order_by('order', 'id')
-    for row in maps:
-        try:
-            value = _json_path(raw_payload, row.source_path)
-        except KeyError:
-            if row.is_required:
-                errors.append({'source_path': row.source_path, 'target_key': row.target_key, 'error': 'missing'})
-                if row.default_value == '':
-                    continue
-            elif row.default_value != '':
-                value = row.default_value
-            else:
-                continue
-        try:
-            normalized[row.target_key] = _cast_mapping_value(value, row.target_type)
-        except ProductionError as exc:
-            errors.append({'source_path': row.source_path, 'target_key': row.target_key, 'error': str(exc)})
-    return normalized, errors
+    from .rule_cache import payload_mapper_for
+
+    return payload_mapper_for(device).apply(raw_payload)
 
 
 def make_pi_idempotency_key(device, raw_payload, normalized_payload):
@@ -1129,65 +1098,20 @@ def make_pi_idempotency_key(device, raw_payload, normalized_payload):
     return f'pi-{device.id}-{digest[:48]}'
 
 
-def _rule_value(config, context, key='value'):
-    if config.get(f'{key}_source') == 'normalized':
-        return context.get('normalized_payload', {}).get(config.get(f'{key}_key', ''))
-    if config.get(f'{key}_source') == 'context':
-        return context.get(config.get(f'{key}_key', ''))
-    return config.get(key)
-
-
-def _condition_matches(config, context):
-    left = _rule_value(config, context, 'left')
-    right = _rule_value(config, context, 'right')
-    op = config.get('operator', 'eq')
-    if op == 'neq':
-        return left != right
-    if op == 'gt':
-        return Decimal(str(left or 0)) > Decimal(str(right or 0))
-    if op == 'gte':
-        return Decimal(str(left or 0)) >= Decimal(str(right or 0))
-    if op == 'lt':
-        return Decimal(str(left or 0)) < Decimal(str(right or 0))
-    if op == 'lte':
-        return Decimal(str(left or 0)) <= Decimal(str(right or 0))
-    if op == 'contains':
-        return str(right) in str(left)
-    return left == right
-
-
 def apply_rule_blocks(context):
+    from .rule_cache import rule_evaluator_for
+
     station = context.get('station')
     route = context.get('route')
     if not station:
         return context
-    rule_sets = ProductionRuleSet.objects.filter(
-        organization=context['organization'],
-        is_active=True,
-        trigger_event=context.get('trigger_event', 'pi_event'),
-    ).filter(
-        models.Q(scope='global') | models.Q(scope='station', station=station) | models.Q(scope='route', route=route)
-    ).prefetch_related('blocks').order_by('order', 'id')
-    for rule_set in rule_sets:
-        active = True
-        for block in rule_set.blocks.all():
-            if not block.is_active or not active:
-                continue
-            config = block.config or {}
-            if block.block_type == 'condition':
-                active = _condition_matches(config, context)
-            elif block.block_type == 'assign':
-                target = config.get('target_key')
-                if target:
-                    context['normalized_payload'][target] = _rule_value(config, context)
-            elif block.block_type == 'increment_quantity':
-                context['event_type'] = 'quantity'
-                context['quantity_delta'] = _rule_value(config, context, 'delta') or context.get('quantity_delta') or 0
-            elif block.block_type == 'change_status':
-                context['event_type'] = config.get('event_type') or context.get('event_type') or 'quantity'
-            elif block.block_type in {'open_next_step', 'stock_in'}:
-                context.setdefault('post_actions', []).append(block.block_type)
-    return context
+    evaluator = rule_evaluator_for(
+        context['organization'].id,
+        station.id,
+        route.id if route else None,
+        context.get('trigger_event', 'pi_event'),
+    )
+    return evaluator.apply(context)
 
 
 def _active_worker_count(station):
@@ -1282,12 +1206,48 @@ def _latest_handover_session(step):
     )
 
 
+def _event_for_key(organization, idempotency_key):
+    return ProductionEvent.objects.filter(organization=organization, idempotency_key=idempotency_key).first()
+
+
+def _is_event_key_conflict(exc):
+    diag = getattr(exc.__cause__, 'diag', None)
+    constraint = getattr(diag, 'constraint_name', None) or str(exc)
+    return EVENT_IDEMPOTENCY_CONSTRAINT in constraint
+
+
+def _returns_existing_event_on_conflict(func):
+    """Run ``func`` atomically, once per idempotency key.
+
+    No lookup runs before the work: the event insert itself is the claim. A
+    replay (or a concurrent duplicate, which waits on the index entry) stops at
+    ``unique_production_event_idempotency``, the savepoint rolls back every
+    change ``func`` made, and the stored event is returned. A replay rejected by
+    a state rule (e.g. the station has since completed) also gets the stored
+    event back; the lookup only runs on those failure paths.
+    """
+
+    @wraps(func)
+    def wrapper(*args, organization, idempotency_key='', **kwargs):
+        try:
+            with transaction.atomic():
+                return func(*args, organization=organization, idempotency_key=idempotency_key, **kwargs)
+        except IntegrityError as exc:
+            if idempotency_key and _is_event_key_conflict(exc):
+                existing = _event_for_key(organization, idempotency_key)
+                if existing:
+                    return existing
+            raise
+        except ProductionError:
+            existing = _event_for_key(organization, idempotency_key) if idempotency_key else None
+            if existing:
+                return existing
+            raise
+    return wrapper
+
+
 def _create_session_event(*, session, event_type, quantity_delta=0, counter_value=None, note='', idempotency_key='', source='ui',
                           device=None, raw_payload=None, normalized_payload=None, mapping_errors=None):
-    if idempotency_key:
-        existing = ProductionEvent.objects.filter(organization=session.organization, idempotency_key=idempotency_key).first()
-        if existing:
-            return existing
     return ProductionEvent.objects.create(
         organization=session.organization,
         work_order=session.work_order,
@@ -1311,10 +1271,6 @@ def _create_session_event(*, session, event_type, quantity_delta=0, counter_valu
 
 def _create_unmatched_machine_event(*, organization, line, step, station, quantity_delta=0, counter_value=None, note='', idempotency_key='',
                                     device=None, raw_payload=None, normalized_payload=None, mapping_errors=None):
-    if idempotency_key:
-        existing = ProductionEvent.objects.filter(organization=organization, idempotency_key=idempotency_key).first()
-        if existing:
-            return existing
     return ProductionEvent.objects.create(
         organization=organization,
         work_order=line.work_order,
@@ -1887,13 +1843,9 @@ def review_session_discrepancy(*, organization, user, session_id, action, correc
     return session
 
 
-@transaction.atomic
+@_returns_existing_event_on_conflict
 def record_machine_session_event(*, organization, line_id, station_code, quantity_delta=0, counter_value=None, note='',
                                  idempotency_key='', device=None, raw_payload=None, normalized_payload=None, mapping_errors=None):
-    if idempotency_key:
-        existing = ProductionEvent.objects.filter(organization=organization, idempotency_key=idempotency_key).first()
-        if existing:
-            return existing
     line, station, step = _step_for_session_action(organization, line_id, station_code)
     qty = _decimal(quantity_delta)
     active_rows = list(_active_sessions_for_step(step).filter(status='started'))
@@ -2388,28 +2340,36 @@ def ack_station_alert(*, organization, alert_id, token='', user=None):
 def _refresh_line_and_order(line):
     final_step = line.steps.filter(station__is_final=True).order_by('-order').first()
     if final_step and final_step.status == 'completed':
-        line.completed_quantity = final_step.completed_quantity
-        line.save(update_fields=['completed_quantity'])
-        complete_line_to_stock(line)
+        if line.completed_quantity != final_step.completed_quantity:
+            line.completed_quantity = final_step.completed_quantity
+            line.save(update_fields=['completed_quantity'])
+        if not line.stock_in_done:
+            complete_line_to_stock(line)
+    # Order counters are kept current by production.signals, so the status
+    # follows from one row instead of a scan over every line and step.
     order = line.work_order
-    all_lines = order.lines.all()
-    if all_lines.exists() and all(item.completed_quantity >= item.quantity for item in all_lines):
-        order.status = 'completed'
-    elif order.lines.filter(steps__status='in_progress').exists():
-        order.status = 'in_progress'
-    else:
-        order.status = 'waiting'
-    order.save(update_fields=['status', 'updated_at'])
+    order.refresh_from_db(fields=['status', *ProductionWorkOrder.PROGRESS_COUNTER_FIELDS])
+    status = order.progress_status()
+    if order.status != status:
+        order.status = status
+        order.save(update_fields=['status', 'updated_at'])
 
 
-@transaction.atomic
+def recount_work_order_progress(order):
+    """Progress counters recomputed from lines and steps, for consistency checks."""
+    lines = list(order.lines.values_list('quantity', 'completed_quantity'))
+    return {
+        'lines_total': len(lines),
+        'lines_completed': sum(1 for quantity, completed in lines if completed >= quantity),
+        'steps_in_progress': ProductionStepProgress.objects.filter(line__work_order=order, status='in_progress').count(),
+        'completed_quantity': sum((completed for _, completed in lines), Decimal('0')),
+    }
+
+
+@_returns_existing_event_on_conflict
 def record_station_event(*, organization, line_id, station_code, event_type, quantity_delta=0, counter_value=None, user=None,
                          note='', idempotency_key='', source='ui', device=None, raw_payload=None, normalized_payload=None,
                          mapping_errors=None):
-    if idempotency_key:
-        existing = ProductionEvent.objects.filter(organization=organization, idempotency_key=idempotency_key).first()
-        if existing:
-            return existing
     line = (
         ProductionWorkOrderLine.objects.select_for_update()
         .select_related('work_order')
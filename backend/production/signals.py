@@ -0,0 +1,137 @@
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    ProductionCountingWindow,
+    ProductionDepartment,
+    ProductionDevicePayloadMap,
+    ProductionEvent,
+    ProductionRuleBlock,
+    ProductionRuleSet,
+    ProductionSessionBreak,
+    ProductionStation,
+    ProductionStationTarget,
+    ProductionStepProgress,
+    ProductionWorkOrder,
+    ProductionWorkOrderLine,
+    ProductionWorkSession,
+)
+from .report_cache import bump_report_revision
+from .rule_cache import bump_config_version
+
+
+def _invalidate_compiled_config(organization_id):
+    # Bump immediately for this process and again after commit so other workers
+    # cannot keep a compilation made from pre-commit data.
+    bump_config_version(organization_id)
+    transaction.on_commit(lambda: bump_config_version(organization_id))
+
+
+@receiver(post_save, sender=ProductionRuleSet)
+@receiver(post_save, sender=ProductionRuleBlock)
+@receiver(post_save, sender=ProductionDevicePayloadMap)
+@receiver(post_delete, sender=ProductionRuleSet)
+@receiver(post_delete, sender=ProductionRuleBlock)
+@receiver(post_delete, sender=ProductionDevicePayloadMap)
+def production_config_changed(sender, instance, **kwargs):
+    _invalidate_compiled_config(instance.organization_id)
+
+
+def _apply_order_deltas(orders, **deltas):
+    deltas = {field: F(field) + value for field, value in deltas.items() if value}
+    if deltas:
+        orders.update(**deltas)
+
+
+@receiver(post_save, sender=ProductionWorkOrderLine)
+def work_order_line_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not {'quantity', 'completed_quantity'} & set(update_fields):
+        return
+    current = instance.progress_snapshot()
+    previous = None if created else getattr(instance, '_loaded_progress', None)
+    instance._loaded_progress = current
+    if current is None or (previous is None and not created):
+        # Unknown starting point; check_production_counters --fix repairs drift.
+        return
+    previous = previous or {'completed': False, 'completed_quantity': 0}
+    _apply_order_deltas(
+        ProductionWorkOrder.objects.filter(pk=instance.work_order_id),
+        lines_total=1 if created else 0,
+        lines_completed=int(current['completed']) - int(previous['completed']),
+        completed_quantity=current['completed_quantity'] - previous['completed_quantity'],
+    )
+
+
+@receiver(pre_delete, sender=ProductionWorkOrderLine)
+def work_order_line_deleted(sender, instance, **kwargs):
+    current = instance.progress_snapshot() or {'completed': False, 'completed_quantity': 0}
+    _apply_order_deltas(
+        ProductionWorkOrder.objects.filter(pk=instance.work_order_id),
+        lines_total=-1,
+        lines_completed=-int(current['completed']),
+        completed_quantity=-current['completed_quantity'],
+    )
+
+
+@receiver(post_save, sender=ProductionStepProgress)
+def step_progress_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if previous is None and not created:
+        return
+    delta = int(instance.status == 'in_progress') - int(previous == 'in_progress')
+    _apply_order_deltas(ProductionWorkOrder.objects.filter(lines=instance.line_id), steps_in_progress=delta)
+
+
+@receiver(pre_delete, sender=ProductionStepProgress)
+def step_progress_deleted(sender, instance, **kwargs):
+    if instance.status == 'in_progress':
+        _apply_order_deltas(ProductionWorkOrder.objects.filter(lines=instance.line_id), steps_in_progress=-1)
+
+
+# Report rows and the field that places them on a report day.
+REPORT_DATE_FIELDS = {
+    ProductionEvent: 'created_at',
+    ProductionWorkSession: 'started_at',
+    ProductionSessionBreak: 'started_at',
+    ProductionCountingWindow: 'closed_at',
+    ProductionStationTarget: 'target_date',
+}
+
+
+def _touches_closed_day(instance):
+    field = REPORT_DATE_FIELDS.get(type(instance))
+    if field is None:
+        # Stations and departments appear in every report range.
+        return True
+    value = getattr(instance, field, None)
+    if isinstance(value, datetime):
+        value = timezone.localdate(value)
+    return isinstance(value, date) and value < timezone.localdate()
+
+
+@receiver(post_save, sender=ProductionEvent)
+@receiver(post_save, sender=ProductionWorkSession)
+@receiver(post_save, sender=ProductionSessionBreak)
+@receiver(post_save, sender=ProductionCountingWindow)
+@receiver(post_save, sender=ProductionStationTarget)
+@receiver(post_save, sender=ProductionStation)
+@receiver(post_save, sender=ProductionDepartment)
+@receiver(post_delete, sender=ProductionEvent)
+@receiver(post_delete, sender=ProductionWorkSession)
+@receiver(post_delete, sender=ProductionSessionBreak)
+@receiver(post_delete, sender=ProductionCountingWindow)
+@receiver(post_delete, sender=ProductionStationTarget)
+@receiver(post_delete, sender=ProductionStation)
+@receiver(post_delete, sender=ProductionDepartment)
+def production_report_data_changed(sender, instance, **kwargs):
+    organization_id = instance.organization_id
+    past = _touches_closed_day(instance)
+    transaction.on_commit(lambda: bump_report_revision(organization_id, past=past))
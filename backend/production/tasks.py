@@ -20,3 +20,10 @@ def enqueue_contract_for_production(quote_id: int):
     if not order:
         return {'created': False, 'reason': 'no_matching_production_route'}
     return {'created': True, 'work_order_id': order.id, 'work_order_number': order.number}
+
+
+@shared_task
+def drain_machine_events(batch_size: int = 200):
+    from .ingest import drain_machine_events as drain
+
+    return drain(batch_size=batch_size)
@@ -1,25 +1,36 @@
+import csv
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
-from io import BytesIO
+from io import BytesIO, StringIO
 from unittest.mock import patch
 
 from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.models import Max, Sum
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+import redis
 from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Border, Side
 from rest_framework.test import APIClient
 
 from accounts.models import Permission, RolePermission, User
+from core import redis_client as shared_redis
 from crm.models import BusinessPartner, Quote, QuoteLine
 from erp.models import Category, InventoryLocation, Product, StockMovement, WarehouseStock
-from organizations.models import Organization, Warehouse
+from organizations.models import IdempotencyKey, Organization, Warehouse
 
+from . import report_cache
 from .automation import schedule_contract_production_if_approved
+from .ingest import drain_machine_events
 from .models import (
     ProductionDevice,
     ProductionDevicePayloadMap,
     ProductionEvent,
+    ProductionIngestEvent,
     ProductRecipe,
     ProductRecipeMaterial,
     ProductRecipeOperation,
@@ -29,6 +40,8 @@ from .models import (
     ProductionMaterialRequirement,
     ProductionOperatorProfile,
     ProductionReportTemplate,
+    ProductionRuleBlock,
+    ProductionRuleSet,
     ProductionSessionBreak,
     ProductionSettings,
     ProductionShiftBreak,
@@ -44,9 +57,10 @@ from .models import (
     ProductionWorkOrder,
     ProductionWorkSession,
 )
-from .report_exports import build_work_order_report_export
+from .report_exports import _expand_line_rows, build_work_order_report_export
 from .services import (
     ProductionError,
+    apply_rule_blocks,
     clone_template_preset,
     close_work_session,
     create_work_order_from_contract,
@@ -66,6 +80,127 @@ from .services import (
 )
 
 
+class FakeRedis:
+    """Süreçler arası paylaşılan Redis'in testte kullanılan küçük bir kısmı."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode()
+        return True
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b'0')) + 1).encode()
+        return int(self.data[key])
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == str(token).encode():
+            return self.delete(key)
+        return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeStreamRedis:
+    """``decode_responses=True`` ile açılmış Redis'in ingest akışının kullandığı kısmı."""
+
+    def __init__(self):
+        self.data = {}
+        self.hashes = {}
+        self.streams = {}
+        self.groups = {}
+        self.sequence = 0
+
+    def ping(self):
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def hincrby(self, key, field, amount=1):
+        values = self.hashes.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+        return int(values[field])
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = str(value)
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    def hdel(self, key, *fields):
+        return sum(1 for field in fields if self.hashes.get(key, {}).pop(field, None) is not None)
+
+    def xadd(self, key, fields):
+        self.sequence += 1
+        entry_id = f'{int(timezone.now().timestamp() * 1000)}-{self.sequence}'
+        self.streams.setdefault(key, []).append((entry_id, dict(fields)))
+        return entry_id
+
+    def xgroup_create(self, key, group, id='0', mkstream=False):
+        if key in self.groups:
+            raise redis.ResponseError('BUSYGROUP Consumer Group name already exists')
+        self.streams.setdefault(key, [])
+        self.groups[key] = {'delivered': set(), 'pending': []}
+
+    def xreadgroup(self, group, consumer, streams, count=None):
+        (key, start), = streams.items()
+        state = self.groups[key]
+        if start == '0':
+            entries = [entry for entry in self.streams[key] if entry[0] in state['pending']]
+        else:
+            entries = [entry for entry in self.streams[key] if entry[0] not in state['delivered']]
+        entries = entries[:count]
+        for entry_id, _ in entries:
+            if entry_id not in state['delivered']:
+                state['delivered'].add(entry_id)
+                state['pending'].append(entry_id)
+        return [[key, entries]] if entries else []
+
+    def xack(self, key, group, entry_id):
+        self.groups[key]['pending'].remove(entry_id)
+
+    def xdel(self, key, entry_id):
+        self.streams[key] = [entry for entry in self.streams[key] if entry[0] != entry_id]
+
+
 class ProductionAutomationTests(TestCase):
     def setUp(self):
         self.org = Organization.objects.create(name='Demo Fabrika', code='DEMO')
@@ -307,6 +442,60 @@ class ProductionAutomationTests(TestCase):
         self.assertIn('Açıklama 1:', rendered_values)
         self.assertIn('120 cm kapılar açılır yavru kanatlı olacak', rendered_values)
 
+    def test_report_line_rows_expand_with_styles_heights_and_merges(self):
+        worksheet = Workbook().active
+        worksheet['A1'] = '{isEmriNo}'
+        worksheet.merge_cells('A1:D1')
+        worksheet.merge_cells('A2:A3')
+        worksheet['B3'] = '{kalem1.sn}'
+        worksheet['C3'] = '{kalem1.urunAdi} / {kalem1.adet}'
+        worksheet['C3'].font = worksheet['C3'].font.copy(bold=True)
+        worksheet.merge_cells('C3:D3')
+        worksheet.row_dimensions[3].height = 22
+        worksheet['A5'] = '{notlar}'
+        worksheet.merge_cells('A5:B6')
+        worksheet.row_dimensions[5].height = 30
+
+        _expand_line_rows(worksheet, 3)
+
+        self.assertEqual([worksheet.cell(row, 2).value for row in range(3, 6)], ['{kalem1.sn}', '{kalem2.sn}', '{kalem3.sn}'])
+        self.assertEqual(worksheet['C5'].value, '{kalem3.urunAdi} / {kalem3.adet}')
+        self.assertTrue(worksheet['C5'].font.b)
+        self.assertEqual(worksheet.row_dimensions[4].height, 22)
+        self.assertEqual(worksheet.row_dimensions[7].height, 30)
+        self.assertEqual(worksheet['A7'].value, '{notlar}')
+        self.assertEqual(
+            sorted(str(merged) for merged in worksheet.merged_cells.ranges),
+            ['A1:D1', 'A2:A3', 'A7:B8', 'C3:D3', 'C4:D4', 'C5:D5'],
+        )
+
+    def test_report_line_rows_keep_merged_borders_through_save(self):
+        worksheet = Workbook().active
+        worksheet['A2'] = '{kalem1.sn}'
+        worksheet['B2'] = '{kalem1.urunAdi}'
+        worksheet['B2'].number_format = '0.00'
+        worksheet['B2'].border = Border(bottom=Side(style='thin'))
+        worksheet.merge_cells('B2:C2')
+        worksheet['A3'] = 'Alt'
+        worksheet['A4'] = '{notlar}'
+        worksheet['A4'].border = Border(top=Side(style='medium'))
+        worksheet.merge_cells('A4:C5')
+        worksheet.row_dimensions[4].height = 18
+
+        _expand_line_rows(worksheet, 4)
+        output = BytesIO()
+        worksheet.parent.save(output)
+        worksheet = load_workbook(BytesIO(output.getvalue())).active
+
+        self.assertEqual([worksheet.cell(row, 1).value for row in range(2, 8)], ['{kalem1.sn}', '{kalem2.sn}', '{kalem3.sn}', '{kalem4.sn}', 'Alt', '{notlar}'])
+        self.assertEqual(
+            sorted(str(merged) for merged in worksheet.merged_cells.ranges),
+            ['A7:C8', 'B2:C2', 'B3:C3', 'B4:C4', 'B5:C5'],
+        )
+        self.assertEqual((worksheet['B5'].number_format, worksheet['C5'].border.bottom.style), ('0.00', 'thin'))
+        self.assertEqual((worksheet['C7'].border.top.style, worksheet.row_dimensions[7].height), ('medium', 18))
+        self.assertIsNone(worksheet.row_dimensions[4].height)
+
     def test_work_order_report_representative_and_date_formatting(self):
         preparer = User.objects.create_user(
             username='contract-preparer',
@@ -406,6 +595,54 @@ class ProductionAutomationTests(TestCase):
         self.assertEqual(repeated.event_type, 'adjust')
         self.assertEqual(StockMovement.objects.filter(source_type='production_work_order', source_id=str(order.id)).count(), 1)
 
+    def test_work_order_progress_counters_follow_step_transitions(self):
+        quote = self.make_contract()
+        order = create_work_order_from_contract(quote, user=self.user)
+        line = order.lines.get()
+        steps = list(line.steps.select_related('station').order_by('order'))
+        order.refresh_from_db()
+        self.assertEqual((order.lines_total, order.lines_completed, order.steps_in_progress), (1, 0, 0))
+
+        record_station_event(organization=self.org, user=self.user, line_id=line.id, station_code=steps[0].station.code, event_type='start')
+        order.refresh_from_db()
+        self.assertEqual((order.steps_in_progress, order.status), (1, 'in_progress'))
+
+        for step in steps:
+            record_station_event(organization=self.org, user=self.user, line_id=line.id, station_code=step.station.code, event_type='complete', note='Tamamlandi')
+        order.refresh_from_db()
+        self.assertEqual((order.lines_completed, order.steps_in_progress, order.status), (1, 0, 'completed'))
+        self.assertEqual(order.completed_quantity, Decimal('2.00'))
+        call_command('check_production_counters', stdout=StringIO())
+
+        ProductionWorkOrder.objects.filter(pk=order.pk).update(steps_in_progress=3)
+        with self.assertRaises(CommandError):
+            call_command('check_production_counters', stdout=StringIO())
+        call_command('check_production_counters', fix=True, stdout=StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.steps_in_progress, 0)
+
+    def test_work_order_list_query_count_does_not_grow_with_orders(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        create_work_order_from_contract(self.make_contract(), user=self.user)
+        with CaptureQueriesContext(connection) as full_queries:
+            self.assertEqual(client.get('/api/production/work-orders/').status_code, 200)
+        with CaptureQueriesContext(connection) as summary_queries:
+            self.assertEqual(client.get('/api/production/work-orders/?view=summary').status_code, 200)
+
+        for _ in range(4):
+            create_work_order_from_contract(self.make_contract(), user=self.user)
+        with self.assertNumQueries(len(full_queries)):
+            response = client.get('/api/production/work-orders/')
+        self.assertEqual(len(response.data), 5)
+        self.assertTrue(response.data[0]['lines'][0]['steps'])
+        with self.assertNumQueries(len(summary_queries)):
+            response = client.get('/api/production/work-orders/?view=summary')
+        row = response.data[0]
+        self.assertNotIn('lines', row)
+        self.assertEqual((row['lines_total'], row['total_quantity'], row['steps_completed']), (1, '2.00', 0))
+        self.assertGreater(row['steps_total'], 0)
+
     def test_pi_events_are_idempotent(self):
         quote = self.make_contract()
         order = create_work_order_from_contract(quote, user=self.user)
@@ -581,6 +818,165 @@ class ProductionAutomationTests(TestCase):
         self.assertEqual(event.normalized_payload['line_id'], float(line.id))
         self.assertEqual(event.mapping_errors[0]['source_path'], '$.missing.required')
 
+    def _started_pi_line(self, token):
+        quote = self.make_contract()
+        order = create_work_order_from_contract(quote, user=self.user)
+        line = order.lines.get()
+        first_step = line.steps.select_related('station').order_by('order').first()
+        ProductionDevice.objects.create(organization=self.org, station=first_step.station, name='Raspberry Pi async', token=token)
+        ProductionStationUser.objects.create(organization=self.org, station=first_step.station, user=self.user)
+        start_work_session(organization=self.org, user=self.user, line_id=line.id, station_code=first_step.station.code)
+        return line, first_step
+
+    @override_settings(PRODUCTION_PI_ASYNC_INGEST=True)
+    @patch('production.ingest._redis_client', side_effect=redis.ConnectionError('redis down'))
+    def test_async_pi_ingest_uses_outbox_when_redis_is_down_and_drains_in_order(self, _redis):
+        line, first_step = self._started_pi_line('pi-async-token')
+        client = APIClient()
+
+        responses = [
+            client.post('/api/production/pi/events/', {'token': 'pi-async-token', 'line_id': line.id, 'quantity_delta': qty, 'idempotency_key': f'async-{idx}'}, format='json')
+            for idx, qty in enumerate(['1', '2'], start=1)
+        ]
+
+        self.assertEqual([item.status_code for item in responses], [202, 202])
+        self.assertEqual(responses[0].data['backend'], 'db')
+        self.assertFalse(ProductionEvent.objects.filter(idempotency_key__startswith='async-').exists())
+
+        stats = drain_machine_events()
+
+        self.assertEqual(stats['redis'], {'available': False})
+        self.assertEqual(stats['outbox']['processed'], 2)
+        keys = list(ProductionEvent.objects.filter(idempotency_key__startswith='async-').order_by('id').values_list('idempotency_key', flat=True))
+        self.assertEqual(keys, ['async-1', 'async-2'])
+        first_step.refresh_from_db()
+        self.assertEqual(first_step.machine_quantity, Decimal('3.00'))
+        self.assertEqual(ProductionIngestEvent.objects.filter(status='done').count(), 2)
+
+    @patch('production.ingest._redis_client', side_effect=redis.ConnectionError('redis down'))
+    def test_async_pi_ingest_retry_blocks_line_and_dead_letters_can_be_requeued(self, _redis):
+        line, first_step = self._started_pi_line('pi-retry-token')
+        rows = [
+            ProductionIngestEvent.objects.create(
+                organization=self.org,
+                line_id=line.id,
+                station_code=first_step.station.code,
+                payload={
+                    'device_id': ProductionDevice.objects.get(token='pi-retry-token').id,
+                    'line_id': line.id,
+                    'station_code': first_step.station.code if idx else 'YOK',
+                    'quantity_delta': '1',
+                    'idempotency_key': f'retry-{idx}',
+                },
+            )
+            for idx in range(2)
+        ]
+
+        with patch('production.ingest.record_machine_session_event', side_effect=RuntimeError('lock timeout')):
+            stats = drain_machine_events()
+
+        self.assertEqual(stats['outbox']['retried'], 1)
+        rows[0].refresh_from_db()
+        rows[1].refresh_from_db()
+        self.assertEqual((rows[0].status, rows[0].attempts), ('pending', 1))
+        self.assertEqual((rows[1].status, rows[1].attempts), ('pending', 0))
+
+        ProductionIngestEvent.objects.filter(pk=rows[0].pk).update(available_at=timezone.now())
+        stats = drain_machine_events()
+
+        self.assertEqual((stats['outbox']['dead'], stats['outbox']['processed']), (1, 1))
+        rows[0].refresh_from_db()
+        self.assertEqual(rows[0].status, 'dead')
+        api = APIClient()
+        api.force_authenticate(self.user)
+        dead = api.get('/api/production/ingest-events/')
+        requeued = api.post('/api/production/ingest-events/requeue/', {'ids': [rows[0].id]}, format='json')
+        metrics = api.get('/api/production/ingest-events/metrics/')
+
+        self.assertEqual([item['id'] for item in dead.data], [rows[0].id])
+        self.assertEqual(requeued.data['requeued'], 1)
+        self.assertEqual(metrics.data['outbox']['depth'], 1)
+        self.assertFalse(metrics.data['redis_available'])
+
+    @override_settings(PRODUCTION_PI_ASYNC_INGEST=True, PRODUCTION_INGEST_MAX_ATTEMPTS=2)
+    def test_async_pi_ingest_stream_backs_off_then_dead_letters(self):
+        fake = FakeStreamRedis()
+        line, first_step = self._started_pi_line('pi-stream-token')
+        client = APIClient()
+        with patch('production.ingest._redis_client', return_value=fake):
+            responses = [
+                client.post('/api/production/pi/events/', {'token': 'pi-stream-token', 'line_id': line.id, 'quantity_delta': '1', 'idempotency_key': f'stream-{idx}'}, format='json')
+                for idx in (1, 2)
+            ]
+        self.assertEqual([item.data['backend'] for item in responses], ['redis', 'redis'])
+
+        def flaky(**kwargs):
+            if kwargs['idempotency_key'] == 'stream-1':
+                raise RuntimeError('lock timeout')
+            return record_machine_session_event(**kwargs)
+
+        with patch('production.ingest._redis_client', return_value=fake), \
+                patch('production.ingest.record_machine_session_event', side_effect=flaky):
+            first = drain_machine_events()['redis']
+            backing_off = drain_machine_events()['redis']
+            with patch('production.ingest.time') as clock:
+                clock.time.return_value = timezone.now().timestamp() + 60
+                last = drain_machine_events()['redis']
+
+        self.assertEqual((first['retried'], first['processed']), (1, 0))
+        self.assertEqual((backing_off['retried'], backing_off['processed'], backing_off['dead']), (0, 0, 0))
+        self.assertEqual((last['dead'], last['processed']), (1, 1))
+        dead = ProductionIngestEvent.objects.get(status='dead')
+        self.assertEqual((dead.backend, dead.stream_id, dead.attempts), ('redis', responses[0].data['id'], 2))
+        self.assertEqual(list(ProductionEvent.objects.filter(idempotency_key__startswith='stream-').values_list('idempotency_key', flat=True)), ['stream-2'])
+        self.assertEqual([entries for entries in fake.streams.values() if entries], [])
+        self.assertFalse(any(fake.hashes.values()))
+        self.assertFalse([key for key in fake.data if key.endswith(':lock')])
+
+    def test_compiled_rule_sets_skip_config_queries_and_follow_block_edits(self):
+        quote = self.make_contract()
+        order = create_work_order_from_contract(quote, user=self.user)
+        line = order.lines.select_related('route', 'work_order__route').get()
+        station = line.steps.select_related('station').order_by('order').first().station
+        rule_set = ProductionRuleSet.objects.create(organization=self.org, name='Vardiya etiketi', station=station, trigger_event='ui_event')
+        block = ProductionRuleBlock.objects.create(
+            organization=self.org,
+            rule_set=rule_set,
+            block_type='assign',
+            config={'target_key': 'shift', 'value': 'A'},
+        )
+        ProductionRuleBlock.objects.create(
+            organization=self.org,
+            rule_set=rule_set,
+            block_type='condition',
+            config={'left_source': 'normalized', 'left_key': 'shift', 'operator': 'eq', 'right': 'Z'},
+            order=1,
+        )
+        ProductionRuleBlock.objects.create(organization=self.org, rule_set=rule_set, block_type='stock_in', order=2)
+
+        def context():
+            return {
+                'organization': self.org,
+                'station': station,
+                'route': line.route or line.work_order.route,
+                'trigger_event': 'ui_event',
+                'normalized_payload': {},
+                'post_actions': [],
+            }
+
+        apply_rule_blocks(context())
+        with self.assertNumQueries(0):
+            result = apply_rule_blocks(context())
+        self.assertEqual(result['normalized_payload'], {'shift': 'A'})
+        self.assertEqual(result['post_actions'], [])
+
+        block.config = {'target_key': 'shift', 'value': 'Z'}
+        block.save()
+        result = apply_rule_blocks(context())
+
+        self.assertEqual(result['normalized_payload'], {'shift': 'Z'})
+        self.assertEqual(result['post_actions'], ['stock_in'])
+
     def test_unassigned_worker_cannot_start_station_session(self):
         quote = self.make_contract()
         order = create_work_order_from_contract(quote, user=self.user)
@@ -663,6 +1059,66 @@ class ProductionAutomationTests(TestCase):
         self.assertEqual(first_step.completed_quantity, Decimal('1.00'))
         self.assertEqual(first_step.status, 'waiting_handover')
 
+    def test_report_export_streams_filtered_sessions(self):
+        order = create_work_order_from_contract(self.make_contract(), user=self.user)
+        line = order.lines.get()
+        first_step, second_step = line.steps.select_related('station').order_by('order')[:2]
+        ProductionStationUser.objects.create(organization=self.org, station=first_step.station, user=self.user)
+        session = start_work_session(organization=self.org, user=self.user, line_id=line.id, station_code=first_step.station.code)
+        close_work_session(organization=self.org, user=self.user, session_id=session.id, declared_good_quantity=Decimal('1'), note='Kenar, boya')
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get('/api/production/reports/export/', {'station': first_step.station.id, 'start': timezone.localdate().isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][3], first_step.station.code)
+        self.assertEqual(rows[1][-1], 'Kenar, boya')
+
+        response = client.get('/api/production/reports/export/', {'station': second_step.station.id})
+        self.assertEqual(len(b''.join(response.streaming_content).decode('utf-8').splitlines()), 1)
+
+        response = client.get('/api/production/reports/export/', {'file_format': 'xlsx', 'worker': self.user.id})
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet.max_row, 2)
+        self.assertEqual(sheet['F2'].value, 1)
+
+        today = timezone.localdate().isoformat()
+        summary = client.get('/api/production/reports/summary/', {'start': today, 'end': today, 'station': first_step.station.id})
+        self.assertEqual(summary.status_code, 200)
+        self.assertEqual([row['user_id'] for row in summary.data['by_worker']], [self.user.id])
+
+    def test_report_summary_sections_are_cached_per_revision(self):
+        order = create_work_order_from_contract(self.make_contract(), user=self.user)
+        line = order.lines.get()
+        first_step = line.steps.select_related('station').order_by('order').first()
+        ProductionStationUser.objects.create(organization=self.org, station=first_step.station, user=self.user)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        today = timezone.localdate()
+        live = {'start': today.isoformat(), 'end': today.isoformat()}
+        closed = {'start': (today - timedelta(days=7)).isoformat(), 'end': (today - timedelta(days=1)).isoformat()}
+
+        with CaptureQueriesContext(connection) as cold:
+            self.assertEqual(client.get('/api/production/reports/summary/', live).data['by_worker'], [])
+        cold_count = len(cold)
+        client.get('/api/production/reports/summary/', closed)
+        with CaptureQueriesContext(connection) as warm:
+            client.get('/api/production/reports/summary/', live)
+        warm_count = len(warm)
+        self.assertLess(warm_count, cold_count - 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            start_work_session(organization=self.org, user=self.user, line_id=line.id, station_code=first_step.station.code)
+        self.assertEqual(client.get('/api/production/reports/summary/', live).data['open_sessions'], 1)
+        with CaptureQueriesContext(connection) as closed_again:
+            response = client.get('/api/production/reports/summary/', closed)
+        self.assertEqual(response.data['open_sessions'], 0)
+        self.assertEqual(len(closed_again), warm_count)
+
     def test_shift_handover_allows_next_user_to_continue_same_step(self):
         quote = self.make_contract()
         order = create_work_order_from_contract(quote, user=self.user)
@@ -1338,6 +1794,69 @@ class ProductionAutomationTests(TestCase):
         self.assertEqual(res3.status_code, 200)
         self.assertTrue(any(a['id'] == alert.id for a in res3.data))
 
+    def _open_machine_session(self):
+        order = create_work_order_from_contract(self.make_contract(), user=self.user)
+        line = order.lines.get()
+        first_step = line.steps.select_related('station').order_by('order').first()
+        ProductionStationUser.objects.create(organization=self.org, station=first_step.station, user=self.user)
+        session = start_work_session(organization=self.org, user=self.user, line_id=line.id, station_code=first_step.station.code)
+        return line, first_step, session
+
+    def test_replayed_machine_event_returns_stored_event_without_work(self):
+        line, first_step, session = self._open_machine_session()
+        kwargs = {'organization': self.org, 'line_id': line.id, 'station_code': first_step.station.code, 'quantity_delta': Decimal('3')}
+        with CaptureQueriesContext(connection) as delivery:
+            first = record_machine_session_event(idempotency_key='machine-replay', **kwargs)
+        self.assertFalse([q['sql'] for q in delivery.captured_queries if IdempotencyKey._meta.db_table in q['sql']])
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # Tekrar gönderim benzersiz indekste durur; yaptığı değişiklikler geri alınır.
+        second = record_machine_session_event(idempotency_key='machine-replay', **kwargs)
+        self.assertEqual(first.id, second.id)
+        session.refresh_from_db()
+        self.assertEqual(session.machine_quantity, Decimal('3.00'))
+        self.assertEqual(ProductionEvent.objects.filter(idempotency_key='machine-replay').count(), 1)
+
+    def test_replayed_station_event_skips_rules_and_real_failures_surface(self):
+        line, first_step, _ = self._open_machine_session()
+        kwargs = {'organization': self.org, 'user': self.user, 'line_id': line.id, 'station_code': first_step.station.code}
+        completed = record_station_event(event_type='complete', note='Tamamlandi', idempotency_key='station-complete', **kwargs)
+        # Tamamlanan istasyonda yeni işlem kuralı tekrar gönderimi reddetmez; kayıtlı olay döner.
+        replay = record_station_event(event_type='complete', note='Tamamlandi', idempotency_key='station-complete', **kwargs)
+        self.assertEqual(replay.id, completed.id)
+
+        with self.assertRaisesMessage(ProductionError, 'Tamamlanan istasyonda'):
+            record_station_event(event_type='quantity', quantity_delta=Decimal('1'), idempotency_key='station-late', **kwargs)
+        self.assertFalse(ProductionEvent.objects.filter(idempotency_key='station-late').exists())
+
+    def test_tablet_checkpoint_and_logout_replay_with_idempotency_key(self):
+        order = create_work_order_from_contract(self.make_contract(), user=self.user)
+        line = order.lines.get()
+        first_step = line.steps.select_related('station').order_by('order').first()
+        worker = User.objects.create_user(username='tablet-replay', password='x', organization=self.org, role='Worker')
+        ProductionStationUser.objects.create(organization=self.org, station=first_step.station, user=worker)
+        profile = ProductionOperatorProfile.objects.create(organization=self.org, user=worker)
+        profile.set_pin('4444')
+        profile.save()
+        tablet = ProductionStationTablet.objects.create(organization=self.org, station=first_step.station, name='Tablet R', token='tablet-replay')
+        session = tablet_login_slot(token=tablet.token, user_id=worker.id, pin='4444', line_id=line.id, slot_index=0)
+        client = APIClient()
+
+        checkpoint = {'token': tablet.token, 'line_id': line.id, 'checkpoint_total': '2.00'}
+        first = client.post('/api/production/tablet/checkpoint/', checkpoint, format='json', HTTP_IDEMPOTENCY_KEY='cp-1')
+        second = client.post('/api/production/tablet/checkpoint/', checkpoint, format='json', HTTP_IDEMPOTENCY_KEY='cp-1')
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual((second.status_code, second['Idempotent-Replayed'], second.data['id']), (201, 'true', first.data['id']))
+        self.assertEqual(ProductionCountingWindow.objects.filter(tablet=tablet, status='closed').count(), 1)
+
+        logout = {'token': tablet.token, 'session_id': session.id, 'user_id': worker.id, 'pin': '4444', 'declared_good_quantity': '2.00'}
+        first = client.post('/api/production/tablet/logout-slot/', logout, format='json', HTTP_IDEMPOTENCY_KEY='logout-1')
+        second = client.post('/api/production/tablet/logout-slot/', logout, format='json', HTTP_IDEMPOTENCY_KEY='logout-1')
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual((second.status_code, second['Idempotent-Replayed'], second.data['id']), (201, 'true', first.data['id']))
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'closed')
+
     def test_tablet_batch_logout_slots(self):
         quote = self.make_contract()
         order = create_work_order_from_contract(quote, user=self.user)
@@ -1483,3 +2002,61 @@ class ProductionAutomationTests(TestCase):
         self.assertEqual(float(req_data['total_stock']), 40.0)
         self.assertEqual(float(req_data['location_stock']), 40.0)
         self.assertEqual(float(req_data['matching_stock']), 15.0)
+
+        listed = client.get('/api/production/work-orders/').data
+        listed_requirement = next(row for row in listed if row['id'] == order.id)['lines'][0]['material_requirements'][0]
+        self.assertEqual(float(listed_requirement['location_stock']), 40.0)
+        self.assertEqual(float(listed_requirement['matching_stock']), 15.0)
+
+
+class ReportCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self._reset_process()
+        patcher = patch.dict(shared_redis._state, {'client': self.redis, 'down_until': 0.0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._reset_process)
+
+    def _reset_process(self):
+        report_cache.clear_report_cache()
+        report_cache._local_revisions.clear()
+        report_cache._pending_bumps.clear()
+
+    def _section(self, calls):
+        revision, shared = report_cache._revision(7, 'live')
+        return report_cache.cached_section(
+            7, 'totals', lambda: calls.append(1) or {'total': len(calls)},
+            filters={'start': None}, scope='live', revision=revision, shared=shared, ttl=60,
+        )
+
+    def test_processes_share_entries_after_a_local_bump(self):
+        calls = []
+        report_cache.bump_report_revision(7)
+        self.assertEqual(report_cache._revision(7, 'live'), ('1', True))
+        self.assertEqual(self._section(calls), {'total': 1})
+        # Başka bir süreç: yerel sayaç ve önbellek boş.
+        self._reset_process()
+        self.assertEqual(self._section(calls), {'total': 1})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(report_cache._key_locks, {})
+        self.assertFalse([key for key in self.redis.data if key.endswith(':lock')])
+
+    def test_bumps_made_while_redis_is_down_are_replayed(self):
+        shared_redis._state['down_until'] = float('inf')
+        report_cache.bump_report_revision(7, past=True)
+        self.assertEqual(report_cache._revision(7, 'past'), ('1-x', False))
+        shared_redis._state['down_until'] = 0.0
+        self.assertEqual(report_cache._revision(7, 'past'), ('1', True))
+        self.assertEqual(report_cache._revision(7, 'live'), ('1', True))
+
+    def test_shared_lock_is_released_only_by_its_owner(self):
+        key = 'production:report:7:totals:live:0:x'
+
+        def compute():
+            # Kilit süresi doldu ve başka bir süreç aldı.
+            self.redis.data[f'{key}:lock'] = b'other-process'
+            return {'total': 1}
+
+        self.assertEqual(report_cache._shared_get_or_compute(self.redis, key, compute, 60), {'total': 1})
+        self.assertEqual(self.redis.data[f'{key}:lock'], b'other-process')
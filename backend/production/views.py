@@ -1,6 +1,6 @@
 import tempfile
-from datetime import datetime, timedelta
 
+from django.conf import settings
 from django.core.management import call_command
 from django.db import IntegrityError, models
 from django.db.models import ProtectedError, Sum
@@ -15,6 +15,7 @@ from rest_framework.views import APIView
 from accounts.utils import user_has_perm
 from crm.models import Quote
 from erp.models import Product
+from organizations.idempotency import idempotent_response
 from permissions import HasAPIPermission, IsOrgMember
 
 from .models import (
@@ -26,6 +27,7 @@ from .models import (
     ProductionDevicePayloadMap,
     ProductionDocument,
     ProductionEvent,
+    ProductionIngestEvent,
     ProductRecipe,
     ProductRecipeMaterial,
     ProductRecipeOperation,
@@ -37,7 +39,6 @@ from .models import (
     ProductionRouteTemplate,
     ProductionReportTemplate,
     ProductionSettings,
-    ProductionSessionBreak,
     ProductionStationAlert,
     ProductionShiftBreak,
     ProductionShiftCheckpoint,
@@ -62,6 +63,7 @@ from .serializers import (
     ProductionDevicePayloadMapSerializer,
     ProductionDocumentSerializer,
     ProductionEventSerializer,
+    ProductionIngestEventSerializer,
     ProductRecipeSerializer,
     ProductRecipeMaterialSerializer,
     ProductRecipeOperationSerializer,
@@ -85,6 +87,7 @@ from .serializers import (
     ProductionStepTabletAssignmentSerializer,
     ProductionTemplatePresetSerializer,
     ProductionWorkOrderSerializer,
+    ProductionWorkOrderSummarySerializer,
     ProductionWorkSessionSerializer,
     SessionCloseSerializer,
     SessionReviewSerializer,
@@ -100,12 +103,17 @@ from .serializers import (
     TabletShiftCheckpointSerializer,
     TabletSessionStateSerializer,
     TabletCallManagerSerializer,
+    work_order_detail_queryset,
+    work_order_summary_queryset,
 )
+from .ingest import enqueue_machine_event, ingest_metrics, requeue_dead_letters
 from .report_exports import (
     build_work_order_report_export,
     list_production_report_placeholders,
     response_for_export,
 )
+from .report_cache import cached_report_summary
+from .reporting import parse_report_filters, sessions_xlsx_response, stream_sessions_csv
 from .services import (
     ProductionError,
     add_manual_work_order_line,
@@ -114,7 +122,6 @@ from .services import (
     clone_template_preset,
     create_manual_work_order,
     create_work_order_from_contract,
-    dashboard_summary,
     ensure_default_template_presets,
     _previous_step_summary,
     handover_work_session,
@@ -647,7 +654,7 @@ class ProductionTemplatePresetViewSet(viewsets.ReadOnlyModelViewSet):
 
 class ProductionWorkOrderViewSet(OrgScopedMixin, viewsets.ModelViewSet):
     serializer_class = ProductionWorkOrderSerializer
-    queryset = ProductionWorkOrder.objects.select_related('route', 'created_by').prefetch_related('lines__steps__station__department', 'lines__steps__tablet_assignments__tablet')
+    queryset = ProductionWorkOrder.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsOrgMember, HasAPIPermission]
     required_perm = 'production.work_orders.view'
     write_perm = 'production.work_orders.manage'
@@ -666,6 +673,22 @@ class ProductionWorkOrderViewSet(OrgScopedMixin, viewsets.ModelViewSet):
     search_fields = ['number', 'source_number', 'customer_name', 'lines__product_name', 'lines__product_sku']
     ordering_fields = ['created_at', 'due_date', 'status']
 
+    def _summary_view(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self._summary_view():
+            return work_order_summary_queryset(qs)
+        if self.action in {'list', 'retrieve'}:
+            return work_order_detail_queryset(qs)
+        return qs
+
+    def get_serializer_class(self):
+        if self._summary_view():
+            return ProductionWorkOrderSummarySerializer
+        return ProductionWorkOrderSerializer
+
     @action(detail=False, methods=['get'], url_path='export')
     def export_orders(self, request):
         if not user_has_perm(request.user, 'production.work_orders.manage'):
@@ -811,6 +834,39 @@ class ProductionEventViewSet(OrgScopedMixin, viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['created_at']
 
 
+class ProductionIngestEventViewSet(OrgScopedMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = ProductionIngestEventSerializer
+    queryset = ProductionIngestEvent.objects.select_related('device', 'event')
+    permission_classes = [permissions.IsAuthenticated, IsOrgMember, HasAPIPermission]
+    required_perm = 'production.pi_events.view'
+    permission_map = {
+        'requeue': 'production.device_maps.manage',
+        'metrics': 'production.pi_events.view',
+    }
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['station_code', 'idempotency_key', 'last_error']
+    ordering_fields = ['id', 'received_at', 'attempts']
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        status_filter = self.request.query_params.get('status', 'dead')
+        if status_filter != 'all':
+            qs = qs.filter(status=status_filter)
+        return qs.order_by('-id')
+
+    @action(detail=False, methods=['post'])
+    def requeue(self, request):
+        ids = request.data.get('ids') or []
+        qs = ProductionIngestEvent.objects.filter(organization=request.user.organization)
+        if ids:
+            qs = qs.filter(id__in=ids)
+        return Response({'requeued': requeue_dead_letters(qs)})
+
+    @action(detail=False, methods=['get'])
+    def metrics(self, request):
+        return Response(ingest_metrics(request.user.organization))
+
+
 class ProductionCountingWindowViewSet(OrgScopedMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ProductionCountingWindowSerializer
     queryset = ProductionCountingWindow.objects.select_related('work_order', 'line', 'step', 'station', 'tablet').prefetch_related('participants__user')
@@ -1024,10 +1080,25 @@ class ProductionTabletLoginSlotView(APIView):
         return Response(ProductionWorkSessionSerializer(session).data, status=status.HTTP_201_CREATED)
 
 
+def _tablet_organization_id(request):
+    token = request.data.get('token') if hasattr(request.data, 'get') else None
+    if not token:
+        return None
+    return ProductionStationTablet.objects.filter(token=token, is_active=True).values_list('organization_id', flat=True).first()
+
+
 class ProductionTabletLogoutSlotView(APIView):
     permission_classes = []
 
     def post(self, request):
+        return idempotent_response(
+            request,
+            organization_id=lambda: _tablet_organization_id(request),
+            scope='production.tablet.logout_slot',
+            handler=lambda: self._post(request),
+        )
+
+    def _post(self, request):
         serializer = TabletLogoutSlotSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         try:
@@ -1041,6 +1112,14 @@ class ProductionTabletBatchLogoutSlotView(APIView):
     permission_classes = []
 
     def post(self, request):
+        return idempotent_response(
+            request,
+            organization_id=lambda: _tablet_organization_id(request),
+            scope='production.tablet.batch_logout_slot',
+            handler=lambda: self._post(request),
+        )
+
+    def _post(self, request):
         serializer = TabletBatchLogoutSlotSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         try:
@@ -1080,6 +1159,14 @@ class ProductionTabletCheckpointView(APIView):
     permission_classes = []
 
     def post(self, request):
+        return idempotent_response(
+            request,
+            organization_id=lambda: _tablet_organization_id(request),
+            scope='production.tablet.checkpoint',
+            handler=lambda: self._post(request),
+        )
+
+    def _post(self, request):
         serializer = TabletCheckpointSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         try:
@@ -1284,6 +1371,20 @@ class ProductionPiEventView(APIView):
         if not line_id:
             return Response({'detail': 'line_id mapping veya payload icinde zorunludur.', 'mapping_errors': mapping_errors}, status=status.HTTP_400_BAD_REQUEST)
         idempotency_key = merged.get('idempotency_key') or make_pi_idempotency_key(device, raw_payload, normalized_payload)
+        if getattr(settings, 'PRODUCTION_PI_ASYNC_INGEST', False):
+            queued = enqueue_machine_event(
+                device=device,
+                line_id=line_id,
+                station_code=station_code,
+                quantity_delta=merged.get('quantity_delta', 0),
+                counter_value=merged.get('counter_value'),
+                note=merged.get('note', ''),
+                idempotency_key=idempotency_key,
+                raw_payload=raw_payload,
+                normalized_payload=normalized_payload,
+                mapping_errors=mapping_errors,
+            )
+            return Response({'queued': True, 'idempotency_key': idempotency_key, **queued}, status=status.HTTP_202_ACCEPTED)
         try:
             event = record_machine_session_event(
                 organization=device.organization,
@@ -1308,197 +1409,8 @@ class ProductionReportSummaryView(APIView):
     required_perm = 'production.reports.view'
 
     def get(self, request):
-        org = request.user.organization
-        start = request.query_params.get('start')
-        end = request.query_params.get('end')
-        dept_id = request.query_params.get('department')
-        station_id = request.query_params.get('station')
-        user_id = request.query_params.get('worker')
-
-        events = ProductionEvent.objects.filter(organization=org)
-        sessions = ProductionWorkSession.objects.filter(organization=org)
-
-        if start:
-            events = events.filter(created_at__date__gte=start)
-            sessions = sessions.filter(started_at__date__gte=start)
-        if end:
-            events = events.filter(created_at__date__lte=end)
-            sessions = sessions.filter(started_at__date__lte=end)
-        if dept_id and dept_id != 'all':
-            events = events.filter(station__department_id=dept_id)
-            sessions = sessions.filter(station__department_id=dept_id)
-        if station_id and station_id != 'all':
-            events = events.filter(station_id=station_id)
-            sessions = sessions.filter(station_id=station_id)
-        if user_id and user_id != 'all':
-            events = events.filter(user_id=user_id)
-            sessions = sessions.filter(user_id=user_id)
-
-        by_station = list(
-            events.values('station_id', 'station__code', 'station__name', 'station__department__name')
-            .annotate(total=Sum('quantity_delta'))
-            .order_by('station__department__order', 'station__order')
-        )
-        
-        by_worker = list(
-            sessions.values('user_id', 'user__username', 'user__first_name', 'user__last_name')
-            .annotate(
-                total=Sum('declared_good_quantity'),
-                machine_total=Sum('machine_quantity'),
-                discrepancy_total=Sum('discrepancy_quantity'),
-            )
-            .order_by('-total')[:100]
-        )
-
-        by_date = list(
-            events.values('created_at__date')
-            .annotate(total=Sum('quantity_delta'))
-            .order_by('created_at__date')
-        )
-        for item in by_date:
-            if item['created_at__date']:
-                item['date'] = item['created_at__date'].strftime('%Y-%m-%d')
-                del item['created_at__date']
-
-        worker_station = list(
-            sessions.values('user__username', 'user__first_name', 'user__last_name', 'station__code', 'station__name')
-            .annotate(total=Sum('declared_good_quantity'))
-            .order_by('-total')[:200]
-        )
-
-        targets = ProductionStationTarget.objects.filter(organization=org).select_related('station__department')
-        windows = ProductionCountingWindow.objects.filter(organization=org, status='closed').select_related('station__department')
-        if start:
-            targets = targets.filter(target_date__gte=start)
-            windows = windows.filter(closed_at__date__gte=start)
-        if end:
-            targets = targets.filter(target_date__lte=end)
-            windows = windows.filter(closed_at__date__lte=end)
-        if dept_id and dept_id != 'all':
-            targets = targets.filter(station__department_id=dept_id)
-            windows = windows.filter(station__department_id=dept_id)
-        if station_id and station_id != 'all':
-            targets = targets.filter(station_id=station_id)
-            windows = windows.filter(station_id=station_id)
-
-        actual_by_station_date = {
-            (row['station_id'], row['closed_at__date']): row['total'] or 0
-            for row in windows.values('station_id', 'closed_at__date').annotate(total=Sum('official_delta'))
-        }
-        override_by_station_date = {
-            (target.station_id, target.target_date): target
-            for target in targets
-        }
-        if start:
-            start_day = datetime.fromisoformat(start).date()
-        elif actual_by_station_date:
-            start_day = min(day for _, day in actual_by_station_date.keys())
-        else:
-            start_day = timezone.localdate()
-        if end:
-            end_day = datetime.fromisoformat(end).date()
-        elif actual_by_station_date:
-            end_day = max(day for _, day in actual_by_station_date.keys())
-        else:
-            end_day = start_day
-        if end_day < start_day:
-            end_day = start_day
-        date_rows = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
-        target_stations = ProductionStation.objects.filter(organization=org, is_active=True).select_related('department')
-        if dept_id and dept_id != 'all':
-            target_stations = target_stations.filter(department_id=dept_id)
-        if station_id and station_id != 'all':
-            target_stations = target_stations.filter(id=station_id)
-        station_target_performance = []
-        for station in target_stations.order_by('department__order', 'order', 'id'):
-            for target_date in date_rows:
-                override = override_by_station_date.get((station.id, target_date))
-                target_quantity = (override.target_quantity if override else station.default_daily_target) or 0
-                actual = actual_by_station_date.get((station.id, target_date), 0)
-                if not target_quantity and not actual and not override:
-                    continue
-                percent = float((actual / target_quantity) * 100) if target_quantity else 0
-                station_target_performance.append({
-                    'station_id': station.id,
-                    'station_code': station.code,
-                    'station_name': station.name,
-                    'department_name': station.department.name,
-                    'target_date': target_date.isoformat(),
-                    'target_quantity': target_quantity,
-                    'actual_quantity': actual,
-                    'remaining_quantity': max(target_quantity - actual, 0),
-                    'completion_percent': min(999, round(percent, 1)),
-                    'is_override': bool(override),
-                })
-
-        detailed_sessions = []
-        for s in sessions.select_related('user', 'station', 'line__work_order', 'line').order_by('-started_at')[:200]:
-            detailed_sessions.append({
-                'id': s.id,
-                'type': 'work',
-                'started_at': s.started_at.isoformat() if s.started_at else None,
-                'ended_at': s.ended_at.isoformat() if s.ended_at else None,
-                'username': s.user.username,
-                'fullname': s.user.get_full_name(),
-                'station_code': s.station.code,
-                'station_name': s.station.name,
-                'work_order_number': s.work_order.number if s.work_order else '',
-                'product_name': s.line.product_name if s.line else 'Genel Çalışma',
-                'quantity': float(s.declared_good_quantity or 0),
-            })
-
-        breaks = ProductionSessionBreak.objects.filter(organization=org).select_related('user', 'session__station')
-        if start:
-            breaks = breaks.filter(started_at__date__gte=start)
-        if end:
-            breaks = breaks.filter(started_at__date__lte=end)
-        if dept_id and dept_id != 'all':
-            breaks = breaks.filter(session__station__department_id=dept_id)
-        if station_id and station_id != 'all':
-            breaks = breaks.filter(session__station_id=station_id)
-        if user_id and user_id != 'all':
-            breaks = breaks.filter(user_id=user_id)
-
-        for b in breaks.order_by('-started_at')[:200]:
-            detailed_sessions.append({
-                'id': f"break-{b.id}",
-                'type': 'break',
-                'started_at': b.started_at.isoformat() if b.started_at else None,
-                'ended_at': b.ended_at.isoformat() if b.ended_at else None,
-                'username': b.user.username,
-                'fullname': b.user.get_full_name(),
-                'station_code': b.session.station.code if b.session else '',
-                'station_name': b.session.station.name if b.session else '',
-                'work_order_number': 'MOLA',
-                'product_name': b.note or 'Kişisel Mola',
-                'quantity': 0.0,
-            })
-
-        detailed_sessions.sort(key=lambda x: x['started_at'] or '', reverse=True)
-        detailed_sessions = detailed_sessions[:200]
-
-        departments = list(ProductionDepartment.objects.filter(organization=org, is_active=True).values('id', 'name'))
-        stations_list = list(ProductionStation.objects.filter(organization=org, is_active=True).values('id', 'name', 'code', 'department_id'))
-        
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        workers_list = list(User.objects.filter(organization=org, is_active=True).values('id', 'username', 'first_name', 'last_name'))
-
-        data = dashboard_summary(org)
-        data.update({
-            'by_station': by_station,
-            'by_worker': by_worker,
-            'by_date': by_date,
-            'worker_station': worker_station,
-            'station_target_performance': station_target_performance,
-            'detailed_sessions': detailed_sessions,
-            'departments_list': departments,
-            'stations_list': stations_list,
-            'workers_list': workers_list,
-            'open_sessions': sessions.filter(status__in=['started', 'paused']).count(),
-            'discrepancies_pending': sessions.filter(discrepancy_status='needs_review').count(),
-        })
-        return Response(data)
+        filters = parse_report_filters(request.query_params)
+        return Response(cached_report_summary(request.user.organization, filters))
 
 
 class ProductionShiftReportSummaryView(APIView):
@@ -1559,23 +1471,10 @@ class ProductionReportExportView(APIView):
     required_perm = 'production.reports.view'
 
     def get(self, request):
-        org = request.user.organization
-        rows = ProductionWorkSession.objects.filter(organization=org).select_related('work_order', 'line', 'station', 'user').order_by('-started_at')[:2000]
-        lines = ['Baslangic,Bitis,Is Emri,Istasyon,Urun,Saglam Adet,Makine Adedi,Fark,Fark Durumu,Kullanici,Not']
-        for session in rows:
-            lines.append(','.join([
-                session.started_at.strftime('%d.%m.%Y %H:%M'),
-                session.ended_at.strftime('%d.%m.%Y %H:%M') if session.ended_at else '',
-                session.work_order.number if session.work_order else '',
-                session.station.code,
-                session.line.product_name.replace(',', ' ') if session.line else 'Genel Çalışma',
-                str(session.declared_good_quantity),
-                str(session.machine_quantity),
-                str(session.discrepancy_quantity),
-                session.discrepancy_status,
-                session.user.username,
-                (session.note or '').replace(',', ' '),
-            ]))
-        response = HttpResponse('\n'.join(lines), content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="imalat_raporu.csv"'
-        return response
+        fmt = (request.query_params.get('file_format') or 'csv').lower()
+        if fmt not in ('csv', 'xlsx'):
+            return Response({'detail': 'file_format=csv veya xlsx olmalı'}, status=status.HTTP_400_BAD_REQUEST)
+        filters = parse_report_filters(request.query_params)
+        if fmt == 'xlsx':
+            return sessions_xlsx_response(request.user.organization, filters)
+        return stream_sessions_csv(request.user.organization, filters)
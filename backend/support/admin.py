@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import Task, TaskAttachment, TaskChecklist, TaskComment, TaskTimeEntry, Ticket, TicketMessage
+from .models_automation import NotificationOutbox
+from .notifications import requeue_dead_notifications
 
 
 @admin.register(Task)
@@ -70,3 +72,16 @@ class TicketMessageAdmin(admin.ModelAdmin):
     list_filter = ('internal',)
     search_fields = ('ticket__subject', 'author__username', 'message')
 
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'organization', 'channel', 'recipient', 'rule', 'task', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'channel', 'organization')
+    search_fields = ('recipient', 'subject', 'last_error')
+    readonly_fields = ('dedup_key', 'created_at', 'claimed_at', 'sent_at')
+    actions = ['requeue_selected']
+
+    @admin.action(description='Secili gonderilemeyen bildirimleri yeniden kuyruga al')
+    def requeue_selected(self, request, queryset):
+        count = requeue_dead_notifications(queryset)
+        self.message_user(request, f'{count} bildirim yeniden kuyruga alindi.')
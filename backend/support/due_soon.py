@@ -0,0 +1,130 @@
+"""``task_due_soon`` kurallarının toplu çalıştırıcısı.
+
+Bir organizasyonun aktif kuralları tek sorguda değerlendirilir: aday görevler
+vade penceresinden seçilir, aynı kural/görev/vade için ``AutomationFireLog``
+kaydı olanlar elenir. Yorumlar ve log satırları toplu yazılır, bildirimler
+``support.notifications`` outbox'ına bırakılır; böylece bir görev her vade için
+kural başına bir kez işlenir.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core.events import push_event
+
+from .models import Task, TaskComment
+from .models_automation import AutomationFireLog, AutomationRule
+from .notifications import enqueue_notifications, notification
+
+HANDLED_ACTIONS = ('add_comment', 'notify')
+OPEN_STATUSES = ('todo', 'in-progress')
+DEFAULT_HOURS = 24
+FIRE_LOG_RETENTION_DAYS = 7
+
+
+def _payload(rule):
+    return rule.action_payload if isinstance(rule.action_payload, dict) else {}
+
+
+def _window(rule):
+    cond = rule.condition if isinstance(rule.condition, dict) else {}
+    try:
+        hours = float(cond.get('hours', DEFAULT_HOURS))
+    except (TypeError, ValueError):
+        hours = DEFAULT_HOURS
+    return timedelta(hours=max(0.0, hours))
+
+
+def _fired_name(rule):
+    return f'fired_{rule.id}'
+
+
+def due_soon_candidates(organization_id, rules, now, limit):
+    """Henüz çalışmamış kural/görev eşleşmeleri: ``{rule_id: [task, ...]}`` ve taranan görev sayısı."""
+    annotations = {}
+    pending = Q()
+    for rule in rules:
+        fired = AutomationFireLog.objects.filter(rule_id=rule.id, task=OuterRef('pk'), due_at=OuterRef('due'))
+        annotations[_fired_name(rule)] = Exists(fired)
+        pending |= Q(due__lte=now + _window(rule), **{_fired_name(rule): False})
+    horizon = max(_window(rule) for rule in rules)
+    tasks = list(
+        Task.objects.filter(organization_id=organization_id, status__in=OPEN_STATUSES, due__gte=now, due__lte=now + horizon)
+        .annotate(**annotations)
+        .filter(pending)
+        .select_related('assignee')
+        .only('id', 'title', 'due', 'organization_id', 'assignee__email')
+        .order_by('due', 'id')[:limit]
+    )
+    matches = {rule.id: [] for rule in rules}
+    for task in tasks:
+        for rule in rules:
+            if not getattr(task, _fired_name(rule)) and task.due <= now + _window(rule):
+                matches[rule.id].append(task)
+    return matches, len(tasks)
+
+
+def _fire_organization(organization_id, now, batch_size, stats):
+    events = []
+    with transaction.atomic():
+        # Eşzamanlı bir çalıştırıcı aynı organizasyonun kurallarını atlar.
+        rules = list(
+            AutomationRule.objects.select_for_update(skip_locked=True)
+            .filter(organization_id=organization_id, trigger='task_due_soon', is_active=True, action__in=HANDLED_ACTIONS)
+            .order_by('id')
+        )
+        if not rules:
+            return
+        matches, scanned = due_soon_candidates(organization_id, rules, now, batch_size)
+        stats['more'] = stats['more'] or scanned >= batch_size
+        logs, comments, notifications = [], [], []
+        for rule in rules:
+            payload = _payload(rule)
+            for task in matches[rule.id]:
+                logs.append(AutomationFireLog(rule=rule, task=task, due_at=task.due, fired_at=now))
+                if rule.action == 'add_comment':
+                    comments.append(TaskComment(task=task, author=None, type='activity', text=payload.get('comment') or 'Otomasyon: due yaklaşıyor'))
+                    continue
+                msg = payload.get('message') or f"Task {task.title}: vade yaklaşıyor"
+                email_to = payload.get('email') or (task.assignee.email if task.assignee else None)
+                dedup = f"rule:{rule.id}:task:{task.id}:due:{task.due.isoformat()}"
+                comments.append(TaskComment(task=task, author=None, type='activity', text='(Notify) Due yaklaşıyor'))
+                notifications.append(notification(task, rule, 'slack', payload.get('webhook') or settings.SLACK_WEBHOOK_URL, msg, dedup=dedup))
+                notifications.append(notification(task, rule, 'email', email_to or '', msg, subject=f"Görev bildirimi: {task.title}", dedup=dedup))
+                events.append(
+                    {
+                        "type": "notification.sla_due_soon",
+                        "task_id": task.id,
+                        "task_title": task.title,
+                        "due": task.due.isoformat(),
+                        "organization": task.organization_id,
+                        "rule_id": rule.id,
+                    }
+                )
+        AutomationFireLog.objects.bulk_create(logs, ignore_conflicts=True)
+        TaskComment.objects.bulk_create(comments)
+        stats['notifications'] += enqueue_notifications(notifications)
+    stats['fired'] += len(logs)
+    stats['comments'] += len(comments)
+    for event in events:
+        push_event(event)
+
+
+def run_due_soon_rules(now=None, batch_size=500):
+    """Tüm organizasyonlar için bir tur; ``more`` bir organizasyonda partinin dolduğunu gösterir."""
+    now = now or timezone.now()
+    AutomationFireLog.objects.filter(due_at__lt=now - timedelta(days=FIRE_LOG_RETENTION_DAYS)).delete()
+    stats = {'fired': 0, 'comments': 0, 'notifications': 0, 'more': False}
+    organization_ids = (
+        AutomationRule.objects.filter(trigger='task_due_soon', is_active=True, action__in=HANDLED_ACTIONS)
+        .order_by('organization_id')
+        .values_list('organization_id', flat=True)
+        .distinct()
+    )
+    for organization_id in list(organization_ids):
+        _fire_organization(organization_id, now, batch_size, stats)
+    return stats
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from organizations.models import Organization
+from support.workflow_backfill import DEFAULT_BATCH_SIZE, backfill_line_workflows
+
+
+class Command(BaseCommand):
+    help = "Eski gorevleri kalem bazli is akisi formatina partiler halinde donusturur; yarida kalirsa kaldigi yerden devam eder."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organization", "-o", default="", help="Sadece bu Organization.code")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Parti basina gorev sayisi.")
+        parser.add_argument("--max-batches", type=int, default=None, help="Bu kadar partiden sonra dur.")
+
+    def handle(self, *args, **options):
+        organization_id = None
+        if options["organization"]:
+            org = Organization.objects.filter(code=options["organization"]).first()
+            if not org:
+                raise CommandError("Organizasyon bulunamadi.")
+            organization_id = org.id
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size en az 1 olmali.")
+
+        def progress(last_id, processed, changed):
+            self.stdout.write(f"id <= {last_id}: {processed} gorev islendi, {changed} donusturuldu.")
+
+        processed, changed, done = backfill_line_workflows(
+            batch_size=options["batch_size"],
+            organization_id=organization_id,
+            max_batches=options["max_batches"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        summary = f"{processed} gorev islendi, {changed} donusturuldu."
+        if not done:
+            summary += " Bekleyen gorevler var; komutu tekrar calistirin."
+        self.stdout.write(self.style.SUCCESS(summary))
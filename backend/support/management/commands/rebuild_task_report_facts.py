@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from organizations.models import Organization
+from support.models import Task, TaskReportSnapshot
+from support.report_facts import FACT_BATCH_SIZE, refresh_report_facts_in_batches, stale_report_fact_tasks
+
+
+class Command(BaseCommand):
+    help = "Gorev raporu olgularini yeniden hesaplar ve kapanmis donem raporlarini temizler."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organization", "-o", default="", help="Sadece bu Organization.code")
+        parser.add_argument("--batch-size", type=int, default=FACT_BATCH_SIZE, help="Parti basina gorev sayisi.")
+        parser.add_argument("--stale-only", action="store_true", help="Sadece eksik veya bayat olgulari hesapla.")
+
+    def handle(self, *args, **options):
+        organization_id = None
+        if options["organization"]:
+            org = Organization.objects.filter(code=options["organization"]).first()
+            if not org:
+                raise CommandError("Organizasyon bulunamadi.")
+            organization_id = org.id
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size en az 1 olmali.")
+
+        if options["stale_only"]:
+            tasks = stale_report_fact_tasks(organization_id)
+        else:
+            tasks = Task.objects.filter(organization_id=organization_id) if organization_id else Task.objects.all()
+            snapshots = TaskReportSnapshot.objects.filter(organization_id=organization_id) if organization_id else TaskReportSnapshot.objects.all()
+            snapshots.delete()
+        count = refresh_report_facts_in_batches(tasks, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{count} gorev olgusu hesaplandi."))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0031_alter_automationrule_action_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='workflow_schema_version',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Kalem bazlı iş akışı normalizasyon sürümü (workflow_utils.LINE_WORKFLOW_SCHEMA_VERSION)'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _stage_assignee_id(value):
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return 0
+
+
+def queue_entry_rows(task):
+    # support.workflow_utils.queue_entry_rows'un bu göç anındaki kopyası.
+    rows = []
+    for index, raw in enumerate(task.product_lines or []):
+        ln = raw if isinstance(raw, dict) else {}
+        ids = [int(x) for x in (ln.get('workflow_team_ids') or []) if str(x).isdigit()]
+        state = ln.get('workflow_stage_state') or {}
+        current = ln.get('current_team_id')
+        for tid in dict.fromkeys(ids):
+            st = state.get(str(tid)) or {}
+            rows.append((index, tid, str(current) == str(tid), _stage_assignee_id(st.get('assignee_id')), bool(st.get('stage_done'))))
+    state = task.workflow_stage_state or {}
+    root_ids = [int(x) for x in (task.workflow_team_ids or []) if x is not None and str(x).isdigit()]
+    for tid in dict.fromkeys(root_ids):
+        st = state.get(str(tid)) or {}
+        rows.append((None, tid, tid == task.current_team_id, _stage_assignee_id(st.get('assignee_id')), bool(st.get('stage_done'))))
+    return rows
+
+
+def populate_queue_entries(apps, schema_editor):
+    Task = apps.get_model('support', 'Task')
+    TaskQueueEntry = apps.get_model('support', 'TaskQueueEntry')
+    batch = []
+    tasks = Task.objects.only('id', 'product_lines', 'workflow_team_ids', 'workflow_stage_state', 'current_team_id')
+    for task in tasks.iterator(chunk_size=500):
+        for line_index, team_id, is_current, assignee_id, stage_done in queue_entry_rows(task):
+            batch.append(
+                TaskQueueEntry(
+                    task_id=task.id,
+                    line_index=line_index,
+                    team_id=team_id,
+                    is_current=is_current,
+                    assignee_id=assignee_id,
+                    stage_done=stage_done,
+                )
+            )
+        if len(batch) >= 2000:
+            TaskQueueEntry.objects.bulk_create(batch)
+            batch = []
+    TaskQueueEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_production_report_template_permissions'),
+        ('support', '0032_task_workflow_schema_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskQueueEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_index', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('is_current', models.BooleanField(default=False)),
+                ('stage_done', models.BooleanField(default=False)),
+                ('assignee', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_entries', to='support.task')),
+                ('team', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.team')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('stage_done', False)), fields=['team', 'task'], name='support_queue_open_team_idx')],
+            },
+        ),
+        migrations.RunPython(populate_queue_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_user_last_self_handover'),
+        ('organizations', '0006_idempotency_key'),
+        ('support', '0033_task_queue_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskReportFact',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report_fact', serialize=False, to='support.task')),
+                ('status', models.CharField(max_length=20)),
+                ('created_month', models.DateField()),
+                ('completed_month', models.DateField(blank=True, null=True)),
+                ('updated_month', models.DateField()),
+                ('task_updated_at', models.DateTimeField(blank=True, help_text='Hesaplandığı andaki Task.updated_at; boşsa yeniden hesaplanır', null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('computed_at', models.DateTimeField()),
+                ('assignee', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('current_team', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.team')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.organization')),
+                ('team', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='accounts.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'created_month'], name='support_fact_created_idx'), models.Index(fields=['organization', 'completed_month'], name='support_fact_completed_idx'), models.Index(fields=['organization', 'updated_month'], name='support_fact_updated_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(help_text='YYYY veya YYYY-MM', max_length=7)),
+                ('filters_key', models.CharField(max_length=64)),
+                ('signature', models.CharField(max_length=64)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.organization')),
+            ],
+            options={
+                'unique_together': {('organization', 'period', 'filters_key')},
+            },
+        ),
+    ]
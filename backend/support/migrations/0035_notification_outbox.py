@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0006_idempotency_key'),
+        ('support', '0034_task_report_facts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('email', 'E-posta'), ('slack', 'Slack')], max_length=10)),
+                ('recipient', models.CharField(help_text='E-posta adresi veya Slack webhook URL', max_length=500)),
+                ('subject', models.CharField(blank=True, default='', max_length=255)),
+                ('body', models.TextField(blank=True, default='')),
+                ('dedup_key', models.CharField(blank=True, default='', help_text='Doluysa aynı bildirim ikinci kez kuyruğa alınmaz', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Bekliyor'), ('processing', 'Gonderiliyor'), ('sent', 'Gonderildi'), ('dead', 'Gonderilemedi')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_outbox', to='organizations.organization')),
+                ('rule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='support.automationrule')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='support.task')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='support_notify_due_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('dedup_key', ''), _negated=True), fields=('dedup_key',), name='support_notify_dedup_uniq')],
+            },
+        ),
+    ]
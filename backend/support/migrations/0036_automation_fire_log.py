@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-19 17:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_user_last_self_handover'),
+        ('erp', '0016_rename_erp_product_organiz_80f20e_idx_erp_product_organiz_921d8a_idx_and_more'),
+        ('organizations', '0006_idempotency_key'),
+        ('support', '0035_notification_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutomationFireLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField()),
+                ('fired_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('due__isnull', False), ('status__in', ['todo', 'in-progress'])), fields=['organization', 'due'], name='support_task_open_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='automationfirelog',
+            name='rule',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fire_logs', to='support.automationrule'),
+        ),
+        migrations.AddField(
+            model_name='automationfirelog',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='support.task'),
+        ),
+        migrations.AddIndex(
+            model_name='automationfirelog',
+            index=models.Index(fields=['due_at'], name='support_autofire_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='automationfirelog',
+            constraint=models.UniqueConstraint(fields=('rule', 'task', 'due_at'), name='support_autofire_uniq'),
+        ),
+    ]
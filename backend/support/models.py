@@ -90,9 +90,22 @@ class Task(models.Model):
         default=0,
         help_text='Şu an iş akışına yansıtılan ürün satırı (0 tabanlı)',
     )
+    workflow_schema_version = models.PositiveSmallIntegerField(
+        default=0,
+        help_text='Kalem bazlı iş akışı normalizasyon sürümü (workflow_utils.LINE_WORKFLOW_SCHEMA_VERSION)',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['organization', 'due'],
+                condition=models.Q(status__in=['todo', 'in-progress'], due__isnull=False),
+                name='support_task_open_due_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -114,6 +127,96 @@ class TaskWorkflowTemplate(models.Model):
         return self.name
 
 
+class TaskQueueEntry(models.Model):
+    """Ekip kuyruğu için kalem ve kök iş akışı aşamalarının satır bazlı izdüşümü.
+
+    ``product_lines`` içindeki her kalem (``line_index``) ve kök ``workflow_team_ids``
+    (``line_index`` boş) için akıştaki her ekip bir satırdır. Görev kaydedilince
+    ``support.signals`` tarafından yeniden yazılır; elle düzenlenmez.
+    """
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='queue_entries')
+    line_index = models.PositiveSmallIntegerField(null=True, blank=True)
+    # JSON'daki id'ler silinmiş ekip/kullanıcıyı gösterebilir; izdüşüm aynen taşır.
+    team = models.ForeignKey('accounts.Team', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    is_current = models.BooleanField(default=False)
+    assignee = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    stage_done = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['team', 'task'],
+                condition=models.Q(stage_done=False),
+                name='support_queue_open_team_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} #{self.line_index} -> {self.team_id}"
+
+
+class TaskReportFact(models.Model):
+    """Görev raporunun görev başına önceden hesaplanmış satırları (``support.report_facts``).
+
+    Ay kolonları (yerel saatle ayın ilk günü) raporun dönem seçimini, ekip/atanan/durum
+    kolonları filtreleri indeksli yapar; ``payload`` görev, kalem, fire, aşama ve üretim
+    girişi satırlarını tutar. Görev kaydedilince yeniden yazılır; üretim girişi veya ekip
+    değişikliklerinde ``task_updated_at`` boşaltılır ve rapor okunurken yenilenir.
+    """
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, primary_key=True, related_name='report_fact')
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='+')
+    team = models.ForeignKey('accounts.Team', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    current_team = models.ForeignKey(
+        'accounts.Team',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    assignee = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20)
+    created_month = models.DateField()
+    completed_month = models.DateField(null=True, blank=True)
+    updated_month = models.DateField()
+    task_updated_at = models.DateTimeField(null=True, blank=True, help_text='Hesaplandığı andaki Task.updated_at; boşsa yeniden hesaplanır')
+    payload = models.JSONField(default=dict, blank=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'created_month'], name='support_fact_created_idx'),
+            models.Index(fields=['organization', 'completed_month'], name='support_fact_completed_idx'),
+            models.Index(fields=['organization', 'updated_month'], name='support_fact_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} @ {self.updated_month:%Y-%m}"
+
+
+class TaskReportSnapshot(models.Model):
+    """Kapanmış dönemlerin görev raporu; ``signature`` dönemin olgularıyla eşleştikçe tekrar kullanılır."""
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='+')
+    period = models.CharField(max_length=7, help_text='YYYY veya YYYY-MM')
+    filters_key = models.CharField(max_length=64)
+    signature = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [['organization', 'period', 'filters_key']]
+
+    def __str__(self):
+        return f"{self.organization_id} {self.period} {self.filters_key}"
+
+
 def task_model_image_path(instance, filename):
     return f"task_models/{instance.organization_id}/{instance.code}/{filename}"
 
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from organizations.models import Organization
 
 
@@ -32,3 +33,66 @@ class AutomationRule(models.Model):
         return self.name
 
 
+
+
+
+class AutomationFireLog(models.Model):
+    """Vade kuralının bir görev için hangi vadeye göre çalıştığını kaydeder.
+
+    Vade değişirse (``due_at`` farklı) kural aynı görev için yeniden çalışır.
+    """
+    rule = models.ForeignKey(AutomationRule, on_delete=models.CASCADE, related_name='fire_logs')
+    task = models.ForeignKey('support.Task', on_delete=models.CASCADE, related_name='+')
+    due_at = models.DateTimeField()
+    fired_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'task', 'due_at'], name='support_autofire_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['due_at'], name='support_autofire_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.rule_id} -> {self.task_id} @ {self.due_at}'
+
+class NotificationOutbox(models.Model):
+    """Otomasyonların e-posta / Slack bildirimleri; ``support.notifications`` teslim eder."""
+    CHANNELS = [
+        ('email', 'E-posta'),
+        ('slack', 'Slack'),
+    ]
+    STATUSES = [
+        ('pending', 'Bekliyor'),
+        ('processing', 'Gonderiliyor'),
+        ('sent', 'Gonderildi'),
+        ('dead', 'Gonderilemedi'),
+    ]
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='notification_outbox')
+    rule = models.ForeignKey(AutomationRule, on_delete=models.SET_NULL, null=True, blank=True, related_name='notifications')
+    task = models.ForeignKey('support.Task', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    channel = models.CharField(max_length=10, choices=CHANNELS)
+    recipient = models.CharField(max_length=500, help_text='E-posta adresi veya Slack webhook URL')
+    subject = models.CharField(max_length=255, blank=True, default='')
+    body = models.TextField(blank=True, default='')
+    dedup_key = models.CharField(max_length=64, blank=True, default='', help_text='Doluysa aynı bildirim ikinci kez kuyruğa alınmaz')
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='support_notify_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedup_key'], condition=~models.Q(dedup_key=''), name='support_notify_dedup_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.channel} -> {self.recipient} ({self.status})'
@@ -0,0 +1,234 @@
+"""Otomasyon bildirimleri için outbox.
+
+Otomasyonlar e-posta / Slack mesajını doğrudan göndermez; ``enqueue_notifications``
+satırları tetikleyen işlemle aynı transaction içinde ``NotificationOutbox``
+tablosuna yazar ve commit sonrası ``deliver_notifications`` Celery işini tetikler.
+Teslimat bir partideki tüm e-postaları tek SMTP bağlantısı üzerinden, Slack
+mesajlarını havuzlu bir HTTP oturumuyla gönderir. Geçici hatalar artan
+bekleme ile yeniden denenir, kalıcı hatalar ve deneme sınırını aşanlar ``dead``
+olarak kalır. ``dedup_key`` aynı kural/görev/olay için ikinci satırın
+yazılmasını engeller.
+"""
+
+import hashlib
+import logging
+import smtplib
+import threading
+from datetime import timedelta
+from email.mime.text import MIMEText
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models_automation import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+STALE_CLAIM_SECONDS = 300
+MAX_BACKOFF_SECONDS = 300
+SENT_RETENTION_DAYS = 7
+SMTP_TIMEOUT_SECONDS = 10
+SLACK_TIMEOUT_SECONDS = 5
+HTTP_POOL_SIZE = 10
+ERROR_MAX_LENGTH = 2000
+
+PERMANENT_SMTP_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+_http = {'session': None}
+_http_guard = threading.Lock()
+
+
+def _max_attempts():
+    return max(1, int(getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5) or 1))
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(MAX_BACKOFF_SECONDS, 2 ** max(0, attempts)))
+
+
+def dedup_key(base, channel, recipient):
+    raw = f'{base}|{channel}|{recipient.strip().lower()}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def notification(task, rule, channel, recipient, body, *, subject='', dedup=''):
+    """Kuyruğa yazılacak satırı hazırlar; ``dedup`` kural/görev/olay kimliğidir."""
+    return NotificationOutbox(
+        organization_id=task.organization_id,
+        rule=rule,
+        task=task,
+        channel=channel,
+        recipient=recipient,
+        subject=subject[:255],
+        body=body,
+        dedup_key=dedup_key(dedup, channel, recipient) if dedup else '',
+    )
+
+
+def _kick_delivery():
+    try:
+        from .tasks import deliver_notifications
+
+        deliver_notifications.delay()
+    except Exception:
+        logger.warning('Notification delivery could not be scheduled.', exc_info=True)
+
+
+def enqueue_notifications(rows):
+    """Satırları yazar; aynı ``dedup_key`` ile gelen tekrarlar sessizce atlanır."""
+    rows = [row for row in rows if row.recipient]
+    if not rows:
+        return 0
+    NotificationOutbox.objects.bulk_create(rows, ignore_conflicts=True)
+    transaction.on_commit(_kick_delivery)
+    return len(rows)
+
+
+def _http_session():
+    with _http_guard:
+        if _http['session'] is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http['session'] = session
+        return _http['session']
+
+
+def _email_message(row, sender):
+    msg = MIMEText(row.body)
+    msg['Subject'] = row.subject
+    msg['From'] = sender
+    msg['To'] = row.recipient
+    return msg
+
+
+def _open_smtp(host):
+    server = smtplib.SMTP(host, int(getattr(settings, 'SMTP_PORT', 587)), timeout=SMTP_TIMEOUT_SECONDS)
+    if getattr(settings, 'SMTP_USE_TLS', True):
+        server.starttls()
+    user = getattr(settings, 'SMTP_USER', None)
+    password = getattr(settings, 'SMTP_PASSWORD', None)
+    if user and password:
+        server.login(user, password)
+    return server
+
+
+def _close_smtp(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def _send_emails(rows, outcome):
+    host = getattr(settings, 'SMTP_HOST', None)
+    if not host:
+        for row in rows:
+            print(f"[EMAIL STUB] To: {row.recipient} | Subject: {row.subject} | Body: {row.body}")
+            outcome(row, None)
+        return
+    sender = getattr(settings, 'SMTP_USER', None) or 'no-reply@udarcrm.local'
+    server = None
+    try:
+        for row in rows:
+            try:
+                if server is None:
+                    server = _open_smtp(host)
+                server.send_message(_email_message(row, sender))
+            except PERMANENT_SMTP_ERRORS as exc:
+                outcome(row, exc, permanent=True)
+            except (smtplib.SMTPException, OSError) as exc:
+                outcome(row, exc)
+                # Bağlantı bozulmuş olabilir; sıradaki mesaj yeni bağlantıyla denenir.
+                if server is not None:
+                    _close_smtp(server)
+                    server = None
+            else:
+                outcome(row, None)
+    finally:
+        if server is not None:
+            _close_smtp(server)
+
+
+def _send_slack(rows, outcome):
+    session = _http_session()
+    for row in rows:
+        try:
+            response = session.post(row.recipient, json={'text': row.body}, timeout=SLACK_TIMEOUT_SECONDS)
+        except requests.RequestException as exc:
+            outcome(row, exc)
+            continue
+        status = response.status_code
+        if status < 400:
+            outcome(row, None)
+        else:
+            error = f'HTTP {status}: {(response.text or "")[:200]}'
+            outcome(row, error, permanent=status != 429 and status < 500)
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', available_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if rows:
+            NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(status='processing', claimed_at=now)
+    for row in rows:
+        row.status = 'processing'
+    return rows
+
+
+def deliver_notifications(batch_size=100):
+    """Bekleyen bildirimlerden bir parti gönderir; ``claimed`` partinin dolu olup olmadığını gösterir."""
+    now = timezone.now()
+    NotificationOutbox.objects.filter(status='processing', claimed_at__lt=now - timedelta(seconds=STALE_CLAIM_SECONDS)).update(status='pending')
+    NotificationOutbox.objects.filter(status='sent', sent_at__lt=now - timedelta(days=SENT_RETENTION_DAYS)).delete()
+    stats = {'claimed': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+    rows = _claim(batch_size)
+    if not rows:
+        return stats
+    stats['claimed'] = len(rows)
+    max_attempts = _max_attempts()
+
+    def outcome(row, error, permanent=False):
+        row.attempts += 1
+        if error is None:
+            row.status = 'sent'
+            row.sent_at = timezone.now()
+            row.last_error = ''
+            stats['sent'] += 1
+            return
+        row.last_error = str(error)[:ERROR_MAX_LENGTH]
+        if permanent or row.attempts >= max_attempts:
+            row.status = 'dead'
+            stats['dead'] += 1
+        else:
+            row.status = 'pending'
+            row.available_at = timezone.now() + _backoff(row.attempts)
+            stats['retried'] += 1
+
+    try:
+        _send_emails([row for row in rows if row.channel == 'email'], outcome)
+        _send_slack([row for row in rows if row.channel == 'slack'], outcome)
+    finally:
+        # Gönderimi yarıda kalan satırlar ``processing`` kalır ve bayat sahiplik olarak geri alınır.
+        done = [row for row in rows if row.status != 'processing']
+        NotificationOutbox.objects.bulk_update(done, ['status', 'attempts', 'last_error', 'available_at', 'sent_at'])
+    return stats
+
+
+def requeue_dead_notifications(queryset):
+    return queryset.filter(status='dead').update(
+        status='pending',
+        attempts=0,
+        last_error='',
+        available_at=timezone.now(),
+        claimed_at=None,
+    )
@@ -0,0 +1,462 @@
+"""Görev raporu olguları: ``build_full_report`` için görev başına önceden hesaplanan satırlar.
+
+``refresh_task_report_facts`` bir görevin rapora tüm katkısını (görev satırı, kalem /
+renk / ölçü kırılımı, fire, aşama süreleri, üretim girişleri) ``TaskReportFact``
+satırına yazar. Olgular istekte yenilenmez: kayıt sinyalleri dokunulan görevleri
+``queue_report_fact_refresh`` ile commit sonrası Celery'ye verir. ``updated_at``'e dokunmayan
+kısmi kayıtlar, üretim girişleri ve ekip / kullanıcı adı değişiklikleri olguyu ayrıca bayat
+işaretler; kuyruğa alınamayan yenilemeleri periyodik görev ve ``rebuild_task_report_facts``
+komutu ``stale_report_fact_tasks`` üzerinden tamamlar. Rapor okuması yalnızca olguları okur.
+
+Rapor dönemin olgularını tek sorguyla okuyup birleştirir. Kapanmış dönemlerin birleşik
+sonucu ``TaskReportSnapshot`` tablosunda olguların imzasıyla saklanır; dönemdeki bir
+görev değişmedikçe yeniden hesaplanmaz, yalnızca içinde bulunulan ay canlı hesaplanır.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from accounts.models import Team, User
+from .models import Task, TaskProductionEntry, TaskReportFact, TaskReportSnapshot
+
+logger = logging.getLogger(__name__)
+
+FACT_BATCH_SIZE = 200
+# Olgu satırına giren görev alanları; bunlara dokunan kısmi kayıtlar olguyu bayatlatır.
+REPORT_SOURCE_FIELDS = frozenset({
+    'organization', 'team', 'current_team', 'owner', 'assignee', 'title', 'status', 'priority',
+    'mode', 'model_code', 'variant', 'quantity', 'start', 'end', 'due', 'created_at',
+    'planned_hours', 'total_planned_minutes', 'tags', 'handover_history', 'product_lines',
+    'workflow_team_ids', 'workflow_stage_state',
+})
+FACT_UPDATE_FIELDS = [
+    'organization',
+    'team',
+    'current_team',
+    'assignee',
+    'status',
+    'created_month',
+    'completed_month',
+    'updated_month',
+    'task_updated_at',
+    'payload',
+    'computed_at',
+]
+
+
+def _month(value):
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def _non_negative(value) -> int:
+    try:
+        return max(0, int(value or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _workflow_ids(task) -> list[int]:
+    return [int(x) for x in (task.workflow_team_ids or []) if str(x).isdigit()]
+
+
+def _task_row(t, team_name, usernames) -> dict[str, Any]:
+    comp = t.end or (t.updated_at if t.status == 'done' else None)
+    team_id = t.current_team_id or t.team_id
+    return {
+        'id': t.id,
+        'title': t.title,
+        'status': t.status,
+        'priority': t.priority,
+        'mode': t.mode,
+        'model_code': t.model_code or '',
+        'variant': t.variant or '',
+        'quantity': t.quantity,
+        'team_name': team_name(team_id) or '',
+        'team_id': team_id,
+        'assignee_username': usernames.get(t.assignee_id, ''),
+        'assignee_id': t.assignee_id,
+        'owner_username': usernames.get(t.owner_id, ''),
+        'start': t.start.isoformat() if t.start else '',
+        'end': t.end.isoformat() if t.end else '',
+        'due': t.due.isoformat() if t.due else '',
+        'created_at': t.created_at.isoformat() if t.created_at else '',
+        'updated_at': t.updated_at.isoformat() if t.updated_at else '',
+        'completed_at': comp.isoformat() if comp else '',
+        'planned_hours': float(t.planned_hours or 0),
+        'total_planned_minutes': float(t.total_planned_minutes or 0),
+        'tags': t.tags or [],
+    }
+
+
+def _stage_rows(t) -> list[dict[str, Any]]:
+    rows = []
+    prev_at = t.start or t.created_at
+    for h in list(t.handover_history or []):
+        at_raw = h.get('at')
+        try:
+            at_dt = datetime.fromisoformat(str(at_raw).replace('Z', '+00:00')) if at_raw else None
+        except Exception:
+            at_dt = None
+        if at_dt is None:
+            continue
+        if timezone.is_naive(at_dt):
+            at_dt = timezone.make_aware(at_dt)
+        dur_h = round(max(0, (at_dt - prev_at).total_seconds()) / 3600, 2) if prev_at else 0
+        rows.append(
+            {
+                'task_id': t.id,
+                'title': t.title,
+                'from_team': h.get('from_team_name') or '—',
+                'to_team': h.get('to_team_name') or '—',
+                'at': at_dt.isoformat(),
+                'duration_hours': dur_h,
+                'type': h.get('type') or '',
+                'note': h.get('note') or '',
+            }
+        )
+        prev_at = at_dt
+    return rows
+
+
+def task_report_payload(t, entries, teams, usernames) -> dict[str, Any]:
+    """Bir görevin rapor satırları; ``teams`` id -> (organization_id, ad), ``usernames`` id -> kullanıcı adı."""
+
+    def team_name(team_id):
+        return teams[team_id][1] if team_id in teams else None
+
+    lines = list(getattr(t, 'product_lines', None) or [])
+    target_total = sum(_non_negative((ln or {}).get('quantity')) for ln in lines)
+    if target_total <= 0:
+        target_total = max(1, int(t.quantity or 1))
+    wf_ids = _workflow_ids(t)
+    stage_state = dict(t.workflow_stage_state or {})
+    stage_qty_rows = []
+    if wf_ids:
+        done_vals = [_non_negative(dict(stage_state.get(str(tid), {}) or {}).get('qty_done')) for tid in wf_ids]
+        realized = min(done_vals) if done_vals else 0
+        # Workflow aşama hedef/gerçekleşen (qty_target/qty_done) detayı
+        for tid in wf_ids:
+            st = dict(stage_state.get(str(tid), {}) or {})
+            team = teams.get(tid)
+            stage_qty_rows.append(
+                {
+                    'task_id': t.id,
+                    'task_title': t.title,
+                    'team_name': team[1] if team and team[0] == t.organization_id else str(tid),
+                    'qty_target': int(st.get('qty_target') or 0),
+                    'qty_done': int(st.get('qty_done') or 0),
+                    'stage_done': bool(st.get('stage_done')),
+                    'pending_approval': bool(st.get('pending_approval')),
+                }
+            )
+    else:
+        realized = sum(_non_negative((ln or {}).get('qty_produced')) for ln in lines)
+
+    active_team = team_name(t.current_team_id or t.team_id)
+    detail = {
+        'task_id': t.id,
+        'title': t.title,
+        'status': t.status,
+        'team_name': active_team or '',
+        'target_total': target_total,
+        'realized_total': realized,
+        'remaining_total': max(0, target_total - realized),
+        'planned_hours': float(t.planned_hours or 0),
+        'start': t.start.isoformat() if t.start else '',
+        'end': t.end.isoformat() if t.end else '',
+        'updated_at': t.updated_at.isoformat() if t.updated_at else '',
+    }
+
+    line_rows = []
+    line_sizes = []
+    fire_rows = []
+    for idx, ln in enumerate(lines):
+        ln = ln or {}
+        cat = str(ln.get('model_code') or '').strip() or 'Kategori Yok'
+        color = str(ln.get('product_color') or '').strip() or 'Renk Yok'
+        color_code = str(ln.get('product_color_code') or '').strip()
+        sizes = list(ln.get('model_sizes') or [])
+        line_target = _non_negative(ln.get('quantity'))
+        # Kalem bazlı gerçekleşen: workflow varsa tüm ekiplerdeki minimum değer (hattı geçen net adet)
+        if wf_ids:
+            vals = [
+                _non_negative(dict(dict(stage_state.get(str(tid), {}) or {}).get('qty_done_by_line') or {}).get(str(idx), 0))
+                for tid in wf_ids
+            ]
+            line_realized = min(vals) if vals else 0
+        else:
+            line_realized = _non_negative(ln.get('qty_produced'))
+        line_rows.append(
+            {
+                'task_id': t.id,
+                'task_title': t.title,
+                'product_line_index': idx,
+                'category_code': cat,
+                'color': color,
+                'color_code': color_code,
+                'sizes': ', '.join(str(x) for x in sizes) if sizes else '',
+                'target_total': line_target,
+                'realized_total': line_realized,
+                'remaining_total': max(0, line_target - line_realized),
+                'status': t.status,
+            }
+        )
+        line_sizes.append([str(sz).strip() or 'Olcu Yok' for sz in sizes] or ['Olcu Yok'])
+        fq = float(ln.get('fire_qty') or 0)
+        fr = str(ln.get('fire_reason') or '').strip()
+        fi = str(ln.get('fire_image_data_url') or '').strip()
+        if fq > 0 or fr or fi:
+            fire_rows.append(
+                {
+                    'task_id': t.id,
+                    'title': t.title,
+                    'product_line_index': idx,
+                    'model_code': str(ln.get('model_code') or ''),
+                    'fire_qty': fq,
+                    'fire_reason': fr,
+                    'fire_where': team_name(t.current_team_id) or team_name(t.team_id) or '',
+                    'fire_image': 'Var' if fi else 'Yok',
+                }
+            )
+
+    workers: dict[tuple, list] = {}
+    for e in entries:
+        line_idx = int(e.product_line_index or 0)
+        wname = e.user.username if e.user else '—'
+        tname = e.team.name if e.team else '—'
+        row = workers.setdefault((e.user_id or 0, wname, tname, line_idx), [e.user_id, wname, tname, line_idx, 0, 0])
+        row[4] += 1
+        row[5] += int(e.quantity or 0)
+
+    return {
+        'row': _task_row(t, team_name, usernames),
+        'detail': detail,
+        'stage_qty': stage_qty_rows,
+        'lines': line_rows,
+        'line_sizes': line_sizes,
+        'fire': fire_rows,
+        'stages': _stage_rows(t),
+        'workers': list(workers.values()),
+    }
+
+
+def refresh_task_report_facts(tasks):
+    """Verilen görevlerin olgularını yeniden hesaplar; görev başına değil parti başına sabit sayıda sorgu."""
+    tasks = [task for task in tasks if task.pk]
+    if not tasks:
+        return
+    entries = defaultdict(list)
+    for entry in TaskProductionEntry.objects.filter(task__in=[t.pk for t in tasks]).select_related('user', 'team').order_by('id'):
+        entries[entry.task_id].append(entry)
+    team_ids = set()
+    user_ids = set()
+    for t in tasks:
+        team_ids.update([t.team_id, t.current_team_id, *_workflow_ids(t)])
+        user_ids.update([t.owner_id, t.assignee_id])
+    teams = {
+        team_id: (organization_id, name)
+        for team_id, organization_id, name in Team.objects.filter(id__in=team_ids - {None}).values_list('id', 'organization_id', 'name')
+    }
+    usernames = dict(User.objects.filter(id__in=user_ids - {None}).values_list('id', 'username'))
+    now = timezone.now()
+    TaskReportFact.objects.bulk_create(
+        [
+            TaskReportFact(
+                task_id=t.pk,
+                organization_id=t.organization_id,
+                team_id=t.team_id,
+                current_team_id=t.current_team_id,
+                assignee_id=t.assignee_id,
+                status=t.status,
+                created_month=_month(t.created_at),
+                completed_month=_month(t.end or t.updated_at) if t.status == 'done' else None,
+                updated_month=_month(t.updated_at),
+                task_updated_at=t.updated_at,
+                payload=task_report_payload(t, entries[t.pk], teams, usernames),
+                computed_at=now,
+            )
+            for t in tasks
+        ],
+        update_conflicts=True,
+        unique_fields=['task'],
+        update_fields=FACT_UPDATE_FIELDS,
+    )
+
+
+def invalidate_task_report_facts(**filters):
+    """Olguları bayat işaretler; bir sonraki rapor okumasında yeniden hesaplanırlar."""
+    TaskReportFact.objects.filter(**filters).update(task_updated_at=None)
+
+
+def stale_report_fact_tasks(organization_id=None):
+    """Olgusu olmayan, bayat işaretli ya da son kayıttan sonra değişmiş görevler."""
+    qs = Task.objects.alias(fact_at=F('report_fact__task_updated_at')).filter(
+        Q(fact_at__isnull=True) | ~Q(fact_at=F('updated_at'))
+    )
+    if organization_id:
+        qs = qs.filter(organization_id=organization_id)
+    return qs
+
+
+def _dispatch_report_fact_refresh(task_ids, organization_id):
+    try:
+        from .tasks import refresh_task_report_facts as refresh_job
+
+        refresh_job.delay(task_ids=task_ids, organization_id=organization_id)
+    except Exception:
+        # Olgu bayat kalır; periyodik yenileme ve rebuild komutu onu yakalar.
+        logger.warning('Task report fact refresh could not be scheduled.', exc_info=True)
+
+
+def queue_report_fact_refresh(task_ids=None, organization_id=None):
+    """Commit sonrası olgu yenilemesini kuyruğa alır: verilen görevler ya da organizasyonun bayat olguları."""
+    task_ids = sorted({task_id for task_id in task_ids or [] if task_id})
+    if not task_ids and not organization_id:
+        return
+    transaction.on_commit(lambda: _dispatch_report_fact_refresh(task_ids, organization_id))
+
+
+def refresh_report_facts_in_batches(tasks, batch_size=FACT_BATCH_SIZE):
+    ids = list(tasks.order_by('id').values_list('id', flat=True))
+    for offset in range(0, len(ids), batch_size):
+        refresh_task_report_facts(list(Task.objects.filter(id__in=ids[offset:offset + batch_size]).order_by('id')))
+    return len(ids)
+
+
+def _period_facts(org_id, start, end, filters):
+    start_month, end_month = timezone.localtime(start).date(), timezone.localtime(end).date()
+    qs = TaskReportFact.objects.filter(organization_id=org_id).filter(
+        Q(created_month__gte=start_month, created_month__lt=end_month)
+        | Q(completed_month__gte=start_month, completed_month__lt=end_month)
+        | Q(updated_month__gte=start_month, updated_month__lt=end_month)
+    )
+    if filters.get('team_id'):
+        qs = qs.filter(Q(team_id=filters['team_id']) | Q(current_team_id=filters['team_id']))
+    if filters.get('assignee_id'):
+        qs = qs.filter(assignee_id=filters['assignee_id'])
+    if filters.get('status') and filters['status'] != 'all':
+        qs = qs.filter(status=filters['status'])
+    return qs
+
+
+def _breakdown_rows(rows: dict, label_key: str, default: str) -> list[dict[str, Any]]:
+    out = []
+    for v in rows.values():
+        tgt = int(v['target_total'])
+        done = int(v['realized_total'])
+        out.append({**v, label_key: v[label_key] or default, 'target_total': tgt, 'realized_total': done, 'remaining_total': max(0, tgt - done)})
+    return out
+
+
+def merge_task_report_facts(payloads) -> dict[str, Any]:
+    """Olgu satırlarından raporun ``tasks`` ve ``master`` bölümlerini üretir."""
+    tasks = []
+    task_detail = []
+    stage_qty_rows = []
+    line_detail_rows = []
+    fire_rows = []
+    stage_rows = []
+    category_map: dict[str, dict[str, Any]] = {}
+    color_map: dict[str, dict[str, Any]] = {}
+    size_map: dict[str, dict[str, Any]] = {}
+    team_perf_map: dict[str, dict[str, Any]] = {}
+    worker_map: dict[tuple, dict[str, Any]] = {}
+
+    for payload in payloads:
+        tasks.append(payload['row'])
+        task_detail.append(payload['detail'])
+        stage_qty_rows.extend(payload['stage_qty'])
+        fire_rows.extend(payload['fire'])
+        for line, sizes in zip(payload['lines'], payload['line_sizes']):
+            line_detail_rows.append(line)
+            tgt, done = line['target_total'], line['realized_total']
+            cat = category_map.setdefault(line['category_code'], {'category_code': line['category_code'], 'target_total': 0, 'realized_total': 0})
+            color_key = f"{line['color']} ({line['color_code']})" if line['color_code'] else line['color']
+            color = color_map.setdefault(color_key, {'color': line['color'], 'color_code': line['color_code'], 'target_total': 0, 'realized_total': 0})
+            for bucket in (cat, color, *(size_map.setdefault(sk, {'size': sk, 'target_total': 0, 'realized_total': 0}) for sk in sizes)):
+                bucket['target_total'] += tgt
+                bucket['realized_total'] += done
+        for stage in payload['stages']:
+            stage_rows.append(stage)
+            perf = team_perf_map.setdefault(
+                stage['to_team'],
+                {'team_name': stage['to_team'], 'transition_count': 0, 'total_duration_hours': 0.0, 'max_duration_hours': 0.0},
+            )
+            perf['transition_count'] += 1
+            perf['total_duration_hours'] += stage['duration_hours']
+            perf['max_duration_hours'] = max(perf['max_duration_hours'], stage['duration_hours'])
+        for user_id, username, team_name, line_idx, entry_count, quantity in payload['workers']:
+            row = worker_map.setdefault(
+                (user_id or 0, username, team_name, line_idx),
+                {
+                    'user_id': user_id,
+                    'username': username,
+                    'team_name': team_name,
+                    'product_line_index': line_idx,
+                    'entry_count': 0,
+                    'reported_quantity_sum': 0,
+                    'task_count': 0,
+                },
+            )
+            row['entry_count'] += entry_count
+            row['reported_quantity_sum'] += quantity
+            row['task_count'] += 1
+
+    worker_rows = [
+        {**row, 'avg_reported_qty': round(row['reported_quantity_sum'] / row['entry_count'], 2) if row['entry_count'] > 0 else 0}
+        for row in worker_map.values()
+    ]
+    worker_rows.sort(key=lambda x: (-x['reported_quantity_sum'], -x['entry_count']))
+    team_perf_rows = [
+        {**v, 'avg_duration_hours': round(float(v['total_duration_hours']) / v['transition_count'], 2) if v['transition_count'] > 0 else 0}
+        for v in team_perf_map.values()
+    ]
+    team_perf_rows.sort(key=lambda x: -x['avg_duration_hours'])
+    return {
+        'tasks': tasks,
+        'master': {
+            'task_detail': task_detail,
+            'team_performance': team_perf_rows,
+            'worker_line_performance': worker_rows,
+            'fire_analysis': fire_rows,
+            'stage_durations': sorted(stage_rows, key=lambda r: (r['task_id'], r['at'])),
+            'stage_qty_detail': stage_qty_rows,
+            'category_breakdown': sorted(_breakdown_rows(category_map, 'category_code', 'Kategori Yok'), key=lambda x: x['category_code']),
+            'color_breakdown': sorted(_breakdown_rows(color_map, 'color', 'Renk Yok'), key=lambda x: (x['color'], x['color_code'])),
+            'size_breakdown': sorted(_breakdown_rows(size_map, 'size', 'Olcu Yok'), key=lambda x: x['size']),
+            'line_detail': line_detail_rows,
+        },
+    }
+
+
+def _filters_key(filters) -> str:
+    raw = json.dumps({key: value for key, value in sorted(filters.items()) if value not in (None, '', 'all')})
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def task_report_period(org_id: int, period: str, start: datetime, end: datetime, filters: dict) -> dict[str, Any]:
+    """``[start, end)`` döneminde oluşturulan, tamamlanan veya güncellenen görevlerin ``tasks`` + ``master`` bölümleri."""
+    facts = _period_facts(org_id, start, end, filters)
+    ordered = facts.order_by('-task_updated_at', '-task_id').values_list('payload', flat=True)
+    month_start = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if end > month_start:
+        return merge_task_report_facts(ordered)
+
+    agg = facts.aggregate(count=Count('task'), latest=Max('computed_at'))
+    signature = f"{agg['count']}:{agg['latest'].isoformat() if agg['latest'] else '-'}"
+    lookup = {'organization_id': org_id, 'period': period, 'filters_key': _filters_key(filters)}
+    snapshot = TaskReportSnapshot.objects.filter(**lookup).only('signature', 'payload').first()
+    if snapshot and snapshot.signature == signature:
+        return snapshot.payload
+    payload = merge_task_report_facts(ordered)
+    TaskReportSnapshot.objects.update_or_create(**lookup, defaults={'signature': signature, 'payload': payload})
+    return payload
@@ -1,14 +1,19 @@
 """
 Görev raporları API (JSON özet + Excel / Word indirme).
 """
+import tempfile
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse
+from django.http import FileResponse
 from django.utils import timezone
 from permissions import IsOrgMember
 
-from .task_reporting import build_full_report, export_xlsx_bytes, export_docx_bytes, export_cnc_docx_bytes
+from .task_reporting import build_full_report, write_cnc_docx_report, write_docx_report, write_xlsx_report
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
 
 
 def _default_year():
@@ -100,21 +105,19 @@ class TaskReportExportView(APIView):
         }
         payload = build_full_report(org.id, year, month, filters)
 
+        # Belge geçici dosyaya yazılır ve parça parça gönderilir; yanıt için bellekte bayt kopyası tutulmaz.
+        handle = tempfile.TemporaryFile()
         if fmt == 'xlsx':
-            body = export_xlsx_bytes(payload)
+            write_xlsx_report(payload, handle)
             name = f"gorev_raporu_{year}_{month or 'yillik'}.xlsx"
-            resp = HttpResponse(body, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            resp['Content-Disposition'] = f'attachment; filename="{name}"'
-            return resp
-        if template_key in ('cnc', 'daily', 'daily-production'):
-            body = export_cnc_docx_bytes(payload)
+            content_type = XLSX_CONTENT_TYPE
+        elif template_key in ('cnc', 'daily', 'daily-production'):
+            write_cnc_docx_report(payload, handle)
             name = f"gunluk_uretim_faaliyet_raporu_{year}_{month or 'yillik'}.docx"
+            content_type = DOCX_CONTENT_TYPE
         else:
-            body = export_docx_bytes(payload)
+            write_docx_report(payload, handle)
             name = f"gorev_raporu_{year}_{month or 'yillik'}.docx"
-        resp = HttpResponse(
-            body,
-            content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        )
-        resp['Content-Disposition'] = f'attachment; filename="{name}"'
-        return resp
+            content_type = DOCX_CONTENT_TYPE
+        handle.seek(0)
+        return FileResponse(handle, as_attachment=True, filename=name, content_type=content_type)
@@ -1,3 +1,5 @@
+from django.db.models import Count, IntegerField, Max, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
 from rest_framework import serializers
 from .models import (
     Ticket,
@@ -12,7 +14,14 @@ from .models import (
     TaskMdfConsumption,
     TaskWorkflowTemplate,
 )
-from .workflow_utils import apply_product_line_to_task, ensure_product_line_workflows, ensure_workflow_state, workflow_team_id_list
+from .workflow_utils import (
+    LINE_WORKFLOW_SCHEMA_VERSION,
+    apply_product_line_to_task,
+    ensure_product_line_workflows,
+    ensure_workflow_state,
+    normalize_line_workflows,
+    workflow_team_id_list,
+)
 from .models_automation import AutomationRule
 
 
@@ -158,6 +167,10 @@ class TaskWorkflowTemplateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError('Şablondaki bazı ekipler organizasyonda bulunamadı.')
         return cleaned
 
+TIME_ENTRIES_PER_TASK = 20
+PRODUCTION_ENTRIES_PER_TASK = 200
+MDF_CONSUMPTIONS_PER_TASK = 200
+
 
 class TaskSerializer(serializers.ModelSerializer):
     attachments = TaskAttachmentSerializer(many=True, read_only=True)
@@ -188,22 +201,37 @@ class TaskSerializer(serializers.ModelSerializer):
             'handover_at': {'required': False, 'allow_null': True},
             'planned_hours': {'required': False, 'allow_null': True},
             'planned_cost': {'required': False, 'allow_null': True},
+            'workflow_schema_version': {'read_only': True},
         }
 
+    def to_representation(self, instance):
+        if (instance.workflow_schema_version or 0) < LINE_WORKFLOW_SCHEMA_VERSION:
+            # Henüz backfill edilmemiş görev: yalnızca bu yanıt için bellekte normalize edilir, kaydedilmez.
+            ensure_product_line_workflows(instance)
+        return super().to_representation(instance)
+
     def get_checklist(self, obj):
-        items = obj.checklist.all().order_by('order', 'id')
+        items = getattr(obj, 'prefetched_checklist', None)
+        if items is None:
+            items = obj.checklist.all().order_by('order', 'id')
         return TaskChecklistSerializer(items, many=True).data
 
     def get_time_entries(self, obj):
-        entries = obj.time_entries.all().order_by('-created_at')[:20]
+        entries = getattr(obj, 'recent_time_entries', None)
+        if entries is None:
+            entries = obj.time_entries.all().order_by('-created_at')[:TIME_ENTRIES_PER_TASK]
         return TaskTimeEntrySerializer(entries, many=True).data
 
     def get_production_entries(self, obj):
-        items = obj.production_entries.all().order_by('-entry_date', '-created_at')[:200]
+        items = getattr(obj, 'recent_production_entries', None)
+        if items is None:
+            items = obj.production_entries.all().order_by('-entry_date', '-created_at')[:PRODUCTION_ENTRIES_PER_TASK]
         return TaskProductionEntrySerializer(items, many=True).data
 
     def get_mdf_consumptions(self, obj):
-        items = obj.mdf_consumptions.select_related('user', 'team', 'mdf_sku').all()[:200]
+        items = getattr(obj, 'recent_mdf_consumptions', None)
+        if items is None:
+            items = obj.mdf_consumptions.select_related('user', 'team', 'mdf_sku').all()[:MDF_CONSUMPTIONS_PER_TASK]
         return TaskMdfConsumptionSerializer(items, many=True).data
 
     def validate(self, attrs):
@@ -278,7 +306,7 @@ class TaskSerializer(serializers.ModelSerializer):
         update_fields = []
         if list(instance.product_lines or []):
             apply_product_line_to_task(instance, int(instance.active_product_index or 0))
-            ensure_product_line_workflows(instance)
+            normalize_line_workflows(instance)
             lines = list(instance.product_lines or [])
             if len(lines) > 1:
                 sum_min = 0.0
@@ -308,6 +336,8 @@ class TaskSerializer(serializers.ModelSerializer):
                     'product_color',
                     'product_color_code',
                     'planned_hours',
+                    'product_lines',
+                    'workflow_schema_version',
                 ]
             )
         if workflow_team_id_list(instance):
@@ -413,6 +443,111 @@ class TaskSerializer(serializers.ModelSerializer):
         return instance
 
 
+TASK_LIST_EXPANSIONS = ('attachments', 'comments', 'checklist', 'time_entries', 'production_entries', 'mdf_consumptions')
+
+
+def parse_task_expand(value):
+    """``?expand=comments,checklist`` → listede iç içe döndürülecek alanlar."""
+    requested = {part.strip() for part in str(value or '').split(',') if part.strip()}
+    return tuple(name for name in TASK_LIST_EXPANSIONS if name in requested)
+
+
+def _task_child_count(model, **filters):
+    rows = model.objects.filter(task=OuterRef('pk'), **filters).order_by().values('task')
+    return Coalesce(Subquery(rows.annotate(total=Count('id')).values('total')), Value(0), output_field=IntegerField())
+
+
+def _task_child_latest(model):
+    rows = model.objects.filter(task=OuterRef('pk')).order_by().values('task')
+    return Subquery(rows.annotate(latest=Max('created_at')).values('latest'))
+
+
+def task_list_queryset(queryset, expand=()):
+    """``TaskListSerializer`` için sayaçlar tek sorguda; ``expand`` alanları görev sayısından bağımsız sabit sayıda sorguyla gelir."""
+    queryset = queryset.annotate(
+        attachments_count=_task_child_count(TaskAttachment),
+        comments_count=_task_child_count(TaskComment, type='comment'),
+        checklist_total=_task_child_count(TaskChecklist),
+        checklist_done=_task_child_count(TaskChecklist, done=True),
+        produced_quantity=Coalesce(
+            Subquery(
+                TaskProductionEntry.objects.filter(task=OuterRef('pk'))
+                .order_by()
+                .values('task')
+                .annotate(total=Sum('quantity'))
+                .values('total')
+            ),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+        # PostgreSQL GREATEST NULL değerleri yok sayar.
+        last_activity_at=Greatest(
+            'updated_at',
+            _task_child_latest(TaskComment),
+            _task_child_latest(TaskTimeEntry),
+            _task_child_latest(TaskProductionEntry),
+        ),
+    )
+    prefetches = {
+        'attachments': Prefetch('attachments'),
+        'comments': Prefetch('comments', queryset=TaskComment.objects.select_related('author')),
+        'checklist': Prefetch(
+            'checklist',
+            queryset=TaskChecklist.objects.order_by('order', 'id'),
+            to_attr='prefetched_checklist',
+        ),
+        'time_entries': Prefetch(
+            'time_entries',
+            queryset=TaskTimeEntry.objects.select_related('user').order_by('-created_at')[:TIME_ENTRIES_PER_TASK],
+            to_attr='recent_time_entries',
+        ),
+        'production_entries': Prefetch(
+            'production_entries',
+            queryset=TaskProductionEntry.objects.select_related('user', 'team').order_by('-entry_date', '-created_at')[
+                :PRODUCTION_ENTRIES_PER_TASK
+            ],
+            to_attr='recent_production_entries',
+        ),
+        'mdf_consumptions': Prefetch(
+            'mdf_consumptions',
+            queryset=TaskMdfConsumption.objects.select_related('user', 'team', 'mdf_sku')[:MDF_CONSUMPTIONS_PER_TASK],
+            to_attr='recent_mdf_consumptions',
+        ),
+    }
+    expand = [name for name in expand if name in prefetches]
+    if expand:
+        queryset = queryset.prefetch_related(*(prefetches[name] for name in expand))
+    return queryset
+
+
+class TaskListSerializer(TaskSerializer):
+    """Liste satırı: ilişkili kayıtlar yerine sayaçlar; iç içe alanlar yalnızca ``expand`` ile gelir."""
+
+    attachments_count = serializers.IntegerField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
+    checklist_total = serializers.IntegerField(read_only=True)
+    checklist_done = serializers.IntegerField(read_only=True)
+    produced_quantity = serializers.IntegerField(read_only=True)
+    last_activity_at = serializers.DateTimeField(read_only=True)
+
+    class Meta(TaskSerializer.Meta):
+        fields = TaskSerializer.Meta.fields + (
+            'attachments_count',
+            'comments_count',
+            'checklist_total',
+            'checklist_done',
+            'produced_quantity',
+            'last_activity_at',
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = set(self.context.get('expand') or ())
+        for name in TASK_LIST_EXPANSIONS:
+            if name not in expand:
+                self.fields.pop(name, None)
+
+
 class TaskModelSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
 
@@ -0,0 +1,80 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import Team, User
+from .models import Task, TaskProductionEntry
+from .report_facts import REPORT_SOURCE_FIELDS, invalidate_task_report_facts, queue_report_fact_refresh
+from .team_queue import QUEUE_SOURCE_FIELDS, sync_task_queue_entries
+
+
+@receiver(post_save, sender=Task)
+def task_queue_entries_changed(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not QUEUE_SOURCE_FIELDS.intersection(update_fields):
+        return
+    sync_task_queue_entries([instance])
+
+
+@receiver(post_save, sender=Task)
+def task_report_fact_changed(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and 'updated_at' not in update_fields:
+        if not REPORT_SOURCE_FIELDS.intersection(update_fields):
+            return
+        # updated_at ilerlemediği için olgu ayrıca bayat işaretlenir; kuyruk kaçarsa periyodik yenileme bulur.
+        invalidate_task_report_facts(task_id=instance.pk)
+    queue_report_fact_refresh(task_ids=[instance.pk])
+
+
+@receiver(post_save, sender=TaskProductionEntry)
+@receiver(post_delete, sender=TaskProductionEntry)
+def production_entry_report_fact_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_task_report_facts(task_id=instance.task_id)
+    queue_report_fact_refresh(task_ids=[instance.task_id])
+
+
+def _refresh_organization_report_facts(organization_id):
+    invalidate_task_report_facts(organization_id=organization_id)
+    queue_report_fact_refresh(organization_id=organization_id)
+
+
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=User)
+def report_names_removed(sender, instance, **kwargs):
+    # Ekip adları ve silinen kişiler olgu satırlarında kopya olarak durur.
+    if instance.organization_id:
+        _refresh_organization_report_facts(instance.organization_id)
+
+
+@receiver(pre_save, sender=Team)
+def remember_previous_team_name(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not instance.pk or (update_fields is not None and 'name' not in update_fields):
+        return
+    instance._previous_name = Team.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Team)
+def report_team_name_changed(sender, instance, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_name', None)
+    if raw or not instance.organization_id or previous is None or previous == instance.name:
+        return
+    _refresh_organization_report_facts(instance.organization_id)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_username(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not instance.pk or (update_fields is not None and 'username' not in update_fields):
+        return
+    instance._previous_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def report_username_changed(sender, instance, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_username', None)
+    if raw or not instance.organization_id or previous is None or previous == instance.username:
+        return
+    _refresh_organization_report_facts(instance.organization_id)
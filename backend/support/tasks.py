@@ -1,51 +1,44 @@
 from celery import shared_task
-from django.utils import timezone
-from datetime import timedelta
-from core.events import push_event
-from .models import Task, TaskComment
-from .models_automation import AutomationRule
 
 
 @shared_task
-def run_due_soon_automations():
-  now = timezone.now()
-  soon = now + timedelta(hours=24)
-  rules = AutomationRule.objects.filter(trigger='task_due_soon', is_active=True)
-  for rule in rules:
-    cond = rule.condition or {}
-    hours = cond.get('hours', 24)
-    window = now + timedelta(hours=hours)
-    tasks = Task.objects.filter(
-      organization=rule.organization,
-      status__in=['todo', 'in-progress'],
-      due__lte=window,
-      due__gte=now,
-    )
-    for task in tasks:
-      try:
-        if rule.action == 'add_comment':
-          text = rule.action_payload.get('comment') if isinstance(rule.action_payload, dict) else None
-          TaskComment.objects.create(task=task, author=None, type='activity', text=text or 'Otomasyon: due yaklaşıyor')
-        elif rule.action == 'notify':
-          payload = rule.action_payload if isinstance(rule.action_payload, dict) else {}
-          msg = payload.get('message') or f"Task {task.title}: vade yaklaşıyor"
-          webhook = payload.get('webhook')
-          email_to = payload.get('email') or (task.assignee.email if task.assignee else None)
-          TaskComment.objects.create(task=task, author=None, type='activity', text='(Notify) Due yaklaşıyor')
-          from .utils import send_slack_webhook, send_email
-          send_slack_webhook(msg, webhook_url=webhook)
-          if email_to:
-            send_email(email_to, f"Görev bildirimi: {task.title}", msg)
-          push_event(
-            {
-              "type": "notification.sla_due_soon",
-              "task_id": task.id,
-              "task_title": task.title,
-              "due": task.due.isoformat() if task.due else None,
-              "organization": task.organization_id,
-              "rule_id": rule.id,
-            }
-          )
-      except Exception as e:
-        TaskComment.objects.create(task=task, author=None, type='activity', text=f"Otomasyon hata: {e}")
+def run_due_soon_automations(batch_size=500):
+  """Vade yaklaşan görevler için kuralları bir kez çalıştırır; parti dolduysa kendini yeniden kuyruğa alır."""
+  from .due_soon import run_due_soon_rules
 
+  stats = run_due_soon_rules(batch_size=batch_size)
+  if stats['more']:
+    run_due_soon_automations.delay(batch_size)
+  return stats
+
+
+@shared_task
+def backfill_task_line_workflows(batch_size=200, max_batches=25):
+  """Eski görevleri partiler halinde normalize eder; iş kaldıysa kendini yeniden kuyruğa alır."""
+  from .workflow_backfill import backfill_line_workflows
+
+  processed, changed, done = backfill_line_workflows(batch_size=batch_size, max_batches=max_batches)
+  if not done:
+    backfill_task_line_workflows.delay(batch_size, max_batches)
+  return {'processed': processed, 'changed': changed, 'done': done}
+
+
+@shared_task
+def deliver_notifications(batch_size=100):
+  """Bildirim outbox'ından bir parti gönderir; parti doluysa kendini yeniden kuyruğa alır."""
+  from .notifications import deliver_notifications as deliver
+
+  stats = deliver(batch_size=batch_size)
+  if stats['claimed'] >= batch_size:
+    deliver_notifications.delay(batch_size)
+  return stats
+
+
+@shared_task
+def refresh_task_report_facts(task_ids=None, organization_id=None):
+  """Verilen görevlerin, yoksa (organizasyonun) bayat görev rapor olgularını partiler halinde yeniler."""
+  from .models import Task
+  from .report_facts import refresh_report_facts_in_batches, stale_report_fact_tasks
+
+  tasks = Task.objects.filter(id__in=task_ids) if task_ids else stale_report_fact_tasks(organization_id)
+  return {'refreshed': refresh_report_facts_in_batches(tasks)}
@@ -0,0 +1,84 @@
+"""my-team-queue görünürlüğünün SQL karşılığı.
+
+Kalem ve kök iş akışı aşamaları ``TaskQueueEntry`` tablosunda tutulur; kuyruk
+``user_can_see_claim_queue_entry`` / ``parallel_queue_visible`` kurallarını
+görev başına Python döngüsü yerine tek bir indeksli sorguyla uygular.
+"""
+
+from django.db.models import Exists, OuterRef, Q
+
+from accounts.models import Team
+
+from .models import Task, TaskQueueEntry
+from .workflow_utils import queue_entry_rows
+
+QUEUE_SOURCE_FIELDS = frozenset({'product_lines', 'workflow_team_ids', 'workflow_stage_state', 'current_team'})
+
+
+def sync_task_queue_entries(tasks):
+    """Verilen görevlerin kuyruk satırlarını JSON alanlarından yeniden yazar."""
+    tasks = [task for task in tasks if task.pk]
+    if not tasks:
+        return
+    TaskQueueEntry.objects.filter(task__in=[task.pk for task in tasks]).delete()
+    TaskQueueEntry.objects.bulk_create(
+        [
+            TaskQueueEntry(
+                task_id=task.pk,
+                line_index=line_index,
+                team_id=team_id,
+                is_current=is_current,
+                assignee_id=assignee_id,
+                stage_done=stage_done,
+            )
+            for task in tasks
+            for line_index, team_id, is_current, assignee_id, stage_done in queue_entry_rows(task)
+        ]
+    )
+
+
+def claim_queue_filter(user, user_team_ids):
+    """``Task`` sorgusu için kuyruk görünürlüğü; ``user_team_ids`` üye + lider olunan ekiplerdir."""
+    staff = getattr(user, 'role', '') in ('Admin', 'Manager')
+    team_ids = list(user_team_ids)
+    entries = TaskQueueEntry.objects.filter(task=OuterRef('pk'))
+    open_lines = entries.filter(line_index__isnull=False, stage_done=False)
+    open_line_in_teams = Exists(open_lines.filter(team_id__in=team_ids))
+    root_stages = entries.filter(line_index__isnull=True)
+    open_root = root_stages.filter(stage_done=False, team__organization_id=OuterRef('organization_id'))
+    claimable = Q(assignee_id__isnull=True) | Q(assignee_id=user.id)
+    if staff:
+        root_visible = Exists(open_root.filter(claimable))
+    else:
+        root_visible = Exists(open_root.filter(team_id__in=team_ids).filter(claimable | Q(team_id=OuterRef('current_team_id'))))
+
+    parallel_visible = open_line_in_teams | (Q(workflow_parallel=True) & root_visible)
+    parallel_mode = Q(workflow_parallel=True) & Exists(root_stages)
+    if staff:
+        sequential_visible = (
+            Exists(open_lines)
+            | Q(assignee__isnull=False)
+            | Q(current_team__isnull=False)
+            | Q(team__isnull=False)
+        )
+        can_see = parallel_mode | sequential_visible
+    else:
+        leads_team = Q(current_team__leader_id=user.id) | Q(current_team__isnull=True, team__leader_id=user.id)
+        sequential_visible = open_line_in_teams | (Q(assignee__isnull=True) & leads_team)
+        can_see = (parallel_mode & parallel_visible) | (~parallel_mode & sequential_visible)
+
+    assignee_in_current_team = Team.members.through.objects.filter(
+        team_id=OuterRef('current_team_id'),
+        user_id=OuterRef('assignee_id'),
+    )
+    team_pool = Q(current_team_id__in=team_ids) & (
+        Q(workflow_parallel=False, assignee__isnull=True)
+        | Q(workflow_parallel=True) & (Q(assignee__isnull=True) | Exists(assignee_in_current_team))
+    )
+    has_lines = Q(product_lines__isnull=False) & ~Q(product_lines=[])
+    candidate = team_pool | (Q(workflow_parallel=True) & parallel_visible) | has_lines
+    return ~Q(status='done') & can_see & candidate
+
+
+def team_queue_queryset(user, user_team_ids):
+    return Task.objects.filter(organization=user.organization).filter(claim_queue_filter(user, user_team_ids))
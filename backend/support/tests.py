@@ -0,0 +1,688 @@
+import random
+import threading
+from datetime import datetime, timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+from django.db import connection
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from docx import Document
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from accounts.models import Team, User
+from accounts.utils import ensure_permissions_seeded
+from organizations.models import Organization
+from .models import Task, TaskChecklist, TaskComment, TaskProductionEntry, TaskReportFact, TaskReportSnapshot, TaskTimeEntry
+from .due_soon import run_due_soon_rules
+from .models_automation import AutomationFireLog, AutomationRule, NotificationOutbox
+from .notifications import deliver_notifications
+from .report_facts import stale_report_fact_tasks
+from .tasks import backfill_task_line_workflows, refresh_task_report_facts, run_due_soon_automations
+from .team_queue import team_queue_queryset
+from .views import user_can_see_claim_queue_entry
+from .workflow_backfill import backfill_line_workflow_batch, backfill_line_workflows
+from .workflow_utils import LINE_WORKFLOW_SCHEMA_VERSION, parallel_queue_visible
+
+
+class TaskListTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Test', code='TEST')
+        self.user = User.objects.create_user(username='admin', password='x', organization=self.org, role='Admin')
+        self.team = Team.objects.create(organization=self.org, name='Montaj')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def make_tasks(self, count):
+        for index in range(count):
+            task = Task.objects.create(
+                organization=self.org,
+                title=f'Görev {index}',
+                workflow_team_ids=[self.team.id],
+                product_lines=[{'model_code': 'KP-1', 'quantity': 2}],
+            )
+            TaskComment.objects.create(task=task, author=self.user, text='Not')
+            TaskChecklist.objects.create(task=task, title='Kontrol', done=True)
+            TaskChecklist.objects.create(task=task, title='Paketleme')
+            for minute in range(3):
+                TaskTimeEntry.objects.create(task=task, user=self.user, started_at=task.created_at, note=str(minute))
+
+    def list_tasks(self, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/tasks/{query}')
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        return rows, len(queries), [q['sql'] for q in queries.captured_queries]
+
+    def test_list_uses_counts_and_constant_queries(self):
+        self.make_tasks(2)
+        rows, small, _ = self.list_tasks()
+        self.make_tasks(6)
+        rows, large, statements = self.list_tasks()
+
+        self.assertEqual(small, large)
+        self.assertFalse([sql for sql in statements if sql.startswith(('UPDATE', 'INSERT', 'DELETE'))])
+        self.assertEqual(len(rows), 8)
+        row = rows[0]
+        self.assertNotIn('comments', row)
+        self.assertNotIn('time_entries', row)
+        self.assertEqual((row['comments_count'], row['checklist_total'], row['checklist_done']), (1, 2, 1))
+        self.assertEqual(row['product_lines'][0]['workflow_team_ids'], [self.team.id])
+
+        _, expanded_small, _ = self.list_tasks('?expand=comments,checklist,time_entries')
+        self.make_tasks(4)
+        rows, expanded_large, _ = self.list_tasks('?expand=comments,checklist,time_entries')
+        self.assertEqual(expanded_small, expanded_large)
+        self.assertEqual(len(rows[0]['comments']), 1)
+        self.assertEqual([item['title'] for item in rows[0]['checklist']], ['Kontrol', 'Paketleme'])
+        self.assertEqual(len(rows[0]['time_entries']), 3)
+        self.assertNotIn('attachments', rows[0])
+
+        detail = self.client.get(f"/api/tasks/{rows[0]['id']}/").data
+        self.assertIn('mdf_consumptions', detail)
+        self.assertEqual(len(detail['comments']), 1)
+
+    def test_team_queue_uses_list_serializer(self):
+        self.team.members.add(self.user)
+        self.make_tasks(3)
+        Task.objects.update(current_team=self.team)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get('/api/tasks/my-team-queue/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response.data[0]['checklist_total'], 2)
+        self.make_tasks(5)
+        Task.objects.update(current_team=self.team)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/api/tasks/my-team-queue/')
+        self.assertEqual(len(response.data), 8)
+        self.assertEqual(len(few), len(many))
+
+    def test_team_queue_follows_line_stage_projection(self):
+        ensure_permissions_seeded()
+        worker = User.objects.create_user(username='usta', password='x', organization=self.org, role='Support')
+        self.team.members.add(worker)
+        paint = Team.objects.create(organization=self.org, name='Boya', leader=worker)
+        line_task = Task.objects.create(
+            organization=self.org,
+            title='Kalem akışı',
+            product_lines=[{'workflow_team_ids': [self.team.id], 'workflow_stage_state': {str(self.team.id): {'stage_done': False}}}],
+        )
+        pool_task = Task.objects.create(organization=self.org, title='Havuz', current_team=paint)
+        Task.objects.create(organization=self.org, title='Başka ekip', current_team=self.team, assignee=self.user)
+        self.assertEqual(line_task.queue_entries.get().team_id, self.team.id)
+
+        client = APIClient()
+        client.force_authenticate(user=worker)
+        response = client.get('/api/tasks/my-team-queue/')
+        ids = {row['id'] for row in response.data}
+        self.assertEqual(ids, {line_task.id, pool_task.id})
+
+        line_task.product_lines[0]['workflow_stage_state'][str(self.team.id)]['stage_done'] = True
+        line_task.save(update_fields=['product_lines'])
+        ids = {row['id'] for row in client.get('/api/tasks/my-team-queue/').data}
+        self.assertEqual(ids, {pool_task.id})
+
+    def test_claim_filter_matches_reference_helpers(self):
+        worker = User.objects.create_user(username='usta', password='x', organization=self.org, role='Support')
+        leader = User.objects.create_user(username='sef', password='x', organization=self.org, role='Support')
+        outsider = User.objects.create_user(username='dis', password='x', organization=self.org, role='Support')
+        cut = self.team
+        paint = Team.objects.create(organization=self.org, name='Boya', leader=leader)
+        pack = Team.objects.create(organization=self.org, name='Paket')
+        cut.members.add(worker)
+        paint.members.add(worker, leader)
+        teams = [cut, paint, pack]
+        rng = random.Random(7)
+
+        def stages(team_ids):
+            return {
+                str(tid): {'stage_done': rng.random() < 0.3, 'assignee_id': rng.choice([None, None, worker.id, leader.id, 'x'])}
+                for tid in team_ids
+            }
+
+        for index in range(80):
+            flow = [team.id for team in rng.sample(teams, rng.randint(0, 3))]
+            lines = []
+            for _ in range(rng.choice([0, 0, 1, 2])):
+                line_flow = [team.id for team in rng.sample(teams, rng.randint(0, 2))]
+                lines.append({
+                    'workflow_team_ids': line_flow,
+                    'workflow_stage_state': stages(line_flow),
+                    'current_team_id': rng.choice(line_flow) if line_flow else None,
+                })
+            Task.objects.create(
+                organization=self.org,
+                title=f'Akış {index}',
+                status=rng.choice(['todo', 'todo', 'in-progress', 'done']),
+                workflow_parallel=rng.random() < 0.5,
+                workflow_team_ids=flow,
+                workflow_stage_state=stages(flow),
+                product_lines=lines,
+                team=rng.choice([None, *teams]),
+                current_team=rng.choice([None, *teams]),
+                assignee=rng.choice([None, None, worker, leader, self.user]),
+            )
+
+        for user in (self.user, worker, leader, outsider):
+            member = set(user.teams.values_list('id', flat=True))
+            user_team_ids = sorted(member | set(Team.objects.filter(organization=self.org, leader=user).values_list('id', flat=True)))
+            expected = reference_team_queue(self.org, user, user_team_ids)
+            actual = set(team_queue_queryset(user, user_team_ids).values_list('id', flat=True))
+            self.assertEqual(actual, expected, user.username)
+
+
+def reference_team_queue(org, user, user_team_ids):
+    """Yan tablodan önceki my-team-queue: aday kümeleri + Python görünürlük kuralları."""
+    base = Task.objects.filter(organization=org, current_team_id__in=user_team_ids).exclude(status='done')
+    pool = [
+        task for task in base
+        if task.assignee_id is None
+        or (task.workflow_parallel and task.current_team.members.filter(id=task.assignee_id).exists())
+    ]
+    open_tasks = Task.objects.filter(organization=org).exclude(status='done')
+    parallel = [task for task in open_tasks.filter(workflow_parallel=True) if parallel_queue_visible(task, user, user_team_ids)]
+    lined = [task for task in open_tasks if task.product_lines]
+    return {task.id for task in pool + parallel + lined if user_can_see_claim_queue_entry(task, user, user_team_ids)}
+
+
+class LegacyTaskMixin:
+    def make_legacy_tasks(self, count):
+        tasks = [
+            Task.objects.create(
+                organization=self.org,
+                title=f'Eski görev {index}',
+                workflow_team_ids=[self.team.id],
+                product_lines=[{'model_code': 'KP-1', 'quantity': 2}],
+            )
+            for index in range(count)
+        ]
+        self.assertFalse(Task.objects.filter(workflow_schema_version=LINE_WORKFLOW_SCHEMA_VERSION).exists())
+        return tasks
+
+
+class WorkflowBackfillTests(LegacyTaskMixin, TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Akış', code='AKS')
+        self.user = User.objects.create_user(username='akis-admin', password='x', organization=self.org, role='Admin')
+        self.team = Team.objects.create(organization=self.org, name='Kesim')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_and_retrieve_normalize_in_memory_without_writes(self):
+        tasks = self.make_legacy_tasks(3)
+        with CaptureQueriesContext(connection) as queries:
+            listed = self.client.get('/api/tasks/')
+            detail = self.client.get(f'/api/tasks/{tasks[0].id}/')
+        self.assertEqual((listed.status_code, detail.status_code), (200, 200))
+        self.assertFalse([q['sql'] for q in queries.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))])
+        self.assertEqual(detail.data['product_lines'][0]['workflow_team_ids'], [self.team.id])
+        stored = Task.objects.get(pk=tasks[0].id)
+        self.assertEqual(stored.workflow_schema_version, 0)
+        self.assertNotIn('workflow_team_ids', stored.product_lines[0])
+
+    def test_batches_stamp_schema_version_and_resume_after_cursor(self):
+        tasks = self.make_legacy_tasks(5)
+        last_id, processed, changed = backfill_line_workflow_batch(batch_size=2)
+        self.assertEqual((last_id, processed, changed), (tasks[1].id, 2, 2))
+        migrated = Task.objects.filter(workflow_schema_version=LINE_WORKFLOW_SCHEMA_VERSION)
+        self.assertEqual(set(migrated.values_list('id', flat=True)), {tasks[0].id, tasks[1].id})
+        self.assertEqual(migrated.first().product_lines[0]['workflow_team_ids'], [self.team.id])
+
+        self.assertEqual(backfill_line_workflow_batch(after_id=last_id, batch_size=10)[1:], (3, 3))
+        self.assertEqual(backfill_line_workflow_batch(after_id=tasks[-1].id), (None, 0, 0))
+        self.assertEqual(backfill_line_workflows(), (0, 0, True))
+
+    def test_celery_task_requeues_itself_until_done(self):
+        self.make_legacy_tasks(3)
+        with patch('support.tasks.backfill_task_line_workflows.delay') as delay:
+            self.assertEqual(backfill_task_line_workflows(1, 2), {'processed': 2, 'changed': 2, 'done': False})
+            delay.assert_called_once_with(1, 2)
+            delay.reset_mock()
+            self.assertEqual(backfill_task_line_workflows(1, 2), {'processed': 1, 'changed': 1, 'done': True})
+            delay.assert_not_called()
+
+
+class WorkflowBackfillLockTests(LegacyTaskMixin, TransactionTestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Akış', code='AKS')
+        self.team = Team.objects.create(organization=self.org, name='Kesim')
+
+    def test_rows_skipped_while_locked_keep_the_run_pending(self):
+        tasks = self.make_legacy_tasks(3)
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    Task.objects.select_for_update().get(pk=tasks[0].id)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertEqual(backfill_line_workflows(batch_size=10), (2, 2, False))
+        finally:
+            release.set()
+            holder.join()
+        self.assertEqual(backfill_line_workflows(batch_size=10), (1, 1, True))
+
+
+class WorkerTrackingTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Test', code='TEST')
+        self.admin = User.objects.create_user(username='admin', password='x', organization=self.org, role='Admin')
+        self.cutting = Team.objects.create(organization=self.org, name='Kesim')
+        self.paint = Team.objects.create(organization=self.org, name='Boya')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def make_worker(self, username, active=2):
+        worker = User.objects.create_user(username=username, password='x', organization=self.org, role='Worker')
+        worker.teams.add(self.cutting)
+        for index in range(active):
+            Task.objects.create(organization=self.org, title=f'{username} {index}', assignee=worker, team=self.cutting)
+        Task.objects.create(organization=self.org, title=f'{username} bitti', assignee=worker, status='done')
+        return worker
+
+    def tracking(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/worker-tracking/')
+        self.assertEqual(response.status_code, 200)
+        return {row['worker_name']: row for row in response.data['workers']}, len(queries)
+
+    def test_tracking_aggregates_with_constant_queries(self):
+        first = self.make_worker('ali')
+        latest = Task.objects.create(organization=self.org, title='Boyada', assignee=first, team=self.cutting, current_team=self.paint)
+        rows, few = self.tracking()
+        for index in range(4):
+            self.make_worker(f'usta{index}', active=index)
+        rows, many = self.tracking()
+
+        self.assertEqual(few, many)
+        self.assertEqual(rows['ali']['active_tasks_count'], 3)
+        self.assertEqual(rows['ali']['current_department'], 'Boya')
+        self.assertEqual(rows['ali']['last_activity'], latest.updated_at)
+        self.assertEqual(rows['ali']['primary_teams'], ['Kesim'])
+        self.assertEqual((rows['usta0']['active_tasks_count'], rows['usta0']['current_department']), (0, None))
+
+    def test_self_handover_is_denormalized_on_user(self):
+        ensure_permissions_seeded()
+        worker = User.objects.create_user(username='veli', password='x', organization=self.org, role='Support')
+        task = Task.objects.create(organization=self.org, title='Devir', assignee=worker, team=self.cutting)
+        client = APIClient()
+        client.force_authenticate(user=worker)
+        response = client.post(f'/api/tasks/{task.id}/self_handover/', {'team': self.paint.id, 'reason': 'Boyaya geçtim'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        worker.refresh_from_db()
+        self.assertEqual(worker.last_self_handover['task_id'], task.id)
+        self.assertEqual(worker.last_self_handover['to_team_name'], 'Boya')
+        self.assertEqual(worker.last_self_handover, {**Task.objects.get(pk=task.pk).handover_history[-1], 'task_id': task.id})
+
+    def test_detail_sums_hours_per_day_and_month_in_range(self):
+        worker = self.make_worker('ayse', active=1)
+        task = Task.objects.filter(assignee=worker).first()
+        base = timezone.make_aware(datetime(2026, 3, 30, 9, 0))
+        for day, hours in ((0, 2), (0, 1.5), (1, 3), (3, 4)):
+            started = base + timedelta(days=day)
+            TaskTimeEntry.objects.create(task=task, user=worker, started_at=started, ended_at=started + timedelta(hours=hours))
+        # Bitişi başlangıçtan önce olan kayıt sıfır sayılır.
+        TaskTimeEntry.objects.create(task=task, user=worker, started_at=base, ended_at=base - timedelta(hours=1))
+
+        response = self.client.get(f'/api/tasks/worker-detail/?worker_id={worker.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['daily_hours'], {'2026-03-30': 3.5, '2026-03-31': 3.0, '2026-04-02': 4.0})
+        self.assertEqual(response.data['monthly_hours'], {'2026-03': 6.5, '2026-04': 4.0})
+
+        response = self.client.get(f'/api/tasks/worker-detail/?worker_id={worker.id}&start=2026-03-31&end=2026-04-30')
+        self.assertEqual(response.data['daily_hours'], {'2026-03-31': 3.0, '2026-04-02': 4.0})
+        self.assertEqual(response.data['monthly_hours'], {'2026-03': 3.0, '2026-04': 4.0})
+
+        response = self.client.get(f'/api/tasks/worker-detail/?worker_id={worker.id}&start=31.03.2026')
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskReportFactTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Test', code='TEST')
+        self.admin = User.objects.create_user(username='admin', password='x', organization=self.org, role='Admin')
+        self.team = Team.objects.create(organization=self.org, name='Kesim')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.past = timezone.localtime().replace(day=15) - timedelta(days=60)
+        # Celery kuyruğu yerine commit sonrası aynı süreçte çalışır.
+        patcher = patch('support.tasks.refresh_task_report_facts.delay', side_effect=lambda **kwargs: refresh_task_report_facts(**kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def committed(self):
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def make_past_task(self, **fields):
+        task = Task.objects.create(
+            organization=self.org,
+            title='Kapalı ay',
+            team=self.team,
+            product_lines=[{'model_code': 'KP-1', 'product_color': 'Beyaz', 'model_sizes': ['M'], 'quantity': 4, 'qty_produced': 1}],
+            **fields,
+        )
+        Task.objects.filter(pk=task.pk).update(created_at=self.past, updated_at=self.past)
+        return task
+
+    def summary(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/task-reports/summary/?year={self.past.year}&month={self.past.month}')
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_closed_month_is_served_from_snapshot_until_its_facts_change(self):
+        with self.committed():
+            task = self.make_past_task()
+            TaskProductionEntry.objects.create(task=task, user=self.admin, team=self.team, product_line_index=0, entry_date=self.past.date(), quantity=3)
+        data, cold = self.summary()
+        self.assertEqual([row['id'] for row in data['tasks']], [task.id])
+        self.assertEqual(data['master']['category_breakdown'], [{'category_code': 'KP-1', 'target_total': 4, 'realized_total': 1, 'remaining_total': 3}])
+        self.assertEqual(data['master']['worker_line_performance'][0]['reported_quantity_sum'], 3)
+        self.assertEqual(TaskReportSnapshot.objects.filter(organization=self.org).count(), 1)
+
+        data, warm = self.summary()
+        self.assertLess(warm, cold)
+        self.assertEqual(data['tasks'][0]['id'], task.id)
+        response = self.client.get(f'/api/task-reports/export/?year={self.past.year}&month={self.past.month}&file_format=xlsx')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TaskReportSnapshot.objects.filter(organization=self.org).count(), 1)
+
+        with self.committed():
+            TaskProductionEntry.objects.create(task=task, user=self.admin, team=self.team, product_line_index=0, entry_date=self.past.date(), quantity=2)
+        data, _ = self.summary()
+        self.assertEqual(data['master']['worker_line_performance'][0]['reported_quantity_sum'], 5)
+
+        with self.committed():
+            second = self.make_past_task(status='done', end=self.past)
+        self.team.save()
+        self.assertFalse(stale_report_fact_tasks(self.org.id).exists())
+        with self.committed():
+            self.team.name = 'Kesimhane'
+            self.team.save()
+        data, _ = self.summary()
+        self.assertEqual({row['id'] for row in data['tasks']}, {task.id, second.id})
+        self.assertEqual({row['team_name'] for row in data['tasks']}, {'Kesimhane'})
+
+    def test_edited_task_moves_to_current_month(self):
+        with self.committed():
+            task = self.make_past_task()
+        self.summary()
+        with self.committed():
+            task.title = 'Bu ay'
+            task.save()
+        data, _ = self.summary()
+        self.assertEqual(data['tasks'], [])
+        fact = TaskReportFact.objects.get(task=task)
+        self.assertEqual(fact.task_updated_at, task.updated_at)
+        self.assertEqual(fact.updated_month, timezone.localdate().replace(day=1))
+
+        current = timezone.localdate()
+        response = self.client.get(f'/api/task-reports/summary/?year={current.year}&month={current.month}')
+        self.assertEqual([row['title'] for row in response.data['tasks']], ['Bu ay'])
+
+    def test_facts_are_refreshed_after_commit_and_never_by_reads(self):
+        with self.committed():
+            task = self.make_past_task()
+        self.summary()
+        with CaptureQueriesContext(connection) as queries:
+            task.save(update_fields=['active_product_index'])
+            task.title = 'Yeni'
+            task.save()
+        self.assertFalse([q for q in queries if 'support_taskreportfact' in q['sql']])
+        self.assertTrue(stale_report_fact_tasks(self.org.id).filter(pk=task.pk).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.summary()
+        writes = [q for q in queries if 'support_taskreportfact' in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+        self.assertTrue(stale_report_fact_tasks(self.org.id).filter(pk=task.pk).exists())
+
+        with self.committed():
+            task.workflow_stage_state = {'0': {'status': 'done'}}
+            task.save(update_fields=['workflow_stage_state'])
+            self.assertIsNone(TaskReportFact.objects.get(task=task).task_updated_at)
+        self.assertFalse(stale_report_fact_tasks(self.org.id).exists())
+
+    def test_username_change_invalidates_facts(self):
+        with self.committed():
+            self.make_past_task(assignee=self.admin)
+        self.summary()
+        self.admin.last_login = timezone.now()
+        self.admin.save(update_fields=['last_login'])
+        self.admin.first_name = 'Ayşe'
+        self.admin.save()
+        self.assertFalse(stale_report_fact_tasks(self.org.id).exists())
+
+        with self.committed():
+            self.admin.username = 'yonetici'
+            self.admin.save()
+            self.assertTrue(stale_report_fact_tasks(self.org.id).exists())
+        self.assertFalse(stale_report_fact_tasks(self.org.id).exists())
+        data, _ = self.summary()
+        self.assertEqual(data['tasks'][0]['assignee_username'], 'yonetici')
+
+    def test_exports_are_written_from_report_sections(self):
+        with self.committed():
+            task = self.make_past_task()
+        query = f'year={self.past.year}&month={self.past.month}'
+        response = self.client.get(f'/api/task-reports/export/?{query}&file_format=xlsx')
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook['Kalem Detayı']
+        self.assertTrue(sheet['A1'].font.b)
+        self.assertEqual([cell.value for cell in sheet[2]][:4], [task.id, 'Kapalı ay', 0, 'KP-1'])
+
+        response = self.client.get(f'/api/task-reports/export/?{query}&file_format=docx&template=cnc')
+        self.assertEqual(response.status_code, 200)
+        document = Document(BytesIO(b''.join(response.streaming_content)))
+        rows = [[cell.text for cell in row.cells] for row in document.tables[-2].rows]
+        self.assertEqual(rows[0][:2], ['IS EMRI KODU', 'GOREV'])
+        self.assertEqual(rows[1][:3], [str(task.id), 'Kapalı ay', 'Kesim'])
+
+
+class FakeSMTP:
+    connections = []
+    refuse_connections = 0
+
+    def __init__(self, host, port, timeout=None):
+        if FakeSMTP.refuse_connections:
+            FakeSMTP.refuse_connections -= 1
+            raise OSError('baglanti reddedildi')
+        self.messages = []
+        FakeSMTP.connections.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, msg):
+        self.messages.append((msg['To'], msg['Subject']))
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ''
+
+
+class FakeSession:
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append((url, json['text']))
+        return FakeResponse(self.statuses.pop(0) if self.statuses else 200)
+
+
+@override_settings(SMTP_HOST='smtp.test', NOTIFICATION_MAX_ATTEMPTS=3)
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        FakeSMTP.connections = []
+        FakeSMTP.refuse_connections = 0
+        self.org = Organization.objects.create(name='Test', code='TEST')
+        self.user = User.objects.create_user(username='admin', password='x', organization=self.org, role='Admin', email='admin@test.local')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(organization=self.org, title='Kapak', status='todo', assignee=self.user, due=timezone.now() + timedelta(hours=3))
+
+    def deliver(self, session=None):
+        session = session or FakeSession()
+        with patch('support.notifications.smtplib.SMTP', FakeSMTP), patch('support.notifications._http_session', return_value=session):
+            return deliver_notifications(), session
+
+    def test_status_change_queues_notifications_without_sending(self):
+        AutomationRule.objects.create(
+            organization=self.org,
+            name='Herkese haber ver',
+            trigger='task_status_changed',
+            condition={'to': 'in-progress'},
+            action='multi_notify',
+            action_payload={
+                'emails': ['a@test.local', 'b@test.local', 'A@test.local', 'c@test.local'],
+                'webhooks': ['https://hooks.test/1', 'https://hooks.test/2'],
+            },
+        )
+        with patch('support.notifications.smtplib.SMTP', side_effect=AssertionError('SMTP istekte acildi')), \
+                patch('support.notifications._http_session', side_effect=AssertionError('HTTP istekte acildi')), \
+                self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch(f'/api/tasks/{self.task.id}/', {'status': 'in-progress'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(callbacks)
+        rows = NotificationOutbox.objects.filter(task=self.task)
+        self.assertEqual(rows.filter(channel='email').count(), 3)
+        self.assertEqual(rows.filter(channel='slack').count(), 2)
+        self.assertTrue(TaskComment.objects.filter(task=self.task, text__startswith='(Multi notify)').exists())
+
+        stats, session = self.deliver()
+        self.assertEqual(stats, {'claimed': 5, 'sent': 5, 'retried': 0, 'dead': 0})
+        self.assertEqual(len(FakeSMTP.connections), 1)
+        self.assertEqual(len(FakeSMTP.connections[0].messages), 3)
+        self.assertEqual(sorted(url for url, _ in session.posts), ['https://hooks.test/1', 'https://hooks.test/2'])
+        self.assertFalse(rows.exclude(status='sent').exists())
+        self.assertEqual(self.deliver()[0]['claimed'], 0)
+
+    def test_due_soon_notifications_are_deduplicated(self):
+        AutomationRule.objects.create(
+            organization=self.org,
+            name='Vade',
+            trigger='task_due_soon',
+            condition={'hours': 24},
+            action='notify',
+            action_payload={'webhook': 'https://hooks.test/due'},
+        )
+        run_due_soon_automations()
+        run_due_soon_automations()
+        self.assertEqual(
+            sorted(NotificationOutbox.objects.values_list('channel', 'recipient')),
+            [('email', 'admin@test.local'), ('slack', 'https://hooks.test/due')],
+        )
+
+    def test_failures_back_off_then_dead_letter(self):
+        make = lambda channel, recipient: NotificationOutbox.objects.create(
+            organization=self.org, task=self.task, channel=channel, recipient=recipient, subject='Konu', body='Mesaj'
+        )
+        flaky = make('slack', 'https://hooks.test/flaky')
+        gone = make('slack', 'https://hooks.test/gone')
+        mail = make('email', 'a@test.local')
+        FakeSMTP.refuse_connections = 1
+
+        stats, _ = self.deliver(FakeSession(503, 404))
+        self.assertEqual(stats, {'claimed': 3, 'sent': 0, 'retried': 2, 'dead': 1})
+        flaky.refresh_from_db()
+        gone.refresh_from_db()
+        self.assertEqual((gone.status, gone.attempts), ('dead', 1))
+        self.assertEqual((flaky.status, flaky.attempts), ('pending', 1))
+        self.assertGreater(flaky.available_at, timezone.now())
+        self.assertEqual(self.deliver()[0]['claimed'], 0)
+
+        for expected in (('pending', 2), ('dead', 3)):
+            NotificationOutbox.objects.filter(status='pending').update(available_at=timezone.now())
+            self.deliver(FakeSession(500))
+            flaky.refresh_from_db()
+            self.assertEqual((flaky.status, flaky.attempts), expected)
+        mail.refresh_from_db()
+        self.assertEqual((mail.status, mail.attempts), ('sent', 2))
+        self.assertIn('HTTP 500', flaky.last_error)
+
+
+class DueSoonAutomationTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Test', code='TEST')
+        self.other = Organization.objects.create(name='Diger', code='OTHER')
+        self.user = User.objects.create_user(username='admin', password='x', organization=self.org, role='Admin', email='admin@test.local')
+        self.now = timezone.now()
+        self.comment_rule = AutomationRule.objects.create(
+            organization=self.org, name='Yorum', trigger='task_due_soon', condition={'hours': 24},
+            action='add_comment', action_payload={'comment': 'Vade yaklasiyor'},
+        )
+        self.notify_rule = AutomationRule.objects.create(
+            organization=self.org, name='Haber', trigger='task_due_soon', condition={'hours': 2},
+            action='notify', action_payload={'webhook': 'https://hooks.test/due'},
+        )
+
+    def make_task(self, hours, org=None, status='todo'):
+        return Task.objects.create(
+            organization=org or self.org, title=f'Vade {hours}', status=status,
+            assignee=self.user, due=self.now + timedelta(hours=hours),
+        )
+
+    def run_rules(self):
+        with CaptureQueriesContext(connection) as queries:
+            stats = run_due_soon_rules(now=self.now)
+        return stats, len(queries)
+
+    def test_fires_once_per_rule_task_and_due(self):
+        soon = self.make_task(1)
+        later = self.make_task(5)
+        self.make_task(30)
+        self.make_task(1, status='done')
+        self.make_task(1, org=self.other)
+
+        stats, _ = self.run_rules()
+        self.assertEqual((stats['fired'], stats['comments'], stats['notifications']), (3, 3, 2))
+        self.assertEqual(
+            sorted(AutomationFireLog.objects.values_list('rule_id', 'task_id')),
+            sorted([(self.comment_rule.id, soon.id), (self.comment_rule.id, later.id), (self.notify_rule.id, soon.id)]),
+        )
+        self.assertEqual(NotificationOutbox.objects.filter(task=soon).count(), 2)
+
+        stats, _ = self.run_rules()
+        self.assertEqual(stats['fired'], 0)
+        self.assertEqual(TaskComment.objects.count(), 3)
+
+        Task.objects.filter(pk=later.pk).update(due=self.now + timedelta(hours=1, minutes=30))
+        stats, _ = self.run_rules()
+        self.assertEqual(stats['fired'], 2)
+        self.assertEqual(TaskComment.objects.filter(task=later).count(), 3)
+
+    def test_query_count_does_not_grow_with_tasks(self):
+        for _ in range(2):
+            self.make_task(1)
+        _, small = self.run_rules()
+        for _ in range(12):
+            self.make_task(1)
+        stats, large = self.run_rules()
+        self.assertEqual(stats['fired'], 24)
+        self.assertEqual(small, large)
@@ -2,8 +2,9 @@ from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
 from core.events import push_event
 from rest_framework.exceptions import PermissionDenied
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Q, Exists, OuterRef, Max
+from django.db.models import Q, Max
 import re
 import os
 import uuid
@@ -12,12 +13,14 @@ from audit.utils import log_entity_action
 from .models import Ticket, TicketMessage, Task, TaskAttachment, TaskComment, TaskChecklist, TaskTimeEntry, TaskModel, TaskProductionEntry, TaskMdfConsumption, TaskWorkflowTemplate
 from accounts.models import User, Team, TeamAssociate
 from .models_automation import AutomationRule
-from .utils import send_slack_webhook, send_email, generate_presigned_post, scan_file_with_clamav
+from .notifications import enqueue_notifications, notification
+from .utils import send_email, generate_presigned_post, scan_file_with_clamav
 from rest_framework import status
 from .serializers import (
     TicketSerializer,
     TicketMessageSerializer,
     TaskSerializer,
+    TaskListSerializer,
     TaskAttachmentSerializer,
     TaskCommentSerializer,
     TaskChecklistSerializer,
@@ -25,16 +28,18 @@ from .serializers import (
     AutomationRuleSerializer,
     TaskTimeEntrySerializer,
     TaskWorkflowTemplateSerializer,
+    parse_task_expand,
+    task_list_queryset,
 )
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils import timezone
 from datetime import datetime as dt_datetime
-from openpyxl import load_workbook
 
 from .workflow_utils import (
+    LINE_WORKFLOW_FIELDS,
     apply_product_line_to_task,
-    ensure_product_line_workflows,
+    normalize_line_workflows,
     ensure_workflow_state,
     format_shortfall_reason_for_storage,
     workflow_team_id_list,
@@ -43,6 +48,8 @@ from .workflow_utils import (
     resolve_production_gate,
 )
 from .checklist_sync import sync_workflow_checklist
+from .task_reporting import worker_active_task_summary, worker_hours_by_period
+from .team_queue import team_queue_queryset
 
 
 def assign_task_to_team_leader(task, team):
@@ -61,15 +68,20 @@ def user_may_claim_task_as_leader(user, team):
     return bool(lid and user.id == lid)
 
 
-def user_can_see_claim_queue_entry(task, user):
-    """my-team-queue: bu kullanıcı görevi üstlenebilecekleri listesinde görmeli mi?"""
+def user_can_see_claim_queue_entry(task, user, user_team_ids=None):
+    """my-team-queue: bu kullanıcı görevi üstlenebilecekleri listesinde görmeli mi?
+
+    Çok sayıda görev kontrol edilirken ``user_team_ids`` (üye + lider olunan ekipler) bir kez hesaplanıp verilmelidir.
+    """
     role = getattr(user, 'role', '')
     staff = role in ('Admin', 'Manager')
-    member_team_ids = set(user.teams.values_list('id', flat=True))
-    leader_team_ids = set(
-        Team.objects.filter(organization_id=task.organization_id, leader_id=user.id).values_list('id', flat=True)
-    )
-    user_team_ids = member_team_ids | leader_team_ids
+    if user_team_ids is None:
+        member_team_ids = set(user.teams.values_list('id', flat=True))
+        leader_team_ids = set(
+            Team.objects.filter(organization_id=task.organization_id, leader_id=user.id).values_list('id', flat=True)
+        )
+        user_team_ids = member_team_ids | leader_team_ids
+    user_team_ids = set(user_team_ids)
     wf = workflow_team_id_list(task)
     if getattr(task, 'workflow_parallel', False) and wf:
         if staff:
@@ -266,20 +278,6 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
     search_fields = ['title', 'status', 'priority']
     ordering_fields = ['due', 'priority', 'updated_at']
 
-    def _backfill_line_workflows(self, tasks):
-        for t in tasks:
-            if ensure_product_line_workflows(t):
-                t.save(
-                    update_fields=[
-                        'product_lines',
-                        'workflow_team_ids',
-                        'workflow_parallel',
-                        'current_team',
-                        'team',
-                        'updated_at',
-                    ]
-                )
-
     def get_queryset(self):
         qs = Task.objects.all()
         org = getattr(self.request.user, 'organization', None)
@@ -292,18 +290,22 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
             pass  # Org içindeki tüm görevleri göster
         elif role not in ['Admin', 'Manager']:
             qs = qs.filter(Q(owner=user) | Q(assignee=user) | Q(team__members=user)).distinct()
+        if self.action == 'list':
+            qs = task_list_queryset(qs, self._expand())
         return qs
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        self._backfill_line_workflows(queryset[:300])
-        return super().list(request, *args, **kwargs)
+    def _expand(self):
+        return parse_task_expand(self.request.query_params.get('expand'))
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        self._backfill_line_workflows([instance])
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+    def get_serializer_class(self):
+        if self.action in ('list', 'my_team_queue'):
+            return TaskListSerializer
+        return TaskSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self._expand()
+        return context
 
     def perform_create(self, serializer):
         if getattr(self.request.user, 'role', '') == 'Worker':
@@ -459,6 +461,8 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         Excel'den tek görev + çoklu ürün kalemi taslağı üretir.
         Her satır: 1 ürün kalemi.
         """
+        from openpyxl import load_workbook
+
         if getattr(request.user, 'role', '') == 'Worker':
             raise PermissionDenied("Worker rolündeki kullanıcılar görev içe aktaramaz")
         up = request.FILES.get('file')
@@ -778,18 +782,17 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         
         from_team = task.current_team or task.team
         history = task.handover_history or []
-        history.append(
-            {
-                "from_team": getattr(from_team, 'id', None),
-                "from_team_name": getattr(from_team, 'name', None),
-                "to_team": target_team.id,
-                "to_team_name": target_team.name,
-                "by": request.user.username,
-                "note": reason,
-                "type": "self-initiated",
-                "at": timezone.now().isoformat(),
-            }
-        )
+        handover = {
+            "from_team": getattr(from_team, 'id', None),
+            "from_team_name": getattr(from_team, 'name', None),
+            "to_team": target_team.id,
+            "to_team_name": target_team.name,
+            "by": request.user.username,
+            "note": reason,
+            "type": "self-initiated",
+            "at": timezone.now().isoformat(),
+        }
+        history.append(handover)
         
         task.current_team = target_team
         task.team = target_team
@@ -798,6 +801,9 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         task.handover_at = timezone.now()
         task.handover_history = history
         task.save(update_fields=['current_team', 'team', 'assignee', 'handover_reason', 'handover_at', 'handover_history', 'updated_at'])
+        # Çalışan takibi görev geçmişini taramasın diye son devir kullanıcıda tutulur.
+        request.user.last_self_handover = {**handover, 'task_id': task.id}
+        request.user.save(update_fields=['last_self_handover'])
         
         TaskComment.objects.create(
             task=task,
@@ -1248,17 +1254,8 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
             return Response(TaskSerializer(task, context={'request': request}).data)
 
         # Eski görevleri kalem-bazlı workflow formatına otomatik dönüştür.
-        if ensure_product_line_workflows(task):
-            task.save(
-                update_fields=[
-                    'product_lines',
-                    'workflow_team_ids',
-                    'workflow_parallel',
-                    'current_team',
-                    'team',
-                    'updated_at',
-                ]
-            )
+        if normalize_line_workflows(task):
+            task.save(update_fields=[*LINE_WORKFLOW_FIELDS, 'updated_at'])
         lines = list(getattr(task, 'product_lines', None) or [])
         active = int(getattr(task, 'active_product_index', 0) or 0)
         # NOT: Çoklu ürün olsa bile, son ekip onayından sonra workflow başa sarmaz.
@@ -2008,51 +2005,8 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         user_team_ids = list(member_team_ids | leader_team_ids)
         if not user_team_ids:
             return Response([])
-        assignee_in_current_team = Team.members.through.objects.filter(
-            team_id=OuterRef('current_team_id'),
-            user_id=OuterRef('assignee_id'),
-        )
-        base = Task.objects.filter(organization=org, current_team_id__in=user_team_ids).exclude(status='done')
-        # Sıralı akış: yalnızca havuz (assignee boş) — lider atanınca görev "Al" kuyruğunda görünmez, çift tıklama/azdırma önlenir.
-        qs_seq = base.filter(workflow_parallel=False, assignee__isnull=True)
-        qs_par = base.filter(workflow_parallel=True).filter(Q(assignee__isnull=True) | Exists(assignee_in_current_team))
-        qs = (qs_seq | qs_par).select_related('team', 'current_team').distinct().order_by('-updated_at')
-        seen = {t.id for t in qs}
-        out = list(qs)
-        par_ids = (
-            Task.objects.filter(organization=org, workflow_parallel=True)
-            .exclude(status='done')
-            .exclude(id__in=seen)
-            .values_list('id', flat=True)
-        )
-        for tid in par_ids:
-            t = (
-                Task.objects.filter(id=tid)
-                .select_related('team', 'current_team')
-                .first()
-            )
-            if t and parallel_queue_visible(t, user, user_team_ids):
-                out.append(t)
-                seen.add(t.id)
-        out.sort(key=lambda x: x.updated_at, reverse=True)
-        # Kalem-bazlı akışta current_team farklı olsa bile kullanıcı kendi açık kalemlerini görsün.
-        line_candidates = (
-            Task.objects.filter(organization=org)
-            .exclude(status='done')
-            .exclude(id__in=seen)
-            .select_related('team', 'current_team')
-            .order_by('-updated_at')[:400]
-        )
-        for t in line_candidates:
-            lines = list(getattr(t, 'product_lines', None) or [])
-            if not lines:
-                continue
-            if user_can_see_claim_queue_entry(t, user):
-                out.append(t)
-                seen.add(t.id)
-        out.sort(key=lambda x: x.updated_at, reverse=True)
-        out = [t for t in out if user_can_see_claim_queue_entry(t, user)]
-        return Response(TaskSerializer(out, many=True, context={'request': request}).data)
+        queue = team_queue_queryset(user, user_team_ids).order_by('-updated_at', '-id')
+        return Response(self.get_serializer(task_list_queryset(queue, self._expand()), many=True).data)
 
     @action(detail=False, methods=['get'], url_path='worker-tracking')
     def worker_tracking(self, request):
@@ -2066,47 +2020,24 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         
         org = request.user.organization
         
-        # Tüm worker'ları al
-        workers = User.objects.filter(organization=org, role='Worker')
+        # Tüm worker'ları al; görev bilgisi tek gruplu sorguyla gelir
+        workers = list(
+            User.objects.filter(organization=org, role='Worker').prefetch_related('teams').order_by('id')
+        )
+        active = worker_active_task_summary(org.id, [worker.id for worker in workers])
         
         tracking_data = []
         for worker in workers:
-            # Worker'ın aktif görevlerini al
-            active_tasks = Task.objects.filter(
-                organization=org,
-                assignee=worker,
-                status__in=['todo', 'in-progress']
-            ).select_related('team', 'current_team').order_by('-updated_at')
-            
-            # Worker'ın son self-handover'ını bul
-            last_handover = None
-            for task in active_tasks:
-                if task.handover_history:
-                    for h in reversed(task.handover_history):
-                        if h.get('type') == 'self-initiated' and h.get('by') == worker.username:
-                            last_handover = h
-                            break
-                    if last_handover:
-                        break
-            
-            # Worker'ın ana ekibi
-            primary_teams = list(worker.teams.values_list('name', flat=True))
-            
-            # Worker'ın şu an çalıştığı departman
-            current_department = None
-            if active_tasks.exists():
-                task = active_tasks.first()
-                current_department = task.current_team.name if task.current_team else (task.team.name if task.team else None)
-            
+            row = active.get(worker.id) or {}
             tracking_data.append({
                 'worker_id': worker.id,
                 'worker_name': worker.username,
                 'worker_email': worker.email,
-                'primary_teams': primary_teams,
-                'current_department': current_department,
-                'active_tasks_count': active_tasks.count(),
-                'last_handover': last_handover,
-                'last_activity': active_tasks.first().updated_at if active_tasks.exists() else None,
+                'primary_teams': [team.name for team in worker.teams.all()],
+                'current_department': row.get('department'),
+                'active_tasks_count': row.get('active_tasks_count', 0),
+                'last_handover': worker.last_self_handover,
+                'last_activity': row.get('updated_at'),
                 'has_account': True,
             })
         
@@ -2116,15 +2047,15 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
             .prefetch_related('teams')
             .order_by('full_name', 'id')
         ):
-            team_names = list(a.teams.values_list('name', flat=True))
+            teams = list(a.teams.all())
             field_staff.append(
                 {
                     'associate_id': a.id,
                     'worker_name': a.full_name,
                     'worker_email': '',
                     'contact': a.phone or '—',
-                    'primary_teams': team_names,
-                    'team_ids': list(a.teams.values_list('id', flat=True)),
+                    'primary_teams': [team.name for team in teams],
+                    'team_ids': [team.id for team in teams],
                     'current_department': None,
                     'active_tasks_count': 0,
                     'last_handover': None,
@@ -2168,25 +2099,19 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         ))
         completed_tasks = list(tasks.filter(status='done').values(
             'id', 'title', 'status', 'priority', 'due', 'start', 'end', 'updated_at'
-        ))[:50]
-
-        # Zaman kayıtlarından günlük/aylık toplam
-        from .models import TaskTimeEntry
-        entries = TaskTimeEntry.objects.filter(
-            task__organization=org,
-            user=worker
-        ).only('started_at', 'ended_at')
+        )[:50])
 
-        daily_hours = {}
-        monthly_hours = {}
-        for e in entries:
-            start = e.started_at
-            end = e.ended_at or timezone.now()
-            hrs = max(0, (end - start).total_seconds() / 3600)
-            day_key = start.date().isoformat()
-            month_key = start.strftime('%Y-%m')
-            daily_hours[day_key] = daily_hours.get(day_key, 0) + hrs
-            monthly_hours[month_key] = monthly_hours.get(month_key, 0) + hrs
+        # Zaman kayıtlarından günlük/aylık toplam: ?start=YYYY-MM-DD&end=YYYY-MM-DD (opsiyonel)
+        bounds = {}
+        for key in ('start', 'end'):
+            raw = request.query_params.get(key)
+            if not raw:
+                continue
+            try:
+                bounds[key] = dt_datetime.strptime(str(raw)[:10], '%Y-%m-%d').date()
+            except ValueError:
+                return Response({'detail': f'{key} YYYY-MM-DD olmalı'}, status=status.HTTP_400_BAD_REQUEST)
+        daily_hours, monthly_hours = worker_hours_by_period(org.id, worker.id, **bounds)
 
         return Response({
             'worker_id': worker.id,
@@ -2209,7 +2134,10 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
         task._automation_in_progress = True
         org = getattr(self.request.user, 'organization', None)
         rules = AutomationRule.objects.filter(organization=org, is_active=True, trigger=trigger)
+        # Aynı olayın tekrar işlenmesi (ör. yeniden denenen istek) ikinci bildirim üretmez.
+        event_key = f"{trigger}:{(extra or {}).get('from')}>{(extra or {}).get('to')}@{task.updated_at.isoformat() if task.updated_at else ''}"
         for rule in rules:
+            dedup = f"rule:{rule.id}:task:{task.id}:{event_key}"
             cond = rule.condition or {}
             if trigger == 'task_status_changed':
                 if cond.get('from') and extra and extra.get('from') != cond.get('from'):
@@ -2250,10 +2178,12 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
                     msg = payload.get('message') or f"Task {task.title}: durum {extra.get('from')} -> {extra.get('to')}"
                     webhook = payload.get('webhook')
                     email_to = payload.get('email') or (task.assignee.email if task.assignee else None)
-                    TaskComment.objects.create(task=task, author=None, type='activity', text='(Notify) Otomasyon tetiklendi')
-                    send_slack_webhook(msg, webhook_url=webhook)
-                    if email_to:
-                        send_email(email_to, f"Görev bildirimi: {task.title}", msg)
+                    with transaction.atomic():
+                        TaskComment.objects.create(task=task, author=None, type='activity', text='(Notify) Otomasyon tetiklendi')
+                        enqueue_notifications([
+                            notification(task, rule, 'slack', webhook or settings.SLACK_WEBHOOK_URL, msg, dedup=dedup),
+                            notification(task, rule, 'email', email_to or '', msg, subject=f"Görev bildirimi: {task.title}", dedup=dedup),
+                        ])
                     push_event(
                         {
                             "type": "notification.automation",
@@ -2269,11 +2199,13 @@ class TaskViewSet(OrgScopedMixin, viewsets.ModelViewSet):
                     msg = payload.get('message') or f"Task {task.title}: durum {extra.get('from')} -> {extra.get('to')}"
                     emails = payload.get('emails') or []
                     hooks = payload.get('webhooks') or []
-                    TaskComment.objects.create(task=task, author=None, type='activity', text='(Multi notify) Otomasyon tetiklendi')
-                    for h in hooks:
-                        send_slack_webhook(msg, webhook_url=h)
-                    for em in emails:
-                        send_email(em, f"Görev bildirimi: {task.title}", msg)
+                    subject = f"Görev bildirimi: {task.title}"
+                    with transaction.atomic():
+                        TaskComment.objects.create(task=task, author=None, type='activity', text='(Multi notify) Otomasyon tetiklendi')
+                        enqueue_notifications(
+                            [notification(task, rule, 'slack', h, msg, dedup=dedup) for h in hooks]
+                            + [notification(task, rule, 'email', em, msg, subject=subject, dedup=dedup) for em in emails]
+                        )
                     push_event(
                         {
                             "type": "notification.automation",
@@ -0,0 +1,67 @@
+"""Eski görevlerin kalem bazlı iş akışına tek seferlik dönüştürülmesi.
+
+Liste ve detay uçları yalnızca okur; ``workflow_schema_version`` güncel olmayan
+görevler burada id sırasıyla, küçük partiler halinde normalize edilir. Her parti
+kendi transaction'ında çalışır ve işlenen görevlerin sürümü yükseltildiği için
+yarıda kalan bir çalıştırma tekrar başlatıldığında kaldığı yerden devam eder.
+Kilitli satırlar atlanır, bir sonraki çalıştırmada işlenir.
+"""
+
+from django.db import transaction
+
+from .models import Task
+from .report_facts import refresh_task_report_facts
+from .team_queue import sync_task_queue_entries
+from .workflow_utils import LINE_WORKFLOW_FIELDS, LINE_WORKFLOW_SCHEMA_VERSION, ensure_product_line_workflows
+
+DEFAULT_BATCH_SIZE = 200
+
+
+def pending_line_workflow_tasks(organization_id=None):
+    qs = Task.objects.filter(workflow_schema_version__lt=LINE_WORKFLOW_SCHEMA_VERSION)
+    if organization_id:
+        qs = qs.filter(organization_id=organization_id)
+    return qs
+
+
+def backfill_line_workflow_batch(*, after_id=0, batch_size=DEFAULT_BATCH_SIZE, organization_id=None):
+    """Bir partiyi normalize eder; ``(son_id, islenen, degisen)`` döner, iş kalmadıysa son_id None."""
+    with transaction.atomic():
+        tasks = list(
+            pending_line_workflow_tasks(organization_id)
+            .filter(id__gt=after_id)
+            .order_by('id')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        if not tasks:
+            return None, 0, 0
+        changed = 0
+        for task in tasks:
+            if ensure_product_line_workflows(task):
+                changed += 1
+            task.workflow_schema_version = LINE_WORKFLOW_SCHEMA_VERSION
+        # bulk_update: sinyal tetiklemez ve updated_at'i kullanıcı değişikliği gibi ilerletmez; kuyruk satırları ve rapor olguları elle senkronlanır.
+        Task.objects.bulk_update(tasks, LINE_WORKFLOW_FIELDS)
+        sync_task_queue_entries(tasks)
+        refresh_task_report_facts(tasks)
+    return tasks[-1].id, len(tasks), changed
+
+
+def backfill_line_workflows(*, batch_size=DEFAULT_BATCH_SIZE, organization_id=None, max_batches=None, progress=None):
+    after_id = 0
+    processed = changed = batches = 0
+    while max_batches is None or batches < max_batches:
+        after_id, count, batch_changed = backfill_line_workflow_batch(
+            after_id=after_id,
+            batch_size=batch_size,
+            organization_id=organization_id,
+        )
+        if after_id is None:
+            break
+        batches += 1
+        processed += count
+        changed += batch_changed
+        if progress:
+            progress(after_id, processed, changed)
+    # İmlecin gerisinde kilitli olduğu için atlanan görevler de bekleyen sayılır.
+    return processed, changed, not pending_line_workflow_tasks(organization_id).exists()
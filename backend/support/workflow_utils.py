@@ -3,6 +3,9 @@
 import re
 
 SHORTFALL_REASON_MAX_LEN = 2000
+# Task.workflow_schema_version bu değere ulaştığında kalem bazlı akış normalize edilmiştir.
+LINE_WORKFLOW_SCHEMA_VERSION = 1
+LINE_WORKFLOW_FIELDS = ['product_lines', 'workflow_team_ids', 'workflow_parallel', 'current_team', 'team', 'workflow_schema_version']
 
 
 def format_shortfall_reason_for_storage(qty_done: int, reason: str) -> str:
@@ -387,6 +390,42 @@ def ensure_product_line_workflows(task):
     return changed
 
 
+def _queue_assignee_id(value):
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    # Sayı olmayan atama hiçbir kullanıcıyla eşleşmez ama "atanmamış" da sayılmaz.
+    return 0
+
+
+def queue_entry_rows(task):
+    """TaskQueueEntry izdüşümü: ``(line_index, team_id, is_current, assignee_id, stage_done)`` listesi."""
+    rows = []
+    for index, raw in enumerate(getattr(task, 'product_lines', None) or []):
+        ln = raw if isinstance(raw, dict) else {}
+        ids = [int(x) for x in (ln.get('workflow_team_ids') or []) if str(x).isdigit()]
+        state = ln.get('workflow_stage_state') or {}
+        current = ln.get('current_team_id')
+        for tid in dict.fromkeys(ids):
+            st = state.get(str(tid)) or {}
+            rows.append((index, tid, str(current) == str(tid), _queue_assignee_id(st.get('assignee_id')), bool(st.get('stage_done'))))
+    state = getattr(task, 'workflow_stage_state', None) or {}
+    for tid in dict.fromkeys(workflow_team_id_list(task)):
+        st = state.get(str(tid)) or {}
+        rows.append((None, tid, tid == task.current_team_id, _queue_assignee_id(st.get('assignee_id')), bool(st.get('stage_done'))))
+    return rows
+
+
+def normalize_line_workflows(task):
+    """ensure_product_line_workflows + sürüm işareti; kaydetmez, LINE_WORKFLOW_FIELDS ile kaydedilmelidir."""
+    changed = ensure_product_line_workflows(task)
+    if int(getattr(task, 'workflow_schema_version', 0) or 0) < LINE_WORKFLOW_SCHEMA_VERSION:
+        task.workflow_schema_version = LINE_WORKFLOW_SCHEMA_VERSION
+        changed = True
+    return changed
+
+
 def parallel_queue_visible(task, user, user_team_ids):
     """Paralel akışta bu kullanıcı görevi ekip kuyruğunda görmeli mi?
 
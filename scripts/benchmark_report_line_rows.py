@@ -0,0 +1,221 @@
+"""Is emri rapor sablonunda kalem satiri acmanin olcumu.
+
+Ust, kalem ve alt satirlarda birlestirmeler, stiller ve satir yukseklikleri olan 40
+satirlik bir sablonda ``production.report_exports._expand_line_rows`` ile onceki
+yol (``insert_rows`` + satir satir ``_copy_row`` + ``_restore_shifted_merges``,
+asagida degistirilmeden kopyalandi) yan yana olculur; her biri icin satir acma ve
+ardindan calisma kitabinin kaydedilmesi icin gecen en iyi sure yazilir.
+
+    python scripts/benchmark_report_line_rows.py [--lines 10 100 1000] [--repeat 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import os
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import django
+
+
+ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = ROOT / 'backend'
+
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from openpyxl import Workbook, load_workbook  # noqa: E402
+from openpyxl.styles import Border, Font, PatternFill, Side  # noqa: E402
+from openpyxl.utils import get_column_letter  # noqa: E402
+
+from production.report_exports import LINE_TOKEN_PATTERN, _expand_line_rows  # noqa: E402
+
+
+# --- Onceki yol (9c52eaa oncesi production/report_exports.py) ---------------------------
+
+def previous_expand_line_rows(worksheet, line_count):
+    template_row = None
+    for row in worksheet.iter_rows():
+        if any(isinstance(cell.value, str) and LINE_TOKEN_PATTERN.search(cell.value) for cell in row):
+            template_row = row[0].row
+            break
+    if not template_row or line_count <= 1:
+        return
+
+    amount = line_count - 1
+    max_row_before = worksheet.max_row
+    merged_ranges = list(worksheet.merged_cells.ranges)
+    row_dimensions = {
+        row_index: _row_dimension_snapshot(worksheet.row_dimensions[row_index])
+        for row_index in range(template_row + 1, max_row_before + 1)
+    }
+    template_row_dimension = _row_dimension_snapshot(worksheet.row_dimensions[template_row])
+
+    for merged in merged_ranges:
+        worksheet.unmerge_cells(str(merged))
+
+    worksheet.insert_rows(template_row + 1, amount=amount)
+    for source_row, snapshot in sorted(row_dimensions.items(), reverse=True):
+        _apply_row_dimension_snapshot(worksheet.row_dimensions[source_row + amount], snapshot)
+    for row_index in range(template_row + 1, template_row + line_count):
+        _apply_row_dimension_snapshot(worksheet.row_dimensions[row_index], template_row_dimension)
+
+    for row_index in range(template_row + 1, template_row + line_count):
+        _copy_row(worksheet, template_row, row_index)
+
+    _restore_shifted_merges(worksheet, merged_ranges, template_row, amount)
+
+    for row_index in range(template_row, template_row + line_count):
+        line_number = row_index - template_row + 1
+        for cell in worksheet[row_index]:
+            if isinstance(cell.value, str):
+                cell.value = cell.value.replace('{kalem1.', f'{{kalem{line_number}.')
+
+
+def _row_dimension_snapshot(row_dimension):
+    return {
+        'height': row_dimension.height,
+        'hidden': row_dimension.hidden,
+        'outlineLevel': row_dimension.outlineLevel,
+        'collapsed': row_dimension.collapsed,
+    }
+
+
+def _apply_row_dimension_snapshot(row_dimension, snapshot):
+    row_dimension.height = snapshot.get('height')
+    row_dimension.hidden = snapshot.get('hidden')
+    row_dimension.outlineLevel = snapshot.get('outlineLevel') or 0
+    row_dimension.collapsed = snapshot.get('collapsed') or False
+
+
+def _restore_shifted_merges(worksheet, merged_ranges, template_row, inserted_count):
+    restored = set()
+    for merged in merged_ranges:
+        if merged.min_row > template_row:
+            ref = _merge_ref(
+                merged.min_row + inserted_count,
+                merged.min_col,
+                merged.max_row + inserted_count,
+                merged.max_col,
+            )
+        elif merged.min_row <= template_row < merged.max_row:
+            ref = _merge_ref(merged.min_row, merged.min_col, merged.max_row + inserted_count, merged.max_col)
+        else:
+            ref = _merge_ref(merged.min_row, merged.min_col, merged.max_row, merged.max_col)
+        if ref not in restored:
+            worksheet.merge_cells(ref)
+            restored.add(ref)
+
+        if merged.min_row == template_row and merged.max_row == template_row:
+            for offset in range(1, inserted_count + 1):
+                copied_ref = _merge_ref(
+                    merged.min_row + offset,
+                    merged.min_col,
+                    merged.max_row + offset,
+                    merged.max_col,
+                )
+                if copied_ref not in restored:
+                    worksheet.merge_cells(copied_ref)
+                    restored.add(copied_ref)
+
+
+def _merge_ref(min_row, min_col, max_row, max_col):
+    return f'{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}'
+
+
+def _copy_row(worksheet, source_row, target_row):
+    worksheet.row_dimensions[target_row].height = worksheet.row_dimensions[source_row].height
+    worksheet.row_dimensions[target_row].hidden = worksheet.row_dimensions[source_row].hidden
+    for col in range(1, worksheet.max_column + 1):
+        source = worksheet.cell(source_row, col)
+        target = worksheet.cell(target_row, col)
+        target.value = source.value
+        if source.has_style:
+            target._style = copy.copy(source._style)
+        if source.number_format:
+            target.number_format = source.number_format
+        if source.font:
+            target.font = copy.copy(source.font)
+        if source.fill:
+            target.fill = copy.copy(source.fill)
+        if source.border:
+            target.border = copy.copy(source.border)
+        if source.alignment:
+            target.alignment = copy.copy(source.alignment)
+        if source.protection:
+            target.protection = copy.copy(source.protection)
+
+
+# --- Olcum -----------------------------------------------------------------------------
+
+IMPLEMENTATIONS = {'onceki': previous_expand_line_rows, 'yeni': _expand_line_rows}
+
+
+def template_bytes(rows=40):
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet['A1'] = 'Is Emri {isEmriNo}'
+    worksheet.merge_cells('A1:D1')
+    worksheet['A2'] = 'Baslik'
+    worksheet.merge_cells('A2:A3')
+    worksheet['B3'] = '{kalem1.sn}'
+    worksheet['C3'] = '{kalem1.urunAdi}'
+    worksheet['D3'] = '{kalem1.adet}'
+    worksheet['C3'].font = Font(bold=True)
+    worksheet['D3'].border = Border(bottom=Side(style='thin'))
+    worksheet['D3'].number_format = '0.00'
+    worksheet['B3'].fill = PatternFill('solid', fgColor='FFFF00')
+    worksheet['E3'] = '{kalem1.aciklama}'
+    worksheet['E3'].border = Border(top=Side(style='thin'))
+    worksheet.merge_cells('E3:F3')
+    worksheet.row_dimensions[3].height = 22
+    for row in range(4, rows):
+        worksheet.cell(row, 1, f'alt {row}')
+        worksheet.cell(row, 2, row)
+    worksheet.row_dimensions[10].height = 30
+    worksheet.merge_cells('A20:C21')
+    worksheet['A30'] = '{notlar}'
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def best_of(expand_line_rows, raw, line_count, repeat):
+    best_expand = best_save = None
+    for _ in range(repeat):
+        workbook = load_workbook(BytesIO(raw))
+        started = time.perf_counter()
+        expand_line_rows(workbook.active, line_count)
+        expanded = time.perf_counter()
+        workbook.save(BytesIO())
+        saved = time.perf_counter()
+        best_expand = min(best_expand or expanded - started, expanded - started)
+        best_save = min(best_save or saved - expanded, saved - expanded)
+    return best_expand, best_save
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args()
+
+    raw = template_bytes()
+    print(f'{"kalem":>6}  {"":6}  {"satir acma":>12}  {"kaydetme":>12}')
+    for line_count in options.lines:
+        timings = {name: best_of(func, raw, line_count, options.repeat) for name, func in IMPLEMENTATIONS.items()}
+        for name, (expand, save) in timings.items():
+            print(f'{line_count:6d}  {name:6}  {expand * 1000:9.1f} ms  {save * 1000:9.1f} ms')
+        speedup = timings['onceki'][0] / timings['yeni'][0] if timings['yeni'][0] else float('inf')
+        print(f'{"":6}  {"oran":6}  {speedup:11.1f}x')
+
+
+if __name__ == '__main__':
+    main()
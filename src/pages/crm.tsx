@@ -25,6 +25,21 @@ import { formatCurrency, formatDate } from '@/lib/utils'
 import type { Opportunity, Contact as ContactType, Company as CompanyType } from '@/types'
 import { BadgeCheck, Download, HandCoins, Plus, Timer, Trash2, Upload } from 'lucide-react'
 
+const PARTNER_IMPORT_BACKGROUND_BYTES = 256 * 1024
+const PARTNER_IMPORT_POLL_MS = 1500
+const PARTNER_IMPORT_MAX_POLLS = 80
+
+// Sonuç; iş belirlenen sürede bitmezse (ör. çalışan bir worker yoksa) null döner.
+async function waitForPartnerImport(jobId: number) {
+  for (let attempt = 0; attempt < PARTNER_IMPORT_MAX_POLLS; attempt += 1) {
+    await new Promise((resolve) => setTimeout(resolve, PARTNER_IMPORT_POLL_MS))
+    const { data } = await api.get(`/partners/import-jobs/${jobId}/`)
+    if (data?.status === 'completed') return data.result || {}
+    if (data?.status === 'failed') throw new Error(data.error || 'Cari aktarımı tamamlanamadı.')
+  }
+  return null
+}
+
 const contactSchema = z.object({
   companyId: z.string(),
   name: z.string().min(2),
@@ -448,11 +463,23 @@ export function CompaniesPage() {
     const formData = new FormData()
     formData.append('file', file)
     formData.append('update_existing', 'true')
+    if (file.size > PARTNER_IMPORT_BACKGROUND_BYTES) formData.append('background', '1')
     setImportingPartners(true)
     try {
       const response = await api.post('/partners/import-excel/', formData)
+      let result = response.data || {}
+      if (response.status === 202 && result.job?.id) {
+        toast({ title: 'Cari aktarımı başladı', description: 'Dosya arka planda işleniyor.' })
+        result = await waitForPartnerImport(result.job.id)
+        if (!result) {
+          toast({
+            title: 'Cari aktarımı sürüyor',
+            description: 'Dosya hâlâ işleniyor. Cari listesini daha sonra yenileyerek sonucu kontrol edebilirsiniz.',
+          })
+          return
+        }
+      }
       await useAppStore.getState().hydrateFromApi()
-      const result = response.data || {}
       toast({
         title: 'Cari aktarımı tamamlandı',
         description: `${result.created || 0} yeni, ${result.updated || 0} güncellendi, ${result.skipped || 0} atlandı.`,
@@ -352,7 +352,10 @@ export const useAppStore = create<AppState>()(
         fetchIf('orders.view', '/sales-orders/'),
         fetchIf('teams.view', '/teams/'),
         fetchIf('users.view', '/auth/users/', quiet),
-        fetchIf('tasks.view.own', '/tasks/'),
+        // Görev ekranları iç içe kayıtları listeden okuyor; liste varsayılan olarak yalnızca sayaç döndürür.
+        fetchIf('tasks.view.own', '/tasks/', {
+          params: { expand: 'attachments,comments,checklist,time_entries,production_entries,mdf_consumptions' },
+        }),
       ])
       const [
         productsRes,